@@ -12,6 +12,7 @@ from .audio_playback import AudioPlaybackModule
 try:
     from common.data_models import GameEvent # 作成したデータモデル
     from common.config_loader import load_config # 設定ファイル読み込み関数
+    from common import metrics
 except ImportError:
     print("Error: data_models.py not found.")
     exit(1)
@@ -40,6 +41,8 @@ if __name__ == '__main__':
         print("Error: Failed to load configuration file. Exiting.")
         exit(1)
     print("Starting Audio Playback Module...")
+    # Prometheus 形式の計測値 (/metrics)
+    metrics.start_http_server(int(os.environ.get('METRICS_PORT', audio_config_data.get('metrics_port', 0))))
 
     playback = AudioPlaybackModule(audio_config=audio_config_data)
 
@@ -1,12 +1,14 @@
 # playback_module.py
 import zmq
 import json
+import queue
 import time
 import threading
 from typing import Optional, Dict, Any
 # --- データモデルをインポート ---
 try:
     from common.data_models import GameEvent # 作成したデータモデル
+    from common import metrics
 except ImportError:
     print("Error: data_models.py not found.")
     exit(1)
@@ -14,11 +16,17 @@ except ImportError:
 
 
 class AudioPlaybackModule:
-    def __init__(self, 
-                 audio_config: Dict[str, Any]):
-        
+    def __init__(self,
+                 audio_config: Dict[str, Any],
+                 context: Optional[zmq.Context] = None,
+                 direct: bool = False):
+        """
+        context: 1 プロセス構成 (main.py) で共有する ZMQ コンテキスト (inproc:// に接続する場合は必須)
+        direct: ZMQ を購読せず、オーケストレーターのコールバック (on_event) から GameEvent を直接受け取る
+        """
+
         self.audio_config = audio_config
-        zmq_publisher_uri = audio_config.get("zmq_publisher_uri", "tcp://localhost:5555")
+        zmq_publisher_uri = audio_config.get("zmq_connect_uri", audio_config.get("zmq_publisher_uri", "tcp://localhost:5555"))
 
         if "event_actions" not in self.audio_config:
              self.audio_config["event_actions"] = {}
@@ -26,10 +34,31 @@ class AudioPlaybackModule:
              self.audio_config["DEFAULT_ACTION"] = {"action": "ignore"}
 
         self.zmq_publisher_uri = zmq_publisher_uri
-        self.context = zmq.Context()
+        self._owns_context = context is None
+        self.context = context if context is not None else zmq.Context()
         self.subscriber: Optional[zmq.Socket] = None
         self._stop_event = threading.Event() # プロセスだが便宜上流用
-        print(f"Playback Module initialized, connecting to {self.zmq_publisher_uri}")
+        # direct: オーケストレーターのスレッドを止めないよう、コールバックではキューに入れるだけにする
+        self.direct = direct
+        self._direct_queue: queue.Queue = queue.Queue(maxsize=audio_config.get("direct_queue_size", 1024))
+        self.direct_drops = 0
+        # Prometheus 形式の計測値 (/metrics の公開は起動側で行う)
+        registry = metrics.REGISTRY
+        self._metric_events = registry.counter(
+            "ssl_audio_events_total", "GameEvents handled by the playback module", ("event_type",))
+        self._metric_handle_seconds = registry.histogram(
+            "ssl_audio_handle_seconds", "Time spent in the playback handler per event")
+        self._metric_errors = registry.counter(
+            "ssl_audio_errors_total", "Events that could not be decoded or handled", ("stage",))
+        self._metric_reconnects = registry.counter("ssl_audio_reconnects_total", "Subscriber reconnects after errors")
+        registry.gauge("ssl_audio_direct_queue_depth", "Events waiting in the direct-callback queue").set_function(
+            self._direct_queue.qsize)
+        registry.counter("ssl_audio_direct_drops_total", "Events dropped because the direct-callback queue was full"
+                         ).set_function(lambda: self.direct_drops)
+        if direct:
+            print("Playback Module initialized, receiving events directly from the orchestrator")
+        else:
+            print(f"Playback Module initialized, connecting to {self.zmq_publisher_uri}")
 
     def _connect_subscriber(self):
         """Subscriberソケットを(再)接続する"""
@@ -43,12 +72,57 @@ class AudioPlaybackModule:
         self.subscriber.connect(self.zmq_publisher_uri)
         print(f"Playback Module connected to {self.zmq_publisher_uri} and subscribed to 'event'")
 
+    def on_event(self, game_event: GameEvent):
+        """Orchestrator.add_event_callback に登録するコールバック (オーケストレーターのスレッドで呼ばれる)"""
+        try:
+            self._direct_queue.put_nowait(game_event)
+        except queue.Full:
+            self.direct_drops += 1
+
     def stop(self):
         self._stop_event.set()
         print("Playback Module stop requested.")
 
+    def _handle_event(self, game_event: GameEvent):
+        """受信したイベントを処理する"""
+        # ミニマル版ではコンソールに表示するだけ
+        print(f"Playback Module Received GameEvent:")
+        print(f"  Timestamp: {game_event.timestamp}")
+        print(f"  Type:      {game_event.event_type}")
+        print(f"  Priority:  {game_event.priority}")
+        print(f"  Data:      {game_event.data}")
+        print("-" * 10)
+
+    def _dispatch(self, game_event: GameEvent):
+        """_handle_event を呼び、イベント数と処理時間を数える"""
+        started = time.perf_counter()
+        self._handle_event(game_event)
+        self._metric_handle_seconds.observe(time.perf_counter() - started)
+        self._metric_events.labels(game_event.event_type).inc()
+
+    def _run_direct(self):
+        """コールバックで受け取ったイベントを処理する (デコード無し)"""
+        while not self._stop_event.is_set():
+            try:
+                game_event = self._direct_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self._dispatch(game_event)
+            except Exception as e:
+                print(f"Playback Module: Unexpected error processing event: {e}")
+                self._metric_errors.labels("handle").inc()
+        if self.direct_drops:
+            print(f"Playback Module: {self.direct_drops} events dropped (direct queue full)")
+
     def run(self):
         print("Playback Module starting...")
+        if self.direct:
+            self._run_direct()
+            print("Playback Module shutting down...")
+            if self._owns_context:
+                self.context.term()
+            return
         self._connect_subscriber()
 
         while not self._stop_event.is_set():
@@ -69,18 +143,14 @@ class AudioPlaybackModule:
                         json_str = payload.decode('utf-8')
                         game_event = GameEvent.from_json(json_str)
                         # --- ここで受信したイベントを処理 ---
-                        # ミニマル版ではコンソールに表示するだけ
-                        print(f"Playback Module Received GameEvent:")
-                        print(f"  Timestamp: {game_event.timestamp}")
-                        print(f"  Type:      {game_event.event_type}")
-                        print(f"  Priority:  {game_event.priority}")
-                        print(f"  Data:      {game_event.data}")
-                        print("-" * 10)
+                        self._dispatch(game_event)
                         # ------------------------------------
                     except (UnicodeDecodeError, ValueError, json.JSONDecodeError) as e:
                         print(f"Playback Module: Error decoding event payload: {e}")
+                        self._metric_errors.labels("decode").inc()
                     except Exception as e:
                         print(f"Playback Module: Unexpected error processing event: {e}")
+                        self._metric_errors.labels("handle").inc()
 
             except zmq.Again:
                 # RCVTIMEOによるタイムアウト、正常。stop()チェックのため。
@@ -88,6 +158,7 @@ class AudioPlaybackModule:
             except zmq.ZMQError as e:
                 print(f"Playback Module: ZeroMQ Error: {e}")
                 print("Attempting to reconnect...")
+                self._metric_reconnects.inc()
                 time.sleep(2) # 再接続前に少し待つ
                 self._connect_subscriber() # 接続試行
             except Exception as e:
@@ -99,5 +170,6 @@ class AudioPlaybackModule:
         print("Playback Module shutting down...")
         if self.subscriber:
             self.subscriber.close()
-        self.context.term()
-        print("Playback Module ZeroMQ context terminated.")
\ No newline at end of file
+        if self._owns_context:
+            self.context.term()
+            print("Playback Module ZeroMQ context terminated.")
@@ -0,0 +1,110 @@
+# benchmarks/bench_checkpoint_restore.py
+# checkpoint ファイルによる再起動の検証と計測。
+#  1. 試合途中でオーケストレーターを「クラッシュ」させ、checkpoint から再起動した後の出力が
+#     中断なしの場合と一致する (イベントの再通知も取りこぼしも無い) ことを確認する。
+#  2. checkpoint からの復元を含む起動 → ready までの時間を、checkpoint 無しの起動と比較する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_checkpoint_restore
+import argparse
+import contextlib
+import io
+import os
+import queue
+import statistics
+import tempfile
+import time
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.state_checkpoint import CheckpointFileWriter, write_checkpoint_file
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def _event_keys(events):
+    return [(e.event_type, e.data.get("team")) for e in events]
+
+
+def verify_restart(checkpoint_path: str, crash_at: int) -> bool:
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    packets = list(synthetic_match(seed=1))
+    reference = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://reference"}, PRIORITY_CONFIG)
+    expected = []
+    first = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://first"}, PRIORITY_CONFIG)
+    writer = CheckpointFileWriter(checkpoint_path, first._checkpoint_snapshot)
+    for index, ref_msg in enumerate(packets):
+        events = reference._process_referee_message(ref_msg)
+        if index < crash_at:
+            first._process_referee_message(ref_msg)
+            writer.flush() # バックグラウンドスレッドと同じ処理を同期的に実行
+        else:
+            expected.extend(events)
+    # ここで first はクラッシュしたとみなし、checkpoint から新しいインスタンスを起動する
+    restarted = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://restarted",
+                                             "checkpoint_file": checkpoint_path}, PRIORITY_CONFIG)
+    actual = []
+    for ref_msg in packets[crash_at:]:
+        actual.extend(restarted._process_referee_message(ref_msg))
+    for orchestrator in (reference, first, restarted):
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+    return restarted.restored_from_checkpoint and _event_keys(actual) == _event_keys(expected)
+
+
+def measure_startup(checkpoint_path, port: int, iterations: int):
+    """Orchestrator の生成から ready (bind 完了) までの時間を計測する"""
+    samples = []
+    for _ in range(iterations):
+        config = {"zmq_publisher_uri": f"tcp://127.0.0.1:{port}"}
+        if checkpoint_path:
+            config["checkpoint_file"] = checkpoint_path
+        start = time.perf_counter()
+        orchestrator = Orchestrator(queue.Queue(), config, PRIORITY_CONFIG)
+        orchestrator.start()
+        orchestrator.ready.wait()
+        samples.append(time.perf_counter() - start)
+        orchestrator.stop()
+        orchestrator.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint restore correctness and startup-to-ready time")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--port", type=int, default=56655)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint_path = os.path.join(tmp, "orchestrator.ckpt")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok = all(verify_restart(checkpoint_path, crash_at) for crash_at in (500, 3000, 7000))
+        print(f"restart without re-announcing or missing events: {ok}")
+        if not ok:
+            raise SystemExit("FAILED")
+
+        # 書き込みコスト (最大サイズの dedup window)
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://size"}, PRIORITY_CONFIG)
+        orchestrator.processed_game_event_ids.update(range(10_000))
+        checkpoint = orchestrator.make_checkpoint()
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+        start = time.perf_counter()
+        for _ in range(100):
+            write_checkpoint_file(checkpoint_path, checkpoint)
+        write_ms = (time.perf_counter() - start) * 10
+        print(f"checkpoint file: {os.path.getsize(checkpoint_path)} bytes "
+              f"({len(checkpoint.processed_game_event_ids)} IDs), write+fsync+rename {write_ms:.3f} ms")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            fresh = measure_startup(None, args.port, args.iterations)
+            restored = measure_startup(checkpoint_path, args.port, args.iterations)
+        for label, samples in (("fresh start", fresh), ("restore from checkpoint", restored)):
+            samples_ms = sorted(s * 1000 for s in samples)
+            print(f"{label:>24}: startup-to-ready median {statistics.median(samples_ms):.2f} ms, "
+                  f"p95 {samples_ms[int(len(samples_ms) * 0.95) - 1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# benchmarks/bench_cold_start.py
+# `python -m orchestrator` の起動時間 (exec から最初のイベントが購読者に届くまで) を計測する。
+# 偽の GC が起動前から 100 Hz で Referee をマルチキャスト (ループバック) に送り、パケットごとにコマンドを
+# STOP / HALT で切り替える (command_counter は 1 ずつ進む) ので、起動後 2 件目のパケットでイベントが検出される。
+# 購読者は起動前から zmq_publisher_uri に接続を試みておき、'event' の最初のメッセージを受け取った時刻を記録する。
+# ソース (orchestrator/, common/) は一時ディレクトリにコピーして
+#  - cold: バイトコード (.pyc) も設定ファイルのキャッシュも無く、書き込みもできない状態
+#          (docker-compose で ./orchestrator を読み取り専用でマウントし、PYTHONPYCACHEPREFIX を使わない場合の毎回の起動)
+#  - warm: compileall 済みで、設定ファイルのキャッシュもある状態 (イメージのビルド時にコンパイルした場合)
+# で起動する。標準ライブラリ・依存パッケージ・protobuf の生成コードは環境にあるものをそのまま使う。
+# 準備完了 (READY_FILE が作られる) までの時間も出す。イベントは並べ替えバッファで event_reorder_tolerance_sec
+# (既定 0.1 s) だけ保持されてから publish されるので、その分も含む。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_cold_start --trials 5
+import argparse
+import compileall
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import yaml
+import zmq
+
+from orchestrator.event_listener import referee_pb2
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.path.join(REPO, "config")
+MULTICAST_GROUP = "224.5.23.1"
+
+
+class FakeGameController(threading.Thread):
+    """パケットごとにコマンドを切り替える Referee を rate_hz で送り続ける"""
+    def __init__(self, port: int, rate_hz: float = 100.0):
+        super().__init__(daemon=True)
+        self.port = port
+        self.interval = 1.0 / rate_hz
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        ref = referee_pb2.Referee()
+        ref.source_identifier = "bench_cold_start"
+        ref.stage = referee_pb2.Referee.NORMAL_FIRST_HALF
+        for team in (ref.yellow, ref.blue):
+            team.name, team.score, team.red_cards, team.yellow_cards = "team", 0, 0, 0
+            team.timeouts, team.timeout_time, team.goalkeeper = 4, 300_000_000, 0
+        counter = 0
+        next_send = time.monotonic()
+        while not self._stop_event.is_set():
+            now_us = int(time.time() * 1_000_000)
+            counter += 1
+            ref.packet_timestamp = now_us
+            ref.command = referee_pb2.Referee.STOP if counter % 2 else referee_pb2.Referee.HALT
+            ref.command_counter = counter
+            ref.command_timestamp = now_us
+            sender.sendto(ref.SerializeToString(), (MULTICAST_GROUP, self.port))
+            next_send += self.interval
+            time.sleep(max(0.0, next_send - time.monotonic()))
+        sender.close()
+
+
+def write_config(directory: str, base_port: int) -> str:
+    """ポートを重ならないようにし、checkpoint ファイルを無効にしたオーケストレーターの設定を書く"""
+    with open(os.path.join(CONFIG_DIR, "config_orchestrator.yaml"), "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["zmq_publisher_uri"] = f"tcp://127.0.0.1:{base_port}"
+    config["metrics_port"] = base_port + 1
+    config["profiler_control_uri"] = f"tcp://127.0.0.1:{base_port + 2}"
+    config["checkpoint_file"] = ""
+    vision = config.setdefault("vision", {})
+    vision["publish_uri"] = f"tcp://127.0.0.1:{base_port + 3}"
+    vision["multicast_port"] = base_port + 4
+    path = os.path.join(directory, "config_orchestrator.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def copy_source(directory: str) -> str:
+    """orchestrator/ と common/ をバイトコード抜きでコピーし、そのディレクトリを返す"""
+    source = os.path.join(directory, "src")
+    for package in ("orchestrator", "common"):
+        shutil.copytree(os.path.join(REPO, package), os.path.join(source, package),
+                        ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    return source
+
+
+def start_once(source: str, config_path: str, gc_port: int, env: dict, ready_file: str, timeout: float = 30.0):
+    """起動して最初のイベントを受け取るまで待ち、(exec→ready [秒] または None, exec→最初のイベント [秒]) を返す"""
+    context = zmq.Context.instance()
+    subscriber = context.socket(zmq.SUB)
+    subscriber.setsockopt(zmq.SUBSCRIBE, b"event")
+    subscriber.setsockopt(zmq.RECONNECT_IVL, 10)
+    subscriber.connect(yaml.safe_load(open(config_path))["zmq_publisher_uri"])
+    if os.path.exists(ready_file):
+        os.remove(ready_file)
+    command = [sys.executable, "-u", "-m", "orchestrator",
+               "--orchestrator-config", config_path,
+               "--priority-config", os.path.join(CONFIG_DIR, "config_priority.yaml"),
+               "--rules-config", os.path.join(CONFIG_DIR, "config_rules.yaml")]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=source, env={**env, "GC_MULTICAST_PORT": str(gc_port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ready_at = None
+    try:
+        while True:
+            if subscriber.poll(timeout=2):
+                subscriber.recv_multipart()
+                first_event = time.perf_counter() - started
+                break
+            if ready_at is None and os.path.exists(ready_file):
+                ready_at = time.perf_counter() - started
+            if time.perf_counter() - started > timeout or process.poll() is not None:
+                raise RuntimeError("orchestrator did not publish an event")
+        deadline = time.perf_counter() + 2.0
+        while ready_at is None and time.perf_counter() < deadline and os.path.exists(os.path.dirname(ready_file)):
+            if os.path.exists(ready_file):
+                ready_at = time.perf_counter() - started # イベントより後に検出した (上限として扱う)
+                break
+            time.sleep(0.002)
+    finally:
+        process.terminate()
+        process.wait()
+        subscriber.close(linger=0)
+    return ready_at, first_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orchestrator cold start: exec -> first published event")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--port", type=int, default=15600, help="base port (publisher, metrics, profiler, vision)")
+    parser.add_argument("--gc-port", type=int, default=10603, help="referee multicast port of the fake GC")
+    args = parser.parse_args()
+
+    gc = FakeGameController(args.gc_port)
+    gc.start()
+    results = {"cold": ([], []), "warm": ([], [])}
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = write_config(directory, args.port)
+        ready_file = os.path.join(directory, "ready")
+        cold_source = copy_source(os.path.join(directory, "cold"))
+        warm_source = copy_source(os.path.join(directory, "warm"))
+        compileall.compile_dir(warm_source, quiet=1)
+        # PYTHONPATH の相対パス (. や ./proto) はリポジトリ基準に直し、リポジトリの代わりにコピーを先頭に置く
+        python_path = [os.path.abspath(path) for path in os.environ.get("PYTHONPATH", "").split(os.pathsep) if path]
+        python_path = [path for path in python_path if path != REPO]
+        # どちらもバイトコードは書かない (cold は読み取り専用のマウント、warm はビルド時にコンパイル済み)
+        base_env = {key: value for key, value in os.environ.items() if key != "PYTHONPYCACHEPREFIX"}
+        base_env.update(READY_FILE=ready_file, PYTHONDONTWRITEBYTECODE="1")
+        envs = {mode: {**base_env, "PYTHONPATH": os.pathsep.join([source] + python_path),
+                       "CONFIG_CACHE_DIR": os.path.join(directory, mode, "cache")}
+                for mode, source in (("cold", cold_source), ("warm", warm_source))}
+        start_once(warm_source, config_path, args.gc_port, envs["warm"], ready_file) # 設定ファイルのキャッシュを作る
+        for trial in range(args.trials):
+            for mode in ("cold", "warm"):
+                if mode == "cold":
+                    shutil.rmtree(envs["cold"]["CONFIG_CACHE_DIR"], ignore_errors=True)
+                ready, first_event = start_once(
+                    cold_source if mode == "cold" else warm_source, config_path, args.gc_port, envs[mode], ready_file)
+                results[mode][0].append(ready)
+                results[mode][1].append(first_event)
+    gc.stop()
+
+    for mode, (ready, first_event) in results.items():
+        ready = [r for r in ready if r is not None]
+        ready_text = f"ready {statistics.median(ready) * 1000:6.0f} ms, " if ready else "ready (no READY_FILE), "
+        print(f"{mode}: {ready_text}first event {statistics.median(first_event) * 1000:6.0f} ms "
+              f"(min {min(first_event) * 1000:.0f}, max {max(first_event) * 1000:.0f}) over {args.trials} trials")
+
+
+if __name__ == '__main__':
+    main()
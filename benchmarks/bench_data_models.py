@@ -0,0 +1,136 @@
+# benchmarks/bench_data_models.py
+# common/data_models の to_json/from_json を、asdict() / cls(**dict) を使う旧実装と比較する。
+# 旧実装はこのファイル内に比較用としてそのまま残している。
+#
+#   PYTHONPATH=. python -m benchmarks.bench_data_models
+import argparse
+import json
+import sys
+import time
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+from common.data_models import GameEvent, GameStateUpdate, TeamState
+
+
+# --- 旧実装 (比較用) ---
+@dataclass
+class LegacyGameEvent:
+    timestamp: float = field(default_factory=time.time)
+    event_type: str = ""
+    priority: int = 0
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, json_str: str) -> 'LegacyGameEvent':
+        return cls(**json.loads(json_str))
+
+
+@dataclass
+class LegacyTeamState:
+    name: str = ""
+    score: int = 0
+    red_cards: int = 0
+    yellow_cards: int = 0
+    yellow_card_times_us: List[int] = field(default_factory=list)
+    timeouts_left: int = 0
+    timeout_time_left_us: int = 0
+    goalkeeper_id: int = 0
+    foul_count: Optional[int] = None
+    max_allowed_bots: Optional[int] = None
+
+
+@dataclass
+class LegacyGameStateUpdate:
+    timestamp: float = field(default_factory=time.time)
+    stage: str = ""
+    command: str = ""
+    stage_time_left_us: Optional[int] = None
+    current_action_time_remaining_us: Optional[int] = None
+    team_yellow: LegacyTeamState = field(default_factory=LegacyTeamState)
+    team_blue: LegacyTeamState = field(default_factory=LegacyTeamState)
+    status_message: str = ""
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, json_str: str) -> 'LegacyGameStateUpdate':
+        data_dict = json.loads(json_str)
+        yellow_data = data_dict.get('team_yellow', {})
+        blue_data = data_dict.get('team_blue', {})
+        known_team_fields = LegacyTeamState.__annotations__.keys()
+        data_dict['team_yellow'] = LegacyTeamState(**{k: v for k, v in yellow_data.items() if k in known_team_fields})
+        data_dict['team_blue'] = LegacyTeamState(**{k: v for k, v in blue_data.items() if k in known_team_fields})
+        known_state_fields = cls.__annotations__.keys()
+        return cls(**{k: v for k, v in data_dict.items() if k in known_state_fields})
+
+
+# --- 計測 ---
+def _event_data() -> Dict[str, Any]:
+    # 実際に publish されるイベントと同程度の入れ子を持つ data
+    return {"team": "YELLOW", "by_bot": 3, "location": {"x": 1.23, "y": -0.45},
+            "details": {"kick_speed": 6.7, "max_ball_height": 0.12, "chipped": False}}
+
+
+def _state(state_cls, team_cls):
+    team = dict(name="Team", score=2, red_cards=0, yellow_cards=1, yellow_card_times_us=[90_000_000],
+                timeouts_left=3, timeout_time_left_us=240_000_000, goalkeeper_id=1, foul_count=2, max_allowed_bots=11)
+    return state_cls(timestamp=1_700_000_000.0, stage="NORMAL_FIRST_HALF", command="STOP", stage_time_left_us=120_000_000,
+                     team_yellow=team_cls(**team), team_blue=team_cls(**team), status_message="")
+
+
+def _per_call_us(stmt, number: int, repeat: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e6
+
+
+def _memory_per_event(cls, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    events = [cls(event_type="EVENT_BALL_LEFT_FIELD_TOUCH_LINE_YELLOW", priority=2, data={}) for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del events
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameEvent / GameStateUpdate serialization microbenchmark")
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    new_event = GameEvent(timestamp=1_700_000_000.0, event_type="EVENT_FOUL_PUSHING_YELLOW", priority=5, data=_event_data())
+    old_event = LegacyGameEvent(timestamp=1_700_000_000.0, event_type="EVENT_FOUL_PUSHING_YELLOW", priority=5, data=_event_data())
+    new_state = _state(GameStateUpdate, TeamState)
+    old_state = _state(LegacyGameStateUpdate, LegacyTeamState)
+    # 出力が同一であることを確認してから計測する
+    assert new_event.to_json() == old_event.to_json()
+    assert new_state.to_json() == old_state.to_json()
+    event_json, state_json = new_event.to_json(), new_state.to_json()
+
+    cases = [
+        ("GameEvent.to_json", old_event.to_json, new_event.to_json),
+        ("GameEvent.from_json", lambda: LegacyGameEvent.from_json(event_json), lambda: GameEvent.from_json(event_json)),
+        ("GameStateUpdate.to_json", old_state.to_json, new_state.to_json),
+        ("GameStateUpdate.from_json", lambda: LegacyGameStateUpdate.from_json(state_json),
+         lambda: GameStateUpdate.from_json(state_json)),
+    ]
+    print(f"Python {sys.version.split()[0]}, best of {args.repeat} x {args.number} calls")
+    for label, old, new in cases:
+        old_us = _per_call_us(old, args.number, args.repeat)
+        new_us = _per_call_us(new, args.number, args.repeat)
+        print(f"{label:>26}: asdict/**kwargs {old_us:6.2f} us, direct {new_us:6.2f} us ({old_us / new_us:.2f}x)")
+
+    old_bytes = _memory_per_event(LegacyGameEvent, 100_000)
+    new_bytes = _memory_per_event(GameEvent, 100_000)
+    print(f"{'GameEvent memory':>26}: dataclass {old_bytes:.0f} B/event, slots {new_bytes:.0f} B/event")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# benchmarks/bench_event_listener.py
+# EventListener の受信経路を計測する。
+#  1. 受信 1 件あたりのコスト: 溜めておいた Referee データグラムを、従来の方法 (recvfrom(65535) + 再利用メッセージへの
+#     ParseFromString + CopyFrom) と、プールのバッファへの recvmsg_into (SO_RXQ_OVFL の補助データ付き) +
+#     memoryview からの FromString で読み出して比較する。
+#  2. 取りこぼしの内訳: 送信側の限界の速さでマルチキャスト (ループバック) に送り、SO_RCVBUF を変えて
+#     受信数・カーネルでの破棄数 (SO_RXQ_OVFL / /proc/net/udp)・Python 側の破棄数の合計が送信数と一致するかを見る。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_event_listener --count 10000
+import argparse
+import contextlib
+import io
+import os
+import queue
+import socket
+import statistics
+import threading
+import time
+
+from orchestrator.event_listener import EventListener, SO_RXQ_OVFL, proc_udp_drops, referee_pb2
+from .referee_stream import synthetic_match
+
+# receive_cost で受信ソケットに溜めるデータグラム数 (小さなデータグラムでも 1 件あたり約 1 KB の受信バッファを使う)
+FILL_COUNT = 3000
+
+
+class MeasuredEventListener(EventListener):
+    """run() を実行したスレッドの CPU 時間を記録する"""
+    cpu_sec = 0.0
+
+    def run(self):
+        start = time.thread_time()
+        try:
+            super().run()
+        finally:
+            self.cpu_sec = time.thread_time() - start
+
+
+def referee_packets(count: int):
+    packets = []
+    for ref_msg in synthetic_match():
+        packets.append(ref_msg.SerializeToString())
+        if len(packets) >= count:
+            break
+    return packets
+
+
+def fill_socket(packets):
+    """受信ソケットに packets を全て溜めた状態にする (ループバックのユニキャスト)"""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 64 * 1024 * 1024)
+    receiver.bind(("127.0.0.1", 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for packet in packets:
+        sender.sendto(packet, receiver.getsockname())
+    sender.close()
+    receiver.setblocking(False)
+    return receiver
+
+
+def receive_cost(packets, repeat: int):
+    """
+    データグラム 1 件あたりの受信 + デコード時間 [us] (従来 / プール + recvmsg_into)。
+    受信バッファ (net.core.rmem_max まで) に収まるよう先頭 FILL_COUNT 件を使う
+    """
+    packets = packets[:FILL_COUNT]
+    def legacy(sock):
+        reused = referee_pb2.Referee()
+        out = []
+        while True:
+            try:
+                data, _ = sock.recvfrom(65535)
+            except BlockingIOError:
+                return out
+            reused.ParseFromString(data)
+            msg_copy = referee_pb2.Referee()
+            msg_copy.CopyFrom(reused)
+            out.append(msg_copy)
+
+    def pooled(sock):
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        pool = [bytearray(65535) for _ in range(16)]
+        views = [memoryview(buffer) for buffer in pool]
+        sizes = [0] * 16
+        ancbufsize = socket.CMSG_SPACE(4)
+        out = []
+        while True:
+            count = 0
+            while count < 16:
+                try:
+                    size, _, _, _ = sock.recvmsg_into([pool[count]], ancbufsize)
+                except BlockingIOError:
+                    break
+                sizes[count] = size
+                count += 1
+            if count == 0:
+                return out
+            for i in range(count):
+                out.append(referee_pb2.Referee.FromString(views[i][:sizes[i]]))
+
+    results = []
+    for fn in (legacy, pooled):
+        samples = []
+        for _ in range(repeat):
+            sock = fill_socket(packets)
+            start = time.perf_counter()
+            received = fn(sock)
+            samples.append(time.perf_counter() - start)
+            sock.close()
+            assert len(received) == len(packets), (fn.__name__, len(received))
+        results.append(statistics.median(samples) * 1e6 / len(packets))
+    return results
+
+
+def blast(packets, rcvbuf_bytes, port: int, consumer_delay_sec: float):
+    """送信側の限界の速さで送り、(リスナー, 統計, 取り出した数, 経過秒) を返す。consumer_delay_sec はキューの取り出し側の遅さ"""
+    output_queue = queue.Queue()
+    listener = MeasuredEventListener(output_queue, multicast_port=port, rcvbuf_bytes=rcvbuf_bytes)
+    listener.start()
+    time.sleep(0.3)
+    consumed = []
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set() or not output_queue.empty():
+            try:
+                consumed.append(output_queue.get(timeout=0.05))
+            except queue.Empty:
+                continue
+            if consumer_delay_sec:
+                time.sleep(consumer_delay_sec)
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    start = time.monotonic()
+    for packet in packets:
+        sender.sendto(packet, (listener.multicast_group, port))
+    elapsed = time.monotonic() - start
+    time.sleep(0.5)
+    stats = listener.stats()
+    listener.stop()
+    listener.join()
+    done.set()
+    consumer.join()
+    sender.close()
+    return listener, stats, len(consumed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EventListener receive path: per-datagram cost and drop accounting")
+    parser.add_argument("--count", type=int, default=10000, help="datagrams to send")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=10930)
+    args = parser.parse_args()
+
+    packets = referee_packets(args.count)
+    print(f"{len(packets)} referee datagrams ({statistics.mean(map(len, packets)):.0f} B each)")
+
+    legacy_us, pooled_us = receive_cost(packets, args.repeat)
+    print(f"receive + decode per datagram ({min(len(packets), FILL_COUNT)} queued): recvfrom + ParseFromString + CopyFrom {legacy_us:.2f} us, "
+          f"pooled recvmsg_into + FromString {pooled_us:.2f} us ({legacy_us / pooled_us:.2f}x)")
+
+    for i, rcvbuf in enumerate((None, 4 * 1024 * 1024)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            listener, stats, consumed, elapsed = blast(packets, rcvbuf, args.port + i, 0.0)
+        accounted = stats["datagrams_received"] + (stats["kernel_drops"] or 0)
+        print(f"SO_RCVBUF {'default' if rcvbuf is None else rcvbuf} (actual {stats['rcvbuf_bytes']}): "
+              f"sent {len(packets)} in {elapsed * 1000:.0f} ms, received {stats['datagrams_received']}, "
+              f"kernel drops {stats['kernel_drops']} ({stats['kernel_drops_source']}), "
+              f"python drops {stats['decode_errors'] + stats['truncated'] + stats['queue_drops']}, "
+              f"unaccounted {len(packets) - accounted}; max {stats['max_drain']} datagrams per wakeup, "
+              f"listener CPU {listener.cpu_sec / max(1, stats['datagrams_received']) * 1e6:.2f} us/datagram")
+
+    # SO_RXQ_OVFL は受信したデータグラムがキューに入った時点の値なので、溢れさせた受信ソケットを全て読み出して
+    # 最後の値と /proc/net/udp の drops を比べる
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    receiver.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.setblocking(False)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for packet in packets[:1000]:
+        sender.sendto(packet, receiver.getsockname())
+    proc_drops = proc_udp_drops(os.fstat(receiver.fileno()).st_ino)
+    ovfl, received = 0, 0
+    while True:
+        try:
+            _, ancdata, _, _ = receiver.recvmsg_into([bytearray(65535)], socket.CMSG_SPACE(4))
+        except BlockingIOError:
+            break
+        received += 1
+        if ancdata:
+            ovfl = int.from_bytes(ancdata[0][2][:4], "little")
+    print(f"overflowed socket (1000 sent, {received} received): last SO_RXQ_OVFL {ovfl}, "
+          f"/proc/net/udp drops {proc_drops}")
+    receiver.close()
+    sender.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_event_reorder.py
+# EventReorderBuffer (orchestrator/event_reorder.py) による並べ替えの効果と、追加される遅延・処理コストを計測する。
+# 合成試合の game_event の created_timestamp を 0–--max-delay 秒だけ前にずらし (autoRef が検出してから GC が
+# パケットに載せるまでの遅れ)、同じパケットで検出したコマンド変化より前の時刻にする。
+# tolerance ごとに、publish 順での時刻の逆転数・保持時間 (p50 / p99 / 最大) と、パケット 1 件あたりのコストを出す。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_event_reorder --max-delay 0.2
+import argparse
+import contextlib
+import io
+import queue
+import random
+import statistics
+import time
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.event_reorder import EventReorderBuffer
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+# ホストの時計が GC より進んでいる量 (秒) と、受信までの遅延の揺らぎ (秒)
+HOST_OFFSET_SEC = 1.5
+RECEIVE_JITTER_SEC = 0.005
+
+
+def record_match(seed: int, max_delay_sec: float):
+    """合成試合をオーケストレーターに通し、(packet_timestamp [us], その packet で検出されたイベント) の列を返す"""
+    rng = random.Random(seed)
+    shifts = {} # game_event の id -> 前にずらす量 (同じイベントは毎パケット同じ値)
+    with contextlib.redirect_stdout(io.StringIO()):
+        orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://reorder"}, PRIORITY_CONFIG)
+        packets = []
+        for ref_msg in synthetic_match(seed=seed):
+            for proto_event in ref_msg.game_events:
+                shift = shifts.setdefault(proto_event.id, int(rng.uniform(0, max_delay_sec) * 1_000_000))
+                proto_event.created_timestamp -= shift
+            packets.append((ref_msg.packet_timestamp, orchestrator._process_referee_message(ref_msg)))
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+    return packets
+
+
+def replay(packets, tolerance_sec: float, max_hold_sec: float, seed: int):
+    """
+    パケットのレートで届いたものとして並べ替えを通す (ホスト時刻は packet 時刻から作る)。
+    (publish 順のイベント, バッファ) を返す
+    """
+    rng = random.Random(seed)
+    buffer = EventReorderBuffer(tolerance_sec=tolerance_sec, max_hold_sec=max_hold_sec)
+    published = []
+    for packet_timestamp, events in packets:
+        now = packet_timestamp / 1_000_000.0
+        buffer.observe_packet(packet_timestamp, received_at=now + HOST_OFFSET_SEC + rng.uniform(0, RECEIVE_JITTER_SEC))
+        if events:
+            buffer.push(events, packet_timestamp, now=now)
+        published.extend(buffer.pop_ready(now=now))
+    published.extend(buffer.flush())
+    return published, buffer
+
+
+def inversions(events) -> int:
+    """publish 順で、既に送ったイベントより前の時刻のイベントの数"""
+    count, latest = 0, float("-inf")
+    for game_event in events:
+        if game_event.timestamp < latest:
+            count += 1
+        latest = max(latest, game_event.timestamp)
+    return count
+
+
+def per_packet_cost(packets, tolerance_sec: float, repeat: int) -> float:
+    """observe_packet + push + pop_ready のパケット 1 件あたりの時間 [us]"""
+    samples = []
+    for _ in range(repeat):
+        buffer = EventReorderBuffer(tolerance_sec=tolerance_sec)
+        start = time.perf_counter()
+        for packet_timestamp, events in packets:
+            now = packet_timestamp / 1_000_000.0
+            buffer.observe_packet(packet_timestamp, received_at=now)
+            if events:
+                buffer.push(events, packet_timestamp, now=now)
+            buffer.pop_ready(now=now)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6 / len(packets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-time reordering: order, added latency and cost")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-delay", type=float, default=0.2,
+                        help="game events are created up to this many seconds before their packet")
+    parser.add_argument("--max-hold", type=float, default=0.5, help="max_hold_sec (host time)")
+    parser.add_argument("--tolerances", type=float, nargs="+", default=[0.0, 0.05, 0.1, 0.2, 0.3])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    packets = record_match(args.seed, args.max_delay)
+    total = sum(len(events) for _, events in packets)
+    print(f"synthetic match: {len(packets)} packets, {total} events "
+          f"(game events created up to {args.max_delay * 1000:.0f} ms before their packet)")
+    print(f"arrival order: {inversions(e for _, events in packets for e in events)} events older than an "
+          f"earlier one")
+
+    for tolerance in args.tolerances:
+        published, buffer = replay(packets, tolerance, args.max_hold, args.seed)
+        assert len(published) == total
+        stats = buffer.stats()
+        cost_us = per_packet_cost(packets, tolerance, args.repeat)
+        print(f"tolerance {tolerance * 1000:3.0f} ms: {inversions(published):3d} out of order after publish, "
+              f"{stats['reordered']} reordered, {stats['late']} late, {stats['forced']} forced; "
+              f"hold p50 {stats['hold_ms_p50']} ms, p99 {stats['hold_ms_p99']} ms, max {stats['hold_ms_max']} ms; "
+              f"clock skew {stats['clock_skew_ms']} ms; {cost_us:.2f} us/packet")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_event_rules.py
+# 複合イベントのルールエンジン (orchestrator/event_rules.py) のイベント 1 件あたりのコストを、ルール数を変えて計測する。
+# config_rules.yaml のルールに、実在する event_type を組み合わせたランダムなルール (2–4 ステップの並び、
+# 同じチームの回数、相手チームへの遷移) を加え、合成試合のイベント列を流す。
+# 比較として、event_type の索引を使わずに全ルールの全ステップを毎回調べる場合も計測する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_event_rules --rules 100 300 1000
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import time
+
+from common.config_loader import load_config
+from orchestrator.event_rules import RuleEngine, compile_rule
+from .bench_match_stats import record_match
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config", "config_rules.yaml")
+
+
+class ScanningRuleEngine(RuleEngine):
+    """索引を使わず、イベントごとに全ルールの全ステップの event_type を調べる (比較用)"""
+    def process(self, game_event):
+        self._listeners.clear()
+        return super().process(game_event)
+
+
+def random_rules(count: int, event_types, seed: int):
+    """実在する event_type を組み合わせたランダムなルールを count 件作る"""
+    rng = random.Random(seed)
+    team_types = sorted({t.rsplit("_", 1)[0] + "_*" for t in event_types if t.endswith(("_YELLOW", "_BLUE"))})
+    specs = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.3:
+            # 同じチームの n 回
+            specs.append({"name": f"REPEAT_{i}", "within_sec": rng.choice([30, 60, 120, 300]),
+                          "steps": [{"types": rng.sample(team_types, rng.randint(1, 4)), "where": {"team": "$team"},
+                                     "count": rng.randint(2, 4)}]})
+        elif kind < 0.6:
+            # あるチームのイベントの後に相手チームのイベント
+            specs.append({"name": f"HANDOVER_{i}", "within_sec": rng.choice([10, 20, 60]),
+                          "cancel_on": ["COMMAND_HALT"],
+                          "steps": [{"types": [rng.choice(team_types)], "where": {"team": "$team"}},
+                                    {"types": [rng.choice(team_types)], "where": {"team": "!$team"}}]})
+        else:
+            # 具体的な event_type の並び
+            steps = [{"types": rng.sample(event_types, rng.randint(1, 3))} for _ in range(rng.randint(2, 4))]
+            specs.append({"name": f"SEQUENCE_{i}", "within_sec": rng.choice([15, 60, 180]), "steps": steps})
+    return [compile_rule(spec) for spec in specs]
+
+
+def build_engine(cls, rule_count: int, event_types, seed: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = load_config(CONFIG_PATH) or {}
+    engine = cls.from_config(base)
+    engine.rules.extend(random_rules(max(0, rule_count - len(engine.rules)), event_types, seed))
+    return engine
+
+
+def run(engine, events):
+    composites = []
+    for game_event in events:
+        composites.extend(engine.process(game_event))
+    return composites
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Composite event rules: per-event cost vs number of rules")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 300, 1000])
+    parser.add_argument("--matches", type=int, default=5, help="synthetic matches to replay")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # 試合ごとに時刻が重ならないようにずらして連結する
+    events = []
+    for match in range(args.matches):
+        for _, packet_events in record_match(args.seed + match):
+            for game_event in packet_events:
+                game_event.timestamp += match * 10_000
+                events.append(game_event)
+    event_types = sorted({e.event_type for e in events})
+    print(f"{len(events)} events from {args.matches} synthetic matches ({len(event_types)} distinct event types)")
+
+    for rule_count in args.rules:
+        results = {}
+        for name, cls in (("indexed", RuleEngine), ("scan", ScanningRuleEngine)):
+            samples = []
+            for _ in range(args.repeat):
+                engine = build_engine(cls, rule_count, event_types, args.seed)
+                start = time.perf_counter()
+                composites = run(engine, events)
+                samples.append(time.perf_counter() - start)
+            results[name] = (statistics.median(samples) * 1e6 / len(events), composites, engine)
+        indexed_us, composites, engine = results["indexed"]
+        scan_us, scan_composites, _ = results["scan"]
+        same = [c.to_json() for c in composites] == [c.to_json() for c in scan_composites]
+        listeners = [len(v) for v in engine._listeners.values()]
+        open_runs = sum(rule.open_runs() for rule in engine.rules)
+        print(f"{len(engine.rules):5d} rules: indexed {indexed_us:7.2f} us/event, scan all rules {scan_us:8.2f} us/event "
+              f"({scan_us / indexed_us:.1f}x); {len(composites)} composites (same: {same}); "
+              f"rules per event type mean {statistics.mean(listeners):.1f}, max {max(listeners)}; "
+              f"{open_runs} partial matches at the end")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_event_store.py
+# 大会 1 回分の GameEvent を EventStore に投入し、追記速度・クエリ時間・メモリ使用量・再起動時の読み込み時間を計測する。
+#
+#   PYTHONPATH=. python -m benchmarks.bench_event_store --matches 120
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from common.data_models import GameEvent
+from event_store.event_store import EventStore
+from event_store.service import EventStoreService, query
+
+EVENT_TYPES = [
+    ("COMMAND_STOP", False), ("COMMAND_NORMAL_START", False), ("COMMAND_FORCE_START", False),
+    ("COMMAND_BALL_PLACEMENT", True), ("COMMAND_DIRECT_FREE", True), ("EVENT_BALL_LEFT_FIELD_TOUCH_LINE", True),
+    ("EVENT_BALL_LEFT_FIELD_GOAL_LINE", True), ("EVENT_FOUL_PUSHING", True), ("EVENT_FOUL_CRASH", True),
+    ("EVENT_PLACEMENT_SUCCEEDED", True), ("EVENT_PLACEMENT_FAILED", True), ("EVENT_GOAL_CONFIRMED", True),
+    ("EVENT_ATTACKER_TOO_CLOSE_TO_DEFENSE_AREA", True), ("EVENT_BOT_TOO_FAST_IN_STOP", True),
+]
+WEIGHTS = [20, 18, 2, 10, 10, 12, 6, 4, 2, 8, 2, 2, 2, 2]
+
+
+def tournament_payloads(matches: int, events_per_match: int, seed: int = 0):
+    """試合ごとに時刻が進む GameEvent JSON を生成する。返り値は (payload のリスト, 各試合の (開始, 終了) 時刻)"""
+    rng = random.Random(seed)
+    payloads, match_ranges = [], []
+    now = 1_700_000_000.0
+    for _ in range(matches):
+        start = now
+        for _ in range(events_per_match):
+            now += rng.uniform(0.2, 2.5)
+            event_type, has_team = rng.choices(EVENT_TYPES, WEIGHTS)[0]
+            data = {}
+            if has_team:
+                data["team"] = rng.choice(("YELLOW", "BLUE"))
+                if event_type.startswith("EVENT_PLACEMENT"):
+                    data.update(time_taken=rng.uniform(3, 20), precision=rng.uniform(0, 0.15))
+            payloads.append(GameEvent(timestamp=now, event_type=event_type, priority=5, data=data).to_json())
+        match_ranges.append((start, now))
+        now += 30 * 60 # 試合間の休憩
+    return payloads, match_ranges
+
+
+def _time_ms(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event store ingest / query / memory benchmark")
+    parser.add_argument("--matches", type=int, default=120)
+    parser.add_argument("--events-per-match", type=int, default=600)
+    parser.add_argument("--segment-max-events", type=int, default=4096)
+    parser.add_argument("--max-segments-in-memory", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--port", type=int, default=56757)
+    args = parser.parse_args()
+
+    payloads, match_ranges = tournament_payloads(args.matches, args.events_per_match)
+    print(f"{len(payloads)} events ({args.matches} matches), segment {args.segment_max_events} events, "
+          f"max {args.max_segments_in_memory} segments in memory")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = dict(data_dir=tmp, segment_max_events=args.segment_max_events,
+                      max_segments_in_memory=args.max_segments_in_memory)
+
+        tracemalloc.start()
+        store = EventStore(**config)
+        start = time.perf_counter()
+        for payload in payloads:
+            store.append_json(payload)
+        ingest_sec = time.perf_counter() - start
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        store.close()
+        info = store.info()
+        print(f"ingest: {len(payloads) / ingest_sec:,.0f} events/s (append to segment file + index), "
+              f"{info['events_in_memory']} events in memory ({info['evicted_segments']} segments evicted), "
+              f"{memory_mb:.1f} MB")
+
+        last_start, last_end = match_ranges[-1]
+        mid_start, mid_end = match_ranges[len(match_ranges) // 2]
+        queries = [
+            ("last 5 fouls by YELLOW", lambda: store.query(event_types=["EVENT_FOUL_PUSHING", "EVENT_FOUL_CRASH"],
+                                                           team="YELLOW", limit=5)),
+            ("all events of last match", lambda: store.query(start=last_start, end=last_end)),
+            ("placements of a middle match", lambda: store.query(start=mid_start, end=mid_end,
+                                                                 event_types=["EVENT_PLACEMENT_SUCCEEDED",
+                                                                              "EVENT_PLACEMENT_FAILED"])),
+            ("placement counts, whole store", lambda: store.count(event_types=["EVENT_PLACEMENT_SUCCEEDED",
+                                                                               "EVENT_PLACEMENT_FAILED"])),
+            ("BLUE events, whole store", lambda: store.query(team="BLUE")),
+        ]
+        for label, fn in queries:
+            median_ms, max_ms, result = _time_ms(fn, args.repeat)
+            size = len(result) if isinstance(result, list) else result
+            print(f"{label:>32}: median {median_ms:7.3f} ms, max {max_ms:7.3f} ms -> {size}")
+
+        # 再起動時のセグメント読み込み
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            reopened = EventStore(**config)
+            load_ms = (time.perf_counter() - start) * 1000
+        disk_mb = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp)) / 1e6
+        print(f"startup load: {len(reopened)} events in {load_ms:.0f} ms ({disk_mb:.1f} MB on disk)")
+
+        # REQ/REP 経由 (JSON エンコード / 送受信を含む)
+        with contextlib.redirect_stdout(io.StringIO()):
+            service = EventStoreService({"zmq_publisher_uri": f"tcp://127.0.0.1:{args.port + 1}",
+                                         "query_bind_uri": f"tcp://127.0.0.1:{args.port}", **config})
+        thread = threading.Thread(target=service.run, daemon=True)
+        thread.start()
+        service.ready.wait()
+        uri = f"tcp://127.0.0.1:{args.port}"
+        request = {"op": "query", "event_types": ["EVENT_FOUL_PUSHING", "EVENT_FOUL_CRASH"], "team": "YELLOW", "limit": 5}
+        median_ms, max_ms, reply = _time_ms(lambda: query(uri, request), args.repeat)
+        print(f"{'REQ/REP last 5 fouls':>32}: median {median_ms:7.3f} ms, max {max_ms:7.3f} ms -> {reply['count']}")
+        request = {"op": "query", "start": last_start, "end": last_end}
+        median_ms, max_ms, reply = _time_ms(lambda: query(uri, request), args.repeat)
+        print(f"{'REQ/REP last match':>32}: median {median_ms:7.3f} ms, max {max_ms:7.3f} ms -> {reply['count']}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            service.stop()
+            thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# benchmarks/bench_failover.py
+# hot-standby フェイルオーバーの障害注入テスト。
+# 同一プロセス内で primary / standby の Orchestrator を起動し、同じ Referee ストリームを両方に流す。
+# 途中で primary を停止 (障害注入) し、standby が publish を引き継ぐまでの時間と、
+# 購読側で重複イベントが発生しないことを計測する。
+# --restart-primary では引き継ぎ後に primary を (checkpoint ファイルから) 再起動し、購読側で重複しないことも確認する。
+#  wait:   peer_uri を設定して再起動し、昇格済みの standby の checkpoint を受信して standby として起動すること
+#  demote: peer_uri なしで再起動してすぐに publish を始め、standby の新しい checkpoint を受信して降格すること
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_failover --trials 5
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_failover --trials 3 --restart-primary wait
+import argparse
+import contextlib
+import io
+import json
+import os
+import queue
+import statistics
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import zmq
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.failover import StandbyMonitor
+from orchestrator.event_reorder import EventReorderBuffer
+from .referee_stream import synthetic_match, referee_pb2
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def _event_key(event: dict) -> Tuple[str, Optional[float]]:
+    """同一イベントを識別するキー。game_events 由来は GC の作成時刻で、状態変化は種類のみで比較する"""
+    if event["event_type"].startswith(("COMMAND_", "STAGE_")):
+        return (event["event_type"], None)
+    return (event["event_type"], round(event["timestamp"], 6))
+
+
+def expected_events(packets: List[referee_pb2.Referee]) -> List[Tuple[str, Optional[float]]]:
+    """
+    障害が無い場合に publish されるイベント列 (同じ検出ロジックと GC 時刻順の並べ替えをスレッド無しで実行)。
+    並べ替えの保持時間の上限 (ホスト時刻) には達しない前提で、watermark だけで送り出す。
+    """
+    reference = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://reference"}, PRIORITY_CONFIG)
+    reorder = EventReorderBuffer(tolerance_sec=reference.event_reorder.tolerance_sec, max_hold_sec=float("inf"))
+    keys = []
+    for ref_msg in packets:
+        events = reference._process_referee_message(ref_msg)
+        reorder.observe_packet(ref_msg.packet_timestamp)
+        reorder.push(events, ref_msg.packet_timestamp)
+        keys.extend(_event_key(json.loads(e.to_json())) for e in reorder.pop_ready())
+    keys.extend(_event_key(json.loads(e.to_json())) for e in reorder.flush())
+    reference.publisher.close()
+    reference.context.term()
+    return keys
+
+
+def is_subsequence(received: list, expected: list) -> bool:
+    it = iter(expected)
+    return all(any(r == e for e in it) for r in received)
+
+
+def run_trial(port: int, packets: List[referee_pb2.Referee], fail_at: int,
+              packet_interval_sec: float, takeover_timeout_sec: float, separate_endpoints: bool,
+              restart_at: Optional[int] = None, restart_mode: str = "wait",
+              checkpoint_dir: Optional[str] = None) -> dict:
+    uri = f"tcp://127.0.0.1:{port}"
+    # 別 endpoint 構成では standby は起動時に bind し、購読側は両方に connect する
+    standby_uri = f"tcp://127.0.0.1:{port + 1000}" if separate_endpoints else uri
+    primary_queue, standby_queue = queue.Queue(), queue.Queue()
+    # 再起動する primary は昇格した standby の endpoint を peer_uri として監視し、checkpoint ファイルから復元する
+    primary_config = {"zmq_publisher_uri": uri,
+                      "failover": {"role": "primary", "checkpoint_interval_sec": 0.1}}
+    if restart_at is not None:
+        primary_config["checkpoint_file"] = os.path.join(checkpoint_dir, f"primary-{port}.ckpt")
+        primary_config["checkpoint_file_interval_sec"] = 0.1
+    primary = Orchestrator(primary_queue, primary_config, PRIORITY_CONFIG)
+    standby = Orchestrator(standby_queue, {"zmq_publisher_uri": standby_uri,
+                                           "failover": {"role": "standby", "checkpoint_interval_sec": 0.1,
+                                                        "standby_bind_early": separate_endpoints}},
+                           PRIORITY_CONFIG)
+    monitor = StandbyMonitor(standby, primary_uri=uri, takeover_timeout_sec=takeover_timeout_sec)
+
+    context = zmq.Context()
+    subscriber = context.socket(zmq.SUB)
+    subscriber.setsockopt(zmq.SUBSCRIBE, b"event")
+    subscriber.setsockopt(zmq.RCVTIMEO, 100)
+    subscriber.setsockopt(zmq.RECONNECT_IVL, 10)
+    subscriber.connect(uri)
+    if separate_endpoints:
+        subscriber.connect(standby_uri)
+    received: List[Tuple[float, dict]] = []
+    receiving = threading.Event()
+    receiving.set()
+
+    def receive_loop():
+        while receiving.is_set():
+            try:
+                _topic, payload = subscriber.recv_multipart()
+                received.append((time.monotonic(), json.loads(payload)))
+            except zmq.Again:
+                continue
+
+    receiver = threading.Thread(target=receive_loop, daemon=True)
+    primary.start()
+    time.sleep(0.2) # SUB の接続待ち (slow joiner)
+    standby.start()
+    monitor.start()
+    receiver.start()
+
+    failed_at = failed_at_wall = None
+    restarted = restarted_monitor = None
+    restarted_queue: queue.Queue = queue.Queue()
+    for index, ref_msg in enumerate(packets):
+        if index == fail_at:
+            primary.stop() # 障害注入: primary はこれ以降のパケットを処理しない
+            failed_at, failed_at_wall = time.monotonic(), time.time()
+        if index == restart_at:
+            # primary の再起動 (restart: unless-stopped): 同じ endpoint に bind し、checkpoint ファイルから復元する
+            primary.join()
+            primary.publisher.close()
+            restarted_config = dict(primary_config, failover=dict(primary_config["failover"],
+                                                                  peer_uri=standby_uri if restart_mode == "wait" else ""))
+            restarted = Orchestrator(restarted_queue, restarted_config, PRIORITY_CONFIG)
+            restarted_monitor = StandbyMonitor(restarted, primary_uri=standby_uri,
+                                               takeover_timeout_sec=takeover_timeout_sec)
+            restarted.start()
+            restarted_monitor.start()
+        if failed_at is None:
+            primary_queue.put(ref_msg)
+        if restarted is not None:
+            restarted_queue.put(ref_msg)
+        standby_queue.put(ref_msg)
+        time.sleep(packet_interval_sec)
+    time.sleep(0.5)
+    receiving.clear()
+    receiver.join()
+
+    takeover_sec = standby.promoted_at - failed_at_wall if standby.promoted_at else float('nan')
+    first_after_takeover = next((t for t, _ in received if t >= failed_at + takeover_sec), None)
+    result = {
+        "takeover_sec": takeover_sec,
+        "first_event_after_failure_sec": first_after_takeover - failed_at if first_after_takeover else None,
+        "received": [_event_key(event) for _, event in received],
+        # 再起動した primary の最後の状態 (フェンシングが効いていれば publish していない)、昇格・降格の有無
+        "restarted_active": restarted.active if restarted else None,
+        "restarted_promoted": restarted.promoted_at is not None if restarted else None,
+        "restarted_demotions": restarted.demotions if restarted else None,
+        # standby が送った Referee / TeamInfo のフィールド変化 (状態変化として game_events より先に検出される)
+        "standby_change_events": sum(1 for t, event in received if t >= failed_at
+                                     and event["event_type"].startswith(("REFEREE_", "TEAM_"))),
+    }
+    monitor.stop()
+    standby.stop()
+    standby.join()
+    primary.join()
+    if restarted is not None:
+        restarted_monitor.stop()
+        restarted.stop()
+        restarted.join()
+        restarted_monitor.join()
+    subscriber.close()
+    context.term()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Failure-injection test for the hot-standby orchestrator")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--packets", type=int, default=1500, help="packets per trial (synthetic match prefix)")
+    parser.add_argument("--rate", type=float, default=200.0, help="packets per second fed to both orchestrators")
+    parser.add_argument("--takeover-timeout", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=56555)
+    parser.add_argument("--separate-endpoints", action="store_true",
+                        help="standby publishes on its own endpoint (bound at startup) instead of taking over the primary's")
+    parser.add_argument("--restart-primary", choices=["wait", "demote"],
+                        help="restart the failed primary after the takeover (implies --separate-endpoints): "
+                             "'wait' checks the peer before publishing, 'demote' publishes at once and must step down")
+    args = parser.parse_args()
+    if args.restart_primary:
+        args.separate_endpoints = True
+    checkpoint_dir = tempfile.mkdtemp(prefix="bench_failover_")
+
+    takeovers, deliveries = [], []
+    for trial in range(args.trials):
+        stream = synthetic_match(seed=trial)
+        packets = [next(stream) for _ in range(args.packets)]
+        with contextlib.redirect_stdout(io.StringIO()): # オーケストレーターのログを抑制
+            expected = expected_events(packets)
+            result = run_trial(args.port + trial, packets, fail_at=len(packets) // 2,
+                               packet_interval_sec=1.0 / args.rate,
+                               takeover_timeout_sec=args.takeover_timeout,
+                               separate_endpoints=args.separate_endpoints,
+                               # 引き継ぎ (takeover_timeout の数倍) の後に再起動する
+                               restart_at=(len(packets) // 2 + int(args.rate * args.takeover_timeout * 3)
+                                           if args.restart_primary else None),
+                               restart_mode=args.restart_primary or "wait",
+                               checkpoint_dir=checkpoint_dir)
+        received = result["received"]
+        no_duplicates = is_subsequence(received, expected)
+        print(f"trial {trial}: takeover {result['takeover_sec']:.3f}s, "
+              f"first event from standby {result['first_event_after_failure_sec'] or float('nan'):.3f}s after failure, "
+              f"received {len(received)}/{len(expected)} events "
+              f"({result['standby_change_events']} REFEREE_/TEAM_ from standby), no duplicates: {no_duplicates}")
+        if not no_duplicates:
+            raise SystemExit("FAILED: standby re-emitted or reordered events")
+        if args.restart_primary:
+            print(f"         restarted primary: publishing at the end {result['restarted_active']}, "
+                  f"promoted {result['restarted_promoted']}, stepped down {result['restarted_demotions']} time(s)")
+            if result["restarted_active"] or (args.restart_primary == "wait" and result["restarted_promoted"]):
+                raise SystemExit("FAILED: restarted primary kept publishing while the promoted standby was active")
+            if args.restart_primary == "demote" and not result["restarted_demotions"]:
+                raise SystemExit("FAILED: restarted primary did not step down")
+        takeovers.append(result["takeover_sec"])
+        if result["first_event_after_failure_sec"] is not None:
+            deliveries.append(result["first_event_after_failure_sec"])
+
+    print(f"takeover time: median {statistics.median(takeovers):.3f}s, max {max(takeovers):.3f}s "
+          f"(takeover_timeout_sec={args.takeover_timeout})")
+    if deliveries:
+        print(f"first delivered event after failure: median {statistics.median(deliveries):.3f}s")
+
+
+if __name__ == '__main__':
+    main()
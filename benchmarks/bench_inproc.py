@@ -0,0 +1,136 @@
+# benchmarks/bench_inproc.py
+# 同じプロセス内の購読者 (音声再生モジュール) までのイベント配送を、接続方法ごとに計測する。
+#  - tcp:    従来の main.py と同じく別々の ZMQ コンテキストで tcp://127.0.0.1 を購読 (JSON エンコード → TCP ループバック → デコード)
+#  - inproc: 共有コンテキストで inproc:// を購読 (JSON エンコード → デコード、TCP 無し)
+#  - direct: Orchestrator.add_event_callback で GameEvent をそのままキューに渡す (シリアライズ無し)
+# 1 件ずつ送って受信を待ち (ping-pong)、_send_event の呼び出しから音声モジュールの _handle_event までの遅延 (p50 / p99)、
+# 送信側 (オーケストレーターのスレッド) の時間と、受信側スレッドの CPU 時間を出す。イベントは合成試合から検出したもの。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_inproc --count 5000
+import argparse
+import contextlib
+import io
+import queue
+import statistics
+import threading
+import time
+
+import zmq
+
+from audio_playback.audio_playback import AudioPlaybackModule
+from orchestrator.orchestrator import Orchestrator
+from .bench_match_stats import record_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+MODES = ("tcp", "inproc", "direct")
+
+
+class RecordingPlayback(AudioPlaybackModule):
+    """_handle_event の時刻を記録し、run() を実行したスレッドの CPU 時間を測る"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = threading.Event()
+        self.received_at = 0.0
+        self.handled = 0
+        self.cpu_sec = 0.0
+
+    def _handle_event(self, game_event):
+        self.received_at = time.perf_counter()
+        self.handled += 1
+        self.received.set()
+
+    def run(self):
+        start = time.thread_time()
+        try:
+            super().run()
+        finally:
+            self.cpu_sec = time.thread_time() - start
+
+
+def setup(mode: str, port: int):
+    """(オーケストレーター, 音声モジュール, 共有コンテキスト) を作り、配送できる状態にする"""
+    shared = zmq.Context() if mode != "tcp" else None
+    config = {"zmq_publisher_uri": f"tcp://127.0.0.1:{port}", "placement_publish_interval_sec": 0,
+              "stats_publish_interval_sec": 0}
+    if mode == "inproc":
+        config["zmq_inproc_uri"] = "inproc://bench-orchestrator"
+    orchestrator = Orchestrator(queue.Queue(), config, PRIORITY_CONFIG, context=shared)
+    orchestrator._bind_publisher()
+    if mode == "direct":
+        playback = RecordingPlayback({}, context=shared, direct=True)
+        orchestrator.add_event_callback(playback.on_event)
+    else:
+        uri = orchestrator.zmq_inproc_uri if mode == "inproc" else config["zmq_publisher_uri"]
+        playback = RecordingPlayback({"zmq_connect_uri": uri}, context=shared)
+    thread = threading.Thread(target=playback.run, daemon=True)
+    thread.start()
+    return orchestrator, playback, thread, shared
+
+
+def deliver(orchestrator, playback, game_event, timeout: float):
+    """1 件送って受信を待つ。(遅延 [秒], 送信側の時間 [秒]) を返す (受信できなければ遅延は None)"""
+    playback.received.clear()
+    start = time.perf_counter()
+    orchestrator._send_event(game_event)
+    sent = time.perf_counter()
+    if not playback.received.wait(timeout):
+        return None, sent - start
+    return playback.received_at - start, sent - start
+
+
+def measure(mode: str, events, count: int, port: int):
+    orchestrator, playback, thread, shared = setup(mode, port)
+    # SUB の接続が完了するまで送り続ける (slow joiner)
+    deadline = time.monotonic() + 5.0
+    while deliver(orchestrator, playback, events[0], 0.05)[0] is None:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{mode}: subscriber did not connect")
+    handled_before, cpu_before = playback.handled, time.thread_time()
+    latencies, send_times = [], []
+    for i in range(count):
+        latency, send_time = deliver(orchestrator, playback, events[i % len(events)], 1.0)
+        if latency is None:
+            raise RuntimeError(f"{mode}: event {i} not delivered")
+        latencies.append(latency)
+        send_times.append(send_time)
+    delivered = playback.handled - handled_before
+    playback.stop()
+    thread.join()
+    orchestrator.publisher.close()
+    if shared is not None:
+        shared.term()
+    else:
+        orchestrator.context.term()
+    latencies.sort()
+    return {
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+        "send_us": statistics.median(send_times) * 1e6,
+        "consumer_cpu_us": playback.cpu_sec * 1e6 / max(1, playback.handled),
+        "delivered": delivered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process event delivery: tcp loopback vs inproc vs direct callback")
+    parser.add_argument("--count", type=int, default=5000, help="events to deliver per mode")
+    parser.add_argument("--port", type=int, default=15571)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    events = [game_event for _, packet_events in record_match(args.seed) for game_event in packet_events]
+    print(f"{len(events)} events from a synthetic match, {args.count} deliveries per mode (one at a time)")
+    results = {}
+    for i, mode in enumerate(MODES):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[mode] = measure(mode, events, args.count, args.port + i)
+    base = results["tcp"]["p50_us"]
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:6s}: latency p50 {r['p50_us']:7.1f} us, p99 {r['p99_us']:7.1f} us ({base / r['p50_us']:.1f}x vs tcp); "
+              f"_send_event {r['send_us']:5.1f} us; consumer CPU {r['consumer_cpu_us']:5.1f} us/event; "
+              f"{r['delivered']}/{args.count} delivered")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_match_stats.py
+# 1 試合分のイベントログから MatchStats を再構築する時間と、逐次集計 1 件あたりのコストを計測する。
+# 比較として、リクエストごとに全履歴から集計し直す場合のコストも計測する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_match_stats
+import argparse
+import contextlib
+import io
+import os
+import queue
+import statistics
+import tempfile
+import time
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.match_stats import MatchStats, StatsPublisher
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def record_match(seed: int):
+    """合成試合をオーケストレーターに通し、(packet 時刻 [秒], その packet で検出されたイベント) の列を返す"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://stats"}, PRIORITY_CONFIG)
+        packets = []
+        for ref_msg in synthetic_match(seed=seed):
+            events = orchestrator._process_referee_message(ref_msg)
+            packet_time = ref_msg.packet_timestamp / 1e6
+            for game_event in events:
+                # 状態変化イベントは検出時の時刻が入るため、リアルタイムで記録した場合と同じく packet 時刻にする
+                if game_event.event_type.startswith(("COMMAND_", "STAGE_")):
+                    game_event.timestamp = packet_time
+            packets.append((packet_time, events))
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+    return packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MatchStats batch rebuild / incremental update benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=1.0, help="stats publish interval (seconds)")
+    args = parser.parse_args()
+
+    packets = record_match(args.seed)
+    events = [game_event for _, packet_events in packets for game_event in packet_events]
+    print(f"synthetic match: {len(packets)} packets, {len(events)} events")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "match.jsonl")
+        with open(log_path, "w", encoding="utf-8") as f:
+            for game_event in events:
+                f.write(game_event.to_json() + "\n")
+
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rebuilt = MatchStats.from_log(log_path)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"batch rebuild from log ({os.path.getsize(log_path) / 1e3:.0f} kB): "
+              f"median {statistics.median(samples):.2f} ms (JSON decode + aggregate)")
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        stats = MatchStats.rebuild(events)
+        samples.append((time.perf_counter() - start) * 1000)
+    per_event_us = statistics.median(samples) * 1000 / len(events)
+    print(f"aggregate only: median {statistics.median(samples):.3f} ms, {per_event_us:.2f} us/event")
+    assert stats.snapshot() == rebuilt.snapshot()
+
+    # 比較: イベントのたびに全履歴から集計し直す
+    start = time.perf_counter()
+    for i in range(1, len(events) + 1):
+        MatchStats.rebuild(events[:i]).snapshot()
+    naive_ms = (time.perf_counter() - start) * 1000
+    print(f"recompute from full history on every event: {naive_ms:.1f} ms total "
+          f"({naive_ms * 1000 / len(events):.1f} us/event)")
+
+    # publish 量: packet 時刻で再生し、interval ごとに変化があれば送る
+    live = MatchStats()
+    publisher = StatsPublisher(live, args.interval)
+    sizes = []
+    for packet_time, packet_events in packets:
+        for game_event in packet_events:
+            live.observe(game_event)
+        payload = publisher.poll(now=packet_time)
+        if payload is not None:
+            sizes.append(len(payload))
+    print(f"'stats' updates over the match (interval {args.interval}s, only on change): "
+          f"{len(sizes)} messages, mean {statistics.mean(sizes):.0f} bytes")
+    print(f"final: {live.to_json()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/bench_metrics.py
+# common/metrics.py のホットパス (inc / labels().inc / observe) の 1 回あたりの時間を計測し、1 us 未満であることを確かめる。
+# 比較として、属性への加算 (統計を属性で数えていた従来の方法) とロックを取るカウンタも計測する。
+# 複数スレッドから同時に加算した場合の時間と合計が失われないこと、scrape (render) の時間も出す。
+# 時間はループ自体のオーバーヘッドを含む (空ループの時間も表示する)。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_metrics --count 1000000 --threads 4
+import argparse
+import statistics
+import threading
+import time
+
+from common.metrics import MetricsRegistry
+
+BUDGET_NS = 1000.0
+
+
+class LockedCounter:
+    """比較用: 加算ごとにロックを取るカウンタ"""
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Attribute:
+    value = 0
+
+
+def per_op_ns(function, count: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(count)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e9 / count
+
+
+def single_thread(registry: MetricsRegistry, count: int, repeat: int):
+    counter = registry.counter("bench_packets_total", "packets")
+    family = registry.counter("bench_events_total", "events", ("event_type",))
+    histogram = registry.histogram("bench_handle_seconds", "handler time")
+    locked = LockedCounter()
+    attribute = Attribute()
+    perf_counter = time.perf_counter
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    def attribute_inc(n):
+        for _ in range(n):
+            attribute.value += 1
+
+    def locked_inc(n):
+        for _ in range(n):
+            locked.inc()
+
+    def counter_inc(n):
+        for _ in range(n):
+            counter.inc()
+
+    def labelled_inc(n):
+        for _ in range(n):
+            family.labels("COMMAND_STOP").inc()
+
+    def observe(n):
+        for _ in range(n):
+            histogram.observe(0.00042)
+
+    def timed_observe(n):
+        # ハンドラの計測と同じ: perf_counter を 2 回読んで observe
+        for _ in range(n):
+            started = perf_counter()
+            histogram.observe(perf_counter() - started)
+
+    return [
+        ("empty loop", per_op_ns(empty, count, repeat), False),
+        ("attribute += 1 (no metrics)", per_op_ns(attribute_inc, count, repeat), False),
+        ("locked counter inc()", per_op_ns(locked_inc, count, repeat), False),
+        ("Counter.inc()", per_op_ns(counter_inc, count, repeat), True),
+        ("Counter.labels(x).inc()", per_op_ns(labelled_inc, count, repeat), True),
+        ("Histogram.observe(v)", per_op_ns(observe, count, repeat), True),
+        ("perf_counter x2 + observe", per_op_ns(timed_observe, count, repeat), True),
+    ]
+
+
+def contended(registry: MetricsRegistry, threads: int, count: int):
+    """threads 本のスレッドから同時に加算し、(Counter の ns/op, ロックの ns/op, Counter の合計, ロックの合計) を返す"""
+    counter = registry.counter("bench_contended_total", "contended")
+    locked = LockedCounter()
+
+    def run(inc):
+        barrier = threading.Barrier(threads + 1)
+
+        def work():
+            barrier.wait()
+            for _ in range(count):
+                inc()
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - start) * 1e9 / (threads * count)
+
+    counter_ns = run(counter.inc)
+    locked_ns = run(locked.inc)
+    return counter_ns, locked_ns, counter.value(), locked.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of metrics instrumentation on the hot path")
+    parser.add_argument("--count", type=int, default=1_000_000, help="operations per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=4, help="threads for the contended measurement")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    print(f"single thread, {args.count} operations (median of {args.repeat}, including loop overhead):")
+    over_budget = []
+    for name, ns, instrumented in single_thread(registry, args.count, args.repeat):
+        print(f"  {name:30s} {ns:7.1f} ns/op")
+        if instrumented and ns >= BUDGET_NS:
+            over_budget.append(name)
+
+    counter_ns, locked_ns, counter_total, locked_total = contended(registry, args.threads, args.count // args.threads)
+    expected = args.threads * (args.count // args.threads)
+    print(f"{args.threads} threads: Counter.inc() {counter_ns:.1f} ns/op (total {counter_total}/{expected}), "
+          f"locked counter {locked_ns:.1f} ns/op (total {locked_total}/{expected})")
+
+    for cells in (1, 16):
+        scrape_registry = MetricsRegistry()
+        family = scrape_registry.counter("bench_events_total", "events", ("event_type",))
+        histogram = scrape_registry.histogram("bench_handle_seconds", "handler time", ("topic",))
+        workers = [threading.Thread(target=lambda: [family.labels(f"EVENT_{i}").inc() for i in range(50)]
+                                    + [histogram.labels(f"topic_{i}").observe(0.001) for i in range(5)])
+                   for _ in range(cells)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        scrape_us = per_op_ns(lambda n: [scrape_registry.render() for _ in range(n)], 200, 3) / 1000
+        print(f"scrape: 50 labelled counters + 5 histograms written from {cells:2d} threads: render {scrape_us:.0f} us")
+
+    if over_budget or counter_total != expected:
+        print(f"FAIL: over the {BUDGET_NS:.0f} ns budget: {over_budget}, lost increments: {expected - counter_total}")
+        raise SystemExit(1)
+    print(f"OK: every instrumented operation is under {BUDGET_NS:.0f} ns and no increments were lost")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_placement_geometry.py
+# ボールプレースメント中の派生指標 (目標までの距離・接近速度・最寄りロボット・線分 0.5 m 以内の相手ロボット) の
+# フレームあたりの計算コストを、線分までの距離をフレームごとに 1 回だけ計算する実装 (orchestrator/placement_geometry.py) と
+# compute() のたびに窓内の全フレーム・全ロボットを計算し直す場合とで、窓の長さごとに比較する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_placement_geometry --rate 100 --windows 1 3
+import argparse
+import collections
+import math
+import statistics
+import time
+
+from orchestrator.placement_geometry import (PositionBuffer, PlacementGeometry, PLACEMENT_STOP_DISTANCE_MM,
+                                             TEAM_CODES, TEAM_NAMES)
+from orchestrator.vision_listener import frame_positions, tracker_pb2
+from .bench_vision import synthetic_packets
+
+
+class WholeWindowPlacementGeometry:
+    """PlacementGeometry と同じ指標を、compute() のたびに窓内の全フレームから計算する (比較用)"""
+    def __init__(self, window_sec: float):
+        self.window_sec = window_sec
+        self.frames = collections.deque()
+
+    def append(self, timestamp, ball, robots):
+        self.frames.append((timestamp, ball, robots))
+        while self.frames and self.frames[0][0] < timestamp - self.window_sec:
+            self.frames.popleft()
+
+    @staticmethod
+    def _segment_distance(px, py, ax, ay, bx, by):
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        ratio = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+        return math.hypot(px - (ax + ratio * dx), py - (ay + ratio * dy))
+
+    def compute(self, team, target):
+        timestamp, ball, robots = self.frames[-1]
+        if ball is None:
+            return None
+        tx, ty = target["x"], target["y"]
+        ball_distance = math.hypot(ball[0] - tx, ball[1] - ty)
+        closest = None
+        for robot_team, robot_id, x, y, _ in robots:
+            distance = math.hypot(x - ball[0], y - ball[1])
+            if closest is None or distance < closest["distance"]:
+                closest = {"team": TEAM_NAMES[robot_team], "id": robot_id, "distance": distance}
+        if closest is not None:
+            closest["distance"] = round(closest["distance"])
+
+        own_team = TEAM_CODES.get(team, 0)
+        inside_counts = collections.Counter()
+        latest_distances = {}
+        for frame_time, frame_ball, frame_robots in self.frames:
+            for robot_team, robot_id, x, y, _ in frame_robots:
+                if frame_ball is None:
+                    continue
+                distance = self._segment_distance(x, y, tx, ty, frame_ball[0], frame_ball[1])
+                if distance < PLACEMENT_STOP_DISTANCE_MM:
+                    inside_counts[(robot_team, robot_id)] += 1
+                if frame_time == timestamp:
+                    latest_distances[(robot_team, robot_id)] = distance
+        violations = [{"team": TEAM_NAMES[key[0]], "id": key[1], "distance": round(distance),
+                       "window_ratio": round(inside_counts[key] / len(self.frames), 2)}
+                      for key, distance in sorted(latest_distances.items())
+                      if key[0] != own_team and distance < PLACEMENT_STOP_DISTANCE_MM]
+
+        samples = [(t, math.hypot(b[0] - tx, b[1] - ty)) for t, b, _ in self.frames if b is not None]
+        approach = eta = None
+        if len(samples) >= 2:
+            mean_t = sum(t for t, _ in samples) / len(samples)
+            mean_d = sum(d for _, d in samples) / len(samples)
+            denominator = sum((t - mean_t) ** 2 for t, _ in samples)
+            if denominator > 0:
+                approach = -sum((t - mean_t) * (d - mean_d) for t, d in samples) / denominator
+                if approach > 1.0:
+                    eta = round(ball_distance / approach, 1)
+                approach = round(approach)
+        return {"t": timestamp, "team": team, "target": target, "ball_distance": round(ball_distance),
+                "approach_mm_s": approach, "eta_sec": eta, "closest": closest, "violations": violations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Placement geometry per-frame cost: incremental vs whole window")
+    parser.add_argument("--rate", type=float, default=100.0, help="vision frame rate (Hz)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1.0, 3.0], help="rolling windows (seconds)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = []
+    for data in synthetic_packets(int(args.rate * args.seconds), args.rate):
+        frame = tracker_pb2.TrackerWrapperPacket.FromString(data).tracked_frame
+        frames.append((frame.timestamp, *frame_positions(frame)))
+    target = {"x": 1500.0, "y": -300.0}
+    print(f"{len(frames)} frames (22 robots + ball) at {args.rate:.0f} Hz, append + compute per frame")
+
+    # 同じ結果になることを確認 (浮動小数点の誤差による丸めの違いは 1 mm / 1 mm/s まで許容)
+    def same(a, b):
+        return (a["ball_distance"] == b["ball_distance"] and a["closest"] == b["closest"]
+                and [(v["team"], v["id"], v["window_ratio"]) for v in a["violations"]]
+                == [(v["team"], v["id"], v["window_ratio"]) for v in b["violations"]]
+                and (a["approach_mm_s"] is None) == (b["approach_mm_s"] is None)
+                and abs((a["approach_mm_s"] or 0) - (b["approach_mm_s"] or 0)) <= 1)
+
+    for window_sec in args.windows:
+        def run_incremental():
+            buffer = PositionBuffer(capacity=int(window_sec * 120) + 16)
+            geometry = PlacementGeometry(buffer, window_sec=window_sec)
+            return [(buffer.append(*f), geometry.compute("BLUE", target))[1] for f in frames]
+
+        def run_whole_window():
+            geometry = WholeWindowPlacementGeometry(window_sec)
+            return [(geometry.append(*f), geometry.compute("BLUE", target))[1] for f in frames]
+
+        results = {}
+        for name, fn in (("incremental", run_incremental), ("whole", run_whole_window)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[name] = fn()
+                samples.append(time.perf_counter() - start)
+            results[name + "_us"] = statistics.median(samples) * 1e6 / len(frames)
+        mismatches = sum(not same(a, b) for a, b in zip(results["incremental"], results["whole"]))
+        violations = sum(len(r["violations"]) for r in results["incremental"])
+        incremental_us, whole_us = results["incremental_us"], results["whole_us"]
+        print(f"window {window_sec:g} s ({int(args.rate * window_sec)} frames): "
+              f"incremental {incremental_us:.1f} us ({incremental_us * args.rate / 1000:.2f} ms/s of CPU), "
+              f"whole window {whole_us:.1f} us ({whole_us / incremental_us:.1f}x); "
+              f"{violations} robot-frames in violation, {mismatches} frames with differing results")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_placement_tracker.py
+# PlacementTracker の Referee パケット 1 件あたりのオーバーヘッドと、'placement' トピックの送信量を計測する。
+# 合成試合をオーケストレーターのイベント検出に通し、追跡あり / なしでパケットあたりの処理時間を比較する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_placement_tracker --rate 100
+import argparse
+import contextlib
+import io
+import json
+import queue
+import statistics
+import time
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.placement_tracker import PlacementTracker, PlacementPublisher
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def process_all(packets, placement_interval: float):
+    """全パケットを _process_referee_message に通した時間 [秒] と、(パケット, 検出イベント) の列を返す"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://placement",
+                                                    "placement_publish_interval_sec": placement_interval},
+                                    PRIORITY_CONFIG)
+        start = time.perf_counter()
+        detected = [(ref_msg, orchestrator._process_referee_message(ref_msg)) for ref_msg in packets]
+        elapsed = time.perf_counter() - start
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+    return elapsed, detected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ball placement tracker per-packet overhead")
+    parser.add_argument("--rate", type=float, default=100.0, help="referee packet rate (Hz)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.1, help="placement publish interval (seconds)")
+    args = parser.parse_args()
+
+    packets = list(synthetic_match(packet_rate_hz=args.rate, seed=args.seed))
+    print(f"synthetic match at {args.rate:.0f} Hz: {len(packets)} referee packets")
+
+    without, with_tracker = [], []
+    for _ in range(args.repeat):
+        without.append(process_all(packets, 0)[0])
+        elapsed, detected = process_all(packets, args.interval)
+        with_tracker.append(elapsed)
+    base_us = statistics.median(without) * 1e6 / len(packets)
+    tracked_us = statistics.median(with_tracker) * 1e6 / len(packets)
+    print(f"event detection per packet: {base_us:.2f} us without tracker, {tracked_us:.2f} us with tracker "
+          f"(+{tracked_us - base_us:.2f} us, {(tracked_us - base_us) / base_us * 100:+.1f}%)")
+
+    # 追跡と publish 判定だけの時間 (パケット時刻で再生)
+    samples = []
+    for _ in range(args.repeat):
+        tracker = PlacementTracker()
+        publisher = PlacementPublisher(tracker, args.interval)
+        payloads = []
+        start = time.perf_counter()
+        for ref_msg, events in detected:
+            tracker.update(ref_msg, events)
+            payload = publisher.poll(now=ref_msg.packet_timestamp / 1e6)
+            if payload is not None:
+                payloads.append(payload)
+        samples.append(time.perf_counter() - start)
+    print(f"tracker.update + publisher.poll: {statistics.median(samples) * 1e6 / len(packets):.2f} us/packet")
+
+    results = [json.loads(p)["last_result"] for p in payloads]
+    finished = {json.dumps(r, sort_keys=True) for r in results if r}
+    paired = sum(1 for r in map(json.loads, finished) if r["target"] is not None and r["outcome"] != "unknown")
+    match_sec = (packets[-1].packet_timestamp - packets[0].packet_timestamp) / 1e6
+    print(f"'placement' topic: {len(payloads)} messages over {match_sec / 60:.1f} min "
+          f"(mean {statistics.mean(len(p) for p in payloads):.0f} B, {sum(map(len, payloads)) / match_sec:.0f} B/s), "
+          f"{paired}/{len(finished)} placements paired with their command")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_profiler.py
+# プロファイル制御チャネル (orchestrator/profiler.py) のオーバーヘッドを計測する。
+# 合成試合の Referee パケットをオーケストレーターの run スレッドに流し、キューが空になるまでのパケットあたりの時間を
+#  - idle:      要求が無い状態 (run ループでの _profile_pending の確認だけ)
+#  - profiling: cProfile + ハンドラーのラッパーが有効な状態
+# で比べる。idle のコストとして、フラグ確認 1 回の時間も出す。レポートの書き出しにかかった時間も表示する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_profiler --packets 30000
+import argparse
+import contextlib
+import io
+import queue
+import statistics
+import tempfile
+import time
+import timeit
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.profiler import ProfileSession
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError("timed out")
+        time.sleep(0.001)
+
+
+def run_packets(packets, port: int, output_dir: str, profile: bool):
+    """(パケットあたりの時間 [us], レポートの書き出し時間 [ms] または None) を返す"""
+    input_queue = queue.Queue()
+    orchestrator = Orchestrator(input_queue, {"zmq_publisher_uri": f"tcp://127.0.0.1:{port}"}, PRIORITY_CONFIG)
+    orchestrator.start()
+    orchestrator.ready.wait()
+    if profile:
+        session = ProfileSession(3600.0, output_dir, lambda: orchestrator.referee_monitor.packets)
+        orchestrator.request_profile(session)
+        wait_for(lambda: session.started_at is not None)
+    start = time.perf_counter()
+    for packet in packets:
+        input_queue.put(packet)
+    input_queue.join()
+    per_packet_us = (time.perf_counter() - start) * 1e6 / len(packets)
+    report_ms = None
+    if profile:
+        stop_requested = time.perf_counter()
+        session.stop_requested = True
+        wait_for(lambda: orchestrator.profile_session is None)
+        report_ms = (time.perf_counter() - stop_requested) * 1000
+    orchestrator.stop()
+    orchestrator.join()
+    return per_packet_us, report_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiler control channel: idle vs profiling overhead")
+    parser.add_argument("--packets", type=int, default=30000, help="referee packets per run (100 Hz synthetic match)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=15581)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    packets = list(synthetic_match(packet_rate_hz=100.0, seed=args.seed))[:args.packets]
+    results = {"idle": [], "profiling": []}
+    report_times = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for i in range(args.repeat):
+            for j, mode in enumerate(results):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    per_packet_us, report_ms = run_packets(packets, args.port + i * 2 + j, output_dir,
+                                                           profile=(mode == "profiling"))
+                results[mode].append(per_packet_us)
+                if report_ms is not None:
+                    report_times.append(report_ms)
+
+    class Loop:
+        _profile_pending = False
+    loop = Loop()
+    check_ns = min(timeit.repeat("if loop._profile_pending: pass", globals={"loop": loop}, number=1_000_000, repeat=5)) * 1000
+
+    idle = statistics.median(results["idle"])
+    profiling = statistics.median(results["profiling"])
+    print(f"{len(packets)} referee packets through the run thread (median of {args.repeat}):")
+    print(f"  idle      : {idle:6.2f} us/packet (profiling check {check_ns:.0f} ns per loop iteration, "
+          f"{check_ns / 1000 / idle * 100:.2f}% of a packet)")
+    print(f"  profiling : {profiling:6.2f} us/packet ({profiling / idle:.2f}x); "
+          f"report written in {statistics.median(report_times):.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
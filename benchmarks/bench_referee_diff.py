@@ -0,0 +1,163 @@
+# benchmarks/bench_referee_diff.py
+# Referee / TeamInfo のフィールドの変化の検出 (orchestrator/referee_diff.py) を計測する。
+#  1. パケット 1 件あたりの時間: RefereeDiff.diff() (記述子から組み立てた監視リスト + TeamInfo のバイト列が同じなら比較しない) と、
+#     毎パケット前後 2 つのメッセージの全フィールドを HasField / getattr で比べる場合 (naive)。両者の検出結果が一致することも確認する
+#  2. コマンドから内部状態への対応: enum の属性を順に比べる if/elif (従来の _update_internal_game_state) と表引き
+#  3. _process_referee_message 全体のパケット 1 件あたりの時間 (team_info_events_enabled あり / なし)
+# 合成試合にはファウル数・イエローカード (残り時間が進む)・得点の変化が含まれる。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_referee_diff --rates 10 100
+import argparse
+import collections
+import contextlib
+import io
+import queue
+import statistics
+import time
+
+from orchestrator.orchestrator import COMMAND_STATES, InternalGameState, Orchestrator
+from orchestrator.referee_diff import REFEREE_IGNORED_FIELDS, TEAM_IGNORED_FIELDS, RefereeDiff
+from state import ssl_gc_referee_message_pb2 as referee_pb2
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+
+
+def naive_changes(prev_ref_msg, current_ref_msg):
+    """全フィールドを毎回比べる: (チーム or None, フィールド名, 前の値, 今の値) のリスト"""
+    def value(msg, field):
+        if field.is_repeated:
+            return len(getattr(msg, field.name))
+        if not msg.HasField(field.name):
+            return None
+        if field.enum_type is not None:
+            return field.enum_type.values_by_number[getattr(msg, field.name)].name
+        return getattr(msg, field.name)
+
+    changes = []
+    for field in referee_pb2.Referee.DESCRIPTOR.fields:
+        if field.name in REFEREE_IGNORED_FIELDS:
+            continue
+        if field.message_type is not None and field.message_type.name == "TeamInfo":
+            prev_team, current_team = getattr(prev_ref_msg, field.name), getattr(current_ref_msg, field.name)
+            for team_field in field.message_type.fields:
+                if team_field.name in TEAM_IGNORED_FIELDS:
+                    continue
+                old, new = value(prev_team, team_field), value(current_team, team_field)
+                if old != new:
+                    changes.append((field.name.upper(), team_field.name, old, new))
+        elif field.message_type is None:
+            old, new = value(prev_ref_msg, field), value(current_ref_msg, field)
+            if old != new:
+                changes.append((None, field.name, old, new))
+    return changes
+
+
+def diff_changes(events):
+    changes = []
+    for game_event in events:
+        data = game_event.data
+        changes.append((data.get("team"), data["field"], data["previous"], data["value"]))
+    return changes
+
+
+def per_packet_us(packets, step, repeat: int) -> float:
+    """step(前のパケット, 今のパケット) のパケット 1 件あたりの時間 [us] (repeat 回の中央値)"""
+    samples = []
+    for _ in range(repeat):
+        prev = None
+        start = time.perf_counter()
+        for ref_msg in packets:
+            step(prev, ref_msg)
+            prev = ref_msg
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6 / len(packets)
+
+
+def command_state_chain(cmd: int):
+    """従来の _update_internal_game_state の if/elif (enum の属性を順に引く)"""
+    if cmd == referee_pb2.Referee.Command.HALT:
+        return InternalGameState.HALTED
+    elif cmd == referee_pb2.Referee.Command.STOP:
+        return InternalGameState.STOPPED
+    elif cmd == referee_pb2.Referee.Command.PREPARE_KICKOFF_YELLOW:
+        return InternalGameState.PREPARE_KICKOFF_YELLOW
+    elif cmd == referee_pb2.Referee.Command.PREPARE_KICKOFF_BLUE:
+        return InternalGameState.PREPARE_KICKOFF_BLUE
+    elif cmd == referee_pb2.Referee.Command.PREPARE_PENALTY_YELLOW:
+        return InternalGameState.PREPARE_PENALTY_YELLOW
+    elif cmd == referee_pb2.Referee.Command.PREPARE_PENALTY_BLUE:
+        return InternalGameState.PREPARE_PENALTY_BLUE
+    elif cmd == referee_pb2.Referee.Command.DIRECT_FREE_YELLOW:
+        return InternalGameState.DIRECT_FREE_YELLOW
+    elif cmd == referee_pb2.Referee.Command.DIRECT_FREE_BLUE:
+        return InternalGameState.DIRECT_FREE_BLUE
+    elif cmd in (referee_pb2.Referee.Command.TIMEOUT_YELLOW, referee_pb2.Referee.Command.TIMEOUT_BLUE):
+        return InternalGameState.TIMEOUT
+    elif cmd == referee_pb2.Referee.Command.BALL_PLACEMENT_YELLOW:
+        return InternalGameState.BALL_PLACEMENT_YELLOW
+    elif cmd == referee_pb2.Referee.Command.BALL_PLACEMENT_BLUE:
+        return InternalGameState.BALL_PLACEMENT_BLUE
+    elif cmd == referee_pb2.Referee.Command.FORCE_START:
+        return InternalGameState.RUNNING
+    elif cmd == referee_pb2.Referee.Command.NORMAL_START:
+        return InternalGameState.RUNNING
+    return None
+
+
+def process_all_us(packets, enabled: bool, repeat: int) -> float:
+    """_process_referee_message のパケット 1 件あたりの時間 [us]"""
+    samples = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://referee-diff",
+                                                        "team_info_events_enabled": enabled}, PRIORITY_CONFIG)
+            start = time.perf_counter()
+            for ref_msg in packets:
+                orchestrator._process_referee_message(ref_msg)
+            samples.append(time.perf_counter() - start)
+        orchestrator.publisher.close()
+        orchestrator.context.term()
+    return statistics.median(samples) * 1e6 / len(packets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Referee / TeamInfo field change detection: per-packet cost")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10.0, 100.0], help="referee packet rates (Hz)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for rate in args.rates:
+        packets = list(synthetic_match(packet_rate_hz=rate, seed=args.seed))
+
+        # 検出結果が全フィールドの比較と一致すること
+        diff = RefereeDiff()
+        counts = collections.Counter()
+        for prev, ref_msg in zip(packets, packets[1:]):
+            events = diff.diff(prev, ref_msg)
+            counts.update(game_event.event_type.removesuffix("_YELLOW").removesuffix("_BLUE") for game_event in events)
+            expected = [c for c in naive_changes(prev, ref_msg)
+                        if not (c[1] == "yellow_card_times" and c[3] > c[2])] # 増加はイベントにしない
+            assert sorted(diff_changes(events), key=str) == sorted(expected, key=str), (events, expected)
+        compared = diff.team_compares / (diff.packets * len(diff.teams))
+
+        diff = RefereeDiff()
+        diff_us = per_packet_us(packets, lambda prev, cur: diff.diff(prev, cur), args.repeat)
+        naive_us = per_packet_us(packets, lambda prev, cur: prev is not None and naive_changes(prev, cur), args.repeat)
+        chain_us = per_packet_us(packets, lambda prev, cur: command_state_chain(cur.command), args.repeat)
+        table_us = per_packet_us(packets, lambda prev, cur: COMMAND_STATES.get(cur.command), args.repeat)
+        enabled_us = process_all_us(packets, True, args.repeat)
+        disabled_us = process_all_us(packets, False, args.repeat)
+
+        print(f"{rate:5.0f} Hz, {len(packets)} packets: {sum(counts.values())} change events "
+              f"({', '.join(f'{name} {count}' for name, count in counts.most_common())})")
+        print(f"      diff {diff_us:.2f} us/packet (TeamInfo bytes changed in {compared:.1%} of packets), "
+              f"naive all-field compare {naive_us:.2f} us/packet ({naive_us / diff_us:.1f}x)")
+        print(f"      command -> state: enum attribute chain {chain_us:.2f} us/packet, table {table_us:.2f} us/packet")
+        print(f"      _process_referee_message {enabled_us:.2f} us/packet with change events, "
+              f"{disabled_us:.2f} us/packet without")
+
+
+if __name__ == '__main__':
+    main()
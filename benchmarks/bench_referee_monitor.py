@@ -0,0 +1,146 @@
+# benchmarks/bench_referee_monitor.py
+# Referee パケットの監視 (orchestrator/referee_monitor.py) と取りこぼし後の再同期を計測する。
+#  1. コスト: RefereeMonitor.observe() 単体と、_process_referee_message の監視あり / なしのパケット 1 件あたりの時間
+#  2. 取りこぼし: 合成試合のパケットを途絶 (--outage-min 〜 --outage-max 秒) でまとめて落とし、損失なしの場合と比べて
+#     キックオフ / ペナルティの開始 (NORMAL_START) が正しいチームで報告されるかを、再同期あり / なしで比較する
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_referee_monitor --outages-per-min 6
+import argparse
+import contextlib
+import io
+import queue
+import random
+import statistics
+import time
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.referee_monitor import RefereeMonitor
+from .referee_stream import synthetic_match
+
+PRIORITY_CONFIG = {"event_priorities": {}}
+START_EVENT_PREFIXES = ("COMMAND_NORMAL_START", "COMMAND_KICKOFF_START_", "COMMAND_PENALTY_KICK_START_")
+
+
+class NullMonitor(RefereeMonitor):
+    """取りこぼしを検出しない (監視・再同期なしの比較用)"""
+    def observe(self, ref_msg, prev_ref_msg=None, arrived_at=None) -> int:
+        return 0
+
+
+def make_orchestrator(monitor: bool) -> Orchestrator:
+    with contextlib.redirect_stdout(io.StringIO()):
+        orchestrator = Orchestrator(queue.Queue(), {"zmq_publisher_uri": "inproc://referee-monitor",
+                                                    "placement_publish_interval_sec": 0},
+                                    PRIORITY_CONFIG)
+    if not monitor:
+        orchestrator.referee_monitor = NullMonitor()
+    return orchestrator
+
+
+def close(orchestrator: Orchestrator):
+    orchestrator.publisher.close()
+    orchestrator.context.term()
+
+
+def process_all(packets, monitor: bool):
+    """全パケットを _process_referee_message に通した時間 [秒] と検出したイベントを返す"""
+    orchestrator = make_orchestrator(monitor)
+    events = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for ref_msg in packets:
+            events.extend(orchestrator._process_referee_message(ref_msg))
+        elapsed = time.perf_counter() - start
+    close(orchestrator)
+    return elapsed, events, orchestrator
+
+
+def observe_cost(packets, repeat: int) -> float:
+    """RefereeMonitor.observe() のパケット 1 件あたりの時間 [us]"""
+    samples = []
+    for _ in range(repeat):
+        monitor = RefereeMonitor()
+        prev = None
+        start = time.perf_counter()
+        for i, ref_msg in enumerate(packets):
+            monitor.observe(ref_msg, prev, arrived_at=i * 0.01)
+            prev = ref_msg
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6 / len(packets)
+
+
+def drop_outages(packets, outages_per_min: float, min_sec: float, max_sec: float, seed: int):
+    """ランダムな時刻に min_sec–max_sec 秒の途絶を入れたパケット列と、途絶の数を返す"""
+    rng = random.Random(seed)
+    interval_sec = (packets[1].packet_timestamp - packets[0].packet_timestamp) / 1e6
+    start_probability = outages_per_min / 60.0 * interval_sec
+    kept, outages, resume_at = [], 0, 0
+    for ref_msg in packets:
+        if ref_msg.packet_timestamp < resume_at:
+            continue
+        if rng.random() < start_probability:
+            outages += 1
+            resume_at = ref_msg.packet_timestamp + int(rng.uniform(min_sec, max_sec) * 1e6)
+            continue
+        kept.append(ref_msg)
+    return kept, outages
+
+
+def start_labels(events):
+    """NORMAL_START の検出結果: command 時刻 [us] -> event_type"""
+    return {round(e.timestamp * 1e6): e.event_type for e in events if e.event_type.startswith(START_EVENT_PREFIXES)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Referee stream monitor: per-packet cost and resync after lost packets")
+    parser.add_argument("--rate", type=float, default=10.0, help="referee packet rate (Hz)")
+    parser.add_argument("--matches", type=int, default=10, help="synthetic matches for the loss test")
+    parser.add_argument("--outages-per-min", type=float, default=6.0)
+    parser.add_argument("--outage-min", type=float, default=0.5, help="shortest outage (seconds)")
+    parser.add_argument("--outage-max", type=float, default=5.0, help="longest outage (seconds)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    packets = list(synthetic_match(packet_rate_hz=args.rate, seed=args.seed))
+    print(f"synthetic match at {args.rate:.0f} Hz: {len(packets)} referee packets")
+    print(f"RefereeMonitor.observe(): {observe_cost(packets, args.repeat):.2f} us/packet")
+    without, with_monitor = [], []
+    for _ in range(args.repeat):
+        without.append(process_all(packets, monitor=False)[0])
+        with_monitor.append(process_all(packets, monitor=True)[0])
+    base_us = statistics.median(without) * 1e6 / len(packets)
+    monitored_us = statistics.median(with_monitor) * 1e6 / len(packets)
+    print(f"event detection per packet: {base_us:.2f} us without monitor, {monitored_us:.2f} us with monitor "
+          f"(+{monitored_us - base_us:.2f} us, {(monitored_us - base_us) / base_us * 100:+.1f}%)")
+
+    totals = {"starts": 0, "outages": 0, "gaps": 0, "missed_commands": 0}
+    results = {name: {"correct": 0, "wrong": 0, "missing": 0} for name in ("without resync", "with resync")}
+    for match in range(args.matches):
+        seed = args.seed + match
+        packets = list(synthetic_match(packet_rate_hz=args.rate, seed=seed))
+        truth = start_labels(process_all(packets, monitor=True)[1])
+        lossy, outages = drop_outages(packets, args.outages_per_min, args.outage_min, args.outage_max, seed)
+        totals["starts"] += len(truth)
+        totals["outages"] += outages
+        for name, monitor in (("without resync", False), ("with resync", True)):
+            _, events, orchestrator = process_all(lossy, monitor)
+            labels = start_labels(events)
+            for command_us, event_type in truth.items():
+                label = labels.get(command_us)
+                key = "missing" if label is None else "correct" if label == event_type else "wrong"
+                results[name][key] += 1
+            if monitor:
+                totals["gaps"] += orchestrator.referee_monitor.gaps
+                totals["missed_commands"] += orchestrator.referee_monitor.missed_commands
+
+    print(f"loss test: {args.matches} matches, {totals['outages']} outages of {args.outage_min}-{args.outage_max} s, "
+          f"{totals['gaps']} command_counter gaps ({totals['missed_commands']} missed commands), "
+          f"{totals['starts']} NORMAL_START commands")
+    for name, counts in results.items():
+        print(f"  {name:15s}: {counts['correct']} labeled as without loss, {counts['wrong']} mislabeled "
+              f"(wrong or no team), {counts['missing']} not reported")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+# benchmarks/bench_soak.py
+# 長時間の soak テスト。パイプライン全体 (EventListener → Orchestrator → ZMQ → 可視化ブリッジ → WebSocket クライアント) を
+# 加速した複数日分の Referee ストリームで動かし、リソースが時間とともに増え続けていないかを調べる。
+#  - オーケストレーター (python -m orchestrator) とブリッジ (placement_visualizer/zmq_websocket_bridge.py) は別プロセスで起動する
+#  - GC 役のスレッドが合成試合 (または SSL のログファイル, --replay) をつなげ、GC の時刻の --speed 倍速でマルチキャスト
+#    (ループバック) に送る。つなぎ目では packet_timestamp / command_counter / game_event の created_timestamp をずらし、
+#    途切れの無い 1 本のストリームにする (同じログを繰り返しても別の試合として扱われる)
+#  - WebSocket クライアント (--clients 台, 全イベント / 配置の購読フィルタ付き / バイナリ) はブリッジに接続し、
+#    --churn-interval ごとに 1 台ずつ接続し直す
+# --sample-interval ごとに、各プロセスの RSS・開いている FD の数・スレッド数・CPU 使用率、オーケストレーターの入力キューの
+# 長さ (/metrics)、GC 役が送信してからイベントが WebSocket クライアントに届くまでの遅延 (p50 / p99) を記録する。
+# 最初の --warmup-fraction を除いた区間で各系列の傾き (Theil-Sen) を求め、区間全体での増加量が許容値を超えていれば失敗
+# (終了コード 1)。結果はバージョン間で比べられる小さな JSON (--report) にまとめ、--compare で前回のレポートと並べて表示する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_soak --duration 3600 --speed 100 --report soak.json
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_soak --replay robocup.log.gz --compare soak.json
+import argparse
+import asyncio
+import bisect
+import gzip
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import yaml
+from websockets.asyncio.client import connect
+
+from .bench_cold_start import REPO, CONFIG_DIR, MULTICAST_GROUP, write_config
+from .referee_stream import Referee, synthetic_match
+
+# SSL の公式ログ (ssl-logtools 形式): ヘッダー "SSL_LOG_FILE" + version (int32) の後に
+# [受信時刻 ns (int64), メッセージ種別 (int32), サイズ (int32), データ] が続く (ビッグエンディアン)
+SSL_LOG_HEADER = b"SSL_LOG_FILE"
+LOG_RECORD = struct.Struct(">qii")
+MESSAGE_SSL_REFEREE_2013 = 3
+
+PLACEMENT_FILTERS = [{"event_types": ["COMMAND_BALL_PLACEMENT_*", "EVENT_PLACEMENT_*"]}]
+CLIENT_KINDS = ("all", "placement", "binary")
+
+# 系列ごとの許容増加量 (区間全体での傾きによる増加がこれを超えたら失敗): (絶対値, 中央値に対する比) の大きい方
+LIMITS = {
+    "rss_mb": (8.0, 0.10),
+    "fds": (2.0, 0.0),
+    "threads": (1.0, 0.0),
+    "queue_depth": (50.0, 0.0),
+    "latency_p50_ms": (5.0, 0.5),
+    "latency_p99_ms": (10.0, 0.5),
+}
+
+
+def log_referee_packets(path: str) -> Iterator[Referee]:
+    """SSL のログファイル (.log / .log.gz) から Referee メッセージを順に読む"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        header = f.read(len(SSL_LOG_HEADER) + 4)
+        if not header.startswith(SSL_LOG_HEADER):
+            raise ValueError(f"{path} is not an SSL log file")
+        while True:
+            record = f.read(LOG_RECORD.size)
+            if len(record) < LOG_RECORD.size:
+                return
+            _, message_type, size = LOG_RECORD.unpack(record)
+            data = f.read(size)
+            if message_type == MESSAGE_SSL_REFEREE_2013:
+                ref = Referee()
+                ref.ParseFromString(data)
+                yield ref
+
+
+def continuous(passes: Iterable[Iterable[Referee]], gap_us: int = 1_000_000) -> Iterator[Referee]:
+    """複数の試合 (ストリーム) を、GC の時刻と command_counter が続くように 1 本につなぐ"""
+    last_ts: Optional[int] = None
+    last_counter = -1
+    for packets in passes:
+        ts_offset = counter_offset = None
+        for ref in packets:
+            if ts_offset is None:
+                ts_offset = 0 if last_ts is None else last_ts + gap_us - ref.packet_timestamp
+                counter_offset = 0 if last_counter < 0 else last_counter + 1 - ref.command_counter
+            ref.packet_timestamp += ts_offset
+            if ref.command_timestamp:
+                ref.command_timestamp += ts_offset
+            for proto_event in ref.game_events:
+                if proto_event.HasField("created_timestamp"):
+                    proto_event.created_timestamp += ts_offset
+            ref.command_counter += counter_offset
+            if last_ts is not None and ref.packet_timestamp <= last_ts:
+                continue # ログ中の重複・逆順のパケット
+            last_ts, last_counter = ref.packet_timestamp, ref.command_counter
+            yield ref
+
+
+class SentLog:
+    """送信したパケットの (packet_timestamp, 送信時刻) の直近分。イベントの時刻から送信時刻を引く"""
+
+    def __init__(self, keep: int = 200_000):
+        self.keep = keep
+        self.timestamps: List[int] = []
+        self.sent_at: List[float] = []
+        self._lock = threading.Lock()
+
+    def append(self, packet_timestamp: int, sent_at: float):
+        with self._lock:
+            self.timestamps.append(packet_timestamp)
+            self.sent_at.append(sent_at)
+            if len(self.timestamps) > 2 * self.keep:
+                del self.timestamps[:self.keep]
+                del self.sent_at[:self.keep]
+
+    def sent_time(self, event_timestamp_us: int) -> Optional[float]:
+        """その時刻以降で最初に送ったパケット (イベントを載せた / 検出させたパケット) の送信時刻"""
+        with self._lock:
+            index = bisect.bisect_left(self.timestamps, event_timestamp_us)
+            if index == len(self.timestamps) or index == 0 and self.timestamps[0] - event_timestamp_us > 1_000_000:
+                return None # 既に捨てた区間
+            return self.sent_at[index]
+
+
+class StreamSender(threading.Thread):
+    """Referee ストリームを GC の時刻の speed 倍速でマルチキャストに送る"""
+
+    def __init__(self, packets: Iterator[Referee], port: int, speed: float):
+        super().__init__(daemon=True, name="StreamSender")
+        self.packets = packets
+        self.port = port
+        self.speed = speed
+        self.sent_log = SentLog()
+        self.sent = 0
+        self.simulated_us = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        started = time.monotonic()
+        first_ts = None
+        for ref in self.packets:
+            if self._stop_event.is_set():
+                break
+            if first_ts is None:
+                first_ts = ref.packet_timestamp
+            delay = started + (ref.packet_timestamp - first_ts) / 1e6 / self.speed - time.monotonic()
+            if delay > 0.002: # 細かい待ちはまとめる
+                time.sleep(delay)
+            sender.sendto(ref.SerializeToString(), (MULTICAST_GROUP, self.port))
+            self.sent_log.append(ref.packet_timestamp, time.time())
+            self.sent += 1
+            self.simulated_us = ref.packet_timestamp - first_ts
+        sender.close()
+
+
+def proc_sample(pid: int) -> Optional[Dict[str, float]]:
+    """/proc から RSS [MB]・FD の数・スレッド数・CPU 時間 [秒] を読む (プロセスが無ければ None)"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return None
+    fields = stat[stat.rfind(")") + 2:].split()
+    return {"rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+            "fds": fds,
+            "threads": int(status["Threads"]),
+            "cpu_sec": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")}
+
+
+def scrape(url: str) -> Dict[str, float]:
+    """Prometheus のテキスト形式をメトリクス名ごとの合計にする (ラベルは区別しない)"""
+    values: Dict[str, float] = {}
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return values
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_part, _, value = line.rpartition(" ")
+        name = name_part.split("{", 1)[0]
+        values[name] = values.get(name, 0.0) + float(value)
+    return values
+
+
+def theil_sen_slope(xs: List[float], ys: List[float]) -> float:
+    """外れ値に強い傾き (2 点間の傾きの中央値)。点が多い場合は間引く"""
+    if len(xs) > 300:
+        step = len(xs) / 300
+        indices = [int(i * step) for i in range(300)]
+        xs, ys = [xs[i] for i in indices], [ys[i] for i in indices]
+    slopes = [(ys[j] - ys[i]) / (xs[j] - xs[i])
+              for i in range(len(xs)) for j in range(i + 1, len(xs)) if xs[j] != xs[i]]
+    return statistics.median(slopes) if slopes else 0.0
+
+
+def analyze(samples: List[Dict[str, float]], warmup_fraction: float) -> Dict[str, dict]:
+    """系列ごとに、ウォームアップ後の傾きから区間全体での増加量を求めて許容値と比べる"""
+    steady = samples[int(len(samples) * warmup_fraction):]
+    series = {}
+    for name in sorted({key for sample in samples for key in sample} - {"t", "sim_h"}):
+        suffix = next((key for key in LIMITS if name.endswith(key)), None)
+        points = [(sample["t"], sample[name]) for sample in steady if sample.get(name) is not None]
+        values = [sample[name] for sample in samples if sample.get(name) is not None]
+        if not values:
+            continue
+        result = {"first": round(values[0], 3), "last": round(values[-1], 3), "max": round(max(values), 3),
+                  "points": [round(values[int(i * (len(values) - 1) / 9)], 3) for i in range(10)] if len(values) >= 10
+                  else [round(value, 3) for value in values]}
+        if suffix is not None:
+            if len(points) >= 5:
+                xs, ys = zip(*points)
+                growth = theil_sen_slope(list(xs), list(ys)) * (xs[-1] - xs[0])
+                absolute, relative = LIMITS[suffix]
+                limit = max(absolute, relative * statistics.median(ys))
+                result.update(growth=round(growth, 3), limit=round(limit, 3), ok=growth <= limit)
+            else:
+                result.update(growth=None, limit=None, ok=True) # 点が少なすぎて判定できない
+        series[name] = result
+    return series
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+class Soak:
+    def __init__(self, args, sender: StreamSender, processes: Dict[str, subprocess.Popen], ws_url: str, metrics_url: str):
+        self.args = args
+        self.sender = sender
+        self.processes = processes
+        self.ws_url = ws_url
+        self.metrics_url = metrics_url
+        self.window_latencies: List[float] = []
+        self.latencies = array("f") # 全体の遅延 [ms]
+        self.frames = 0
+        self.events = 0
+        self.connects = 0
+        self.client_errors = 0
+        self.samples: List[Dict[str, float]] = []
+        self.rng = random.Random(args.seed)
+
+    async def client(self, kind: str):
+        """1 台の WebSocket クライアント。キャンセルされるまで受信し続ける"""
+        subprotocols = ["ssl-placement.v1"] if kind == "binary" else None
+        try:
+            async with connect(self.ws_url, max_size=None, subprotocols=subprotocols) as websocket:
+                self.connects += 1
+                if kind == "placement":
+                    await websocket.send(json.dumps({"op": "subscribe", "filters": PLACEMENT_FILTERS}))
+                async for frame in websocket:
+                    self.frames += 1
+                    # ブリッジは同じ表示フレーム内のメッセージを JSON の配列 1 つにまとめて送る
+                    if isinstance(frame, str) and '{"topic": "event"' in frame:
+                        received_at = time.time()
+                        messages = json.loads(frame)
+                        for message in messages if isinstance(messages, list) else [messages]:
+                            if message["topic"] != "event":
+                                continue
+                            self.events += 1
+                            event = message["data"]
+                            sent_at = self.sender.sent_log.sent_time(round(event["timestamp"] * 1_000_000))
+                            if sent_at is not None:
+                                latency_ms = (received_at - sent_at) * 1000
+                                self.window_latencies.append(latency_ms)
+                                self.latencies.append(latency_ms)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.client_errors += 1
+
+    def sample(self, elapsed: float, previous_cpu: Dict[str, Tuple[float, float]]) -> Dict[str, float]:
+        row: Dict[str, float] = {"t": round(elapsed, 1), "sim_h": round(self.sender.simulated_us / 3.6e9, 2)}
+        for name, process in self.processes.items():
+            stats = proc_sample(process.pid) # /metrics の scrape より先に読む (scrape 用のスレッドを数えないため)
+            if stats is None:
+                continue
+            for key in ("rss_mb", "fds", "threads"):
+                row[f"{name}_{key}"] = stats[key]
+            last_elapsed, last_cpu = previous_cpu.get(name, (0.0, 0.0))
+            if elapsed > last_elapsed:
+                row[f"{name}_cpu_pct"] = round((stats["cpu_sec"] - last_cpu) / (elapsed - last_elapsed) * 100, 1)
+            previous_cpu[name] = (elapsed, stats["cpu_sec"])
+        scraped = scrape(self.metrics_url)
+        if "ssl_orchestrator_input_queue_depth" in scraped:
+            row["orchestrator_queue_depth"] = scraped["ssl_orchestrator_input_queue_depth"]
+            row["orchestrator_reorder_held"] = scraped.get("ssl_orchestrator_reorder_held_events", 0.0)
+        if self.window_latencies:
+            window = sorted(self.window_latencies)
+            row["latency_p50_ms"] = round(window[len(window) // 2], 2)
+            row["latency_p99_ms"] = round(window[min(len(window) - 1, int(len(window) * 0.99))], 2)
+            self.window_latencies = []
+        return row
+
+    async def run(self) -> Dict[str, float]:
+        kinds = itertools.cycle(CLIENT_KINDS)
+        clients = [asyncio.create_task(self.client(next(kinds))) for _ in range(self.args.clients)]
+        started = time.monotonic()
+        next_sample = started + self.args.sample_interval
+        next_churn = started + self.args.churn_interval
+        previous_cpu: Dict[str, Tuple[float, float]] = {}
+        while True:
+            now = time.monotonic()
+            if now - started >= self.args.duration:
+                break
+            if any(process.poll() is not None for process in self.processes.values()):
+                print("A pipeline process exited; stopping.")
+                break
+            if self.args.churn_interval > 0 and now >= next_churn:
+                # 1 台切断して、別の種類で接続し直す (ブリッジ側の接続の後始末を確かめる)
+                index = self.rng.randrange(len(clients))
+                clients[index].cancel()
+                clients[index] = asyncio.create_task(self.client(next(kinds)))
+                next_churn += self.args.churn_interval
+            if now >= next_sample:
+                row = await asyncio.to_thread(self.sample, now - started, previous_cpu)
+                self.samples.append(row)
+                print(" ".join(f"{key}={value}" for key, value in row.items()), flush=True)
+                next_sample += self.args.sample_interval
+            await asyncio.sleep(0.05)
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        return scrape(self.metrics_url)
+
+
+def build_report(args, soak: Soak, totals: Dict[str, float], elapsed: float, exited: List[str]) -> dict:
+    series = analyze(soak.samples, args.warmup_fraction)
+    failures = [name for name, result in series.items() if not result.get("ok", True)]
+    failures += [f"{name} exited" for name in exited]
+    if soak.events == 0:
+        failures.append("no events reached the WebSocket clients")
+    latencies = sorted(soak.latencies)
+    return {
+        "version": git_version(),
+        "stream": f"replay:{os.path.basename(args.replay)}" if args.replay else f"synthetic@{args.rate_hz:g}Hz",
+        "speed": args.speed,
+        "duration_sec": round(elapsed, 1),
+        "simulated_hours": round(soak.sender.simulated_us / 3.6e9, 2),
+        "clients": args.clients,
+        "packets_sent": soak.sender.sent,
+        "referee_packets_processed": int(totals.get("ssl_referee_packets_total", 0)),
+        "listener_drops": int(totals.get("ssl_listener_drops_total", 0)),
+        "events_published": int(totals.get("ssl_orchestrator_events_published_total", 0)),
+        "ws_events_received": soak.events,
+        "ws_frames_received": soak.frames,
+        "ws_connects": soak.connects,
+        "ws_client_errors": soak.client_errors,
+        "latency_ms": {"p50": round(latencies[len(latencies) // 2], 2),
+                       "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+                       "max": round(latencies[-1], 2)} if latencies else None,
+        "series": series,
+        "failures": failures,
+        "ok": not failures,
+    }
+
+
+def print_report(report: dict, previous: Optional[dict] = None):
+    print(f"\nsoak {report['version']}: {report['duration_sec']:.0f} s wall, {report['simulated_hours']} h simulated "
+          f"({report['stream']} x{report['speed']:g}), {report['packets_sent']} packets, "
+          f"{report['events_published']} events, {report['ws_connects']} WebSocket connects")
+    if previous:
+        print(f"previous {previous['version']}: {previous['duration_sec']:.0f} s wall, "
+              f"{previous['simulated_hours']} h simulated ({previous['stream']} x{previous['speed']:g})")
+    print(f"  latency (ms)  {report['latency_ms']}" + (f"   | previous {previous.get('latency_ms')}" if previous else ""))
+    for name, result in report["series"].items():
+        if "ok" not in result:
+            continue
+        status = "ok  " if result["ok"] else "FAIL"
+        growth = "n/a" if result["growth"] is None else f"{result['growth']:+.2f} (limit {result['limit']:.2f})"
+        line = f"  {status} {name:32s} {result['first']:9.2f} -> {result['last']:9.2f}  growth {growth}"
+        old = (previous or {}).get("series", {}).get(name)
+        if old:
+            old_growth = "n/a" if old.get("growth") is None else f"{old['growth']:+.2f}"
+            line += f"   | previous {old['first']:9.2f} -> {old['last']:9.2f}  growth {old_growth}"
+        print(line)
+    print("PASS" if report["ok"] else f"FAIL: {', '.join(report['failures'])}")
+
+
+def wait_for_bridge(url: str, timeout: float = 15.0):
+    async def attempt():
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                async with connect(url):
+                    return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("bridge did not start")
+                await asyncio.sleep(0.1)
+    asyncio.run(attempt())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test of the full pipeline with resource-drift detection")
+    parser.add_argument("--duration", type=float, default=600.0, help="wall-clock seconds")
+    parser.add_argument("--speed", type=float, default=100.0, help="game controller time per wall-clock second")
+    parser.add_argument("--rate-hz", type=float, default=20.0, help="synthetic referee packet rate (game time)")
+    parser.add_argument("--replay", default=None, help="SSL log file (.log / .log.gz) to replay in a loop instead")
+    parser.add_argument("--clients", type=int, default=12, help="simulated WebSocket clients")
+    parser.add_argument("--churn-interval", type=float, default=2.0, help="seconds between client reconnects (0: off)")
+    parser.add_argument("--sample-interval", type=float, default=10.0)
+    parser.add_argument("--warmup-fraction", type=float, default=0.2, help="part of the run ignored by the trend check")
+    parser.add_argument("--report", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", default=None, help="previous JSON report to show side by side")
+    parser.add_argument("--port", type=int, default=15800, help="base port (publisher, metrics, profiler, vision, bridge)")
+    parser.add_argument("--gc-port", type=int, default=10803, help="referee multicast port of the simulated GC")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.replay:
+        passes = (log_referee_packets(args.replay) for _ in itertools.count())
+    else:
+        passes = (synthetic_match(packet_rate_hz=args.rate_hz, seed=seed) for seed in itertools.count(args.seed))
+    bridge_port, bridge_metrics_port = args.port + 5, args.port + 6
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = write_config(directory, args.port)
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+        config["checkpoint_file"] = os.path.join(directory, "checkpoint.bin") # 書き込みスレッドも動かす
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(config, f)
+        python_path = os.pathsep.join([REPO] + [os.path.abspath(path) for path in
+                                                os.environ.get("PYTHONPATH", "").split(os.pathsep) if path])
+        env = {**os.environ, "PYTHONPATH": python_path, "CONFIG_CACHE_DIR": ""}
+        ready_file = os.path.join(directory, "ready")
+        processes = {
+            "orchestrator": subprocess.Popen(
+                [sys.executable, "-u", "-m", "orchestrator", "--orchestrator-config", config_path,
+                 "--priority-config", os.path.join(CONFIG_DIR, "config_priority.yaml"),
+                 "--rules-config", os.path.join(CONFIG_DIR, "config_rules.yaml")],
+                cwd=REPO, env={**env, "GC_MULTICAST_PORT": str(args.gc_port), "READY_FILE": ready_file},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+            "bridge": subprocess.Popen(
+                [sys.executable, "-u", os.path.join(REPO, "placement_visualizer", "zmq_websocket_bridge.py")],
+                cwd=directory, env={**env, "ZMQ_SUBSCRIBER_URI": f"tcp://127.0.0.1:{args.port}",
+                                    "ZMQ_VISION_URI": f"tcp://127.0.0.1:{args.port + 3}",
+                                    "HTTP_PORT": str(bridge_port), "METRICS_PORT": str(bridge_metrics_port),
+                                    "SERVE_DIRECTORY": directory},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        }
+        sender = None
+        try:
+            deadline = time.monotonic() + 15
+            while not os.path.exists(ready_file):
+                if time.monotonic() > deadline or processes["orchestrator"].poll() is not None:
+                    raise RuntimeError("orchestrator did not become ready")
+                time.sleep(0.05)
+            ws_url = f"ws://127.0.0.1:{bridge_port}/ws"
+            wait_for_bridge(ws_url)
+
+            sender = StreamSender(continuous(passes), args.gc_port, args.speed)
+            soak = Soak(args, sender, processes, ws_url, f"http://127.0.0.1:{args.port + 1}/metrics")
+            sender.start()
+            started = time.monotonic()
+            totals = asyncio.run(soak.run())
+            elapsed = time.monotonic() - started
+            exited = [name for name, process in processes.items() if process.poll() is not None]
+        finally:
+            if sender is not None:
+                sender.stop()
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.wait()
+
+    report = build_report(args, soak, totals, elapsed, exited)
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, separators=(",", ":"))
+        print(f"Report written to {args.report}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == '__main__':
+    main()
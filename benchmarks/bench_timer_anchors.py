@@ -0,0 +1,90 @@
+# benchmarks/bench_timer_anchors.py
+# 残り時間のアンカー ('timers' トピック, orchestrator/timer_anchors.py) の送信量と精度を計測する。
+# 合成試合の全パケットについて、全タイマーの値をパケットごとに送る場合 (naive) と、アンカーを送る場合の
+# メッセージ数・バイト数を比べる。受信側 (common/timer_anchor.py) がパケットの時刻に外挿した値と実際の値の差
+# (最大 / p99) と、update() + poll() のパケット 1 件あたりの時間も出す。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_timer_anchors --rates 10 100
+import argparse
+import json
+import statistics
+import time
+
+from common.timer_anchor import TimerAnchors
+from orchestrator.timer_anchors import TimerAnchorTracker
+from .referee_stream import synthetic_match
+
+
+def timer_values(ref_msg):
+    """パケットに含まれる全タイマーの値 [秒] (naive 版のメッセージの中身)"""
+    values = {}
+    if ref_msg.HasField("stage_time_left"):
+        values["stage"] = ref_msg.stage_time_left / 1e6
+    if ref_msg.HasField("current_action_time_remaining"):
+        values["action"] = ref_msg.current_action_time_remaining / 1e6
+    for name, team in (("yellow", ref_msg.yellow), ("blue", ref_msg.blue)):
+        if team.HasField("timeout_time"):
+            values[f"{name}.timeout"] = team.timeout_time / 1e6
+        for i, remaining in enumerate(team.yellow_card_times):
+            values[f"{name}.card_{i}"] = remaining / 1e6
+    return values
+
+
+def replay(packets, tolerance_sec: float, refresh_sec: float):
+    """アンカーを遅延無しで受信側に渡し、(メッセージ数, バイト数, 外挿誤差 [秒] のリスト, 欠けた値の数) を返す"""
+    tracker = TimerAnchorTracker(tolerance_sec=tolerance_sec, refresh_sec=refresh_sec)
+    client = TimerAnchors()
+    messages, size, errors, missing = 0, 0, [], 0
+    for ref_msg in packets:
+        now = ref_msg.packet_timestamp / 1e6
+        tracker.update(ref_msg)
+        payload = tracker.poll(now=now)
+        if payload is not None:
+            messages += 1
+            size += len(payload)
+            client.update(json.loads(payload), received_at=now)
+        for name, actual in timer_values(ref_msg).items():
+            estimate = client.value(name, now=now)
+            if estimate is None:
+                missing += 1
+            else:
+                errors.append(abs(estimate - actual))
+    return messages, size, errors, missing
+
+
+def update_cost(packets, tolerance_sec: float, refresh_sec: float, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        tracker = TimerAnchorTracker(tolerance_sec=tolerance_sec, refresh_sec=refresh_sec)
+        start = time.perf_counter()
+        for ref_msg in packets:
+            tracker.update(ref_msg)
+            tracker.poll(now=ref_msg.packet_timestamp / 1e6)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6 / len(packets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timer anchors: messages per match vs per-packet publishing")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10.0, 100.0], help="referee packet rates (Hz)")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="timer_anchor_tolerance_sec")
+    parser.add_argument("--refresh", type=float, default=5.0, help="timer_anchor_refresh_sec")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for rate in args.rates:
+        packets = list(synthetic_match(packet_rate_hz=rate, seed=args.seed))
+        naive_size = sum(len(json.dumps({"now": p.packet_timestamp / 1e6, "timers": timer_values(p)},
+                                        separators=(",", ":"))) for p in packets)
+        messages, size, errors, missing = replay(packets, args.tolerance, args.refresh)
+        errors.sort()
+        print(f"{rate:5.0f} Hz, {len(packets)} packets: naive {len(packets)} messages ({naive_size / 1024:.0f} KiB), "
+              f"anchors {messages} messages ({size / 1024:.0f} KiB, {len(packets) / messages:.0f}x fewer); "
+              f"extrapolation error max {errors[-1] * 1000:.0f} ms, p99 {errors[int(len(errors) * 0.99)] * 1000:.0f} ms "
+              f"over {len(errors)} samples ({missing} missing); "
+              f"update + poll {update_cost(packets, args.tolerance, args.refresh, args.repeat):.2f} us/packet")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_vision.py
+# VisionListener の受信コストを計測する。
+# 22 台のロボットとボールの合成 TrackerWrapperPacket をマルチキャスト (ループバック) で --rate Hz で送り、
+# リスナースレッドの CPU 時間 (thread_time)・publish されたフレームのレート・'vision' トピックの送信量を測る。
+# あわせて、全パケットをパースする場合 (新しいメッセージ / 再利用) と間引いてパースする場合のコストを比較する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_vision --rate 100 --seconds 5
+import argparse
+import contextlib
+import io
+import math
+import socket
+import statistics
+import time
+
+import zmq
+
+from orchestrator.vision_listener import VisionListener, encode_frame, tracker_pb2, common_pb2
+
+
+class MeasuredVisionListener(VisionListener):
+    """run() を実行したスレッドの CPU 時間を記録する"""
+    cpu_sec = 0.0
+
+    def run(self):
+        start = time.thread_time()
+        try:
+            super().run()
+        finally:
+            self.cpu_sec = time.thread_time() - start
+
+
+def synthetic_packets(count: int, rate_hz: float):
+    """ロボットが円を描いて動き、ボールが往復するフレーム列 (シリアライズ済み)"""
+    wrapper = tracker_pb2.TrackerWrapperPacket(uuid="bench", source_name="bench")
+    frame = wrapper.tracked_frame
+    frame.balls.add()
+    for team in (common_pb2.YELLOW, common_pb2.BLUE):
+        for robot_id in range(11):
+            robot = frame.robots.add()
+            robot.robot_id.id, robot.robot_id.team = robot_id, team
+            robot.visibility = 1.0
+    packets = []
+    for i in range(count):
+        t = i / rate_hz
+        frame.frame_number, frame.timestamp = i, 1_700_000_000 + t
+        ball = frame.balls[0]
+        ball.pos.x, ball.pos.y = 4.0 * math.sin(t), 2.0 * math.cos(0.5 * t)
+        ball.pos.z = 0.0
+        ball.vel.x, ball.vel.y, ball.vel.z = 4.0 * math.cos(t), -math.sin(0.5 * t), 0.0
+        for k, robot in enumerate(frame.robots):
+            phase = t + k * 0.3
+            robot.pos.x, robot.pos.y = 5.0 * math.cos(phase * 0.2 + k), 3.5 * math.sin(phase * 0.3 + k)
+            robot.orientation = math.remainder(phase, 2 * math.pi)
+            robot.vel.x, robot.vel.y = -math.sin(phase), math.cos(phase)
+        packets.append(wrapper.SerializeToString())
+    return packets
+
+
+def live_run(packets, rate_hz: float, display_rate_hz: float, port: int):
+    """実際のリスナーにマルチキャストで送り、(リスナー, 受信フレーム数, 受信バイト数, 経過秒) を返す"""
+    uri = f"tcp://127.0.0.1:{port + 1}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        listener = MeasuredVisionListener(multicast_port=port, publish_uri=uri, display_rate_hz=display_rate_hz)
+        listener.start()
+        listener.ready.wait(timeout=5)
+    subscriber = zmq.Context.instance().socket(zmq.SUB)
+    subscriber.setsockopt(zmq.SUBSCRIBE, b"vision")
+    subscriber.connect(uri)
+    time.sleep(0.3)
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    frames = size = 0
+    interval = 1.0 / rate_hz if rate_hz > 0 else 0.0
+    start = time.monotonic()
+    for i, packet in enumerate(packets):
+        sender.sendto(packet, (listener.multicast_group, port))
+        if interval:
+            delay = start + (i + 1) * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        while subscriber.poll(0):
+            frames += 1
+            size += len(subscriber.recv_multipart()[1])
+    elapsed = time.monotonic() - start
+    while subscriber.poll(200):
+        frames += 1
+        size += len(subscriber.recv_multipart()[1])
+    with contextlib.redirect_stdout(io.StringIO()):
+        listener.stop()
+        listener.join()
+    subscriber.close()
+    sender.close()
+    return listener, frames, size, elapsed
+
+
+def decode_cost(packets, repeat: int):
+    """パケット 1 件あたりのパース時間 [us]: 毎回新しいメッセージ / メッセージを再利用"""
+    def fresh():
+        for data in packets:
+            tracker_pb2.TrackerWrapperPacket.FromString(data)
+
+    reused_packet = tracker_pb2.TrackerWrapperPacket()
+
+    def reused():
+        for data in packets:
+            reused_packet.ParseFromString(data)
+
+    results = []
+    for fn in (fresh, reused):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        results.append(statistics.median(samples) * 1e6 / len(packets))
+    return results
+
+
+def encode_cost(packets, repeat: int):
+    frames = [tracker_pb2.TrackerWrapperPacket.FromString(p).tracked_frame for p in packets]
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for frame in frames:
+            encode_frame(frame)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6 / len(frames), statistics.mean(len(encode_frame(f)) for f in frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vision (tracker) ingestion cost")
+    parser.add_argument("--rate", type=float, default=100.0, help="tracker packet rate (Hz)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--display-rate", type=float, default=20.0, help="published frame rate (Hz)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=10910)
+    args = parser.parse_args()
+
+    packets = synthetic_packets(int(args.rate * args.seconds), args.rate)
+    print(f"{len(packets)} tracker packets (22 robots + ball, {statistics.mean(map(len, packets)):.0f} B each)")
+
+    fresh_us, reused_us = decode_cost(packets, args.repeat)
+    encode_us, encoded_size = encode_cost(packets, args.repeat)
+    print(f"parse per packet: new message {fresh_us:.2f} us, reused message {reused_us:.2f} us; "
+          f"encode_frame {encode_us:.2f} us ({encoded_size:.0f} B)")
+    parse_all_ms = (fresh_us + encode_us) * args.rate / 1000
+    parse_thinned_ms = (fresh_us + encode_us) * args.display_rate / 1000
+    print(f"parse + encode CPU per second: every packet {parse_all_ms:.2f} ms, thinned to "
+          f"{args.display_rate:.0f} Hz {parse_thinned_ms:.2f} ms")
+
+    listener, frames, size, elapsed = live_run(packets, args.rate, args.display_rate, args.port)
+    print(f"live at {args.rate:.0f} Hz: {listener.packets_received}/{len(packets)} packets received, "
+          f"{frames} frames published ({frames / elapsed:.1f} Hz, {size / elapsed / 1e3:.1f} kB/s), "
+          f"listener CPU {listener.cpu_sec * 1000 / elapsed:.1f} ms/s ({listener.cpu_sec / elapsed * 100:.2f}% of a core)")
+
+    # 送信側の限界まで送った場合 (溜まったデータグラムはまとめて読み出し、最新のものだけ使う)
+    blast = packets * 40
+    listener, frames, size, elapsed = live_run(blast, 0, args.display_rate, args.port + 10)
+    print(f"saturated: {len(blast) / elapsed:.0f} packets/s sent, {listener.packets_received} received, "
+          f"{frames} frames published, listener CPU {listener.cpu_sec / elapsed * 100:.1f}% of a core")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/bench_viz_binary.py
+# 可視化ブリッジの JSON テキストフレームとバイナリサブプロトコル (配置イベントの固定長レコード) を比較する。
+#  - 1 イベントあたりの WebSocket ペイロードのバイト数とブリッジ側のエンコード時間
+#  - 実際のブリッジに JSON / バイナリのクライアントを 1 つずつ接続し、同じイベント列を受信して内容が一致すること
+# ブラウザ側のデコード時間は benchmarks/viz_decode.mjs で計測する。
+#
+#   PYTHONPATH=. python -m benchmarks.bench_viz_binary --events 20000
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+
+import zmq
+import zmq.asyncio
+from websockets.asyncio.client import connect
+
+from common.data_models import GameEvent
+from placement_visualizer import zmq_websocket_bridge as bridge
+
+
+def synthetic_events(count: int, seed: int = 0):
+    """配置イベント (ボールプレースメント指示 / 成功) とそれ以外のイベントが混ざった GameEvent JSON の列"""
+    rng = random.Random(seed)
+    payloads = []
+    now = 1_700_000_000.0
+    for i in range(count):
+        now += rng.uniform(0.05, 2.0)
+        team = rng.choice(("YELLOW", "BLUE"))
+        location = {"x": rng.uniform(-6000, 6000), "y": rng.uniform(-4500, 4500)}
+        kind = i % 4
+        if kind == 0:
+            event = GameEvent(now, f"COMMAND_BALL_PLACEMENT_{team}", 5,
+                              {"team": team, "current_action_time_remaining_us": 30_000_000, "placement_pos": location})
+        elif kind == 1:
+            event = GameEvent(now, f"EVENT_PLACEMENT_SUCCEEDED_{team}", 5,
+                              {"team": team, "time_taken": rng.uniform(3, 20), "precision": rng.uniform(0, 0.15),
+                               "location": location})
+        elif kind == 2:
+            event = GameEvent(now, f"EVENT_BOT_PUSHING_{team}", 3, {"team": team, "location": location})
+        else:
+            event = GameEvent(now, "COMMAND_STOP", 1, {})
+        payloads.append(event.to_json().encode("utf-8"))
+    return payloads
+
+
+def encode_costs(payloads, repeat: int):
+    """ブリッジが 1 イベントごとに行う処理 (json.loads 後の JSON 再エンコード / バイナリ化) の時間 [us/event]"""
+    events = [json.loads(p) for p in payloads]
+    json_samples, binary_samples = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for event in events:
+            json.dumps({"topic": "event", "data": event})
+        json_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for event in events:
+            bridge.encode_placement(event)
+        binary_samples.append(time.perf_counter() - start)
+    per_event = lambda samples: statistics.median(samples) * 1e6 / len(events)
+    return per_event(json_samples), per_event(binary_samples)
+
+
+async def end_to_end(payloads, port: int):
+    zmq_port = port + 1
+    bridge.ZMQ_SUBSCRIBER_URI = f"tcp://127.0.0.1:{zmq_port}"
+    bridge.COALESCE_WINDOW_MS = 0 # 1 イベント 1 フレームで比較する (まとめ送りの効果は bench_viz_coalesce)
+    context = zmq.asyncio.Context()
+    publisher = context.socket(zmq.PUB)
+    publisher.setsockopt(zmq.SNDHWM, 0)
+    publisher.bind(bridge.ZMQ_SUBSCRIBER_URI)
+    server = asyncio.create_task(bridge.main("127.0.0.1", port, "/nonexistent"))
+    await asyncio.sleep(0.3)
+
+    url = f"ws://127.0.0.1:{port}/ws"
+    async with connect(url, max_size=None) as json_client, \
+            connect(url, subprotocols=[bridge.BINARY_SUBPROTOCOL], max_size=None) as binary_client:
+        assert json_client.subprotocol is None and binary_client.subprotocol == bridge.BINARY_SUBPROTOCOL
+        await asyncio.sleep(0.3) # SUB の接続待ち
+
+        expected_binary = sum(bridge.encode_placement(json.loads(p)) is not None for p in payloads)
+        for payload in payloads:
+            await publisher.send_multipart([b"event", payload])
+
+        async def drain(client, count):
+            frames = []
+            while len(frames) < count:
+                frames.append(await asyncio.wait_for(client.recv(), timeout=10))
+            return frames
+
+        json_frames, binary_frames = await asyncio.gather(drain(json_client, len(payloads)),
+                                                          drain(binary_client, expected_binary))
+
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    publisher.close()
+    context.term()
+    return json_frames, binary_frames
+
+
+def check_same(json_frames, binary_frames):
+    """JSON クライアントが受けた配置イベントと、バイナリクライアントが受けたレコードが一致することを確認する"""
+    placements = []
+    for frame in json_frames:
+        event = json.loads(frame)["data"]
+        if bridge.encode_placement(event) is not None:
+            placements.append(event)
+    assert len(placements) == len(binary_frames)
+    for event, frame in zip(placements, binary_frames):
+        type_code, team_code, x, y, timestamp = bridge.PLACEMENT_RECORD.unpack(frame)
+        location = event["data"].get("location") or event["data"]["placement_pos"]
+        assert event["event_type"].startswith(next(k for k, v in bridge.PLACEMENT_TYPE_CODES.items() if v == type_code))
+        assert team_code == bridge.TEAM_CODES[event["data"]["team"]]
+        # float32: フィールド座標 (mm) で誤差は 1 mm 未満
+        assert abs(x - location["x"]) < 1 and abs(y - location["y"]) < 1
+        assert timestamp == event["timestamp"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visualizer WebSocket: JSON text frames vs binary placement records")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=58180)
+    args = parser.parse_args()
+    logging.getLogger("zmq_websocket_bridge").setLevel(logging.ERROR)
+
+    payloads = synthetic_events(args.events)
+    json_us, binary_us = encode_costs(payloads, args.repeat)
+    json_frames, binary_frames = asyncio.run(end_to_end(payloads, args.port))
+    check_same(json_frames, binary_frames)
+
+    placement_json = [f for f in json_frames if bridge.encode_placement(json.loads(f)["data"]) is not None]
+    json_bytes = sum(len(f.encode("utf-8")) for f in json_frames)
+    placement_json_bytes = sum(len(f.encode("utf-8")) for f in placement_json)
+    binary_bytes = sum(len(f) for f in binary_frames)
+    print(f"{len(payloads)} events published, {len(binary_frames)} placement events")
+    print(f"JSON client:   {len(json_frames)} frames, {json_bytes / 1e3:.0f} kB "
+          f"(placement events {placement_json_bytes / len(placement_json):.0f} B/event), "
+          f"encode {json_us:.2f} us/event")
+    print(f"binary client: {len(binary_frames)} frames, {binary_bytes / 1e3:.0f} kB "
+          f"({bridge.PLACEMENT_RECORD.size} B/event, non-placement events not sent), "
+          f"encode {binary_us:.2f} us/event")
+    print(f"payload bytes for the same placement updates: {placement_json_bytes / binary_bytes:.1f}x smaller; "
+          f"total downstream {json_bytes / binary_bytes:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/bench_viz_coalesce.py
+# 可視化ブリッジのまとめ送り (COALESCE_WINDOW_MS) と permessage-deflate (WS_COMPRESSION) の効果を計測する。
+# ブリッジをこのプロセスの asyncio ループで動かし、クライアント (既定 100 台) は別プロセスから接続する。
+# 合成試合の packet ごとのイベント (同じ packet で検出されたものはオーケストレーターが続けて publish する) を
+# --burst-interval-ms ごとに publish し、1 イベントあたりの次の値を比較する (100 台分の合計):
+#  - 送信のシステムコール: ループのスレッドでのソケットの send / sendmsg の呼び出し
+#    (transport.write はバッファが空なら直接 send し、溜まっていれば書き込み可能になった時にまとめて送る)
+#  - 送信バイト数 (WebSocket のフレームヘッダを含み、圧縮後。TCP/IP ヘッダは含まない)
+#  - ブリッジの CPU 時間 (ループのスレッドの thread_time)
+# あわせてクライアントでの遅延 (publish から受信まで) の p50 / p99 を出す (まとめ送りで窓の分だけ遅れる)。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_viz_coalesce --clients 100
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import zmq
+from websockets.asyncio.client import connect
+
+from placement_visualizer import zmq_websocket_bridge as bridge
+from .bench_match_stats import record_match
+
+END_EVENT = "BENCH_END" # 全クライアントが受け取る終了マーカー
+MODES = [(0, "off"), (0, "deflate"), (0, "shared"), (16, "off"), (16, "deflate"), (16, "shared")]
+
+
+def match_bursts(matches: int):
+    """合成試合の packet ごとのイベント (dict) の列"""
+    bursts = []
+    for seed in range(matches):
+        for _, events in record_match(seed):
+            if events:
+                bursts.append([json.loads(game_event.to_json()) for game_event in events])
+    return bursts
+
+
+async def run_clients(url: str, count: int):
+    """(クライアントプロセス) count 台で接続し、終了マーカーまで受信して集計を JSON で標準出力に出す"""
+    clients = [await connect(url, max_size=None) for _ in range(count)]
+    print("ready", flush=True)
+
+    async def receive(client):
+        frames = messages = 0
+        latencies = []
+        while True:
+            frame = await asyncio.wait_for(client.recv(), timeout=30)
+            received_at = time.time()
+            frames += 1
+            parsed = json.loads(frame)
+            for message in parsed if isinstance(parsed, list) else [parsed]:
+                messages += 1
+                event = message["data"]
+                if event.get("event_type") == END_EVENT:
+                    return frames, messages, latencies
+                latencies.append((received_at - event["timestamp"]) * 1000)
+
+    results = await asyncio.gather(*(receive(client) for client in clients))
+    for client in clients:
+        await client.close()
+    latencies = sorted(latency for _, _, client_latencies in results for latency in client_latencies)
+    print(json.dumps({"frames": sum(r[0] for r in results), "messages": sum(r[1] for r in results),
+                      "p50_ms": latencies[len(latencies) // 2],
+                      "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]}), flush=True)
+
+
+def publish(uri: str, bursts, interval_sec: float, started: threading.Event):
+    """(スレッド) バーストごとにイベントを続けて publish する。timestamp には publish 時刻を入れる"""
+    context = zmq.Context()
+    publisher = context.socket(zmq.PUB)
+    publisher.setsockopt(zmq.SNDHWM, 0)
+    publisher.bind(uri)
+    started.wait()
+    next_at = time.perf_counter()
+    for burst in bursts:
+        for event in burst:
+            event["timestamp"] = time.time()
+            publisher.send_multipart([b"event", json.dumps(event).encode("utf-8")])
+        next_at += interval_sec
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+    publisher.send_multipart([b"event", json.dumps({"timestamp": time.time(), "event_type": END_EVENT,
+                                                    "priority": 10, "data": {}}).encode()])
+    publisher.close(linger=1000)
+    context.term()
+
+
+class SendCounter:
+    """ループのスレッドでのソケットへの送信 (send / sendmsg の呼び出し = システムコール) の回数とバイト数を数える"""
+
+    def __init__(self):
+        self.calls = self.bytes = 0
+        self._originals = {name: getattr(socket.socket, name) for name in ("send", "sendmsg")}
+
+    def __enter__(self):
+        thread = threading.get_ident()
+        for name, original in self._originals.items():
+            def counted(sock, *args, _original=original, **kwargs):
+                sent = _original(sock, *args, **kwargs)
+                if threading.get_ident() == thread:
+                    self.calls += 1
+                    self.bytes += sent
+                return sent
+            setattr(socket.socket, name, counted)
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._originals.items():
+            setattr(socket.socket, name, original)
+
+
+async def run_mode(bursts, window_ms: float, compression: str, args, port: int):
+    bridge.COALESCE_WINDOW_MS = window_ms
+    bridge.WS_COMPRESSION = compression
+    bridge.ZMQ_SUBSCRIBER_URI = f"tcp://127.0.0.1:{port + 1}"
+    bridge.ZMQ_VISION_URI = ""
+    bridge.METRICS_PORT = 0
+    server = asyncio.create_task(bridge.main("127.0.0.1", port, "/nonexistent"))
+    await asyncio.sleep(0.3)
+
+    client_process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.bench_viz_coalesce", "--client-process",
+        "--clients", str(args.clients), "--port", str(port),
+        stdout=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    assert (await client_process.stdout.readline()).strip() == b"ready"
+    started = threading.Event()
+    publisher = threading.Thread(target=publish, args=(f"tcp://127.0.0.1:{port + 1}", bursts,
+                                                       args.burst_interval_ms / 1000, started))
+    publisher.start()
+    await asyncio.sleep(0.5) # PUB の接続待ち
+
+    with SendCounter() as sends:
+        cpu = time.thread_time()
+        started.set()
+        result = json.loads(await client_process.stdout.readline())
+        cpu = time.thread_time() - cpu
+    await client_process.wait()
+    publisher.join()
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+
+    events = sum(len(burst) for burst in bursts)
+    expected = (events + 1) * args.clients
+    assert result["messages"] == expected, (result, expected)
+    return {"syscalls": sends.calls / events, "bytes": sends.bytes / events,
+            "cpu_us": cpu * 1e6 / events, "frames_per_client": result["frames"] / args.clients,
+            "p50_ms": result["p50_ms"], "p99_ms": result["p99_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visualizer bridge: frame coalescing and permessage-deflate")
+    parser.add_argument("--matches", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--burst-interval-ms", type=float, default=50.0)
+    parser.add_argument("--port", type=int, default=58380)
+    parser.add_argument("--client-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.client_process:
+        asyncio.run(run_clients(f"ws://127.0.0.1:{args.port}/ws", args.clients))
+        return
+    logging.getLogger("zmq_websocket_bridge").setLevel(logging.ERROR)
+
+    bursts = match_bursts(args.matches)
+    events = sum(len(burst) for burst in bursts)
+    print(f"{events} events in {len(bursts)} bursts (max {max(len(b) for b in bursts)}), "
+          f"one burst every {args.burst_interval_ms:g} ms, {args.clients} clients")
+    print(f"{'window':>7} {'compression':>11} | {'syscalls/ev':>11} {'bytes/ev':>9} "
+          f"{'cpu us/ev':>9} | {'frames/client':>13} {'p50 ms':>6} {'p99 ms':>6}")
+    for index, (window_ms, compression) in enumerate(MODES):
+        result = asyncio.run(run_mode(bursts, window_ms, compression, args, args.port + index * 10))
+        print(f"{window_ms:>5g}ms {compression:>11} | {result['syscalls']:>11.1f} "
+              f"{result['bytes']:>9.0f} {result['cpu_us']:>9.0f} | {result['frames_per_client']:>13.0f} "
+              f"{result['p50_ms']:>6.1f} {result['p99_ms']:>6.1f}")
+    print(f"(per event, summed over {args.clients} clients; first row is the previous behaviour: "
+          f"one uncompressed frame per message)")
+
+
+if __name__ == '__main__':
+    main()
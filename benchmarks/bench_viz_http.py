@@ -0,0 +1,115 @@
+# benchmarks/bench_viz_http.py
+# 可視化ページの同時読み込み (例: 30 画面が一斉にリロード) を再現し、
+# ブリッジの HTTP 配信 (メモリ上の圧縮済みファイル + ETag) と、
+# 以前の serve.py 相当 (シングルスレッドの SimpleHTTPRequestHandler) を比較する。
+#
+#   PYTHONPATH=. python -m benchmarks.bench_viz_http --clients 30
+import argparse
+import asyncio
+import functools
+import http.client
+import http.server
+import logging
+import os
+import socketserver
+import statistics
+import threading
+import time
+
+from placement_visualizer import zmq_websocket_bridge as bridge
+
+
+def page_load(port: int, barrier: threading.Barrier, results: list, etag=None):
+    headers = {"Accept-Encoding": "gzip, br"}
+    if etag:
+        headers["If-None-Match"] = etag
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    barrier.wait()
+    start = time.perf_counter()
+    conn.request("GET", "/index.html", headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    results.append((time.perf_counter() - start, response.status, len(body), response.getheader("ETag")))
+    conn.close()
+
+
+def concurrent_loads(port: int, clients: int, etag=None):
+    barrier = threading.Barrier(clients + 1)
+    results = []
+    threads = [threading.Thread(target=page_load, args=(port, barrier, results, etag)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def report(label: str, wall: float, results: list):
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses = sorted({r[1] for r in results})
+    print(f"{label:>40}: all done in {wall * 1000:7.2f} ms, median {statistics.median(latencies):6.2f} ms, "
+          f"max {latencies[-1]:6.2f} ms, {results[0][2]} bytes/response, status {statuses}")
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_legacy_server(port: int, directory: str) -> socketserver.TCPServer:
+    httpd = socketserver.TCPServer(("127.0.0.1", port), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def start_bridge(port: int, directory: str):
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        task = loop.create_task(bridge.main("127.0.0.1", port, directory))
+        loop.call_later(0.2, started.set)
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    return loop, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent visualizer page loads: bridge vs SimpleHTTPRequestHandler")
+    parser.add_argument("--clients", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--port", type=int, default=58080)
+    parser.add_argument("--directory", default=bridge.SERVE_DIRECTORY, help="built page (placement_visualizer/web/dist)")
+    args = parser.parse_args()
+    if not os.path.isfile(os.path.join(args.directory, "index.html")):
+        raise SystemExit(f"No index.html in {args.directory}; run 'npm run build' in placement_visualizer/web first")
+    logging.getLogger("zmq_websocket_bridge").setLevel(logging.WARNING)
+
+    legacy = start_legacy_server(args.port, args.directory)
+    wall, results = min((concurrent_loads(args.port, args.clients) for _ in range(args.rounds)), key=lambda r: r[0])
+    report("serve.py (single-threaded, from disk)", wall, results)
+    legacy.shutdown()
+    legacy.server_close()
+
+    loop, thread = start_bridge(args.port + 1, args.directory)
+    wall, results = min((concurrent_loads(args.port + 1, args.clients) for _ in range(args.rounds)), key=lambda r: r[0])
+    report("bridge (in memory, precompressed)", wall, results)
+    etag = results[0][3]
+    wall, results = min((concurrent_loads(args.port + 1, args.clients, etag) for _ in range(args.rounds)), key=lambda r: r[0])
+    report("bridge revalidation (If-None-Match)", wall, results)
+    for task in asyncio.all_tasks(loop):
+        loop.call_soon_threadsafe(task.cancel)
+    thread.join(timeout=5)
+
+
+if __name__ == '__main__':
+    main()
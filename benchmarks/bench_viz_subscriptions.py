@@ -0,0 +1,154 @@
+# benchmarks/bench_viz_subscriptions.py
+# 可視化ブリッジのクライアントごとの購読フィルタの効果を計測する。
+# 配置表示・スコアボード・全イベントのクライアントを実際のブリッジに接続し、合成試合のイベント列を流して
+# フィルタ無し (全員に全イベント) の場合とクライアントごとの受信バイト数・メッセージ数を比較する。
+# あわせて、SubscriptionFilter.matches (キャッシュ付き) と毎回 fnmatch で照合する場合のコストを比較する。
+#
+#   PYTHONPATH=.:./proto python -m benchmarks.bench_viz_subscriptions --matches 10
+import argparse
+import asyncio
+import fnmatch
+import json
+import logging
+import time
+
+import yaml
+import zmq
+import zmq.asyncio
+from websockets.asyncio.client import connect
+
+from placement_visualizer import zmq_websocket_bridge as bridge
+from .bench_match_stats import record_match
+
+END_EVENT = "BENCH_END" # 全クライアントが受け取る終了マーカー
+PLACEMENT_FILTERS = [{"event_types": ["COMMAND_BALL_PLACEMENT_*", "EVENT_PLACEMENT_*", END_EVENT]}]
+SCOREBOARD_FILTERS = [{"event_types": ["EVENT_GOAL_*", "STAGE_*", END_EVENT]},
+                      {"event_types": ["COMMAND_*"], "min_priority": 7}]
+
+
+def match_payloads(matches: int, priority_config: str):
+    """合成試合のイベントを、優先度設定ファイルの優先度を付けて JSON にする"""
+    with open(priority_config, "r", encoding="utf-8") as f:
+        priorities = (yaml.safe_load(f) or {}).get("event_priorities", {}) or {}
+    payloads = []
+    for seed in range(matches):
+        for _, events in record_match(seed):
+            for game_event in events:
+                game_event.priority = priorities.get(game_event.event_type, 5)
+                payloads.append(game_event.to_json().encode("utf-8"))
+    return payloads
+
+
+async def run_clients(payloads, groups, port: int):
+    """groups: [(名前, クライアント数, filters または None)]。グループごとの (メッセージ数, バイト数) / クライアントを返す"""
+    bridge.ZMQ_SUBSCRIBER_URI = f"tcp://127.0.0.1:{port + 1}"
+    bridge.COALESCE_WINDOW_MS = 0 # 1 イベント 1 フレームで比較する (まとめ送りの効果は bench_viz_coalesce)
+    context = zmq.asyncio.Context()
+    publisher = context.socket(zmq.PUB)
+    publisher.setsockopt(zmq.SNDHWM, 0)
+    publisher.bind(bridge.ZMQ_SUBSCRIBER_URI)
+    server = asyncio.create_task(bridge.main("127.0.0.1", port, "/nonexistent"))
+    await asyncio.sleep(0.3)
+
+    clients = []
+    for name, count, filters in groups:
+        for _ in range(count):
+            client = await connect(f"ws://127.0.0.1:{port}/ws", max_size=None)
+            if filters is not None:
+                await client.send(json.dumps({"op": "subscribe", "filters": filters}))
+                ack = json.loads(await client.recv())
+                assert "error" not in ack["data"], ack
+            clients.append((name, client))
+    await asyncio.sleep(0.3) # SUB の接続待ち
+
+    async def receive(client):
+        messages = size = 0
+        while True:
+            frame = await asyncio.wait_for(client.recv(), timeout=10)
+            messages += 1
+            size += len(frame.encode("utf-8"))
+            if json.loads(frame)["data"].get("event_type") == END_EVENT:
+                return messages, size
+
+    receivers = [asyncio.create_task(receive(client)) for _, client in clients]
+    start = time.perf_counter()
+    for payload in payloads:
+        await publisher.send_multipart([b"event", payload])
+    await publisher.send_multipart([b"event", json.dumps({"timestamp": 0, "event_type": END_EVENT,
+                                                          "priority": 10, "data": {}}).encode()])
+    results = await asyncio.gather(*receivers)
+    elapsed = time.perf_counter() - start
+
+    for _, client in clients:
+        await client.close()
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    publisher.close()
+    context.term()
+
+    per_group = {}
+    for (name, _), (messages, size) in zip(clients, results):
+        per_group.setdefault(name, []).append((messages, size))
+    return {name: tuple(sum(v[i] for v in values) / len(values) for i in range(2)) for name, values in per_group.items()}, elapsed
+
+
+def matcher_cost(payloads, repeat: int):
+    events = [json.loads(p) for p in payloads]
+    keys = [(e["event_type"], e["priority"]) for e in events]
+    compiled = bridge.SubscriptionFilter(SCOREBOARD_FILTERS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for event_type, priority in keys:
+            compiled.matches(event_type, priority)
+    cached_ns = (time.perf_counter() - start) * 1e9 / (repeat * len(keys))
+
+    def naive(event_type, priority):
+        return any(priority >= f.get("min_priority", 0) and any(fnmatch.fnmatchcase(event_type, p) for p in f["event_types"])
+                   for f in SCOREBOARD_FILTERS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for event_type, priority in keys:
+            naive(event_type, priority)
+    naive_ns = (time.perf_counter() - start) * 1e9 / (repeat * len(keys))
+    assert all(compiled.matches(*k) == naive(*k) for k in keys)
+    return cached_ns, naive_ns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-client subscription filters in the visualizer bridge")
+    parser.add_argument("--matches", type=int, default=10)
+    parser.add_argument("--placement-clients", type=int, default=20)
+    parser.add_argument("--scoreboard-clients", type=int, default=5)
+    parser.add_argument("--all-clients", type=int, default=5)
+    parser.add_argument("--priority-config", default="config/config_priority.yaml")
+    parser.add_argument("--port", type=int, default=58280)
+    args = parser.parse_args()
+    logging.getLogger("zmq_websocket_bridge").setLevel(logging.ERROR)
+
+    payloads = match_payloads(args.matches, args.priority_config)
+    print(f"{len(payloads)} events from {args.matches} synthetic matches")
+
+    groups = [("placement view", args.placement_clients, PLACEMENT_FILTERS),
+              ("scoreboard", args.scoreboard_clients, SCOREBOARD_FILTERS),
+              ("everything", args.all_clients, None)]
+    unfiltered = [(name, count, None) for name, count, _ in groups]
+    baseline, baseline_sec = asyncio.run(run_clients(payloads, unfiltered, args.port))
+    filtered, filtered_sec = asyncio.run(run_clients(payloads, groups, args.port + 10))
+
+    total_before = total_after = 0
+    for name, count, _ in groups:
+        messages_before, bytes_before = baseline[name]
+        messages_after, bytes_after = filtered[name]
+        total_before += bytes_before * count
+        total_after += bytes_after * count
+        print(f"{name:>15} x{count:<3}: {messages_before:6.0f} -> {messages_after:6.0f} messages/client, "
+              f"{bytes_before / 1e3:7.1f} -> {bytes_after / 1e3:7.1f} kB/client")
+    print(f"bridge downstream total: {total_before / 1e6:.2f} MB -> {total_after / 1e6:.2f} MB "
+          f"({total_before / total_after:.1f}x less); delivery {baseline_sec * 1000:.0f} ms -> {filtered_sec * 1000:.0f} ms")
+
+    cached_ns, naive_ns = matcher_cost(payloads, 20)
+    print(f"filter check per event per client: compiled + cached {cached_ns:.0f} ns, fnmatch every time {naive_ns:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
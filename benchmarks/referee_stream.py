@@ -0,0 +1,205 @@
+# benchmarks/referee_stream.py
+# ベンチマーク / 障害注入テスト用の合成 Referee ストリーム。
+# 実際の GC と同じく一定レートで Referee を送り、停止中は game_events を保持し続ける。
+import random
+from typing import Iterator, Optional
+
+try:
+    from state import ssl_gc_referee_message_pb2 as referee_pb2
+    from state import ssl_gc_game_event_pb2 as game_event_pb2
+    from state import ssl_gc_common_pb2 as common_pb2
+except ImportError:
+    print("Error: Protobuf generated code not found. Add ./proto to PYTHONPATH.")
+    exit(1)
+
+Referee = referee_pb2.Referee
+HALF_DURATION_US = 5 * 60 * 1_000_000
+HALF_TIME_DURATION_US = 5 * 60 * 1_000_000
+
+
+class SyntheticMatch:
+    """
+    前半 → ハーフタイム → 後半 の 1 試合分の Referee メッセージを生成する。
+    プレー再開 / ファウル / ボールプレースメント / ゴール / カードをランダムに発生させる。
+    """
+    def __init__(self,
+                 packet_rate_hz: float = 10.0,
+                 seed: int = 0,
+                 start_timestamp_us: int = 1_700_000_000_000_000,
+                 half_duration_us: int = HALF_DURATION_US,
+                 half_time_duration_us: int = HALF_TIME_DURATION_US):
+        self.packet_interval_us = int(1_000_000 / packet_rate_hz)
+        self.rng = random.Random(seed)
+        self.now_us = start_timestamp_us
+        self.half_duration_us = half_duration_us
+        self.half_time_duration_us = half_time_duration_us
+        self.ref = Referee()
+        self.ref.packet_timestamp = self.now_us
+        self.ref.command_timestamp = self.now_us
+        self.ref.command_counter = 0
+        self.ref.stage = Referee.NORMAL_FIRST_HALF_PRE
+        self.ref.command = Referee.HALT
+        for team, name in ((self.ref.yellow, "SyntheticYellow"), (self.ref.blue, "SyntheticBlue")):
+            team.name = name
+            team.score = 0
+            team.red_cards = 0
+            team.yellow_cards = 0
+            team.timeouts = 4
+            team.timeout_time = 300_000_000
+            team.goalkeeper = 0
+            team.foul_counter = 0
+            team.max_allowed_bots = 11
+        self._next_event_id = 0
+
+    # --- 内部ヘルパー ---
+    def _team_info(self, team: int):
+        return self.ref.yellow if team == common_pb2.YELLOW else self.ref.blue
+
+    def _set_command(self, command: int, next_command: Optional[int] = None):
+        self.ref.command = command
+        self.ref.command_counter += 1
+        self.ref.command_timestamp = self.now_us
+        # GC と同じく、次に出す予定のコマンドがあれば next_command に載せる
+        if next_command is None:
+            self.ref.ClearField("next_command")
+        else:
+            self.ref.next_command = next_command
+
+    def _add_game_event(self, proto_event: game_event_pb2.GameEvent):
+        self._next_event_id += 1
+        proto_event.created_timestamp = self.now_us + self._next_event_id # 一意になるようにずらす
+        proto_event.id = f"synthetic-{self._next_event_id}"
+        self.ref.game_events.append(proto_event)
+
+    def _tick(self, duration_us: int, running: bool) -> Iterator[Referee]:
+        """duration_us の間、現在の状態で Referee を送り続ける"""
+        elapsed = 0
+        while elapsed < duration_us:
+            self.now_us += self.packet_interval_us
+            elapsed += self.packet_interval_us
+            self.ref.packet_timestamp = self.now_us
+            if running and self.ref.HasField("stage_time_left"):
+                self.ref.stage_time_left -= self.packet_interval_us
+            if self.ref.HasField("current_action_time_remaining"):
+                self.ref.current_action_time_remaining -= self.packet_interval_us
+            for team in (self.ref.yellow, self.ref.blue):
+                if running and team.yellow_card_times:
+                    times = [t - self.packet_interval_us for t in team.yellow_card_times]
+                    del team.yellow_card_times[:]
+                    team.yellow_card_times.extend(t for t in times if t > 0)
+            msg = Referee()
+            msg.CopyFrom(self.ref)
+            yield msg
+
+    def _stoppage(self) -> Iterator[Referee]:
+        """ファウル/ボールアウト → STOP → (ボールプレースメント) → フリーキック再開"""
+        rng = self.rng
+        team = rng.choice((common_pb2.YELLOW, common_pb2.BLUE))
+        opponent = common_pb2.BLUE if team == common_pb2.YELLOW else common_pb2.YELLOW
+
+        proto_event = game_event_pb2.GameEvent()
+        kind = rng.random()
+        if kind < 0.1:
+            proto_event.type = game_event_pb2.GameEvent.Type.GOAL
+            proto_event.goal.by_team = team
+            proto_event.goal.kicking_bot = rng.randrange(11)
+            self._team_info(team).score += 1
+        elif kind < 0.45:
+            proto_event.type = game_event_pb2.GameEvent.Type.BOT_PUSHED_BOT
+            proto_event.bot_pushed_bot.by_team = team
+            proto_event.bot_pushed_bot.violator = rng.randrange(11)
+            proto_event.bot_pushed_bot.victim = rng.randrange(11)
+            self._team_info(team).foul_counter += 1
+            if self._team_info(team).foul_counter % 3 == 0:
+                self._team_info(team).yellow_cards += 1
+                self._team_info(team).yellow_card_times.append(120_000_000)
+        else:
+            proto_event.type = game_event_pb2.GameEvent.Type.BALL_LEFT_FIELD_TOUCH_LINE
+            proto_event.ball_left_field_touch_line.by_team = team
+        self._add_game_event(proto_event)
+
+        if proto_event.type == game_event_pb2.GameEvent.Type.GOAL:
+            next_command = Referee.PREPARE_KICKOFF_YELLOW if opponent == common_pb2.YELLOW else Referee.PREPARE_KICKOFF_BLUE
+            self._set_command(Referee.STOP, next_command)
+            yield from self._tick(rng.randint(1, 3) * 1_000_000, running=False)
+        else:
+            self._set_command(Referee.STOP)
+            yield from self._tick(rng.randint(1, 3) * 1_000_000, running=False)
+            # ボールプレースメント
+            self._set_command(Referee.BALL_PLACEMENT_YELLOW if opponent == common_pb2.YELLOW else Referee.BALL_PLACEMENT_BLUE)
+            self.ref.designated_position.x = rng.uniform(-5500, 5500)
+            self.ref.designated_position.y = rng.uniform(-4000, 4000)
+            self.ref.current_action_time_remaining = 30_000_000
+            placement_us = rng.randint(3, 20) * 1_000_000
+            yield from self._tick(placement_us, running=False)
+            placement_event = game_event_pb2.GameEvent()
+            if rng.random() < 0.85:
+                placement_event.type = game_event_pb2.GameEvent.Type.PLACEMENT_SUCCEEDED
+                placement_event.placement_succeeded.by_team = opponent
+                placement_event.placement_succeeded.time_taken = placement_us / 1e6
+                placement_event.placement_succeeded.precision = rng.uniform(0.0, 0.15)
+                placement_event.placement_succeeded.distance = rng.uniform(0.5, 8.0)
+            else:
+                placement_event.type = game_event_pb2.GameEvent.Type.PLACEMENT_FAILED
+                placement_event.placement_failed.by_team = opponent
+                placement_event.placement_failed.remaining_dist = rng.uniform(0.2, 3.0)
+            self._add_game_event(placement_event)
+            self.ref.ClearField("current_action_time_remaining")
+            next_command = Referee.DIRECT_FREE_YELLOW if opponent == common_pb2.YELLOW else Referee.DIRECT_FREE_BLUE
+            self._set_command(Referee.STOP, next_command)
+            yield from self._tick(rng.randint(1, 3) * 1_000_000, running=False)
+
+        is_kickoff = next_command in (Referee.PREPARE_KICKOFF_YELLOW, Referee.PREPARE_KICKOFF_BLUE)
+        self._set_command(next_command, Referee.NORMAL_START if is_kickoff else None)
+        if is_kickoff:
+            yield from self._tick(2_000_000, running=False)
+            self._set_command(Referee.NORMAL_START)
+        # プレー再開で GC は game_events をクリアする
+        del self.ref.game_events[:]
+        self.ref.ClearField("designated_position")
+        yield from self._tick(1_000_000, running=True)
+
+    def _half(self, pre_stage: int, stage: int, kickoff: int) -> Iterator[Referee]:
+        self.ref.stage = pre_stage
+        self.ref.ClearField("stage_time_left")
+        self._set_command(Referee.STOP, kickoff)
+        yield from self._tick(2_000_000, running=False)
+        self._set_command(kickoff, Referee.NORMAL_START)
+        yield from self._tick(2_000_000, running=False)
+        self.ref.stage = stage
+        self.ref.stage_time_left = self.half_duration_us
+        self._set_command(Referee.NORMAL_START)
+        while self.ref.stage_time_left > 0:
+            yield from self._tick(self.rng.randint(5, 40) * 1_000_000, running=True)
+            if self.ref.stage_time_left <= 0:
+                break
+            yield from self._stoppage()
+        self._set_command(Referee.STOP)
+
+    def packets(self) -> Iterator[Referee]:
+        """試合開始から終了までの Referee メッセージを順に返す"""
+        yield from self._tick(1_000_000, running=False)
+        yield from self._half(Referee.NORMAL_FIRST_HALF_PRE, Referee.NORMAL_FIRST_HALF, Referee.PREPARE_KICKOFF_YELLOW)
+        self.ref.stage = Referee.NORMAL_HALF_TIME
+        self.ref.stage_time_left = self.half_time_duration_us
+        self._set_command(Referee.HALT)
+        yield from self._tick(self.half_time_duration_us, running=True)
+        yield from self._half(Referee.NORMAL_SECOND_HALF_PRE, Referee.NORMAL_SECOND_HALF, Referee.PREPARE_KICKOFF_BLUE)
+        self.ref.stage = Referee.POST_GAME
+        self.ref.ClearField("stage_time_left")
+        self._set_command(Referee.HALT)
+        yield from self._tick(1_000_000, running=False)
+
+
+def synthetic_match(packet_rate_hz: float = 10.0, seed: int = 0, **kwargs) -> Iterator[Referee]:
+    return SyntheticMatch(packet_rate_hz=packet_rate_hz, seed=seed, **kwargs).packets()
+
+
+if __name__ == '__main__':
+    count = 0
+    last: Optional[Referee] = None
+    for msg in synthetic_match():
+        count += 1
+        last = msg
+    print(f"Generated {count} packets, final score {last.yellow.score}-{last.blue.score}, "
+          f"command_counter={last.command_counter}")
@@ -0,0 +1,95 @@
+// benchmarks/viz_decode.mjs
+// 可視化ページでの受信メッセージのデコード時間を比較する (Node も Chrome と同じ V8)。
+//  - JSON: JSON.parse して topic / event_type / location を取り出す (従来の処理)
+//  - バイナリ: placementCodec.js の decodePlacements (DataView) で 18 バイトのレコードを読む
+//
+//   node benchmarks/viz_decode.mjs --events 100000
+import { parseArgs } from "node:util";
+import { decodePlacements, RECORD_SIZE } from "../placement_visualizer/web/src/placementCodec.js";
+
+const { values } = parseArgs({
+  options: {
+    events: { type: "string", default: "100000" },
+    repeat: { type: "string", default: "7" },
+  },
+});
+const count = Number(values.events);
+const repeat = Number(values.repeat);
+
+// ブリッジが送るのと同じ形の JSON と、同じ内容のバイナリレコード
+const jsonMessages = [];
+const binaryMessages = [];
+let seed = 1;
+const random = () => ((seed = (seed * 16807) % 2147483647) / 2147483647);
+for (let i = 0; i < count; i++) {
+  const team = i % 2 ? "BLUE" : "YELLOW";
+  const x = random() * 12000 - 6000;
+  const y = random() * 9000 - 4500;
+  const timestamp = 1_700_000_000 + i * 0.5;
+  jsonMessages.push(JSON.stringify({
+    topic: "event",
+    data: {
+      timestamp,
+      event_type: `COMMAND_BALL_PLACEMENT_${team}`,
+      priority: 5,
+      data: { team, current_action_time_remaining_us: 30000000, placement_pos: { x, y } },
+    },
+  }));
+  const buffer = new ArrayBuffer(RECORD_SIZE);
+  const view = new DataView(buffer);
+  view.setUint8(0, 2);
+  view.setUint8(1, team === "YELLOW" ? 1 : 2);
+  view.setFloat32(2, x, true);
+  view.setFloat32(6, y, true);
+  view.setFloat64(10, timestamp, true);
+  binaryMessages.push(buffer);
+}
+
+// 受信処理の結果を捨てないよう、座標の合計を返す
+function decodeJson() {
+  let sum = 0;
+  for (const text of jsonMessages) {
+    const message = JSON.parse(text);
+    if (message.topic === "event" && message.data) {
+      const event = message.data;
+      if (event.event_type.includes("BALL_PLACEMENT")) {
+        const location = event.data.location || event.data.placement_pos;
+        sum += location.x + location.y;
+      }
+    }
+  }
+  return sum;
+}
+
+function decodeBinary() {
+  let sum = 0;
+  const onEvent = (event) => { sum += event.data.location.x + event.data.location.y; };
+  for (const buffer of binaryMessages) {
+    decodePlacements(buffer, onEvent);
+  }
+  return sum;
+}
+
+function time(fn) {
+  fn(); // ウォームアップ (JIT)
+  const samples = [];
+  let result = 0;
+  for (let i = 0; i < repeat; i++) {
+    const start = performance.now();
+    result = fn();
+    samples.push(performance.now() - start);
+  }
+  samples.sort((a, b) => a - b);
+  return { ms: samples[Math.floor(samples.length / 2)], result };
+}
+
+const jsonBytes = jsonMessages.reduce((n, m) => n + Buffer.byteLength(m), 0);
+const json = time(decodeJson);
+const binary = time(decodeBinary);
+if (Math.abs(json.result - binary.result) > count) { // float32 の丸め誤差 (1 件あたり 1 mm 未満) を超える差は不一致
+  throw new Error(`decoded coordinates differ: ${json.result} vs ${binary.result}`);
+}
+console.log(`${count} placement messages`);
+console.log(`JSON:   ${(jsonBytes / count).toFixed(0)} B/message, decode ${(json.ms * 1e3 / count).toFixed(3)} us/message`);
+console.log(`binary: ${RECORD_SIZE} B/message, decode ${(binary.ms * 1e3 / count).toFixed(3)} us/message ` +
+            `(${(json.ms / binary.ms).toFixed(1)}x faster)`);
@@ -0,0 +1,76 @@
+// benchmarks/viz_first_render.mjs
+// 可視化ページの time-to-first-render を headless Chrome で計測する。
+// ナビゲーション開始から #root に最初の要素が描画されるまでの時間を、キャッシュ無し (cold) と
+// リロード (warm) でそれぞれ計測する。--cpu-throttle で会場の低スペック PC を模擬できる。
+//
+// puppeteer が必要 (npm install -g puppeteer など):
+//   NODE_PATH=$(npm root -g) node benchmarks/viz_first_render.mjs --url http://localhost:8080/ --cpu-throttle 4
+//
+// ビルド前 (in-browser Babel 版) と比較する場合は、旧 index.html を別ポートで配信して --url を 2 つ指定する:
+//   git show <commit>:placement_visualizer/index.html > /tmp/legacy/index.html
+//   python -m http.server 8081 -d /tmp/legacy
+//   NODE_PATH=$(npm root -g) node benchmarks/viz_first_render.mjs --url http://localhost:8081/ --url http://localhost:8080/
+import { createRequire } from "node:module";
+import { parseArgs } from "node:util";
+
+const require = createRequire(import.meta.url); // NODE_PATH のグローバルインストールを解決するため
+const puppeteer = require("puppeteer");
+
+const { values } = parseArgs({
+  options: {
+    url: { type: "string", multiple: true, default: ["http://localhost:8080/"] },
+    runs: { type: "string", default: "10" },
+    "cpu-throttle": { type: "string", default: "1" },
+    timeout: { type: "string", default: "30000" },
+  },
+});
+const runs = Number(values.runs);
+const cpuThrottle = Number(values["cpu-throttle"]);
+const timeout = Number(values.timeout);
+
+const median = (xs) => {
+  const s = [...xs].sort((a, b) => a - b);
+  return s.length % 2 ? s[(s.length - 1) / 2] : (s[s.length / 2 - 1] + s[s.length / 2]) / 2;
+};
+
+// #root に子要素が現れた時刻 (performance.now() の原点はナビゲーション開始)
+async function firstRender(page) {
+  await page.waitForFunction(() => document.getElementById("root")?.firstElementChild, { polling: "raf", timeout });
+  return page.evaluate(() => performance.now());
+}
+
+async function measure(browser, url) {
+  const cold = [];
+  const warm = [];
+  for (let i = 0; i < runs; i++) {
+    const context = await browser.createBrowserContext(); // 毎回空のキャッシュ
+    const page = await context.newPage();
+    if (cpuThrottle > 1) {
+      await page.emulateCPUThrottling(cpuThrottle);
+    }
+    const pending = firstRender(page);
+    await page.goto(url, { waitUntil: "commit", timeout });
+    cold.push(await pending);
+    const reloaded = firstRender(page);
+    await page.reload({ waitUntil: "commit", timeout });
+    warm.push(await reloaded);
+    await context.close();
+  }
+  return { cold, warm };
+}
+
+const browser = await puppeteer.launch({ headless: true, args: ["--no-sandbox"] });
+try {
+  console.log(`time-to-first-render, ${runs} runs, CPU throttle x${cpuThrottle}`);
+  for (const url of values.url) {
+    try {
+      const { cold, warm } = await measure(browser, url);
+      console.log(`${url}: cold median ${median(cold).toFixed(0)} ms (max ${Math.max(...cold).toFixed(0)}), ` +
+                  `warm median ${median(warm).toFixed(0)} ms (max ${Math.max(...warm).toFixed(0)})`);
+    } catch (err) {
+      console.log(`${url}: failed (${err.message})`);
+    }
+  }
+} finally {
+  await browser.close();
+}
@@ -0,0 +1,118 @@
+// benchmarks/viz_render_load.mjs
+// 可視化ページにイベントのバーストを流し込み、フレーム間隔 (60fps を保てるか) とメインスレッドの負荷を計測する。
+// ページの WebSocket を差し替えて合成メッセージを送るため、ブリッジやオーケストレーターは不要 (ページの配信だけでよい)。
+//
+// puppeteer が必要 (npm install -g puppeteer など):
+//   NODE_PATH=$(npm root -g) node benchmarks/viz_render_load.mjs --url http://localhost:8080/ --burst 50 --cpu-throttle 4
+//
+// DOM 版 (canvas 化前) と比較する場合は、そのコミットでビルドした dist を別ポートで配信して --url を 2 つ指定する。
+import { createRequire } from "node:module";
+import { parseArgs } from "node:util";
+
+const require = createRequire(import.meta.url); // NODE_PATH のグローバルインストールを解決するため
+const puppeteer = require("puppeteer");
+
+const { values } = parseArgs({
+  options: {
+    url: { type: "string", multiple: true, default: ["http://localhost:8080/"] },
+    burst: { type: "string", default: "50" }, // 1 バーストのメッセージ数
+    interval: { type: "string", default: "16" }, // バースト間隔 (ms)
+    duration: { type: "string", default: "5000" }, // 計測時間 (ms)
+    "cpu-throttle": { type: "string", default: "1" },
+  },
+});
+const burst = Number(values.burst);
+const interval = Number(values.interval);
+const duration = Number(values.duration);
+const cpuThrottle = Number(values["cpu-throttle"]);
+
+// ページ読み込み前に注入する: WebSocket を合成メッセージを送る偽物に置き換える
+function installFakeSocket() {
+  class FakeSocket extends EventTarget {
+    constructor() {
+      super();
+      window.__vizSocket = this;
+      setTimeout(() => this.dispatchEvent(new Event("open")), 0);
+    }
+    send() {}
+    close() {}
+  }
+  window.WebSocket = FakeSocket;
+}
+
+// ページ内で実行する: バーストを送りながら rAF でフレーム間隔を記録し、long task を数える
+async function runLoad({ burst, interval, duration }) {
+  const socket = window.__vizSocket;
+  const frames = [];
+  let longTaskMs = 0;
+  const observer = new PerformanceObserver((list) => {
+    for (const entry of list.getEntries()) longTaskMs += entry.duration;
+  });
+  observer.observe({ type: "longtask", buffered: false });
+
+  let seq = 0;
+  const send = () => {
+    for (let i = 0; i < burst; i++, seq++) {
+      const team = seq % 2 ? "BLUE" : "YELLOW";
+      const data = JSON.stringify({
+        topic: "event",
+        data: {
+          timestamp: Date.now() / 1000,
+          event_type: `EVENT_PLACEMENT_SUCCEEDED_${team}`,
+          priority: 5,
+          data: { team, location: { x: Math.random() * 12000 - 6000, y: Math.random() * 9000 - 4500 } },
+        },
+      });
+      socket.dispatchEvent(new MessageEvent("message", { data }));
+    }
+  };
+  const timer = setInterval(send, interval);
+
+  await new Promise((resolve) => {
+    const start = performance.now();
+    let last = start;
+    const tick = (now) => {
+      frames.push(now - last);
+      last = now;
+      if (now - start < duration) requestAnimationFrame(tick);
+      else resolve();
+    };
+    requestAnimationFrame(tick);
+  });
+  clearInterval(timer);
+  observer.disconnect();
+  return { frames: frames.slice(1), messages: seq, longTaskMs };
+}
+
+const percentile = (xs, p) => {
+  const s = [...xs].sort((a, b) => a - b);
+  return s[Math.min(s.length - 1, Math.floor((p / 100) * s.length))];
+};
+
+const browser = await puppeteer.launch({ headless: true, args: ["--no-sandbox"] });
+try {
+  console.log(`${burst} messages every ${interval} ms for ${duration} ms, CPU throttle x${cpuThrottle}`);
+  for (const url of values.url) {
+    const page = await browser.newPage();
+    try {
+      await page.evaluateOnNewDocument(installFakeSocket);
+      if (cpuThrottle > 1) {
+        await page.emulateCPUThrottling(cpuThrottle);
+      }
+      await page.goto(url, { waitUntil: "load" });
+      await page.waitForFunction(() => window.__vizSocket && document.getElementById("root")?.firstElementChild);
+      const { frames, messages, longTaskMs } = await page.evaluate(runLoad, { burst, interval, duration });
+      const fps = (frames.length * 1000) / frames.reduce((a, b) => a + b, 0);
+      const dropped = frames.filter((f) => f > 1000 / 60 * 1.5).length;
+      console.log(`${url}: ${fps.toFixed(1)} fps, frame p50 ${percentile(frames, 50).toFixed(1)} ms, ` +
+                  `p95 ${percentile(frames, 95).toFixed(1)} ms, max ${Math.max(...frames).toFixed(1)} ms, ` +
+                  `${dropped}/${frames.length} late frames, long tasks ${longTaskMs.toFixed(0)} ms, ${messages} messages`);
+    } catch (err) {
+      console.log(`${url}: failed (${err.message})`);
+    } finally {
+      await page.close();
+    }
+  }
+} finally {
+  await browser.close();
+}
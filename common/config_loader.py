@@ -1,12 +1,66 @@
 # 例: common/config_loader.py (または各アプリの utils.py など)
-import yaml
+# YAML の解析結果は、ファイルの絶対パスと内容のハッシュをキーにして marshal 形式で CONFIG_CACHE_DIR にキャッシュする。
+# 内容が同じなら次回以降の起動では yaml の import と解析を省く (再起動を速くするため)。
+# 環境変数 CONFIG_CACHE_DIR で場所を変えられる (空文字でキャッシュ無効)。
+import hashlib
+import marshal
 import os
+import sys
 from typing import Dict, Any, Optional
 
-def load_config(config_path: str) -> Optional[Dict[str, Any]]:
+CONFIG_CACHE_DIR = os.environ.get(
+    "CONFIG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ssl_streaming_system", "config"))
+
+
+def _cache_prefix(config_path: str) -> str:
+    """設定ファイルごとのキャッシュファイル名の接頭辞 (ファイル名 + 絶対パスのハッシュ)。
+    ファイル名が同じでも別の場所の設定ファイルのキャッシュとは区別する"""
+    path_digest = hashlib.sha256(os.path.abspath(config_path).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return f"{os.path.basename(config_path)}-{path_digest}-"
+
+
+def _cache_path(config_path: str, content: bytes, cache_dir: str) -> str:
+    """設定ファイルのパス・内容と Python (marshal) のバージョンから決まるキャッシュファイルのパス"""
+    digest = hashlib.sha256(content)
+    digest.update(f"{sys.version_info[0]}.{sys.version_info[1]}-{marshal.version}".encode("ascii"))
+    return os.path.join(cache_dir, f"{_cache_prefix(config_path)}{digest.hexdigest()[:32]}.marshal")
+
+
+def _read_cache(cache_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_path, 'rb') as f:
+            config_data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None # 無い・壊れている場合は YAML を解析し直す
+    return config_data if isinstance(config_data, dict) else None
+
+
+def _write_cache(config_path: str, cache_path: str, config_data: Dict[str, Any]):
+    """キャッシュを書き (一時ファイル + rename)、同じ設定ファイルの古いキャッシュを消す。失敗しても無視する"""
+    try:
+        payload = marshal.dumps(config_data)
+    except ValueError:
+        return # marshal できない値 (日時など) を含む設定はキャッシュしない
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+        prefix = _cache_prefix(config_path)
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix) and name.endswith(".marshal") and name != os.path.basename(cache_path):
+                os.remove(os.path.join(cache_dir, name))
+    except OSError:
+        pass
+
+
+def load_config(config_path: str, cache_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     指定されたパスのYAMLファイルを読み込み、Python辞書として返す。
     エラー発生時は None を返す。
+    cache_dir (省略時は CONFIG_CACHE_DIR) に同じ内容の解析結果があればそれを使う。
     """
     if not os.path.exists(config_path):
         print(f"Error: Config file not found at {config_path}")
@@ -14,21 +68,37 @@ def load_config(config_path: str) -> Optional[Dict[str, Any]]:
     if not os.path.isfile(config_path):
         print(f"Error: Specified config path is not a file: {config_path}")
         return None
+    if cache_dir is None:
+        cache_dir = CONFIG_CACHE_DIR
 
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config_data = yaml.safe_load(f) # 安全な safe_load を使用
+        with open(config_path, 'rb') as f:
+            content = f.read()
+    except IOError as e:
+        print(f"Error reading file {config_path}: {e}")
+        return None
+
+    cache_path = _cache_path(config_path, content, cache_dir) if cache_dir else None
+    if cache_path:
+        config_data = _read_cache(cache_path)
+        if config_data is not None:
+            print(f"Successfully loaded config from: {config_path} (cached)")
+            return config_data
+
+    import yaml # キャッシュが使えたときは import しない
+    try:
+        # 安全な SafeLoader を使用 (libyaml があれば C 実装)
+        config_data = yaml.load(content.decode('utf-8'), Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
         if not isinstance(config_data, dict):
             print(f"Error: Config file content is not a dictionary: {config_path}")
             return None
         print(f"Successfully loaded config from: {config_path}")
+        if cache_path:
+            _write_cache(config_path, cache_path, config_data)
         return config_data
     except yaml.YAMLError as e:
         print(f"Error parsing YAML file {config_path}: {e}")
         return None
-    except IOError as e:
-        print(f"Error reading file {config_path}: {e}")
-        return None
     except Exception as e:
         print(f"Unexpected error loading config {config_path}: {e}")
-        return None
\ No newline at end of file
+        return None
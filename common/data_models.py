@@ -1,14 +1,19 @@
 import time
 import json
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields
 from typing import Dict, List, Optional, Any, Literal
 
 # --- Type Aliases (型エイリアス) ---
 Team = Literal["UNKNOWN", "YELLOW", "BLUE"]
 Location = Optional[Dict[str, float]] # 例: {"x": 1.23, "y": -0.45}
 
+# json.dumps はキーワード引数を渡すと呼び出しごとに JSONEncoder を生成するため、使い回す
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
 # --- Data Classes ---
-@dataclass
+# publish ごとに生成されるため slots=True でインスタンスを小さくし、
+# to_json/from_json は asdict() による再帰コピーや cls(**dict) を経由せずに直接組み立てる。
+@dataclass(slots=True)
 class GameEvent:
     """
     オーケストレーターから 'event' トピックで送信される、
@@ -21,20 +26,29 @@ class GameEvent:
 
     def to_json(self) -> str:
         try:
-            return json.dumps(asdict(self), ensure_ascii=False)
-        except TypeError as e:
+            # data はコピーせずにそのままエンコーダへ渡す
+            return _json_encoder.encode({
+                "timestamp": self.timestamp,
+                "event_type": self.event_type,
+                "priority": self.priority,
+                "data": self.data,
+            })
+        except (TypeError, ValueError) as e:
             print(f"Error serializing GameEvent to JSON: {e}\nData: {self}")
             raise ValueError(f"Could not serialize GameEvent to JSON: {e}") from e
     @classmethod
     def from_json(cls, json_str: str) -> 'GameEvent':
         try:
-            data_dict = json.loads(json_str)
-            return cls(**data_dict)
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            d = json.loads(json_str)
+            return cls(d["timestamp"] if "timestamp" in d else time.time(),
+                       d.get("event_type", ""),
+                       d.get("priority", 0),
+                       d["data"] if "data" in d else {})
+        except (json.JSONDecodeError, TypeError, KeyError, AttributeError) as e:
             print(f"Error decoding GameEvent JSON: {e}\nJSON string: {json_str}")
             raise ValueError(f"Could not decode GameEvent from JSON: {e}") from e
 
-@dataclass
+@dataclass(slots=True)
 class TeamState:
     """GameStateUpdate内で使用される、チームごとの現在の状態"""
     name: str = ""
@@ -48,8 +62,27 @@ class TeamState:
     foul_count: Optional[int] = None # ファウルカウント (Protobufではoptional)
     max_allowed_bots: Optional[int] = None # 最大許容ロボット数 (Protobufではoptional)
 
+    def _to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "score": self.score,
+            "red_cards": self.red_cards,
+            "yellow_cards": self.yellow_cards,
+            "yellow_card_times_us": self.yellow_card_times_us,
+            "timeouts_left": self.timeouts_left,
+            "timeout_time_left_us": self.timeout_time_left_us,
+            "goalkeeper_id": self.goalkeeper_id,
+            "foul_count": self.foul_count,
+            "max_allowed_bots": self.max_allowed_bots,
+        }
+
+    @classmethod
+    def _from_dict(cls, d: Dict[str, Any]) -> 'TeamState':
+        # 未知のキーは無視する (送信側が新しいフィールドを追加しても受信できるように)
+        return cls(**{k: v for k, v in d.items() if k in _TEAM_STATE_FIELDS})
+
 
-@dataclass
+@dataclass(slots=True)
 class GameStateUpdate:
     """
     オーケストレーターから 'state' トピックで定期的に送信される、
@@ -67,28 +100,35 @@ class GameStateUpdate:
 
     def to_json(self) -> str:
         try:
-            return json.dumps(asdict(self), ensure_ascii=False)
-        except TypeError as e:
+            return _json_encoder.encode({
+                "timestamp": self.timestamp,
+                "stage": self.stage,
+                "command": self.command,
+                "stage_time_left_us": self.stage_time_left_us,
+                "current_action_time_remaining_us": self.current_action_time_remaining_us,
+                "team_yellow": self.team_yellow._to_dict(),
+                "team_blue": self.team_blue._to_dict(),
+                "status_message": self.status_message,
+            })
+        except (TypeError, ValueError) as e:
             print(f"Error serializing GameStateUpdate to JSON: {e}\nData: {self}")
             raise ValueError(f"Could not serialize GameStateUpdate to JSON: {e}") from e
     @classmethod
     def from_json(cls, json_str: str) -> 'GameStateUpdate':
         try:
             data_dict = json.loads(json_str)
-            yellow_data = data_dict.get('team_yellow', {})
-            blue_data = data_dict.get('team_blue', {})
-            known_team_fields = TeamState.__annotations__.keys()
-            yellow_args = {k: v for k, v in yellow_data.items() if k in known_team_fields}
-            blue_args = {k: v for k, v in blue_data.items() if k in known_team_fields}
-            data_dict['team_yellow'] = TeamState(**yellow_args)
-            data_dict['team_blue'] = TeamState(**blue_args)
-            known_state_fields = cls.__annotations__.keys()
-            state_args = {k: v for k, v in data_dict.items() if k in known_state_fields}
+            state_args = {k: v for k, v in data_dict.items() if k in _GAME_STATE_UPDATE_FIELDS}
+            state_args['team_yellow'] = TeamState._from_dict(data_dict.get('team_yellow', {}))
+            state_args['team_blue'] = TeamState._from_dict(data_dict.get('team_blue', {}))
             return cls(**state_args)
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
+        except (json.JSONDecodeError, TypeError, KeyError, AttributeError) as e:
             print(f"Error decoding GameStateUpdate JSON: {e}\nJSON string: {json_str}")
             raise ValueError(f"Could not decode GameStateUpdate from JSON: {e}") from e
 
+# from_json で受け付けるフィールド名 (呼び出しごとに annotations を走査しないよう事前に計算)
+_TEAM_STATE_FIELDS = frozenset(f.name for f in fields(TeamState))
+_GAME_STATE_UPDATE_FIELDS = frozenset(f.name for f in fields(GameStateUpdate))
+
 # --- 使用例 (テスト用) ---
 if __name__ == '__main__':
     # GameEventのテスト
@@ -122,5 +162,12 @@ if __name__ == '__main__':
         gs_invalid = GameStateUpdate.from_json(invalid_gs_json)
         print(f"Decoded from invalid (should fail or handle): {gs_invalid}") # ここでエラーになるはず
 
+    except ValueError as e:
+        print(f"Caught expected error: {e}")
+
+    try:
+        # team_blue が辞書でない JSON (構文としては正しい)
+        GameStateUpdate.from_json('{"team_blue": "invalid"}')
+
     except ValueError as e:
         print(f"Caught expected error: {e}")
\ No newline at end of file
@@ -0,0 +1,356 @@
+# common/metrics.py
+# 長時間動くプロセス (オーケストレーター, 音声再生, イベントストア, 可視化ブリッジ) の計測値を
+# Prometheus のテキスト形式 (version 0.0.4) で HTTP 公開する軽量モジュール。
+#
+#   EVENTS = metrics.REGISTRY.counter("ssl_orchestrator_events_published_total", "Published events", ("event_type",))
+#   EVENTS.labels("GOAL").inc()
+#   metrics.REGISTRY.gauge("ssl_orchestrator_input_queue_depth", "...").set_function(input_queue.qsize)
+#   metrics.start_http_server(9151)   # GET /metrics
+#
+# ホットパスでロックを取らないよう、カウンタ・ヒストグラムはスレッドごとのセル (list) に加算し、scrape 時に合計する。
+# セルを書くのは持ち主のスレッドだけなので、加算が他のスレッドの加算と衝突して失われることは無い。
+# 既に別の場所で数えている値 (EventListener の受信数など) は set_function で scrape 時に読む (加算のコスト無し)。
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 処理時間 [秒] 用のバケット (10 us – 1 s)
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _ThreadCells:
+    """スレッドごとのセル (長さ size の list)。セルの作成時だけロックを取る"""
+    __slots__ = ("local", "cells", "size", "_lock")
+
+    def __init__(self, size: int):
+        self.local = threading.local()
+        self.cells: List[list] = []
+        self.size = size
+        self._lock = threading.Lock()
+
+    def new_cell(self) -> list:
+        cell = [0] * self.size
+        with self._lock:
+            self.cells.append(cell)
+        self.local.cell = cell
+        return cell
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            cells = list(self.cells)
+        totals = [0] * self.size
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class Counter:
+    """単調増加するカウンタ。inc() はスレッドごとのセルに加算する"""
+    __slots__ = ("_local", "_cells", "_function")
+
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+        self._local = self._cells.local
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError: # このスレッドで初めての加算
+            self._cells.new_cell()[0] += amount
+
+    def set_function(self, function: Callable[[], float]):
+        """他で数えている累積値を scrape 時に読む (inc() の値は使われなくなる)"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._cells.totals()[0]
+
+    def samples(self, name: str, labelnames: Sequence[str], labelvalues: Sequence[str]) -> Iterator[str]:
+        yield f"{name}{_label_text(labelnames, labelvalues)} {_format_value(self.value())}"
+
+
+class Gauge:
+    """現在値。set() は最後に書いた値、set_function は scrape 時に呼んだ値 (キューの長さ・接続数など)"""
+    __slots__ = ("_value", "_function")
+
+    def __init__(self):
+        self._value: float = 0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def samples(self, name: str, labelnames: Sequence[str], labelvalues: Sequence[str]) -> Iterator[str]:
+        yield f"{name}{_label_text(labelnames, labelvalues)} {_format_value(self.value())}"
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "Histogram"):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Histogram:
+    """
+    固定バケットのヒストグラム。セルは [バケットごとの件数..., +Inf の件数, 合計] で、scrape 時に累積件数にする。
+    バケットの境界は値以上 (le) の最初の境界 (bisect_left)
+    """
+    __slots__ = ("_local", "_cells", "_bounds")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._bounds = tuple(sorted(buckets))
+        self._cells = _ThreadCells(len(self._bounds) + 2)
+        self._local = self._cells.local
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells.new_cell()
+        cell[bisect_left(self._bounds, value)] += 1
+        cell[-1] += value
+
+    def time(self) -> _Timer:
+        """with 文の処理時間 [秒] を observe する"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        """(累積件数 (境界ごと), 件数, 合計)"""
+        totals = self._cells.totals()
+        cumulative, count = [], 0
+        for n in totals[:-2]:
+            count += n
+            cumulative.append(count)
+        count += totals[-2]
+        return cumulative, count, totals[-1]
+
+    def samples(self, name: str, labelnames: Sequence[str], labelvalues: Sequence[str]) -> Iterator[str]:
+        cumulative, count, total = self.snapshot()
+        for bound, n in zip(self._bounds, cumulative):
+            le = 'le="' + _format_value(bound) + '"'
+            yield f"{name}_bucket{_label_text(labelnames, labelvalues, le)} {n}"
+        le = 'le="+Inf"'
+        yield f"{name}_bucket{_label_text(labelnames, labelvalues, le)} {count}"
+        yield f"{name}_sum{_label_text(labelnames, labelvalues)} {_format_value(float(total))}"
+        yield f"{name}_count{_label_text(labelnames, labelvalues)} {count}"
+
+
+class MetricFamily:
+    """ラベル付きの計測値。labels(*values) でラベルの値ごとの Counter / Gauge / Histogram を得る (作成後はキャッシュ)"""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str],
+                 factory: Callable[[], object]):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        try:
+            return self._children[values]
+        except KeyError:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            with self._lock:
+                return self._children.setdefault(values, self._factory())
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {_escape(self.documentation)}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            try:
+                yield from child.samples(self.name, self.labelnames, values)
+            except Exception as e: # set_function の例外で他の計測値を出せなくしない
+                print(f"Metrics: Error collecting {self.name}{values}: {e}")
+
+
+class MetricsRegistry:
+    """計測値の登録先。同じ名前で登録すると既存のもの (種類・ラベルが同じ場合) を返す"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind: str, name: str, documentation: str, labelnames: Sequence[str],
+                  factory: Callable[[], object]):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(kind, name, documentation, labelnames, factory)
+            elif family.kind != kind or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as {family.kind}{family.labelnames}")
+        # ラベル無しなら値そのもの (inc() / set() などを直接呼べる) を返す
+        return family if labelnames else family.labels()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self._register("counter", name, documentation, labelnames, Counter)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self._register("gauge", name, documentation, labelnames, Gauge)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS):
+        return self._register("histogram", name, documentation, labelnames, lambda: Histogram(buckets))
+
+    def render(self) -> bytes:
+        with self._lock:
+            families = sorted(self._families.values(), key=lambda family: family.name)
+        lines = []
+        for family in families:
+            lines.extend(family.collect())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+REGISTRY = MetricsRegistry()
+
+
+def register_process_metrics(registry: MetricsRegistry = REGISTRY):
+    """プロセスの CPU 時間・開始時刻・スレッド数"""
+    registry.counter("process_cpu_seconds_total", "Total user and system CPU time spent in seconds").set_function(
+        time.process_time)
+    start_time = time.time()
+    registry.gauge("process_start_time_seconds", "Start time of the process since unix epoch in seconds").set_function(
+        lambda: start_time)
+    registry.gauge("process_threads", "Number of Python threads").set_function(threading.active_count)
+
+
+class MetricsServer(threading.Thread):
+    """GET /metrics にテキスト形式で応答するスレッド (scrape ごとにスレッドを立てる ThreadingHTTPServer)"""
+
+    def __init__(self, port: int, host: str = "", registry: MetricsRegistry = REGISTRY):
+        super().__init__(daemon=True, name="MetricsServer")
+        import http.server # 起動を遅くしないよう、公開するときだけ import する
+        self.registry = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    handler.send_error(404)
+                    return
+                body = registry.render()
+                handler.send_response(200)
+                handler.send_header("Content-Type", CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass # scrape ごとのアクセスログは出さない
+
+        # bind はここで行い、ポートが使えなければ呼び出し側に OSError を返す
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.5)
+        self.server.server_close()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def start_http_server(port: Optional[int], host: str = "", registry: MetricsRegistry = REGISTRY) -> Optional[MetricsServer]:
+    """port で /metrics を公開する (port が 0 / None なら何もしない)。bind できなければ警告を出して None を返す"""
+    if not port:
+        return None
+    register_process_metrics(registry)
+    try:
+        server = MetricsServer(int(port), host, registry)
+    except OSError as e:
+        print(f"Warning: Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.start()
+    print(f"Metrics endpoint listening on http://{host or '0.0.0.0'}:{server.port}/metrics")
+    return server
+
+
+if __name__ == '__main__':
+    import urllib.request
+
+    registry = MetricsRegistry()
+    events = registry.counter("test_events_total", "Events", ("event_type",))
+    packets = registry.counter("test_packets_total", "Packets")
+    handle = registry.histogram("test_handle_seconds", "Handler time", buckets=(0.001, 0.01))
+    depth = registry.gauge("test_queue_depth", "Queue depth")
+    depth.set_function(lambda: 7)
+
+    # 4 スレッドから同時に加算しても失われない
+    def work():
+        for i in range(10000):
+            packets.inc()
+            events.labels("GOAL" if i % 2 else "STOP").inc()
+            handle.observe(0.005)
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    handle.observe(0.0005)
+    handle.observe(2.0)
+    assert packets.value() == 40000
+    assert events.labels("GOAL").value() == 20000
+    assert handle.snapshot()[:2] == ([1, 40001], 40002)
+    assert registry.counter("test_packets_total", "Packets") is packets
+
+    server = start_http_server(0, registry=registry) # 0 は無効
+    assert server is None
+    server = MetricsServer(0, "127.0.0.1", registry)
+    server.start()
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+        text = response.read().decode("utf-8")
+    server.stop()
+    print(text)
+    assert 'test_events_total{event_type="GOAL"} 20000' in text
+    assert 'test_handle_seconds_bucket{le="+Inf"} 40002' in text
+    assert "test_queue_depth 7" in text
@@ -0,0 +1,61 @@
+# common/timer_anchor.py
+# 'timers' トピック (オーケストレーターの TimerAnchorTracker) の受信側ヘルパー。
+# 残り時間は Referee パケットごとには送られず、開始・停止・飛び・ずれの時だけアンカー
+# {"value": 値 [秒], "t": その値の GC 時刻 [秒], "rate": 1 秒あたりの変化量, "running": 進行中か} が届く。
+# 受信側はアンカーから現在の値を外挿する (JS 版: placement_visualizer/web/src/timerAnchors.js)。
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def extrapolate(anchor: Dict[str, Any], gc_time: float) -> float:
+    """アンカーから GC 時刻 gc_time [秒] の値を求める"""
+    return anchor["value"] + anchor["rate"] * (gc_time - anchor["t"])
+
+
+class TimerAnchors:
+    """
+    'timers' メッセージを update() に渡し、value() で現在の値を得る。
+    GC 時刻はメッセージの "now" (送信のきっかけになったパケットの GC 時刻) と受信時刻の差から推定する
+    (誤差は配送の遅延程度)
+    """
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.anchors: Dict[str, Dict[str, Any]] = {}
+        self.offset: Optional[float] = None # ホスト時刻 - GC 時刻 [秒]
+
+    def update(self, message: Dict[str, Any], received_at: Optional[float] = None):
+        """メッセージは全てのタイマーを含む (含まれないタイマーは止まった / 消えたもの)"""
+        received_at = self.clock() if received_at is None else received_at
+        self.anchors = message.get("timers") or {}
+        if message.get("now") is not None:
+            self.offset = received_at - message["now"]
+
+    def gc_time(self, now: Optional[float] = None) -> Optional[float]:
+        if self.offset is None:
+            return None
+        return (self.clock() if now is None else now) - self.offset
+
+    def value(self, name: str, now: Optional[float] = None) -> Optional[float]:
+        """タイマー name の現在の値 [秒] (無ければ None)"""
+        anchor = self.anchors.get(name)
+        gc_time = self.gc_time(now)
+        if anchor is None or gc_time is None:
+            return None
+        return extrapolate(anchor, gc_time)
+
+    def values(self, now: Optional[float] = None) -> Dict[str, float]:
+        gc_time = self.gc_time(now)
+        if gc_time is None:
+            return {}
+        return {name: extrapolate(anchor, gc_time) for name, anchor in self.anchors.items()}
+
+
+if __name__ == '__main__':
+    anchors = TimerAnchors(clock=lambda: 1000.0)
+    # GC 時刻 100.0 で残り 30 秒から進行、ホストは 900 秒進んでいる
+    anchors.update({"now": 100.0, "timers": {"action": {"value": 30.0, "t": 100.0, "rate": -1.0, "running": True},
+                                             "stage": {"value": 250.0, "t": 95.0, "rate": 0.0, "running": False}}})
+    assert anchors.value("action", now=1002.5) == 27.5
+    assert anchors.value("stage", now=1002.5) == 250.0
+    assert anchors.value("missing") is None
+    print(anchors.values(now=1010.0))
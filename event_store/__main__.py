@@ -0,0 +1,45 @@
+import argparse
+import os
+
+from .service import EventStoreService
+
+try:
+    from common.config_loader import load_config # 設定ファイル読み込み関数
+    from common import metrics
+except ImportError:
+    print("Error: config_loader.py not found.")
+    exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Event history store")
+    parser.add_argument(
+        '--config',
+        type=str,
+        default='../config/config_event_store.yaml',
+        help='Path to the config file')
+    args = parser.parse_args()
+
+    # パス解決
+    script_dir = os.path.dirname(__file__)
+    cfg_path = os.path.abspath(os.path.join(script_dir, args.config))
+
+    store_config_data = load_config(cfg_path)
+    if store_config_data is None:
+        print("Error: Failed to load configuration file. Exiting.")
+        exit(1)
+
+    # 環境変数でオーケストレーターの URI を上書きできるようにする
+    if os.environ.get('ZMQ_SUBSCRIBER_URI'):
+        store_config_data['zmq_publisher_uri'] = os.environ['ZMQ_SUBSCRIBER_URI']
+
+    print("Starting Event Store...")
+    # Prometheus 形式の計測値 (/metrics)
+    metrics.start_http_server(int(os.environ.get('METRICS_PORT', store_config_data.get('metrics_port', 0))))
+    service = EventStoreService(store_config_data)
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        print("\nKeyboard interrupt received. Stopping event store...")
+    finally:
+        service.stop()
+        print("Event Store finished.")
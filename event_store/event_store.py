@@ -0,0 +1,315 @@
+# event_store/event_store.py
+# オーケストレーターが publish した GameEvent を保存する、追記専用のイベントストア。
+# イベントはセグメントファイル (1 行 1 イベントの JSON) に追記し、メモリ上にはセグメントごとに
+# タイムスタンプ / event_type / チームのインデックスを持つ。古いセグメントはメモリから丸ごと破棄する。
+import bisect
+import heapq
+import os
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: data_models.py not found.")
+    exit(1)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class Segment:
+    """
+    一定件数のイベントをまとめた単位。位置 (pos) はセグメント内の到着順の通し番号で、
+    インデックスは pos の昇順リストとして保持する。
+    """
+    __slots__ = ("first_seq", "path", "timestamps", "payloads", "types", "teams",
+                 "by_type", "by_team", "monotonic", "min_ts", "max_ts", "_file")
+
+    def __init__(self, first_seq: int, path: str):
+        self.first_seq = first_seq
+        self.path = path
+        self.timestamps: List[float] = []
+        self.payloads: List[str] = []         # 受信した JSON 文字列そのもの (クエリ応答にそのまま埋め込む)
+        self.types: List[str] = []
+        self.teams: List[Optional[str]] = []
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_team: Dict[str, List[int]] = {}
+        self.monotonic = True                 # タイムスタンプが到着順に単調増加しているか (bisect で範囲検索できるか)
+        self.min_ts = float("inf")
+        self.max_ts = float("-inf")
+        self._file = None
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def append(self, timestamp: float, event_type: str, team: Optional[str], payload: str):
+        pos = len(self.payloads)
+        if timestamp < self.max_ts:
+            self.monotonic = False
+        self.min_ts = min(self.min_ts, timestamp)
+        self.max_ts = max(self.max_ts, timestamp)
+        type_positions = self.by_type.get(event_type)
+        if type_positions is None:
+            type_positions = self.by_type[event_type] = []
+        else:
+            event_type = self.types[type_positions[0]] # 同じ文字列オブジェクトを共有してメモリを節約
+        type_positions.append(pos)
+        if team is not None:
+            self.by_team.setdefault(team, []).append(pos)
+        self.timestamps.append(timestamp)
+        self.payloads.append(payload)
+        self.types.append(event_type)
+        self.teams.append(team)
+
+    def open_for_append(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, payload: str, fsync: bool = False):
+        self._file.write(payload + "\n")
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def select(self,
+               start: Optional[float],
+               end: Optional[float],
+               event_types: Optional[Sequence[str]],
+               team: Optional[str]) -> Sequence[int]:
+        """条件に一致する位置を昇順で返す。インデックスのうち候補が少ない方から絞り込む"""
+        if event_types is not None:
+            lists = [self.by_type[t] for t in event_types if t in self.by_type]
+            if not lists:
+                return ()
+            candidates = lists[0] if len(lists) == 1 else list(heapq.merge(*lists))
+            if team is not None:
+                team_positions = self.by_team.get(team, ())
+                if len(team_positions) < len(candidates):
+                    wanted = set(event_types)
+                    candidates = [p for p in team_positions if self.types[p] in wanted]
+                else:
+                    candidates = [p for p in candidates if self.teams[p] == team]
+        elif team is not None:
+            candidates = self.by_team.get(team, ())
+        else:
+            candidates = range(len(self.payloads))
+
+        if (start is None or start <= self.min_ts) and (end is None or end >= self.max_ts):
+            return candidates
+        timestamps = self.timestamps
+        if self.monotonic:
+            lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+            hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+            if isinstance(candidates, range):
+                return range(lo, hi)
+            return candidates[bisect.bisect_left(candidates, lo):bisect.bisect_left(candidates, hi)]
+        return [p for p in candidates
+                if (start is None or timestamps[p] >= start) and (end is None or timestamps[p] <= end)]
+
+
+class EventStore:
+    """
+    GameEvent の追記専用ストア。
+
+    - イベントは data_dir 内のセグメントファイルに追記する (segment_max_events 件ごとに新しいファイル)。
+    - メモリに保持するのは直近 max_segments_in_memory 個のセグメントだけで、古いものは丸ごと破棄する。
+      クエリの対象もメモリ上のセグメントに限られる。
+    - ディスク上のセグメントは max_segments_on_disk 個を超えたら古い順に削除する (0 = 削除しない)。
+    - 起動時はディスク上の直近のセグメントを読み込み、インデックスを再構築する。
+    """
+    def __init__(self,
+                 data_dir: Optional[str] = None,
+                 segment_max_events: int = 4096,
+                 max_segments_in_memory: int = 64,
+                 max_segments_on_disk: int = 0,
+                 fsync: bool = False):
+        self.data_dir = data_dir
+        self.segment_max_events = max(1, segment_max_events)
+        self.max_segments_in_memory = max(1, max_segments_in_memory)
+        self.max_segments_on_disk = max_segments_on_disk
+        self.fsync = fsync
+        self.segments: Deque[Segment] = deque()
+        self._disk_segments: Deque[str] = deque()
+        self.next_seq = 0 # 次に追加するイベントの通し番号
+        self.evicted_segments = 0
+        if self.data_dir:
+            os.makedirs(self.data_dir, exist_ok=True)
+            self._load_segments()
+
+    # --- 永続化 ---
+    def _segment_path(self, first_seq: int) -> Optional[str]:
+        if not self.data_dir:
+            return None
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+
+    def _load_segments(self):
+        names = sorted(n for n in os.listdir(self.data_dir)
+                       if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+        self._disk_segments.extend(os.path.join(self.data_dir, n) for n in names)
+        for name in names[-self.max_segments_in_memory:]:
+            try:
+                first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                print(f"EventStore: Skipping unexpected file name: {name}")
+                continue
+            segment = Segment(first_seq, os.path.join(self.data_dir, name))
+            skipped = 0
+            with open(segment.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if not line:
+                        continue
+                    try:
+                        self._index(segment, GameEvent.from_json(line), line)
+                    except ValueError:
+                        skipped += 1 # 書き込み途中で終了した行など
+            if skipped:
+                print(f"EventStore: Skipped {skipped} unreadable line(s) in {segment.path}")
+            self.segments.append(segment)
+            self.next_seq = max(self.next_seq, first_seq + max(1, len(segment)))
+        if self.segments:
+            print(f"EventStore: Loaded {len(self)} events from {len(self.segments)} segment(s) in {self.data_dir}")
+
+    def _roll_segment(self) -> Segment:
+        """現在のセグメントを閉じ、新しいセグメントを開始する"""
+        if self.segments:
+            self.segments[-1].close()
+        segment = Segment(self.next_seq, self._segment_path(self.next_seq))
+        if segment.path:
+            segment.open_for_append()
+            self._disk_segments.append(segment.path)
+            while self.max_segments_on_disk and len(self._disk_segments) > self.max_segments_on_disk:
+                try:
+                    os.remove(self._disk_segments.popleft())
+                except OSError as e:
+                    print(f"EventStore: Error removing old segment: {e}")
+        self.segments.append(segment)
+        while len(self.segments) > self.max_segments_in_memory:
+            self.segments.popleft().close()
+            self.evicted_segments += 1
+        return segment
+
+    def close(self):
+        if self.segments:
+            self.segments[-1].close()
+
+    # --- 追加 ---
+    @staticmethod
+    def _index(segment: Segment, game_event: GameEvent, payload: str):
+        team = game_event.data.get("team") if isinstance(game_event.data, dict) else None
+        segment.append(game_event.timestamp, game_event.event_type, team, payload)
+
+    def append_json(self, payload: str) -> GameEvent:
+        """'event' トピックの JSON を追加する。デコードできない場合は ValueError"""
+        game_event = GameEvent.from_json(payload)
+        if "\n" in payload:
+            payload = game_event.to_json() # 1 行 1 イベントを保つ
+        self._append(game_event, payload)
+        return game_event
+
+    def append(self, game_event: GameEvent):
+        self._append(game_event, game_event.to_json())
+
+    def _append(self, game_event: GameEvent, payload: str):
+        segment = self.segments[-1] if self.segments else None
+        # 起動時に読み込んだセグメントには追記せず、新しいセグメントから書き始める
+        if segment is None or len(segment) >= self.segment_max_events or (segment.path and segment._file is None):
+            segment = self._roll_segment()
+        if segment.path:
+            try:
+                segment.write(payload, self.fsync)
+            except OSError as e:
+                print(f"EventStore: Error writing segment {segment.path}: {e}")
+        self._index(segment, game_event, payload)
+        self.next_seq += 1
+
+    # --- クエリ ---
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments)
+
+    def iter_payloads(self,
+                      start: Optional[float] = None,
+                      end: Optional[float] = None,
+                      event_types: Optional[Iterable[str]] = None,
+                      team: Optional[str] = None,
+                      newest_first: bool = True) -> Iterator[str]:
+        """条件に一致するイベントの JSON を到着順 (newest_first なら逆順) に返す"""
+        if event_types is not None:
+            event_types = list(event_types)
+        segments = reversed(self.segments) if newest_first else iter(self.segments)
+        for segment in segments:
+            if (start is not None and segment.max_ts < start) or (end is not None and segment.min_ts > end):
+                continue
+            positions = segment.select(start, end, event_types, team)
+            payloads = segment.payloads
+            for pos in (reversed(positions) if newest_first else positions):
+                yield payloads[pos]
+
+    def query(self,
+              start: Optional[float] = None,
+              end: Optional[float] = None,
+              event_types: Optional[Iterable[str]] = None,
+              team: Optional[str] = None,
+              limit: Optional[int] = None,
+              newest_first: bool = True) -> List[str]:
+        it = self.iter_payloads(start, end, event_types, team, newest_first)
+        if limit is None:
+            return list(it)
+        return [payload for payload, _ in zip(it, range(max(0, limit)))]
+
+    def count(self,
+              start: Optional[float] = None,
+              end: Optional[float] = None,
+              event_types: Optional[Iterable[str]] = None,
+              team: Optional[str] = None) -> Dict[str, int]:
+        """条件に一致するイベント数を event_type ごとに返す (例: プレースメント成功率の計算用)"""
+        counts: Dict[str, int] = {}
+        for segment in self.segments:
+            if (start is not None and segment.max_ts < start) or (end is not None and segment.min_ts > end):
+                continue
+            types = list(event_types) if event_types is not None else list(segment.by_type)
+            for event_type in types:
+                n = len(segment.select(start, end, (event_type,), team))
+                if n:
+                    counts[event_type] = counts.get(event_type, 0) + n
+        return counts
+
+    def info(self) -> Dict[str, object]:
+        return {
+            "events_in_memory": len(self),
+            "segments_in_memory": len(self.segments),
+            "segments_on_disk": len(self._disk_segments),
+            "evicted_segments": self.evicted_segments,
+            "next_seq": self.next_seq,
+            "oldest_timestamp": min((s.min_ts for s in self.segments if len(s)), default=None),
+            "newest_timestamp": max((s.max_ts for s in self.segments if len(s)), default=None),
+        }
+
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(tmp, segment_max_events=3, max_segments_in_memory=2)
+        for i, (event_type, team) in enumerate([("EVENT_FOUL_PUSHING", "YELLOW"), ("COMMAND_STOP", None),
+                                                ("EVENT_FOUL_PUSHING", "BLUE"), ("EVENT_PLACEMENT_SUCCEEDED", "BLUE"),
+                                                ("EVENT_FOUL_PUSHING", "YELLOW"), ("EVENT_PLACEMENT_FAILED", "YELLOW"),
+                                                ("EVENT_FOUL_PUSHING", "BLUE")]):
+            data = {"team": team} if team else {}
+            store.append(GameEvent(timestamp=1000.0 + i, event_type=event_type, data=data))
+        store.close()
+        print(f"Info: {store.info()}")
+        # 最初のセグメント (3 件) はメモリから破棄されている
+        assert len(store) == 4
+        assert [GameEvent.from_json(p).timestamp for p in store.query(event_types=["EVENT_FOUL_PUSHING"])] == [1006.0, 1004.0]
+        assert store.count(event_types=["EVENT_PLACEMENT_SUCCEEDED", "EVENT_PLACEMENT_FAILED"]) == \
+            {"EVENT_PLACEMENT_SUCCEEDED": 1, "EVENT_PLACEMENT_FAILED": 1}
+        assert len(store.query(start=1004.0, end=1005.0, team="YELLOW")) == 2
+
+        reopened = EventStore(tmp, segment_max_events=3, max_segments_in_memory=2)
+        assert reopened.query(limit=1) == store.query(limit=1)
+        print("EventStore self-test passed.")
@@ -0,0 +1,141 @@
+# event_store/service.py
+# オーケストレーターの 'event' トピックを購読して EventStore に保存し、
+# REQ/REP ソケットで範囲 / フィルタクエリに応答するサービス。
+#
+# リクエスト (JSON):
+#   {"op": "query", "start": 1700000000.0, "end": 1700000600.0,
+#    "event_types": ["EVENT_FOUL_PUSHING"], "team": "YELLOW", "limit": 5, "order": "desc"}
+#   {"op": "count", "event_types": ["EVENT_PLACEMENT_SUCCEEDED", "EVENT_PLACEMENT_FAILED"]}
+#   {"op": "info"}
+# start / end は GameEvent.timestamp (Unix 秒) で、両端を含む。省略した条件は絞り込まない。
+# レスポンス: {"ok": true, "count": n, "events": [...]} / {"ok": true, "counts": {...}} / {"ok": false, "error": "..."}
+import json
+import threading
+from typing import Any, Dict, Optional
+
+import zmq
+
+from .event_store import EventStore
+
+try:
+    from common import metrics
+except ImportError:
+    print("Error: common/metrics.py not found.")
+    exit(1)
+
+
+class EventStoreService:
+    def __init__(self, store_config: Dict[str, Any]):
+        self.zmq_publisher_uri = store_config.get("zmq_publisher_uri", "tcp://localhost:5555")
+        self.query_bind_uri = store_config.get("query_bind_uri", "tcp://*:5557")
+        self.max_query_limit = store_config.get("max_query_limit", 10000)
+        self.store = EventStore(
+            data_dir=store_config.get("data_dir") or None,
+            segment_max_events=store_config.get("segment_max_events", 4096),
+            max_segments_in_memory=store_config.get("max_segments_in_memory", 64),
+            max_segments_on_disk=store_config.get("max_segments_on_disk", 0),
+            fsync=store_config.get("fsync", False))
+        self.context = zmq.Context()
+        self.ready = threading.Event() # ソケットの bind / connect が完了したら set
+        self._stop_event = threading.Event()
+        # Prometheus 形式の計測値 (/metrics の公開は起動側で行う)
+        registry = metrics.REGISTRY
+        self._metric_events = registry.counter("ssl_event_store_events_total", "Events appended to the store")
+        self._metric_decode_errors = registry.counter(
+            "ssl_event_store_decode_errors_total", "Event payloads that could not be decoded")
+        self._metric_requests = registry.counter("ssl_event_store_requests_total", "Query requests", ("op",))
+        self._metric_request_seconds = registry.histogram(
+            "ssl_event_store_request_seconds", "Time to answer a query request")
+        print(f"EventStore Service initialized, subscribing to {self.zmq_publisher_uri}, queries on {self.query_bind_uri}")
+
+    def stop(self):
+        self._stop_event.set()
+        print("EventStore Service stop requested.")
+
+    # --- クエリ処理 ---
+    def handle_request(self, request_bytes: bytes) -> bytes:
+        try:
+            request = json.loads(request_bytes)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            op = request.get("op", "query")
+            # ラベルの値はクライアントの入力をそのまま使わない (種類が増え続けないように)
+            self._metric_requests.labels(op if op in ("query", "count", "info") else "unknown").inc()
+            event_types = request.get("event_types")
+            if isinstance(event_types, str):
+                event_types = [event_types]
+            if op == "query":
+                limit = request.get("limit")
+                limit = self.max_query_limit if limit is None else min(int(limit), self.max_query_limit)
+                payloads = self.store.query(start=request.get("start"), end=request.get("end"),
+                                            event_types=event_types, team=request.get("team"),
+                                            limit=limit, newest_first=request.get("order", "desc") != "asc")
+                # 保存済みの JSON 文字列をそのまま連結する (再エンコードしない)
+                return (f'{{"ok": true, "count": {len(payloads)}, "events": [' + ", ".join(payloads) + "]}").encode("utf-8")
+            if op == "count":
+                counts = self.store.count(start=request.get("start"), end=request.get("end"),
+                                          event_types=event_types, team=request.get("team"))
+                return json.dumps({"ok": True, "counts": counts}).encode("utf-8")
+            if op == "info":
+                return json.dumps({"ok": True, **self.store.info()}).encode("utf-8")
+            raise ValueError(f"unknown op: {op}")
+        except (ValueError, TypeError) as e:
+            return json.dumps({"ok": False, "error": str(e)}).encode("utf-8")
+
+    def run(self):
+        print("EventStore Service starting...")
+        subscriber = self.context.socket(zmq.SUB)
+        subscriber.setsockopt(zmq.SUBSCRIBE, b"event")
+        subscriber.connect(self.zmq_publisher_uri)
+        responder = self.context.socket(zmq.REP)
+        responder.bind(self.query_bind_uri)
+        poller = zmq.Poller()
+        poller.register(subscriber, zmq.POLLIN)
+        poller.register(responder, zmq.POLLIN)
+        self.ready.set()
+
+        # 1 スレッドで購読とクエリを処理するため、EventStore にロックは不要
+        try:
+            while not self._stop_event.is_set():
+                sockets = dict(poller.poll(timeout=1000))
+                if responder in sockets:
+                    with self._metric_request_seconds.time():
+                        reply = self.handle_request(responder.recv())
+                    responder.send(reply)
+                if subscriber in sockets:
+                    while True:
+                        try:
+                            _topic, payload = subscriber.recv_multipart(zmq.NOBLOCK)
+                        except zmq.Again:
+                            break
+                        try:
+                            self.store.append_json(payload.decode("utf-8"))
+                            self._metric_events.inc()
+                        except (UnicodeDecodeError, ValueError) as e:
+                            print(f"EventStore Service: Error decoding event payload: {e}")
+                            self._metric_decode_errors.inc()
+        except zmq.ZMQError as e:
+            print(f"EventStore Service: ZeroMQ Error: {e}")
+        finally:
+            print("EventStore Service shutting down...")
+            self.store.close()
+            subscriber.close(linger=0)
+            responder.close(linger=0)
+            self.context.term()
+            print("EventStore Service ZeroMQ context terminated.")
+
+
+def query(uri: str, request: Dict[str, Any], timeout_ms: int = 1000, context: Optional[zmq.Context] = None) -> Dict[str, Any]:
+    """クライアント用のヘルパー。応答が無い場合は TimeoutError"""
+    context = context or zmq.Context.instance()
+    requester = context.socket(zmq.REQ)
+    requester.setsockopt(zmq.RCVTIMEO, timeout_ms)
+    requester.setsockopt(zmq.LINGER, 0)
+    requester.connect(uri)
+    try:
+        requester.send(json.dumps(request).encode("utf-8"))
+        return json.loads(requester.recv())
+    except zmq.Again:
+        raise TimeoutError(f"No reply from event store at {uri}")
+    finally:
+        requester.close()
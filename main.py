@@ -1,29 +1,30 @@
 # main.py
+# 1 プロセス構成: リスナー・オーケストレーター・音声再生モジュールを同じプロセスで動かす。
+# ZMQ コンテキストを共有し、同じプロセス内の購読者は GameEvent を直接受け取るコールバック (シリアライズ無し) か
+# inproc:// (TCP ループバック無し) で接続する。他のプロセス (event_store, 可視化) は従来どおり zmq_publisher_uri を購読する。
+#
+#   PYTHONPATH=.:./proto python main.py --audio-transport direct
+import argparse
 import queue
 import threading
 import time
 import signal
-import sys
 import os # 設定ファイルのパス解決用
 
+import zmq
+
 # 他のモジュールをインポート
+from common.config_loader import load_config
+from common import metrics
 from orchestrator.event_listener import EventListener
 from orchestrator.orchestrator import Orchestrator
+from orchestrator.profiler import ProfilerControl
 from audio_playback.audio_playback import AudioPlaybackModule
 
-# 設定ファイルのパス (環境に合わせて変更)
-# カレントディレクトリに設定ファイルがあると仮定
-CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_ORCHESTRATOR = os.path.join(CONFIG_DIR, "config_orchestrator.yaml")
-CONFIG_PRIORITY = os.path.join(CONFIG_DIR, "config_priority.yaml")
-CONFIG_AUDIO = os.path.join(CONFIG_DIR, "config_audio.yaml")
-
-# SSL設定 (環境に合わせて変更)
-MULTICAST_IP = "224.5.23.1"
-MULTICAST_PORT = 10003
-# 特定NICから受信する場合は、そのIPアドレスを文字列で指定
-# LISTENING_INTERFACE_IP = "192.168.1.100"
-LISTENING_INTERFACE_IP = None # Noneの場合はシステムに任せる (or "")
+# 設定ファイルのディレクトリ (リポジトリの config/)
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+# 設定ファイルに zmq_inproc_uri が無い場合に使う inproc エンドポイント
+DEFAULT_INPROC_URI = "inproc://orchestrator"
 
 
 # グローバルな停止フラグ
@@ -34,50 +35,84 @@ def signal_handler(sig, frame):
     stop_flag.set()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSL commentary system in a single process")
+    parser.add_argument('--orchestrator-config', type=str,
+                        default=os.path.join(CONFIG_DIR, "config_orchestrator.yaml"))
+    parser.add_argument('--priority-config', type=str, default=os.path.join(CONFIG_DIR, "config_priority.yaml"))
+    parser.add_argument('--rules-config', type=str, default=os.path.join(CONFIG_DIR, "config_rules.yaml"),
+                        help='Path to the composite event rules config file (optional)')
+    parser.add_argument('--audio-config', type=str, default=os.path.join(CONFIG_DIR, "config_audio.yaml"))
+    parser.add_argument('--audio-transport', choices=("direct", "inproc", "tcp"), default="direct",
+                        help="direct: GameEvent callback, inproc: shared-context ZMQ, tcp: zmq_connect_uri in the audio config")
+    args = parser.parse_args()
+
     print("Starting SSL Commentary System...")
 
     # 終了シグナルハンドラ設定
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    # 1. 連携用キューの作成
+    orchestrator_config_data = load_config(args.orchestrator_config)
+    priority_config_data = load_config(args.priority_config)
+    audio_config_data = load_config(args.audio_config)
+    if orchestrator_config_data is None or priority_config_data is None or audio_config_data is None:
+        print("Error: Failed to load configuration files. Exiting.")
+        exit(1)
+    rules_config_data = load_config(args.rules_config)
+    if rules_config_data is None:
+        print("Warning: No composite event rules loaded.")
+    if args.audio_transport == "inproc" and not orchestrator_config_data.get("zmq_inproc_uri"):
+        orchestrator_config_data["zmq_inproc_uri"] = DEFAULT_INPROC_URI
+
+    # 1. 連携用キューと共有 ZMQ コンテキストの作成
     referee_queue = queue.Queue()
+    context = zmq.Context()
 
     # 2. 各コンポーネントの初期化
-    # リスナー設定 (必要に応じて interface_ip を設定)
-    listener = EventListener(MULTICAST_IP, MULTICAST_PORT, referee_queue, interface_ip=LISTENING_INTERFACE_IP)
-
-    # オーケストレーター設定
-    orchestrator = Orchestrator(referee_queue, CONFIG_ORCHESTRATOR, CONFIG_PRIORITY)
-
-    # 音声再生モジュール設定 (オーケストレーターのURIを取得する方法が必要)
-    # ここでは config_orchestrator.yaml から読み込む前提とする (要調整)
-    import yaml
-    publisher_uri = "tcp://127.0.0.1:5555" # デフォルト、または設定から読む
-    try:
-        with open(CONFIG_ORCHESTRATOR, 'r') as f:
-            orch_conf = yaml.safe_load(f)
-            publisher_uri = orch_conf.get('zmq_publisher_uri', publisher_uri)
-    except Exception as e:
-        print(f"Warning: Could not read orchestrator URI from config, using default: {publisher_uri}. Error: {e}")
-
-    audio_player = AudioPlaybackModule(publisher_uri, CONFIG_AUDIO)
+    listener_config = orchestrator_config_data.get('listener') or {}
+    listener = EventListener(referee_queue,
+                             multicast_group=os.environ.get('GC_MULTICAST_GROUP', '224.5.23.1'),
+                             multicast_port=int(os.environ.get('GC_MULTICAST_PORT', '10003')),
+                             rcvbuf_bytes=listener_config.get('rcvbuf_bytes'),
+                             pool_size=listener_config.get('pool_size', 16),
+                             stats_interval_sec=listener_config.get('stats_interval_sec', 60.0))
+
+    orchestrator = Orchestrator(referee_queue, orchestrator_config_data, priority_config_data,
+                                rules_config=rules_config_data, context=context)
+    orchestrator.ops_sources["listener"] = listener.stats
+
+    if args.audio_transport == "direct":
+        audio_player = AudioPlaybackModule(audio_config_data, context=context, direct=True)
+        orchestrator.add_event_callback(audio_player.on_event)
+    else:
+        if args.audio_transport == "inproc":
+            audio_config_data["zmq_connect_uri"] = orchestrator.zmq_inproc_uri
+        audio_player = AudioPlaybackModule(audio_config_data, context=context)
+
+    # Prometheus 形式の計測値 (/metrics)。全コンポーネントの計測値を 1 つのエンドポイントで公開する
+    metrics_server = metrics.start_http_server(
+        int(os.environ.get('METRICS_PORT', orchestrator_config_data.get('metrics_port', 0))))
 
     # 3. 各コンポーネントのスレッド起動
-    print("Starting components...")
+    print(f"Starting components (audio transport: {args.audio_transport})...")
     listener.start()
-    # オーケストレーターのrunはブロッキングするので別スレッドで
-    orchestrator_thread = threading.Thread(target=orchestrator.run, daemon=True)
-    orchestrator_thread.start()
-    # 音声再生モジュールも別プロセスまたはスレッドで開始 (ここではスレッド)
-    audio_player.start()
+    orchestrator.start()
+    orchestrator.ready.wait(timeout=5.0) # bind してから購読者を接続する
+    audio_thread = threading.Thread(target=audio_player.run, daemon=True, name="AudioPlayback")
+    audio_thread.start()
+    profiler_control = None
+    if orchestrator_config_data.get('profiler_control_uri'):
+        profiler_control = ProfilerControl(
+            orchestrator, orchestrator_config_data['profiler_control_uri'],
+            orchestrator_config_data.get('profiler_output_dir', 'profiles'),
+            orchestrator_config_data.get('profiler_max_duration_sec', 300.0), context=context)
+        profiler_control.start()
 
     # 4. メインループ (終了待機)
     print("System running. Press Ctrl+C to exit.")
-    while not stop_flag.is_set():
+    while not stop_flag.is_set() and listener.is_alive() and orchestrator.is_alive():
         try:
-            # メインスレッドはここで待機 or 他の処理
-            time.sleep(1)
+            time.sleep(0.5)
         except KeyboardInterrupt: # Ctrl+C でも停止できるように
             print("KeyboardInterrupt received.")
             stop_flag.set()
@@ -87,12 +122,20 @@ if __name__ == "__main__":
     listener.stop()
     orchestrator.stop()
     audio_player.stop()
+    if profiler_control:
+        profiler_control.stop()
+    if metrics_server:
+        metrics_server.stop()
 
-    # スレッドの終了を待つ
+    # スレッドの終了を待つ (ソケットを閉じてからコンテキストを終了する)
     listener.join(timeout=2)
-    orchestrator_thread.join(timeout=2)
-    # audio_player の start がスレッドを開始する場合、それもjoinする
-    # (現在のAudioPlaybackModule.start()はブロッキングしないので不要だが、
-    #  _receive_thread と _reconnect_thread の join は stop() 内で行う想定)
-
-    print("System exited.")
\ No newline at end of file
+    orchestrator.join(timeout=2)
+    audio_thread.join(timeout=2)
+    if profiler_control:
+        profiler_control.join(timeout=2)
+    if orchestrator.is_alive() or audio_thread.is_alive():
+        context.destroy(linger=0) # 終了しなかったスレッドのソケットも閉じる
+    else:
+        context.term()
+
+    print("System exited.")
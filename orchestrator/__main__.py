@@ -1,34 +1,84 @@
 # main.py
+# 起動経路: restart: unless-stopped での再起動を速くするため、最初のパケットの処理に必要なものから順に用意する
+#  1. 設定の読み込み (common/config_loader が解析結果をキャッシュしている)
+#  2. EventListener の起動 (マルチキャストへの参加はリスナーのスレッドで行い、以降のパケットはキューに溜まる)
+#  3. PUB ソケットの bind (購読者の再接続を、残りの初期化と並行して始めさせる)
+#  4. Orchestrator の import・生成・起動 (溜まったパケットから処理を始める)
+#  5. 準備完了の通知 (READY_FILE の作成, systemd の NOTIFY_SOCKET) と起動時間の出力
+#  6. 最初のパケットに不要なもの (/metrics, プロファイル制御, standby 監視) の import・起動
 import queue
+import socket
 import time
 import argparse
 import os
-# orchestrator.py から Orchestrator クラスをインポート
-from .orchestrator import Orchestrator
+from typing import Optional
+
+import zmq
+
+from common.config_loader import load_config
 # event_listener.py から EventListener クラスをインポート
 from .event_listener import EventListener
-from common.config_loader import load_config
-# (必要であれば、他のモジュールもインポート)
+# (Orchestrator などは PUB ソケットの bind 後にインポートする)
+
+
+def seconds_since_exec() -> Optional[float]:
+    """プロセスの開始 (exec) からの経過秒数 (/proc が読めなければ None。分解能はクロック tick)"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            stat = f.read()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+    # comm は空白や括弧を含み得るので最後の ')' の後から数える (starttime は 22 番目)
+    starttime_ticks = int(stat[stat.rfind(")") + 2:].split()[19])
+    return max(0.0, uptime - starttime_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+def notify_ready(ready_file: Optional[str]):
+    """準備完了を通知する: ready_file を作り、systemd (Type=notify) の NOTIFY_SOCKET があれば READY=1 を送る"""
+    if ready_file:
+        try:
+            with open(ready_file, "w") as f:
+                f.write(f"{os.getpid()}\n")
+        except OSError as e:
+            print(f"Warning: Could not write ready file {ready_file}: {e}")
+    notify_socket = os.environ.get("NOTIFY_SOCKET")
+    if notify_socket:
+        if notify_socket.startswith("@"):
+            notify_socket = "\0" + notify_socket[1:] # 抽象名前空間
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"READY=1", notify_socket)
+        except OSError as e:
+            print(f"Warning: sd_notify failed: {e}")
+
 
 # --- ここに orchestrator.py から移動してきた if __name__ == '__main__': ブロックの内容を記述 ---
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(...)
     parser.add_argument(
-        '--orchestrator-config', 
+        '--orchestrator-config',
         type=str,
-        default='../config/config_orchestrator.yaml', 
+        default='../config/config_orchestrator.yaml',
         help='Path to the orchestrator config file')
     parser.add_argument(
-        '--priority-config', 
+        '--priority-config',
         type=str,
-        default='../config/config_priority.yaml', 
+        default='../config/config_priority.yaml',
         help='Path to the priority config file')
+    parser.add_argument(
+        '--rules-config',
+        type=str,
+        default='../config/config_rules.yaml',
+        help='Path to the composite event rules config file (optional)')
     args = parser.parse_args()
 
     # パス解決
     script_dir = os.path.dirname(__file__)
     orch_cfg_path = os.path.abspath(os.path.join(script_dir, args.orchestrator_config))
     prio_cfg_path = os.path.abspath(os.path.join(script_dir, args.priority_config))
+    rules_cfg_path = os.path.abspath(os.path.join(script_dir, args.rules_config))
 
     # ★ 設定ファイルをここで読み込む
     orchestrator_config_data = load_config(orch_cfg_path)
@@ -38,6 +88,23 @@ if __name__ == '__main__':
     if orchestrator_config_data is None or priority_config_data is None:
         print("Error: Failed to load configuration files. Exiting.")
         exit(1)
+    # 複合イベントのルールは任意 (読み込めなければルール無しで動作する)
+    rules_config_data = load_config(rules_cfg_path)
+    if rules_config_data is None:
+        print("Warning: No composite event rules loaded.")
+
+    # 準備完了の通知先。前回の起動で作ったものが残っていれば消しておく
+    ready_file = os.environ.get('READY_FILE', orchestrator_config_data.get('ready_file', ''))
+    if ready_file and os.path.exists(ready_file):
+        os.remove(ready_file)
+
+    # 環境変数で hot-standby の役割を上書きできるようにする (同じ設定ファイルを primary/standby で共有するため)
+    failover_config = orchestrator_config_data.get('failover') or {}
+    orchestrator_config_data['failover'] = failover_config
+    if os.environ.get('ORCHESTRATOR_ROLE'):
+        failover_config['role'] = os.environ['ORCHESTRATOR_ROLE']
+    if os.environ.get('ORCHESTRATOR_PEER_URI'):
+        failover_config['peer_uri'] = os.environ['ORCHESTRATOR_PEER_URI']
 
     print("Starting commentary system (Listener + Orchestrator)...") # メッセージを修正
     message_queue = queue.Queue()
@@ -47,19 +114,101 @@ if __name__ == '__main__':
     multicast_port = os.environ.get('GC_MULTICAST_PORT', '10003')
     # 整数にキャスト
     multicast_port = int(multicast_port)
-    
-    # リスナー起動
-    listener = EventListener(message_queue, multicast_group=multicast_group, multicast_port=multicast_port)
+
+    # リスナー起動 (オーケストレーターの初期化と並行してマルチキャストに参加し、受信したパケットはキューに溜める)
+    listener_config = orchestrator_config_data.get('listener') or {}
+    listener = EventListener(message_queue, multicast_group=multicast_group, multicast_port=multicast_port,
+                             rcvbuf_bytes=listener_config.get('rcvbuf_bytes'),
+                             pool_size=listener_config.get('pool_size', 16),
+                             stats_interval_sec=listener_config.get('stats_interval_sec', 60.0))
     listener.start()
 
+    # primary (と standby_bind_early の standby) は PUB ソケットを先に bind しておく
+    context = zmq.Context()
+    publisher = None
+    if failover_config.get('role', 'primary') != 'standby' or failover_config.get('standby_bind_early', False):
+        publisher = context.socket(zmq.PUB)
+        try:
+            publisher.bind(orchestrator_config_data.get('zmq_publisher_uri', 'tcp://*:5555'))
+            if orchestrator_config_data.get('zmq_inproc_uri'):
+                publisher.bind(orchestrator_config_data['zmq_inproc_uri'])
+        except zmq.ZMQError as e:
+            print(f"Error binding ZeroMQ socket: {e}")
+            exit(1)
+
+    # orchestrator.py から Orchestrator クラスをインポート
+    from .orchestrator import Orchestrator
+    from common import metrics
+
     # オーケストレーター起動
     orchestrator = Orchestrator(
         input_queue=message_queue,
         orchestrator_config=orchestrator_config_data,
-        priority_config=priority_config_data
+        priority_config=priority_config_data,
+        rules_config=rules_config_data,
+        context=context,
+        publisher=publisher
     )
+    # 'ops' トピックに受信経路の統計 (受信数・カーネルでの破棄数など) も載せる
+    orchestrator.ops_sources["listener"] = listener.stats
     orchestrator.start()
 
+    if orchestrator.ready.wait(timeout=10.0):
+        notify_ready(ready_file)
+        startup_sec = seconds_since_exec()
+        if startup_sec is not None:
+            metrics.REGISTRY.gauge("ssl_orchestrator_startup_seconds",
+                                   "Seconds from exec until the orchestrator was ready").set(startup_sec)
+            print(f"Orchestrator ready {startup_sec:.2f} s after start.")
+
+    # --- ここから先は最初のパケットの処理に不要なもの ---
+    # Prometheus 形式の計測値 (/metrics)。リスナー・オーケストレーターは生成時に計測値を登録済み
+    metrics.start_http_server(int(os.environ.get('METRICS_PORT', orchestrator_config_data.get('metrics_port', 0))))
+
+    # 再起動せずにプロファイルするための制御チャネル
+    profiler_control = None
+    if orchestrator_config_data.get('profiler_control_uri'):
+        from .profiler import ProfilerControl
+        profiler_control = ProfilerControl(
+            orchestrator,
+            bind_uri=orchestrator_config_data['profiler_control_uri'],
+            output_dir=orchestrator_config_data.get('profiler_output_dir', 'profiles'),
+            max_duration_sec=orchestrator_config_data.get('profiler_max_duration_sec', 300.0),
+            context=context)
+        profiler_control.start()
+
+    # ロボット・ボール位置 (トラッカー) のリスナー起動。可視化用に間引いて別の PUB ソケットで publish する
+    vision_listener = None
+    vision_config = orchestrator_config_data.get('vision') or {}
+    if vision_config.get('enabled', True):
+        from .vision_listener import VisionListener
+        vision_listener = VisionListener(
+            multicast_group=os.environ.get('VISION_MULTICAST_GROUP', vision_config.get('multicast_group', '224.5.23.2')),
+            multicast_port=int(os.environ.get('VISION_MULTICAST_PORT', vision_config.get('multicast_port', 10010))),
+            publish_uri=vision_config.get('publish_uri', 'tcp://*:5558'),
+            display_rate_hz=vision_config.get('display_rate_hz', 20.0),
+            source_name=vision_config.get('source_name'),
+            # 進行中のボールプレースメントの間は、全フレームから派生指標 ('placement_metrics') を計算する
+            placement_source=(lambda: orchestrator.placement_tracker.active) if orchestrator.placement_tracker else None,
+            metrics_window_sec=vision_config.get('metrics_window_sec', 1.0))
+        vision_listener.start()
+
+    # standby は primary の、peer_uri のある primary は昇格した standby の checkpoint を監視する。
+    # 途絶えたら昇格させ、昇格後に peer も publish していればどちらか一方を降格させる
+    standby_monitor = None
+    peer_uri = None
+    if orchestrator.role == "standby":
+        peer_uri = os.environ.get('ORCHESTRATOR_PRIMARY_URI', failover_config.get('primary_uri', 'tcp://localhost:5555'))
+    elif orchestrator.peer_uri:
+        peer_uri = orchestrator.peer_uri
+    if peer_uri:
+        from .failover import StandbyMonitor
+        standby_monitor = StandbyMonitor(
+            orchestrator,
+            primary_uri=peer_uri,
+            takeover_timeout_sec=failover_config.get('takeover_timeout_sec', 1.0))
+        standby_monitor.start()
+
     try:
         while listener.is_alive() and orchestrator.is_alive():
             time.sleep(0.5)
@@ -67,4 +216,6 @@ if __name__ == '__main__':
         print("\nKeyboard interrupt received. Stopping threads...")
     finally:
         # ... (終了処理 - listener.stop(), orchestrator.stop(), .join() など) ...
-        print("All threads stopped.")
\ No newline at end of file
+        if ready_file and os.path.exists(ready_file):
+            os.remove(ready_file)
+        print("All threads stopped.")
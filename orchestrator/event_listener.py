@@ -1,15 +1,19 @@
 # listener.py
+import os
+import select
 import socket
 import struct
+import sys
 import time
 import queue
 import threading
-from typing import Optional
+from typing import Any, Dict, Optional
 
 # --- Protobufの生成済みコードをインポート ---
 # (実際のパスに合わせて修正してください)
 try:
     from state import ssl_gc_referee_message_pb2 as referee_pb2
+    from google.protobuf.message import DecodeError
 except ImportError:
     print("Error: Protobuf generated code not found.")
     print("Please generate Python code from .proto files using protoc.")
@@ -17,18 +21,77 @@ except ImportError:
     exit(1)
 # --- ここまで ---
 
+try:
+    from common import metrics
+except ImportError:
+    print("Error: common/metrics.py not found.")
+    exit(1)
+
+
+# Linux の SO_RXQ_OVFL (受信キューが溢れてカーネルが捨てたデータグラム数を recvmsg の補助データで受け取る)。
+# Python の socket モジュールには定数が無いため値を直接使う (include/uapi/asm-generic/socket.h)
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40)
+SO_RCVBUFFORCE = getattr(socket, "SO_RCVBUFFORCE", 33)
+# Linux の getsockopt(SO_RCVBUF) は管理用の領域を含めて設定値の 2 倍を返す
+RCVBUF_OVERHEAD_FACTOR = 2 if sys.platform.startswith("linux") else 1
+MAX_DATAGRAM_SIZE = 65535
+
+
+def proc_udp_drops(inode: int, path: str = "/proc/net/udp") -> Optional[int]:
+    """/proc/net/udp からソケット (inode) の drops 列を読む。見つからなければ None"""
+    try:
+        with open(path, "r") as f:
+            next(f) # ヘッダー
+            for line in f:
+                columns = line.split()
+                if len(columns) >= 13 and columns[9] == str(inode):
+                    return int(columns[12])
+    except (OSError, ValueError, StopIteration):
+        pass
+    return None
+
 
 class EventListener(threading.Thread):
+    """
+    GC の Referee をマルチキャストで受信し、デコードした Referee を output_queue に入れるスレッド。
+    受信は事前確保したバッファのプール (pool_size 個) に recvmsg_into で読み込み、起床ごとに溜まっているデータグラムを
+    プールが埋まるまで読み出してから memoryview のスライスでまとめてデコードする (ソケットを先に空ける)。
+    SO_RCVBUF は rcvbuf_bytes に設定して実際の値を確認し、カーネルでの破棄数は SO_RXQ_OVFL
+    と /proc/net/udp の drops (使えるもの) から取得して、Python 側の破棄 (デコード失敗・キュー満杯) と分けて数える。
+    """
     def __init__(self,
                  output_queue: queue.Queue,
                  multicast_group: str = "224.5.23.1",
                  multicast_port: int = 10003,
-                 interface_ip: Optional[str] = None): # WSL/Linuxローカルテスト用
-        super().__init__(daemon=True) # メインスレッド終了時に一緒に終了
+                 interface_ip: Optional[str] = None, # WSL/Linuxローカルテスト用
+                 rcvbuf_bytes: Optional[int] = None, # None ならOSのデフォルトのまま
+                 pool_size: int = 16,
+                 stats_interval_sec: float = 0.0):
+        super().__init__(daemon=True, name="EventListener") # メインスレッド終了時に一緒に終了
         self.output_queue = output_queue
         self.multicast_group = multicast_group
         self.multicast_port = multicast_port
         self.interface_ip = interface_ip if interface_ip else '0.0.0.0' # 指定なければANY
+        self.rcvbuf_bytes = rcvbuf_bytes
+        self.pool_size = max(1, pool_size)
+        self.stats_interval_sec = stats_interval_sec
+        # 受信バッファのプール (起動時に確保し、以降は再利用する)
+        self._pool = [bytearray(MAX_DATAGRAM_SIZE) for _ in range(self.pool_size)]
+        self._views = [memoryview(buffer) for buffer in self._pool]
+        self._sizes = [0] * self.pool_size # 直近の _drain で各バッファに読み込んだサイズ
+        # 統計 (run スレッドのみが更新する)
+        self.datagrams_received = 0
+        self.bytes_received = 0
+        self.decode_errors = 0     # Python 側: パースできなかったもの
+        self.truncated = 0         # Python 側: バッファより大きく切り詰められたもの
+        self.queue_drops = 0       # Python 側: output_queue が満杯で捨てたもの
+        self.wakeups = 0
+        self.max_drain = 0         # 1 回の起床で読み出したデータグラムの最大数
+        self.kernel_drops: Optional[int] = None # カーネルが捨てた数 (取得できなければ None)
+        self.kernel_drops_source: Optional[str] = None # 取得方法 ("SO_RXQ_OVFL+/proc/net/udp" など)
+        self.rcvbuf_actual: Optional[int] = None
+        self._inode: Optional[int] = None
+        self._register_metrics(metrics.REGISTRY)
         self._stop_event = threading.Event()
         print(f"Listener initialized for {self.multicast_group}:{self.multicast_port} on interface {self.interface_ip}")
 
@@ -36,10 +99,113 @@ class EventListener(threading.Thread):
         self._stop_event.set()
         print("Listener stop requested.")
 
+    def _register_metrics(self, registry: metrics.MetricsRegistry):
+        """Prometheus 形式の計測値。run スレッドの統計を scrape 時に読む (受信ループでは何もしない)"""
+        registry.counter("ssl_listener_datagrams_total", "Referee datagrams received").set_function(
+            lambda: self.datagrams_received)
+        registry.counter("ssl_listener_bytes_total", "Referee bytes received").set_function(lambda: self.bytes_received)
+        registry.counter("ssl_listener_wakeups_total", "Receive loop wakeups").set_function(lambda: self.wakeups)
+        drops = registry.counter("ssl_listener_drops_total", "Referee datagrams lost, by where they were lost", ("reason",))
+        drops.labels("kernel").set_function(lambda: self.stats()["kernel_drops"] or 0)
+        drops.labels("decode").set_function(lambda: self.decode_errors)
+        drops.labels("truncated").set_function(lambda: self.truncated)
+        drops.labels("queue_full").set_function(lambda: self.queue_drops)
+        registry.gauge("ssl_listener_rcvbuf_bytes", "Effective SO_RCVBUF of the referee socket (excluding kernel overhead)").set_function(
+            lambda: self.rcvbuf_actual or 0)
+
+    @staticmethod
+    def _effective_rcvbuf(sock: socket.socket) -> int:
+        """データに使える SO_RCVBUF (rcvbuf_bytes と比べられる値。Linux では getsockopt の値の半分)"""
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // RCVBUF_OVERHEAD_FACTOR
+
+    def _configure_socket(self, sock: socket.socket):
+        """SO_RCVBUF の設定と確認、カーネルの破棄数の取得方法の選択"""
+        if self.rcvbuf_bytes:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf_bytes)
+            except OSError as e:
+                print(f"Listener: Failed to set SO_RCVBUF to {self.rcvbuf_bytes}: {e}")
+            # 上限 (net.core.rmem_max) で切り詰められていれば、権限があれば SO_RCVBUFFORCE で上限を超えて設定する
+            if self._effective_rcvbuf(sock) < self.rcvbuf_bytes:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, self.rcvbuf_bytes)
+                except OSError:
+                    pass
+        self.rcvbuf_actual = self._effective_rcvbuf(sock)
+        if self.rcvbuf_bytes and self.rcvbuf_actual < self.rcvbuf_bytes:
+            print(f"Warning: Listener SO_RCVBUF is {self.rcvbuf_actual} bytes (requested {self.rcvbuf_bytes}). "
+                  f"Raise net.core.rmem_max to allow larger receive buffers.")
+        else:
+            print(f"Listener SO_RCVBUF: {self.rcvbuf_actual} bytes")
+
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+            self.kernel_drops_source = "SO_RXQ_OVFL"
+            self.kernel_drops = 0
+        except OSError:
+            pass
+
+    def _find_proc_entry(self, sock: socket.socket):
+        """
+        bind 後に /proc/net/udp でソケットの行を探す (bind 前は載らない)。
+        SO_RXQ_OVFL の値は受信したデータグラムがキューに入った時点の累積値なので、最後に受信した後の破棄は
+        次の受信まで分からない。/proc/net/udp が読めれば stats() で現在の値と比べて大きい方を使う
+        """
+        inode = os.fstat(sock.fileno()).st_ino
+        if proc_udp_drops(inode) is None:
+            return
+        self._inode = inode
+        self.kernel_drops = self.kernel_drops or 0
+        self.kernel_drops_source = "+".join(filter(None, (self.kernel_drops_source, "/proc/net/udp")))
+
+    def _drain(self, sock: socket.socket, ancbufsize: int) -> int:
+        """溜まっているデータグラムをプールが埋まるまで読み込み、読み込んだ数を返す (サイズは self._sizes)"""
+        count = 0
+        sizes = self._sizes
+        use_ancillary = self.kernel_drops_source is not None and "SO_RXQ_OVFL" in self.kernel_drops_source
+        while count < self.pool_size:
+            try:
+                if use_ancillary:
+                    size, ancdata, flags, _ = sock.recvmsg_into([self._pool[count]], ancbufsize)
+                    for level, kind, value in ancdata:
+                        if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(value) >= 4:
+                            # ソケット作成以降の累積値
+                            self.kernel_drops = max(self.kernel_drops, struct.unpack("=I", value[:4])[0])
+                else:
+                    size, flags = sock.recvfrom_into(self._pool[count])[0], 0
+            except (BlockingIOError, InterruptedError):
+                break
+            if flags & socket.MSG_TRUNC:
+                self.truncated += 1
+                continue
+            sizes[count] = size
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """受信の統計。kernel_drops はカーネル、decode_errors / truncated / queue_drops は Python 側で失われた数"""
+        if self._inode is not None:
+            drops = proc_udp_drops(self._inode)
+            if drops is not None and drops > self.kernel_drops:
+                self.kernel_drops = drops
+        return {
+            "datagrams_received": self.datagrams_received,
+            "bytes_received": self.bytes_received,
+            "kernel_drops": self.kernel_drops,
+            "kernel_drops_source": self.kernel_drops_source,
+            "decode_errors": self.decode_errors,
+            "truncated": self.truncated,
+            "queue_drops": self.queue_drops,
+            "wakeups": self.wakeups,
+            "max_drain": self.max_drain,
+            "rcvbuf_bytes": self.rcvbuf_actual,
+        }
+
     def run(self):
         print("Listener thread started.")
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._configure_socket(sock)
 
         # --- ポートへのバインド ---
         # マルチキャストアドレスではなく、ローカルインターフェースにバインド
@@ -49,6 +215,7 @@ class EventListener(threading.Thread):
         except OSError as e:
             print(f"Error binding socket: {e}")
             print("Check if the port is already in use or if the interface IP is correct.")
+            sock.close()
             return # スレッド終了
 
         # --- マルチキャストグループへの参加 ---
@@ -74,36 +241,50 @@ class EventListener(threading.Thread):
             #     return # スレッド終了
             sock.close()
             return
-
+        self._find_proc_entry(sock)
 
         # --- 受信ループ ---
-        sock.settimeout(10.0) # タイムアウトを設定してstop()をチェック
-        ref_message = referee_pb2.Referee() # 再利用して効率化
+        sock.setblocking(False)
+        ancbufsize = socket.CMSG_SPACE(4)
+        views = self._views
+        put = self.output_queue.put_nowait
+        last_report = time.monotonic()
 
         while not self._stop_event.is_set():
             try:
-                data, addr = sock.recvfrom(65535) # バッファサイズ
-                # print(f"Received {len(data)} bytes from {addr}") # デバッグ用
-                ref_message.ParseFromString(data)
-                # print(f"Parsed Referee msg: stage={ref_message.stage}, command={ref_message.command}") # デバッグ用
-                
-                msg_copy = referee_pb2.Referee()
-                msg_copy.CopyFrom(ref_message)
-                
-                # デコード成功したらキューに入れる (コピーを渡す方が安全かもしれないが、まずはそのまま)
-                self.output_queue.put(msg_copy)
-
-            except socket.timeout:
-                # タイムアウトは正常、stop()をチェックするため
-                continue
-            except socket.error as e:
+                readable, _, _ = select.select([sock], [], [], 1.0) # stop() を確認するためのタイムアウト
+                if not readable:
+                    continue
+                count = self._drain(sock, ancbufsize)
+            except OSError as e:
                 print(f"Socket error in listener: {e}")
                 time.sleep(1) # エラー時は少し待つ
-            except Exception as e: # Protobufのパースエラーなども含む
-                print(f"Error processing UDP packet: {e}")
+                continue
+            self.wakeups += 1
+            if count > self.max_drain:
+                self.max_drain = count
+            for i in range(count):
+                size = self._sizes[i]
+                self.datagrams_received += 1
+                self.bytes_received += size
+                try:
+                    # upb 実装では既存のメッセージに ParseFromString + CopyFrom するより FromString で作る方が速い
+                    ref_message = referee_pb2.Referee.FromString(views[i][:size])
+                except DecodeError as e:
+                    self.decode_errors += 1
+                    print(f"Error processing UDP packet: {e}")
+                    continue
+                try:
+                    put(ref_message)
+                except queue.Full:
+                    self.queue_drops += 1
+
+            if self.stats_interval_sec > 0 and time.monotonic() - last_report >= self.stats_interval_sec:
+                last_report = time.monotonic()
+                print(f"Listener stats: {self.stats()}")
 
         # --- 終了処理 ---
-        print("Listener shutting down...")
+        print(f"Listener shutting down... stats: {self.stats()}")
         try:
             # マルチキャストグループからの離脱 (必須ではないことが多いが一応)
             # mreq = struct.pack("4sl", socket.inet_aton(self.multicast_group), socket.INADDR_ANY)
@@ -0,0 +1,178 @@
+# orchestrator/event_reorder.py
+# 検出した GameEvent を GC の時刻 (イベント時刻) 順に並べ替えてから publish するためのバッファ。
+# GC の game_event は created_timestamp (autoRef が検出した時刻) を持ち、それを含む Referee パケットより前の時刻になる。
+# そのため、同じパケットで検出したコマンド変化 (command_timestamp) より後に届いても、実際には先に起きていることがある。
+# watermark (受信した packet_timestamp の最大値 - tolerance) を過ぎたイベントから時刻順に送り出し、
+# ホスト時刻で max_hold_sec を超えて保持したイベントは watermark を待たずに送る (GC が止まった場合の上限)。
+# あわせて、ホストの時計と GC の時計の差 (受信時刻 - packet_timestamp の最小値) を推定し、送り出すイベントに付与する。
+import heapq
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: common/data_models.py not found.")
+    exit(1)
+
+# 時計のずれの推定に使う期間 (秒)。この期間の「受信時刻 - packet_timestamp」の最小値をずれとする
+# (最小値はネットワーク・処理の遅延が最も小さかったパケットの値で、遅延の揺らぎの影響を受けにくい)
+DEFAULT_SKEW_WINDOW_SEC = 10.0
+# 保持時間の統計に使う直近のイベント数
+HOLD_SAMPLES = 1024
+
+
+class EventReorderBuffer:
+    """
+    observe_packet() で Referee パケットの時刻を、push() で検出したイベントを渡し、pop_ready() で送り出せるイベントを
+    イベント時刻順に受け取る。tolerance_sec が 0 なら並べ替えずにすぐ送り出す (時計のずれの付与は行う)。
+    """
+    def __init__(self, tolerance_sec: float = 0.1, max_hold_sec: float = 0.5,
+                 skew_window_sec: float = DEFAULT_SKEW_WINDOW_SEC):
+        self.tolerance_sec = tolerance_sec
+        self.max_hold_sec = max(max_hold_sec, tolerance_sec)
+        self.skew_window_sec = skew_window_sec
+        self.watermark = float("-inf") # GC 時刻。これ以前のイベントは送り出してよい
+        # (イベント時刻, 到着順, 到着時のホスト時刻 (monotonic), 検出したパケットの packet_timestamp, イベント)
+        self._heap: List[Tuple[float, int, float, int, GameEvent]] = []
+        self._seq = 0
+        # 時計のずれ: 単調キュー (ホスト時刻, 受信時刻 - packet_timestamp) で期間内の最小値を保つ
+        self._skew_samples: Deque[Tuple[float, float]] = deque()
+        self.skew_sec: Optional[float] = None
+        # 統計
+        self.released = 0
+        self.reordered = 0 # 到着順と異なる順序で送り出したイベント数
+        self.late = 0 # 既に送り出したイベントより前の時刻で届いたイベント数 (順序を保証できなかったもの)
+        self.forced = 0 # max_hold_sec により watermark を待たずに送り出したイベント数
+        self.max_hold_observed_sec = 0.0
+        self._hold_samples: Deque[float] = deque(maxlen=HOLD_SAMPLES)
+        self._last_released_time = float("-inf")
+        self._last_released_seq = -1
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def observe_packet(self, packet_timestamp_us: int, received_at: Optional[float] = None):
+        """Referee パケット 1 件の GC 時刻 (packet_timestamp) と受信したホスト時刻 (time.time()) を反映する"""
+        packet_time = packet_timestamp_us / 1_000_000.0
+        received_at = time.time() if received_at is None else received_at
+        watermark = packet_time - self.tolerance_sec
+        if watermark > self.watermark:
+            self.watermark = watermark
+        sample = received_at - packet_time
+        samples = self._skew_samples
+        while samples and samples[-1][1] >= sample:
+            samples.pop()
+        samples.append((received_at, sample))
+        while samples[0][0] < received_at - self.skew_window_sec:
+            samples.popleft()
+        self.skew_sec = samples[0][1]
+
+    def gc_now(self) -> float:
+        """現在時刻を GC の時計で表したもの (ずれが未推定ならホストの時刻)"""
+        now = time.time()
+        return now - self.skew_sec if self.skew_sec is not None else now
+
+    def push(self, events: List[GameEvent], packet_timestamp_us: int = 0, now: Optional[float] = None):
+        """packet_timestamp_us のパケットで検出したイベントを追加する"""
+        now = time.monotonic() if now is None else now
+        for game_event in events:
+            if game_event.timestamp < self._last_released_time:
+                self.late += 1
+            heapq.heappush(self._heap, (game_event.timestamp, self._seq, now, packet_timestamp_us, game_event))
+            self._seq += 1
+
+    def oldest_packet_timestamp(self) -> Optional[int]:
+        """保持中のイベントを検出したパケットのうち最も古い packet_timestamp (保持していなければ None)"""
+        if not self._heap:
+            return None
+        return min(entry[3] for entry in self._heap)
+
+    def next_deadline(self) -> Optional[float]:
+        """保持中のイベントが max_hold_sec に達するホスト時刻 (monotonic)。保持していなければ None"""
+        if not self._heap:
+            return None
+        return min(entry[2] for entry in self._heap) + self.max_hold_sec
+
+    def pop_ready(self, now: Optional[float] = None) -> List[GameEvent]:
+        """送り出せるイベントを時刻順に返す (時計のずれを data["clock_skew_ms"] に付与する)"""
+        heap = self._heap
+        if not heap:
+            return []
+        now = time.monotonic() if now is None else now
+        # max_hold_sec を超えたイベントがあれば、それ以前の時刻のイベントもまとめて送り出す
+        release_until = self.watermark if self.tolerance_sec > 0 else float("inf")
+        deadline = now - self.max_hold_sec
+        for event_time, _, arrived, _, _ in heap:
+            if arrived <= deadline and event_time > release_until:
+                release_until = event_time
+                self.forced += 1
+        ready = []
+        skew_ms = round(self.skew_sec * 1000, 1) if self.skew_sec is not None else None
+        while heap and heap[0][0] <= release_until:
+            event_time, seq, arrived, _, game_event = heapq.heappop(heap)
+            if seq < self._last_released_seq:
+                self.reordered += 1
+            self._last_released_seq = max(self._last_released_seq, seq)
+            self._last_released_time = max(self._last_released_time, event_time)
+            hold = now - arrived
+            self._hold_samples.append(hold)
+            if hold > self.max_hold_observed_sec:
+                self.max_hold_observed_sec = hold
+            if skew_ms is not None:
+                game_event.data["clock_skew_ms"] = skew_ms
+            ready.append(game_event)
+        self.released += len(ready)
+        return ready
+
+    def flush(self) -> List[GameEvent]:
+        """保持中のイベントを全て時刻順に返す (終了時など)"""
+        return self.pop_ready(now=float("inf"))
+
+    def take_all(self) -> List[Tuple[int, GameEvent]]:
+        """保持中のイベントを送り出さずに全て (検出したパケットの packet_timestamp, イベント) で取り出す (降格時)"""
+        entries = [(packet_timestamp, game_event) for _, _, _, packet_timestamp, game_event in self._heap]
+        self._heap.clear()
+        return entries
+
+    def stats(self) -> Dict[str, Any]:
+        holds = sorted(self._hold_samples)
+        def percentile(p: float) -> Optional[float]:
+            return round(holds[min(len(holds) - 1, int(p * len(holds)))] * 1000, 1) if holds else None
+        return {
+            "released": self.released,
+            "held": len(self._heap),
+            "reordered": self.reordered,
+            "late": self.late,
+            "forced": self.forced,
+            "hold_ms_p50": percentile(0.5),
+            "hold_ms_p99": percentile(0.99),
+            "hold_ms_max": round(self.max_hold_observed_sec * 1000, 1),
+            "clock_skew_ms": round(self.skew_sec * 1000, 1) if self.skew_sec is not None else None,
+        }
+
+
+if __name__ == '__main__':
+    buffer = EventReorderBuffer(tolerance_sec=0.1, max_hold_sec=0.5)
+    base = 1_700_000_000.0
+    host_offset = 2.5 # ホストの時計が GC より 2.5 秒進んでいる
+    # 10 Hz のパケット。t=1.0 のパケットでコマンド (1.0) と、0.15 秒前に作られた game_event (0.85) を同時に検出する
+    released = []
+    for i in range(20):
+        packet_time = base + i * 0.1
+        buffer.observe_packet(int(packet_time * 1_000_000), received_at=packet_time + host_offset + 0.002 * (i % 3))
+        if i == 10:
+            buffer.push([GameEvent(timestamp=packet_time, event_type="COMMAND_STOP"),
+                         GameEvent(timestamp=packet_time - 0.15, event_type="EVENT_BOT_PUSHING_BLUE")],
+                        int(packet_time * 1_000_000), now=i * 0.1)
+        released.extend(buffer.pop_ready(now=i * 0.1))
+    print([e.event_type for e in released], buffer.stats())
+    assert [e.event_type for e in released] == ["EVENT_BOT_PUSHING_BLUE", "COMMAND_STOP"]
+    assert released[0].data["clock_skew_ms"] == 2500.0
+    assert buffer.reordered == 1 and buffer.late == 0 and buffer.stats()["hold_ms_max"] <= 200.0 + 1e-6
+    # GC が止まった場合は max_hold_sec で送り出す
+    buffer.push([GameEvent(timestamp=base + 10.0, event_type="COMMAND_HALT")], int((base + 10.0) * 1_000_000), now=5.0)
+    assert buffer.oldest_packet_timestamp() == int((base + 10.0) * 1_000_000)
+    assert buffer.pop_ready(now=5.4) == [] and [e.event_type for e in buffer.pop_ready(now=5.5)] == ["COMMAND_HALT"]
+    assert buffer.forced == 1
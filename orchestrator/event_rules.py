@@ -0,0 +1,330 @@
+# orchestrator/event_rules.py
+# 複数のイベントの並び (例: キックオフ直後のゴール、同じチームの 2 分以内の 3 回目のファウル) を検出して
+# 複合イベントを生成するルールエンジン。ルールは config/config_rules.yaml に書き、読み込み時に
+# ステップ列のオートマトンへコンパイルする。
+#
+# ルールの書式:
+#   - name: GOAL_AFTER_KICKOFF          # 複合イベントの event_type は COMPOSITE_<name> (event_type で変更可能)
+#     priority: 9                       # 省略時は config_priority.yaml の値 (なければ DEFAULT_PRIORITY)
+#     within_sec: 15                    # 最初のステップから最後のステップまでの GC 時刻の上限 (省略時は無制限)
+#     cancel_on: [COMMAND_HALT]         # 途中まで一致した状態を破棄するイベント
+#     steps:
+#       - types: [COMMAND_KICKOFF_START_*]   # event_type。末尾の * は接頭辞一致
+#         where: {team: $team}               # data のフィールド条件。$var は変数 (最初の出現で束縛、以降は一致)
+#       - types: [EVENT_GOAL_CONFIRMED_*]
+#         where: {team: $team}               # "!$var" / "!値" は不一致、それ以外は値の一致
+#         count: 1                           # 同じステップを count 回繰り返す (省略時 1)
+#
+# 各イベントは、その event_type を待っているルールだけを進める (event_type -> (ルール, ステップ) の索引)。
+# ルールごとの途中状態は、次に待つステップの位置ごとに変数の値をキーにした辞書で、同じキーの状態は開始が新しい方だけを残す
+# (残り時間が長い方が常に有利なため)。一致したら、同じ変数の値を持つ途中状態を破棄する (一致は重ならない)。
+# 時刻は GameEvent.timestamp (GC の時計) を使う。
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: common/data_models.py not found.")
+    exit(1)
+
+DEFAULT_EVENT_TYPE_PREFIX = "COMPOSITE_"
+
+# where の条件の種類
+_EQ, _NE, _EQ_VAR, _NE_VAR, _BIND = range(5)
+
+
+def _team_from_suffix(event_type: str) -> Optional[str]:
+    if event_type.endswith("_YELLOW"):
+        return "YELLOW"
+    if event_type.endswith("_BLUE"):
+        return "BLUE"
+    return None
+
+
+def event_field(game_event: GameEvent, field_name: str) -> Any:
+    """where で参照する値。data のキーで、team が無ければ event_type の末尾 (_YELLOW / _BLUE) から決める"""
+    value = game_event.data.get(field_name)
+    if value is None and field_name == "team":
+        value = _team_from_suffix(game_event.event_type)
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class RuleStep:
+    """ルールの 1 ステップ: event_type のパターンと data の条件"""
+    __slots__ = ("exact_types", "type_prefixes", "conditions")
+
+    def __init__(self, types: Iterable[str], conditions: List[Tuple[int, str, Any]]):
+        types = list(types)
+        self.exact_types = frozenset(t for t in types if not t.endswith("*"))
+        self.type_prefixes = tuple(t[:-1] for t in types if t.endswith("*"))
+        self.conditions = conditions
+
+    def accepts_type(self, event_type: str) -> bool:
+        return event_type in self.exact_types or event_type.startswith(self.type_prefixes)
+
+    def match(self, game_event: GameEvent, bindings: Tuple[Tuple[str, Any], ...]) -> Optional[Tuple[Tuple[str, Any], ...]]:
+        """条件を満たせば (束縛を追加した) bindings を返す。満たさなければ None (event_type は確認済みとする)"""
+        if not self.conditions:
+            return bindings
+        bound = dict(bindings) if bindings else {}
+        added = False
+        for kind, field_name, operand in self.conditions:
+            value = event_field(game_event, field_name)
+            if kind == _EQ:
+                if value != operand:
+                    return None
+            elif kind == _NE:
+                if value == operand:
+                    return None
+            elif kind == _BIND:
+                # 前のステップで束縛済みなら一致、未束縛なら束縛する
+                if operand in bound:
+                    if bound[operand] != value:
+                        return None
+                elif value is None:
+                    return None
+                else:
+                    bound[operand] = _hashable(value)
+                    added = True
+            elif kind == _EQ_VAR:
+                if bound.get(operand) != value:
+                    return None
+            elif bound.get(operand) == value: # _NE_VAR
+                return None
+        return tuple(sorted(bound.items())) if added else bindings
+
+
+class CompiledRule:
+    """1 つのルール (ステップ列) と、その途中状態"""
+    def __init__(self, name: str, event_type: str, priority: Optional[int], within_sec: Optional[float],
+                 steps: List[RuleStep], cancel_types: Iterable[str] = ()):
+        self.name = name
+        self.event_type = event_type
+        self.priority = priority
+        self.within_sec = within_sec if within_sec is not None else float("inf")
+        self.steps = steps
+        self.cancel_step = RuleStep(cancel_types, []) if cancel_types else None
+        # 次に待つステップの位置ごとに、変数の値 -> (最初のイベントの時刻, 一致したイベントの列)。
+        # 最後のステップを待つ状態まで (位置 1..len(steps)-1) を持つ (位置 0 は状態を持たない)
+        self.runs: List[Dict[Tuple[Tuple[str, Any], ...], Tuple[float, Tuple[GameEvent, ...]]]] = [
+            {} for _ in steps]
+        self.matched = 0
+
+    def open_runs(self) -> int:
+        return sum(len(waiting) for waiting in self.runs)
+
+    def advance(self, game_event: GameEvent, step_indices: Tuple[int, ...], cancels: bool) -> Optional[Tuple[Dict[str, Any], Tuple[GameEvent, ...]]]:
+        """
+        step_indices はこのイベントの event_type を待つステップの位置 (降順)。
+        ルール全体が一致したら (変数の値, 一致したイベントの列) を返す。
+        待っている状態だけを調べ、期限切れの状態は調べた時に捨てる。
+        """
+        now = game_event.timestamp
+        runs = self.runs
+        if cancels:
+            for waiting in runs:
+                waiting.clear()
+        cutoff = now - self.within_sec
+        last = len(self.steps) - 1
+        steps = self.steps
+        advanced = []
+        for position in step_indices:
+            step = steps[position]
+            if position == 0:
+                bindings = step.match(game_event, ()) if step.conditions else ()
+                if bindings is not None:
+                    if last == 0:
+                        return self._complete(bindings, (game_event,))
+                    advanced.append((1, bindings, now, (game_event,)))
+                continue
+            waiting = runs[position]
+            if not waiting:
+                continue
+            expired = None
+            for bindings, (started, matched) in waiting.items():
+                if started < cutoff or started > now: # 期限切れ、または GC の時計が戻った (再起動)
+                    if expired is None:
+                        expired = []
+                    expired.append(bindings)
+                    continue
+                new_bindings = step.match(game_event, bindings) if step.conditions else bindings
+                if new_bindings is None:
+                    continue
+                if position == last:
+                    return self._complete(new_bindings, matched + (game_event,))
+                advanced.append((position + 1, new_bindings, started, matched + (game_event,)))
+            if expired:
+                for bindings in expired:
+                    del waiting[bindings]
+        # 同じ (位置, 変数の値) の状態は開始が新しい方だけ残す
+        for position, bindings, started, matched in advanced:
+            waiting = runs[position]
+            existing = waiting.get(bindings)
+            if existing is None or existing[0] <= started:
+                waiting[bindings] = (started, matched)
+        return None
+
+    def _complete(self, bindings: Tuple[Tuple[str, Any], ...], matched: Tuple[GameEvent, ...]):
+        self.matched += 1
+        values = dict(bindings)
+        # 同じ変数の値を持つ (矛盾しない) 途中状態を破棄し、同じイベントを使った一致が続かないようにする
+        for waiting in self.runs:
+            stale = [key for key in waiting if all(values.get(var) == value for var, value in key)]
+            for key in stale:
+                del waiting[key]
+        return values, matched
+
+    def make_event(self, values: Dict[str, Any], matched: Tuple[GameEvent, ...], priority: int) -> GameEvent:
+        data = dict(values)
+        data["rule"] = self.name
+        data["events"] = [{"event_type": e.event_type, "timestamp": e.timestamp} for e in matched]
+        data["duration_sec"] = round(matched[-1].timestamp - matched[0].timestamp, 3)
+        return GameEvent(timestamp=matched[-1].timestamp, event_type=self.event_type, priority=priority, data=data)
+
+
+def _compile_conditions(where: Dict[str, Any], bound_vars: set, rule_name: str) -> List[Tuple[int, str, Any]]:
+    conditions = []
+    for field_name, operand in (where or {}).items():
+        if isinstance(operand, str) and operand.startswith("!$"):
+            var = operand[2:]
+            if var not in bound_vars:
+                raise ValueError(f"rule {rule_name}: '{operand}' refers to a variable not bound by an earlier step")
+            conditions.append((_NE_VAR, field_name, var))
+        elif isinstance(operand, str) and operand.startswith("$"):
+            var = operand[1:]
+            conditions.append((_EQ_VAR if var in bound_vars else _BIND, field_name, var))
+            bound_vars.add(var)
+        elif isinstance(operand, str) and operand.startswith("!"):
+            conditions.append((_NE, field_name, operand[1:]))
+        else:
+            conditions.append((_EQ, field_name, operand))
+    # 束縛を先に評価する (同じステップ内の $var 参照より前に値が決まるように)
+    conditions.sort(key=lambda c: c[0] != _BIND)
+    return conditions
+
+
+def compile_rule(spec: Dict[str, Any]) -> CompiledRule:
+    """ルール 1 件 (YAML の辞書) をコンパイルする。書式が誤っていれば ValueError"""
+    name = spec.get("name")
+    if not name:
+        raise ValueError(f"rule without a name: {spec}")
+    raw_steps = spec.get("steps")
+    if not raw_steps or not isinstance(raw_steps, list):
+        raise ValueError(f"rule {name}: 'steps' must be a non-empty list")
+    steps = []
+    bound_vars: set = set()
+    for raw in raw_steps:
+        types = raw.get("types") if isinstance(raw, dict) else None
+        if isinstance(types, str):
+            types = [types]
+        if not types:
+            raise ValueError(f"rule {name}: each step needs 'types'")
+        count = int(raw.get("count", 1))
+        if count < 1:
+            raise ValueError(f"rule {name}: 'count' must be at least 1")
+        for _ in range(count):
+            steps.append(RuleStep(types, _compile_conditions(raw.get("where"), bound_vars, name)))
+    cancel_types = spec.get("cancel_on") or []
+    if isinstance(cancel_types, str):
+        cancel_types = [cancel_types]
+    within_sec = spec.get("within_sec")
+    return CompiledRule(name=name,
+                        event_type=spec.get("event_type", DEFAULT_EVENT_TYPE_PREFIX + name),
+                        priority=spec.get("priority"),
+                        within_sec=float(within_sec) if within_sec is not None else None,
+                        steps=steps,
+                        cancel_types=cancel_types)
+
+
+class RuleEngine:
+    """
+    コンパイル済みのルールを event_type で索引し、process() でイベント 1 件を渡すと生成された複合イベントを返す。
+    索引は event_type ごとに (ルール, 待っているステップの位置, 破棄対象か) の組を初回に求めてキャッシュする
+    (接頭辞パターンがあるため、未知の event_type も初回だけ全ルールを調べる)。
+    """
+    def __init__(self, rules: List[CompiledRule], priority_of: Optional[Callable[[str], int]] = None):
+        self.rules = rules
+        self.priority_of = priority_of or (lambda event_type: 5)
+        self._listeners: Dict[str, Tuple[Tuple[CompiledRule, Tuple[int, ...], bool], ...]] = {}
+        self.events_processed = 0
+        self.composites_emitted = 0
+
+    @classmethod
+    def from_config(cls, rules_config: Optional[Dict[str, Any]],
+                    priority_of: Optional[Callable[[str], int]] = None) -> 'RuleEngine':
+        """config_rules.yaml の内容から作る。書式が誤ったルールは警告を出して読み飛ばす"""
+        rules = []
+        for spec in (rules_config or {}).get("rules") or []:
+            try:
+                rules.append(compile_rule(spec))
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Warning: Skipping invalid composite event rule: {e}")
+        return cls(rules, priority_of)
+
+    def _resolve(self, event_type: str) -> Tuple[Tuple[CompiledRule, Tuple[int, ...], bool], ...]:
+        listeners = []
+        for rule in self.rules:
+            # 後ろのステップから進める (同じイベントで 1 つの状態が 2 ステップ進まないように、進めた状態は最後に反映する)
+            positions = tuple(i for i in reversed(range(len(rule.steps))) if rule.steps[i].accepts_type(event_type))
+            cancels = rule.cancel_step is not None and rule.cancel_step.accepts_type(event_type)
+            if positions or cancels:
+                listeners.append((rule, positions, cancels))
+        resolved = tuple(listeners)
+        self._listeners[event_type] = resolved
+        return resolved
+
+    def process(self, game_event: GameEvent) -> List[GameEvent]:
+        """イベント 1 件でルールを進め、一致したルールの複合イベントを返す (イベントは GC 時刻順に渡すこと)"""
+        self.events_processed += 1
+        listeners = self._listeners.get(game_event.event_type)
+        if listeners is None:
+            listeners = self._resolve(game_event.event_type)
+        composites = []
+        for rule, positions, cancels in listeners:
+            result = rule.advance(game_event, positions, cancels)
+            if result is not None:
+                priority = rule.priority if rule.priority is not None else self.priority_of(rule.event_type)
+                composites.append(rule.make_event(*result, priority))
+        self.composites_emitted += len(composites)
+        return composites
+
+
+if __name__ == '__main__':
+    import os
+    from common.config_loader import load_config
+
+    config_path = os.path.join(os.path.dirname(__file__), "..", "config", "config_rules.yaml")
+    engine = RuleEngine.from_config(load_config(config_path))
+    print(f"{len(engine.rules)} rules loaded: {[rule.name for rule in engine.rules]}")
+
+    def feed(t: float, event_type: str, **data) -> List[str]:
+        return [e.event_type for e in engine.process(GameEvent(timestamp=t, event_type=event_type, data=data))]
+
+    # キックオフ直後のゴール (同じチーム)
+    assert feed(0.0, "COMMAND_KICKOFF_START_YELLOW", team="YELLOW") == []
+    assert feed(8.0, "EVENT_GOAL_CONFIRMED_YELLOW", team="YELLOW") == ["COMPOSITE_GOAL_AFTER_KICKOFF"]
+    # 同じチームの 3 回目のファウル (2 分以内)。間に相手チームのファウルが入っても数えない
+    assert feed(100.0, "EVENT_BOT_PUSHING_BLUE", team="BLUE") == []
+    assert feed(130.0, "EVENT_BOT_CRASH_UNIQUE_YELLOW", team="YELLOW") == []
+    assert feed(150.0, "EVENT_KEEPER_HELD_BALL_BLUE", team="BLUE") == []
+    third = engine.process(GameEvent(timestamp=210.0, event_type="EVENT_DEFENDER_TOO_CLOSE_BLUE", data={"team": "BLUE"}))
+    print(third[0].to_json())
+    assert [e.event_type for e in third] == ["COMPOSITE_THIRD_FOUL_IN_TWO_MINUTES"]
+    assert third[0].data["team"] == "BLUE" and third[0].data["duration_sec"] == 110.0
+    # 2 分を超えたファウルは数えない
+    assert feed(400.0, "EVENT_BOT_PUSHING_YELLOW", team="YELLOW") == []
+    assert feed(450.0, "EVENT_BOT_PUSHING_YELLOW", team="YELLOW") == []
+    assert feed(530.0, "EVENT_BOT_PUSHING_YELLOW", team="YELLOW") == []
+    # プレースメント失敗の後に相手チームのフリーキック
+    assert feed(600.0, "EVENT_PLACEMENT_FAILED_BLUE", team="BLUE") == []
+    assert feed(603.0, "COMMAND_DIRECT_FREE_BLUE", team="BLUE") == []
+    assert feed(604.0, "COMMAND_DIRECT_FREE_YELLOW", team="YELLOW") == ["COMPOSITE_PLACEMENT_FAILED_THEN_FREE_KICK"]
+    print("composite event rules OK")
@@ -0,0 +1,75 @@
+# orchestrator/failover.py
+# hot-standby 構成でオーケストレーターが peer (standby なら primary、primary なら昇格した standby) を監視するためのスレッド。
+import threading
+import time
+from typing import Optional
+
+import zmq
+
+from .state_checkpoint import OrchestratorCheckpoint
+
+
+class StandbyMonitor(threading.Thread):
+    """
+    peer の 'checkpoint' トピックを購読して publish していない間の状態を同期し、
+    takeover_timeout_sec の間 checkpoint が届かなければ昇格させる。
+    昇格後も購読を続け、peer も publish していれば (再起動した primary など) Orchestrator がどちらか一方を降格させる。
+    """
+    def __init__(self,
+                 orchestrator,
+                 primary_uri: str = "tcp://localhost:5555",
+                 takeover_timeout_sec: float = 1.0):
+        super().__init__(daemon=True, name="StandbyMonitor")
+        self.orchestrator = orchestrator
+        self.primary_uri = primary_uri
+        self.takeover_timeout_sec = takeover_timeout_sec
+        self.context = zmq.Context()
+        self.last_checkpoint_at: Optional[float] = None # 最後に checkpoint を受信した時刻 (monotonic)
+        self.checkpoints_received = 0
+        self._stop_event = threading.Event()
+        print(f"StandbyMonitor initialized, watching {self.primary_uri} (takeover after {self.takeover_timeout_sec}s of silence)")
+
+    def stop(self):
+        self._stop_event.set()
+        print("StandbyMonitor stop requested.")
+
+    def run(self):
+        subscriber = self.context.socket(zmq.SUB)
+        subscriber.setsockopt(zmq.SUBSCRIBE, b"checkpoint")
+        subscriber.setsockopt(zmq.LINGER, 0)
+        # タイムアウト判定の粒度 (takeover_timeout_sec の 1/10、最大 100ms)
+        subscriber.setsockopt(zmq.RCVTIMEO, max(1, int(min(self.takeover_timeout_sec / 10, 0.1) * 1000)))
+        subscriber.connect(self.primary_uri)
+
+        # 起動直後は peer への接続待ちとして takeover_timeout_sec の猶予を与える
+        last_seen = time.monotonic()
+        promoting = False # 昇格を要求済み (peer の checkpoint が届くまで繰り返さない)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    _topic, payload = subscriber.recv_multipart()
+                except zmq.Again:
+                    silence = time.monotonic() - last_seen
+                    if silence >= self.takeover_timeout_sec and not promoting and not self.orchestrator.active:
+                        print(f"StandbyMonitor: No checkpoint from {self.primary_uri} for {silence:.3f}s, promoting.")
+                        self.orchestrator.promote()
+                        promoting = True
+                    continue
+
+                try:
+                    checkpoint = OrchestratorCheckpoint.from_bytes(payload)
+                except ValueError as e:
+                    print(f"StandbyMonitor: Error decoding checkpoint: {e}")
+                    continue
+
+                last_seen = time.monotonic()
+                promoting = False
+                self.last_checkpoint_at = last_seen
+                self.checkpoints_received += 1
+                self.orchestrator.apply_primary_checkpoint(checkpoint)
+        except zmq.ZMQError as e:
+            print(f"StandbyMonitor: ZeroMQ Error: {e}")
+        finally:
+            subscriber.close()
+            self.context.term()
+            print("StandbyMonitor stopped.")
@@ -0,0 +1,254 @@
+# orchestrator/match_stats.py
+# publish された GameEvent から試合統計 (チームごとのファウル数・カード数・ボールプレースメント成功率・
+# 状態ごとの経過時間) を逐次集計するモジュール。
+# イベント 1 件ごとの更新はカウンタの加算のみ (O(1)) で、履歴を保持しない。
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: common/data_models.py not found.")
+    exit(1)
+
+TEAMS = ("YELLOW", "BLUE")
+
+# ファウル数に数える event_type の接頭辞 (protobuf_event_handlers が生成する名前)
+DEFAULT_FOUL_EVENT_PREFIXES: Tuple[str, ...] = (
+    "EVENT_BOT_PUSHING_",
+    "EVENT_BOT_CRASH_UNIQUE_",
+    "EVENT_BOT_CRASH_DRAWN",    # チーム情報なし: 両チームのファウルとして数える
+    "EVENT_BALL_SPEED_TOO_FAST_",
+    "EVENT_DEFENDER_TOO_CLOSE_",
+    "EVENT_EXCESSIVE_DRIBBLING_",
+    "EVENT_KEEPER_HELD_BALL_",
+)
+
+# COMMAND_* イベント (Orchestrator._detect_status_changes) から InternalGameState 名への対応。
+# Orchestrator._update_internal_game_state と同じ遷移をイベント列だけから再現する。
+COMMAND_STATES: Dict[str, str] = {
+    "COMMAND_HALT": "HALTED",
+    "COMMAND_STOP": "STOPPED",
+    "COMMAND_NORMAL_START": "RUNNING",
+    "COMMAND_FORCE_START": "RUNNING",
+    "COMMAND_KICKOFF_START_YELLOW": "RUNNING",
+    "COMMAND_KICKOFF_START_BLUE": "RUNNING",
+    "COMMAND_PENALTY_KICK_START_YELLOW": "RUNNING",
+    "COMMAND_PENALTY_KICK_START_BLUE": "RUNNING",
+    "COMMAND_PREPARE_KICKOFF_YELLOW": "PREPARE_KICKOFF_YELLOW",
+    "COMMAND_PREPARE_KICKOFF_BLUE": "PREPARE_KICKOFF_BLUE",
+    "COMMAND_PREPARE_PENALTY_YELLOW": "PREPARE_PENALTY_YELLOW",
+    "COMMAND_PREPARE_PENALTY_BLUE": "PREPARE_PENALTY_BLUE",
+    "COMMAND_DIRECT_FREE_YELLOW": "DIRECT_FREE_YELLOW",
+    "COMMAND_DIRECT_FREE_BLUE": "DIRECT_FREE_BLUE",
+    "COMMAND_TIMEOUT_YELLOW": "TIMEOUT",
+    "COMMAND_TIMEOUT_BLUE": "TIMEOUT",
+    "COMMAND_BALL_PLACEMENT_YELLOW": "BALL_PLACEMENT_YELLOW",
+    "COMMAND_BALL_PLACEMENT_BLUE": "BALL_PLACEMENT_BLUE",
+}
+
+# event_type の分類 (_classify の結果をキャッシュする)
+_OTHER, _FOUL, _YELLOW_CARD, _RED_CARD, _PLACEMENT_SUCCEEDED, _PLACEMENT_FAILED, _STATE = range(7)
+
+
+def _team_from_suffix(event_type: str) -> Optional[str]:
+    if event_type.endswith("_YELLOW"):
+        return "YELLOW"
+    if event_type.endswith("_BLUE"):
+        return "BLUE"
+    return None
+
+
+class MatchStats:
+    """
+    GameEvent を 1 件ずつ observe() して試合統計を更新する。
+    version は統計が変化するたびに増加するので、publish 側は変化があった場合だけ送ればよい。
+    """
+    def __init__(self, foul_event_prefixes: Iterable[str] = DEFAULT_FOUL_EVENT_PREFIXES):
+        self.foul_event_prefixes = tuple(foul_event_prefixes)
+        self.fouls = dict.fromkeys(TEAMS, 0)
+        self.yellow_cards = dict.fromkeys(TEAMS, 0)
+        self.red_cards = dict.fromkeys(TEAMS, 0)
+        self.placements_succeeded = dict.fromkeys(TEAMS, 0)
+        self.placements_failed = dict.fromkeys(TEAMS, 0)
+        # 平均値は合計と件数で持つ (time_taken / precision は任意フィールドのため件数を別に数える)
+        self.time_taken_sum = dict.fromkeys(TEAMS, 0.0)
+        self.time_taken_count = dict.fromkeys(TEAMS, 0)
+        self.precision_sum = dict.fromkeys(TEAMS, 0.0)
+        self.precision_count = dict.fromkeys(TEAMS, 0)
+        self.state_durations: Dict[str, float] = {} # 終了済みの区間の合計 (秒)
+        self.current_state: Optional[str] = None
+        self.state_since: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.events_observed = 0
+        self.version = 0
+        self._kinds: Dict[str, int] = {}
+
+    def _classify(self, event_type: str) -> int:
+        if event_type in COMMAND_STATES:
+            return _STATE
+        if event_type.startswith(self.foul_event_prefixes):
+            return _FOUL
+        # カードは referee_diff が TeamInfo の yellow_cards / red_cards の増加から出すイベントで数える
+        if event_type.startswith("TEAM_CARD_YELLOW_ISSUED_"):
+            return _YELLOW_CARD
+        if event_type.startswith("TEAM_CARD_RED_ISSUED_"):
+            return _RED_CARD
+        if event_type.startswith("EVENT_PLACEMENT_SUCCEEDED_"):
+            return _PLACEMENT_SUCCEEDED
+        if event_type.startswith("EVENT_PLACEMENT_FAILED_"):
+            return _PLACEMENT_FAILED
+        return _OTHER
+
+    def observe(self, game_event: GameEvent):
+        """GameEvent 1 件分の統計を更新する"""
+        event_type = game_event.event_type
+        kind = self._kinds.get(event_type)
+        if kind is None:
+            kind = self._kinds[event_type] = self._classify(event_type)
+        self.events_observed += 1
+        timestamp = game_event.timestamp
+        if self.last_timestamp is None or timestamp > self.last_timestamp:
+            self.last_timestamp = timestamp
+        if kind == _OTHER:
+            return
+
+        if kind == _STATE:
+            state = COMMAND_STATES[event_type]
+            if self.current_state is not None:
+                elapsed = max(0.0, timestamp - self.state_since)
+                self.state_durations[self.current_state] = self.state_durations.get(self.current_state, 0.0) + elapsed
+            self.current_state = state
+            self.state_since = timestamp
+            self.version += 1
+            return
+
+        data = game_event.data
+        team = data.get("team") or _team_from_suffix(event_type)
+        if kind == _FOUL:
+            if team in self.fouls:
+                self.fouls[team] += 1
+            else:
+                # 両チームが関与するファウル (BOT_CRASH_DRAWN)
+                for t in TEAMS:
+                    self.fouls[t] += 1
+        elif team not in self.fouls:
+            return
+        elif kind == _YELLOW_CARD:
+            self.yellow_cards[team] += 1
+        elif kind == _RED_CARD:
+            self.red_cards[team] += 1
+        elif kind == _PLACEMENT_SUCCEEDED:
+            self.placements_succeeded[team] += 1
+            if data.get("time_taken") is not None:
+                self.time_taken_sum[team] += data["time_taken"]
+                self.time_taken_count[team] += 1
+            if data.get("precision") is not None:
+                self.precision_sum[team] += data["precision"]
+                self.precision_count[team] += 1
+        elif kind == _PLACEMENT_FAILED:
+            self.placements_failed[team] += 1
+        self.version += 1
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        現在の統計を辞書で返す。now を渡すと、現在の状態の経過時間を now までとして加算する
+        (省略時は最後に観測したイベントの時刻まで)。
+        """
+        time_in_state = dict(self.state_durations)
+        if self.current_state is not None:
+            until = self.last_timestamp if now is None else now
+            time_in_state[self.current_state] = time_in_state.get(self.current_state, 0.0) + max(0.0, until - self.state_since)
+
+        placement = {}
+        for team in TEAMS:
+            succeeded, failed = self.placements_succeeded[team], self.placements_failed[team]
+            placement[team] = {
+                "succeeded": succeeded,
+                "failed": failed,
+                "success_ratio": round(succeeded / (succeeded + failed), 4) if succeeded + failed else None,
+                "mean_time_taken": (round(self.time_taken_sum[team] / self.time_taken_count[team], 3)
+                                    if self.time_taken_count[team] else None),
+                "mean_precision": (round(self.precision_sum[team] / self.precision_count[team], 4)
+                                   if self.precision_count[team] else None),
+            }
+        return {
+            "events": self.events_observed,
+            "fouls": dict(self.fouls),
+            "yellow_cards": dict(self.yellow_cards),
+            "red_cards": dict(self.red_cards),
+            "placement": placement,
+            "state": self.current_state,
+            "time_in_state_sec": {state: round(sec, 1) for state, sec in time_in_state.items()},
+        }
+
+    def to_json(self, now: Optional[float] = None) -> str:
+        return json.dumps(self.snapshot(now), separators=(",", ":"))
+
+    # --- バッチ再構築 ---
+    @classmethod
+    def rebuild(cls, events: Iterable[GameEvent], **kwargs) -> 'MatchStats':
+        """記録済みのイベント列から統計を作り直す"""
+        stats = cls(**kwargs)
+        observe = stats.observe
+        for game_event in events:
+            observe(game_event)
+        return stats
+
+    @classmethod
+    def from_log(cls, path: str, **kwargs) -> 'MatchStats':
+        """1 行 1 イベントの JSON ログ (event_store のセグメントファイルなど) から統計を作り直す"""
+        def events():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            yield GameEvent.from_json(line)
+                        except ValueError:
+                            continue
+        return cls.rebuild(events(), **kwargs)
+
+
+class StatsPublisher:
+    """
+    MatchStats の publish 間隔を制御する。interval_sec 以上経過し、かつ統計が変化していれば payload を返す。
+    clock は現在の状態の経過時間を数えるための現在時刻で、イベントの timestamp と同じ時計を返すもの。
+    """
+    def __init__(self, stats: MatchStats, interval_sec: float = 1.0, clock: Callable[[], float] = time.time):
+        self.stats = stats
+        self.interval_sec = interval_sec
+        self.clock = clock
+        self._published_version = -1
+        self._last_published = 0.0
+
+    def poll(self, now: Optional[float] = None) -> Optional[bytes]:
+        now = time.monotonic() if now is None else now
+        if self.stats.version == self._published_version or now - self._last_published < self.interval_sec:
+            return None
+        self._published_version = self.stats.version
+        self._last_published = now
+        return self.stats.to_json(now=self.clock()).encode("utf-8")
+
+
+if __name__ == '__main__':
+    stats = MatchStats()
+    for i, (event_type, data) in enumerate([
+            ("COMMAND_STOP", {}),
+            ("EVENT_BOT_PUSHING_YELLOW", {"team": "YELLOW"}),
+            ("COMMAND_BALL_PLACEMENT_BLUE", {"team": "BLUE"}),
+            ("EVENT_PLACEMENT_SUCCEEDED_BLUE", {"team": "BLUE", "time_taken": 6.0, "precision": 0.05}),
+            ("EVENT_BOT_CRASH_DRAWN", {}),
+            ("TEAM_CARD_YELLOW_ISSUED_YELLOW", {"field": "yellow_cards", "value": 1, "previous": 0, "team": "YELLOW"}),
+            ("TEAM_CARD_YELLOW_EXPIRED_YELLOW", {"field": "yellow_card_times", "value": 0, "previous": 1, "team": "YELLOW"}),
+            ("TEAM_CARD_RED_ISSUED_BLUE", {"field": "red_cards", "value": 1, "previous": 0, "team": "BLUE"}),
+            ("COMMAND_DIRECT_FREE_BLUE", {"team": "BLUE"}),
+            ("EVENT_PLACEMENT_FAILED_YELLOW", {"team": "YELLOW", "remaining_distance": 0.4}),
+            ("COMMAND_NORMAL_START", {})]):
+        stats.observe(GameEvent(timestamp=100.0 + i * 10, event_type=event_type, data=data))
+    snapshot = stats.snapshot(now=220.0)
+    print(json.dumps(snapshot, indent=2))
+    assert snapshot["fouls"] == {"YELLOW": 2, "BLUE": 1}
+    assert snapshot["yellow_cards"] == {"YELLOW": 1, "BLUE": 0} and snapshot["red_cards"] == {"YELLOW": 0, "BLUE": 1}
+    assert snapshot["placement"]["BLUE"]["success_ratio"] == 1.0
+    assert snapshot["time_in_state_sec"] == {"STOPPED": 20.0, "BALL_PLACEMENT_BLUE": 60.0, "DIRECT_FREE_BLUE": 20.0, "RUNNING": 20.0}
@@ -5,16 +5,27 @@ import time
 import zmq
 import json
 import traceback
-from typing import List, Optional, Set, Dict, Any, Callable
+from collections import deque
+from typing import List, Optional, Set, Dict, Any, Callable, Deque, Tuple
 from enum import Enum, auto
 
 from . import protobuf_event_handlers
+from .state_checkpoint import (EventIdWindow, OrchestratorCheckpoint, CheckpointFileWriter,
+                               read_checkpoint_file)
+from .match_stats import MatchStats, StatsPublisher
+from .placement_tracker import PlacementTracker, PlacementPublisher
+from .event_reorder import EventReorderBuffer
+from .event_rules import RuleEngine
+from .referee_monitor import RefereeMonitor, COUNTER_RESET
+from .timer_anchors import TimerAnchorTracker
+from .referee_diff import RefereeDiff
 
 # --- データモデルとProtobuf Enumをインポート ---
 # (パスは実際の環境に合わせてください)
 try:
     # data_models.py は common ディレクトリにあると仮定
     from common.data_models import GameEvent, Team, Location # Locationも使う可能性があるのでインポート
+    from common import metrics
 except ImportError:
     print("Error: common/data_models.py not found.")
     exit(1)
@@ -46,32 +57,193 @@ class InternalGameState(Enum):
     BALL_PLACEMENT_YELLOW = auto()
     BALL_PLACEMENT_BLUE = auto()
 
+# Referee のコマンド (数値) -> 内部状態。パケットごとに enum の属性を引く
+# (EnumTypeWrapper.__getattr__ は 1 回 1 us 程度かかる) のを避けるため、起動時に 1 度だけ作る
+COMMAND_STATES: Dict[int, InternalGameState] = {
+    referee_pb2.Referee.Command.Value(command): state for command, state in (
+        ("HALT", InternalGameState.HALTED),
+        ("STOP", InternalGameState.STOPPED),
+        ("PREPARE_KICKOFF_YELLOW", InternalGameState.PREPARE_KICKOFF_YELLOW),
+        ("PREPARE_KICKOFF_BLUE", InternalGameState.PREPARE_KICKOFF_BLUE),
+        ("PREPARE_PENALTY_YELLOW", InternalGameState.PREPARE_PENALTY_YELLOW),
+        ("PREPARE_PENALTY_BLUE", InternalGameState.PREPARE_PENALTY_BLUE),
+        ("DIRECT_FREE_YELLOW", InternalGameState.DIRECT_FREE_YELLOW),
+        ("DIRECT_FREE_BLUE", InternalGameState.DIRECT_FREE_BLUE),
+        ("TIMEOUT_YELLOW", InternalGameState.TIMEOUT),
+        ("TIMEOUT_BLUE", InternalGameState.TIMEOUT),
+        ("BALL_PLACEMENT_YELLOW", InternalGameState.BALL_PLACEMENT_YELLOW),
+        ("BALL_PLACEMENT_BLUE", InternalGameState.BALL_PLACEMENT_BLUE),
+        ("FORCE_START", InternalGameState.RUNNING),
+        ("NORMAL_START", InternalGameState.RUNNING),
+    )
+}
+
 class Orchestrator(threading.Thread):
     def __init__(self,
                  input_queue: queue.Queue,
                  orchestrator_config: Dict[str, Any],
-                 priority_config: Dict[str, Any]):
-        super().__init__(daemon=True)
+                 priority_config: Dict[str, Any],
+                 rules_config: Optional[Dict[str, Any]] = None,
+                 context: Optional[zmq.Context] = None,
+                 publisher: Optional[zmq.Socket] = None):
+        super().__init__(daemon=True, name="Orchestrator")
         self.input_queue = input_queue
-        self.context = zmq.Context()
-        self.publisher = self.context.socket(zmq.PUB)
+        # 1 プロセス構成 (main.py) では ZMQ コンテキストを共有し、同じプロセスの購読者は inproc で接続する
+        self._owns_context = context is None
+        self.context = context if context is not None else zmq.Context()
+        # 起動を速くするため、呼び出し側 (__main__) で先に bind 済みの PUB ソケットを渡すこともできる
+        self.publisher = publisher if publisher is not None else self.context.socket(zmq.PUB)
 
         # --- 状態保持用属性 ---
         self.internal_game_state: InternalGameState = InternalGameState.UNKNOWN # 内部状態属性
         self.previous_ref_msg: Optional[referee_pb2.Referee] = None
 
-        self.previous_ref_msg: Optional[referee_pb2.Referee] = None
-        self.processed_game_event_ids: Set[int] = set() # 処理済みProtobuf GameEventタイムスタンプ
-
         self.orchestrator_config = orchestrator_config
         self.priority_config = priority_config
 
+        # 処理済みProtobuf GameEventタイムスタンプ (直近 dedup_window_size 件のみ保持)
+        self.processed_game_event_ids: EventIdWindow = EventIdWindow(
+            self.orchestrator_config.get("dedup_window_size", 512))
+
         # --- 設定値を使用 ---
         self.zmq_publisher_uri = self.orchestrator_config.get("zmq_publisher_uri", "tcp://*:5555") # .getでデフォルト値指定も可能
+        # 同じプロセス内の購読者向けに追加で bind する inproc エンドポイント (共有コンテキストが必要)
+        self.zmq_inproc_uri: Optional[str] = self.orchestrator_config.get("zmq_inproc_uri") or None
         self.state_update_interval_sec = self.orchestrator_config.get("state_update_interval_sec", 1.0)
         self.event_priorities = self.priority_config.get("event_priorities", {})
         self.DEFAULT_PRIORITY = self.priority_config.get("DEFAULT_PRIORITY", 5) # デフォルト優先度
 
+        # --- フェイルオーバー (hot-standby) 設定 ---
+        failover_config = self.orchestrator_config.get("failover") or {}
+        self.role: str = failover_config.get("role", "primary") # "primary" or "standby"
+        self.checkpoint_interval_sec: float = failover_config.get("checkpoint_interval_sec", 0.5)
+        # 昇格した standby の publish 先 (primary 用、環境変数 ORCHESTRATOR_PEER_URI で上書き可能)。
+        # 設定されていれば primary も起動時は publish せず、peer が publish していなければ takeover_timeout_sec 後に
+        # 昇格する (再起動した primary が、昇格済みの standby と重複して publish しないためのフェンシング)
+        self.peer_uri: Optional[str] = failover_config.get("peer_uri") or None
+        # standby (と peer_uri のある primary) は昇格するまで publish しない
+        self.active: bool = self.role != "standby" and self.peer_uri is None
+        # standby が primary と別の endpoint で publish する構成では起動時に bind しておく
+        # (購読側は両方に connect しておけば、昇格直後のイベントを取りこぼさない)
+        self.standby_bind_early: bool = failover_config.get("standby_bind_early", False)
+        # 昇格時に bind した場合、購読側の再接続を待ってから保留イベントを送る
+        self.takeover_flush_delay_sec: float = failover_config.get("takeover_flush_delay_sec", 0.2)
+        self._bound: bool = publisher is not None
+        self.promoted_at: Optional[float] = None
+        self.checkpoint_seq: int = 0
+        self._last_checkpoint_sent: float = 0.0
+        self._last_primary_packet_timestamp: int = 0
+        # standby 中に検出したイベント (packet_timestamp, GameEvent)。primary の checkpoint で破棄される
+        self._pending_events: Deque[Tuple[int, GameEvent]] = deque(
+            maxlen=failover_config.get("pending_events_max", 1024))
+        self._promote_event = threading.Event()
+        self._demote_event = threading.Event() # peer の方が新しい checkpoint を publish している (run スレッドで降格する)
+        self.demotions = 0
+        self._checkpoint_summary: Optional[referee_pb2.Referee] = None # restore_checkpoint で組み立てた Referee
+        self._state_lock = threading.Lock() # 内部状態は run スレッドと StandbyMonitor から触る
+        self._queue_timeout_sec = min(1.0, self.checkpoint_interval_sec)
+        if not self.active:
+            # standby は昇格要求を素早く拾うためにキュー待ちを短くする
+            self._queue_timeout_sec = min(self._queue_timeout_sec, 0.05)
+
+        # --- 再起動用 checkpoint ファイル ---
+        # 状態が変化するたびに _state_version を進め、CheckpointFileWriter が変化時のみ書き込む
+        self.checkpoint_file: Optional[str] = self.orchestrator_config.get("checkpoint_file") or None
+        self.checkpoint_file_interval_sec: float = self.orchestrator_config.get("checkpoint_file_interval_sec", 1.0)
+        self._state_version: int = 0
+        self._checkpoint_writer: Optional[CheckpointFileWriter] = None
+        self.restored_from_checkpoint: bool = False
+        if self.checkpoint_file:
+            self._restore_from_checkpoint_file(self.orchestrator_config.get("checkpoint_max_age_sec", 600.0))
+        self.ready = threading.Event() # 受信処理を開始できる状態 (primary は bind 済み) になったら set
+
+        # --- 試合統計 ('stats' トピック) ---
+        # publish したイベントから逐次集計し、stats_publish_interval_sec ごとに変化があれば送信する (0 で無効)
+        self.match_stats = MatchStats()
+        # --- イベントの並べ替え (GC の時刻順に publish する) ---
+        # watermark (最新の packet_timestamp - tolerance) を過ぎたイベントから時刻順に送る。
+        # 保持時間は max_hold_sec (ホスト時刻) が上限 (tolerance 0 で並べ替えない)
+        self.event_reorder = EventReorderBuffer(
+            tolerance_sec=self.orchestrator_config.get("event_reorder_tolerance_sec", 0.1),
+            max_hold_sec=self.orchestrator_config.get("event_reorder_max_hold_sec", 0.5))
+        self.event_reorder_report_interval_sec: float = self.orchestrator_config.get("event_reorder_report_interval_sec", 60.0)
+        self._last_reorder_report = time.monotonic()
+        # 保持中のイベントを検出したパケットの最も古い packet_timestamp (checkpoint 用, run スレッドが更新する)
+        self._held_packet_timestamp: Optional[int] = None
+
+        stats_publish_interval_sec = self.orchestrator_config.get("stats_publish_interval_sec", 1.0)
+        # イベント時刻は GC の時計なので、現在の状態の経過時間も GC の時計で数える
+        self._stats_publisher: Optional[StatsPublisher] = (
+            StatsPublisher(self.match_stats, stats_publish_interval_sec, clock=self.event_reorder.gc_now)
+            if stats_publish_interval_sec > 0 else None)
+
+        # --- 複合イベント (config_rules.yaml) ---
+        # publish するイベント (GC の時刻順) でルールを進め、一致したら複合イベントを続けて publish する
+        self.rule_engine = RuleEngine.from_config(rules_config, priority_of=self._get_priority)
+        if self.rule_engine.rules:
+            print(f"Orchestrator: {len(self.rule_engine.rules)} composite event rules loaded")
+
+        # --- ボールプレースメントの追跡 ('placement' トピック) ---
+        # 指示と結果を対応付け、残り時間の変化を placement_publish_interval_sec ごとに送信する (0 で無効)
+        placement_publish_interval_sec = self.orchestrator_config.get("placement_publish_interval_sec", 0.1)
+        self.placement_tracker: Optional[PlacementTracker] = None
+        self._placement_publisher: Optional[PlacementPublisher] = None
+        if placement_publish_interval_sec > 0:
+            self.placement_tracker = PlacementTracker(
+                self.orchestrator_config.get("placement_result_grace_sec", 2.0))
+            self._placement_publisher = PlacementPublisher(self.placement_tracker, placement_publish_interval_sec)
+
+        # --- 残り時間のアンカー ('timers' トピック) ---
+        # stage_time_left などをパケットごとには送らず、開始・停止・飛び・ずれの時だけアンカーを送る (購読側で外挿する)
+        self.timer_anchors: Optional[TimerAnchorTracker] = None
+        if self.orchestrator_config.get("timer_anchors_enabled", True):
+            self.timer_anchors = TimerAnchorTracker(
+                tolerance_sec=self.orchestrator_config.get("timer_anchor_tolerance_sec", 0.1),
+                refresh_sec=self.orchestrator_config.get("timer_anchor_refresh_sec", 5.0))
+
+        # --- Referee / TeamInfo のフィールドの変化 (TEAM_CARD_YELLOW_ISSUED_BLUE, TEAM_GOALKEEPER_CHANGED_YELLOW など) ---
+        # 監視するフィールドは protobuf の記述子から 1 度だけ組み立て、TeamInfo はバイト列が変わった時だけ比べる
+        self.referee_diff: Optional[RefereeDiff] = None
+        if self.orchestrator_config.get("team_info_events_enabled", True):
+            self.referee_diff = RefereeDiff(priority_of=self._get_priority)
+
+        # --- Referee パケットの監視 ('ops' トピック) ---
+        # command_counter の飛び・GC の再起動・到着間隔の揺らぎ・途絶を数え、ops_publish_interval_sec ごとに送信する。
+        # 飛び / 再起動 / 途絶の開始時は間隔を待たずに送る (0 で無効)
+        self.referee_monitor = RefereeMonitor(self.orchestrator_config.get("referee_stale_after_sec", 1.0))
+        self.ops_publish_interval_sec: float = self.orchestrator_config.get("ops_publish_interval_sec", 5.0)
+        # 'ops' に載せる他のコンポーネントの統計 (名前 -> dict を返す関数。例: EventListener.stats)
+        self.ops_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._last_ops_publish = 0.0
+        self._ops_due = False
+
+        # --- Prometheus 形式の計測値 (common/metrics.py。/metrics の公開はプロセスの起動側で行う) ---
+        # 既に数えている値は scrape 時に読み、run スレッドで加算するのはイベント数・エラー数・処理時間だけ
+        registry = metrics.REGISTRY
+        self._metric_events = registry.counter(
+            "ssl_orchestrator_events_published_total", "GameEvents published on the 'event' topic", ("event_type",))
+        self._metric_publish_errors = registry.counter(
+            "ssl_orchestrator_publish_errors_total", "Errors while publishing on a ZeroMQ topic", ("topic",))
+        self._metric_callback_errors = registry.counter(
+            "ssl_orchestrator_callback_errors_total", "Exceptions raised by in-process event callbacks")
+        self._metric_packet_seconds = registry.histogram(
+            "ssl_orchestrator_packet_seconds", "Time to detect events and update state for one referee packet")
+        registry.gauge("ssl_orchestrator_input_queue_depth", "Referee packets waiting in the input queue").set_function(
+            input_queue.qsize)
+        registry.gauge("ssl_orchestrator_reorder_held_events", "Events held by the reorder buffer").set_function(
+            self.event_reorder.__len__)
+        registry.gauge("ssl_orchestrator_active", "1 while publishing (primary), 0 while standby").set_function(
+            lambda: int(self.active))
+        monitor = self.referee_monitor
+        registry.counter("ssl_referee_packets_total", "Referee packets processed").set_function(lambda: monitor.packets)
+        registry.counter("ssl_referee_missed_commands_total", "Referee commands missed (command_counter gaps)").set_function(
+            lambda: monitor.missed_commands)
+        registry.counter("ssl_referee_counter_resets_total", "command_counter decreases (game controller restarts)").set_function(
+            lambda: monitor.counter_resets)
+        registry.counter("ssl_referee_stale_periods_total", "Periods without referee packets").set_function(
+            lambda: monitor.stale_periods)
+        registry.gauge("ssl_referee_stale", "1 while no referee packet arrived for referee_stale_after_sec").set_function(
+            lambda: int(monitor.stale))
 
         # --- イベントタイプとハンドラーのマッピング辞書 (インポートした関数を参照) ---
         self.protobuf_event_handlers: Dict[int, Callable] = {
@@ -96,6 +268,17 @@ class Orchestrator(threading.Thread):
         }
         print(f"Orchestrator initialized with {len(self.protobuf_event_handlers)} Protobuf event handlers.")
         
+        # --- プロファイル (orchestrator/profiler.py の ProfilerControl から要求される) ---
+        # セッションの開始・終了は run スレッドで行う (cProfile は有効にしたスレッドだけを計測する)。
+        # 要求が無い間のコストは run ループでの _profile_pending の確認だけ
+        self.profile_session = None # ProfileSession: 要求されてからレポートを書き終えるまで
+        self.last_profile_report: Optional[str] = None
+        self._profile_pending = False
+        self._unprofiled_handlers: Optional[Dict[int, Callable]] = None
+
+        # --- 同じプロセス内の購読者 (GameEvent をシリアライズせずに直接渡す) ---
+        self._event_callbacks: List[Callable[[GameEvent], None]] = []
+
         # --- スレッド制御 ---
         self._stop_event = threading.Event()
         print(f"Orchestrator initialized, publishing to {self.zmq_publisher_uri}")
@@ -138,46 +321,13 @@ class Orchestrator(threading.Thread):
         return priority
     
     def _update_internal_game_state(self, current_ref_msg: referee_pb2.Referee):
-        cmd = current_ref_msg.command
-        new_state = self.internal_game_state # デフォルトは維持
-
-        if cmd == referee_pb2.Referee.Command.HALT:
-            new_state = InternalGameState.HALTED
-        elif cmd == referee_pb2.Referee.Command.STOP:
-            new_state = InternalGameState.STOPPED
-        elif cmd == referee_pb2.Referee.Command.PREPARE_KICKOFF_YELLOW:
-            new_state = InternalGameState.PREPARE_KICKOFF_YELLOW
-        elif cmd == referee_pb2.Referee.Command.PREPARE_KICKOFF_BLUE:
-            new_state = InternalGameState.PREPARE_KICKOFF_BLUE
-        elif cmd == referee_pb2.Referee.Command.PREPARE_PENALTY_YELLOW:
-            new_state = InternalGameState.PREPARE_PENALTY_YELLOW
-        elif cmd == referee_pb2.Referee.Command.PREPARE_PENALTY_BLUE:
-            new_state = InternalGameState.PREPARE_PENALTY_BLUE
-        elif cmd == referee_pb2.Referee.Command.DIRECT_FREE_YELLOW:
-            new_state = InternalGameState.DIRECT_FREE_YELLOW
-        elif cmd == referee_pb2.Referee.Command.DIRECT_FREE_BLUE:
-            new_state = InternalGameState.DIRECT_FREE_BLUE
-        elif cmd == referee_pb2.Referee.Command.TIMEOUT_YELLOW:
-            new_state = InternalGameState.TIMEOUT_YELLOW
-        elif cmd == referee_pb2.Referee.Command.TIMEOUT_BLUE:
-            new_state = InternalGameState.TIMEOUT_BLUE
-        elif cmd == referee_pb2.Referee.Command.BALL_PLACEMENT_YELLOW:
-            new_state = InternalGameState.BALL_PLACEMENT_YELLOW
-        elif cmd == referee_pb2.Referee.Command.BALL_PLACEMENT_BLUE:
-            new_state = InternalGameState.BALL_PLACEMENT_BLUE
-        elif cmd == referee_pb2.Referee.Command.FORCE_START:
-            new_state = InternalGameState.RUNNING
-        elif cmd == referee_pb2.Referee.Command.NORMAL_START:
-            # NORMAL_START 自体は RUNNING 状態への移行を示すことが多い
-            # (ただし、具体的なイベント生成は _detect_status_changes で行う)
-            new_state = InternalGameState.RUNNING
+        # 表に無いコマンド (INDIRECT_FREE, GOAL など) では状態を維持する
+        # (NORMAL_START 自体は RUNNING 状態への移行を示す。具体的なイベント生成は _detect_status_changes で行う)
+        new_state = COMMAND_STATES.get(current_ref_msg.command, self.internal_game_state)
 
         if new_state != self.internal_game_state:
             print(f"Internal Game State changed to: {new_state.name}")
             self.internal_game_state = new_state
-        # else:
-            # print(f"Internal Game State remains: {self.internal_game_state.name}")
-            # pass
 
     def _map_protobuf_event_to_game_event(self, proto_event: game_event_pb2.GameEvent, current_ref: referee_pb2.Referee) -> Optional[GameEvent]:
         """ Protobuf GameEvent をシステムの GameEvent にマッピングする (辞書と外部ハンドラーを使用) """
@@ -206,8 +356,38 @@ class Orchestrator(threading.Thread):
             print(f"Orchestrator: No handler defined for event type {event_enum}")
             return None
     
-    def _detect_status_changes(self, prev_ref_msg: Optional[referee_pb2.Referee], current_ref_msg: referee_pb2.Referee) -> List[GameEvent]:
-        """Refereeメッセージの主要なステータス変化を検出し、GameEventリストを返す"""
+    def _resync_internal_game_state(self, prev_ref_msg: referee_pb2.Referee, current_ref_msg: referee_pb2.Referee):
+        """
+        コマンドを見逃した (command_counter の飛び / GC の再起動) 後、内部状態を履歴ではなく受信したパケットから推定し直す。
+        NORMAL_START の直前のコマンドは、前のパケットの next_command か、得点の変化 (失点したチームのキックオフ) から推定する。
+        推定できなければ UNKNOWN (NORMAL_START はチーム無しの COMMAND_NORMAL_START になる)
+        """
+        new_state = InternalGameState.UNKNOWN
+        if current_ref_msg.command == referee_pb2.Referee.Command.NORMAL_START:
+            next_command = prev_ref_msg.next_command if prev_ref_msg.HasField("next_command") else None
+            if next_command == referee_pb2.Referee.Command.PREPARE_KICKOFF_YELLOW:
+                new_state = InternalGameState.PREPARE_KICKOFF_YELLOW
+            elif next_command == referee_pb2.Referee.Command.PREPARE_KICKOFF_BLUE:
+                new_state = InternalGameState.PREPARE_KICKOFF_BLUE
+            elif next_command == referee_pb2.Referee.Command.PREPARE_PENALTY_YELLOW:
+                new_state = InternalGameState.PREPARE_PENALTY_YELLOW
+            elif next_command == referee_pb2.Referee.Command.PREPARE_PENALTY_BLUE:
+                new_state = InternalGameState.PREPARE_PENALTY_BLUE
+            elif prev_ref_msg.HasField("yellow"): # checkpoint から復元した要約は得点を持たない
+                if current_ref_msg.yellow.score > prev_ref_msg.yellow.score:
+                    new_state = InternalGameState.PREPARE_KICKOFF_BLUE
+                elif current_ref_msg.blue.score > prev_ref_msg.blue.score:
+                    new_state = InternalGameState.PREPARE_KICKOFF_YELLOW
+        print(f"Orchestrator: Resynced Internal Game State to {new_state.name} "
+              f"(command_counter {prev_ref_msg.command_counter} -> {current_ref_msg.command_counter})")
+        self.internal_game_state = new_state
+
+    def _detect_status_changes(self, prev_ref_msg: Optional[referee_pb2.Referee], current_ref_msg: referee_pb2.Referee,
+                               command_reissued: bool = False) -> List[GameEvent]:
+        """
+        Refereeメッセージの主要なステータス変化を検出し、GameEventリストを返す。
+        command_reissued: 間のコマンドを見逃した (同じコマンドが出し直された可能性がある) ので、コマンドが同じでも検出する
+        """
         events = []
         if prev_ref_msg is None: # 最初のメッセージでは比較できない
             return events
@@ -231,16 +411,20 @@ class Orchestrator(threading.Thread):
 
                 # priority = self._get_priority(event_type_str) # 将来
                 priority = 5 # 仮
-                events.append(GameEvent(event_type=event_type_str, priority=priority, data=data))
+                # イベント時刻は GC の時計 (game_event の created_timestamp と揃える)
+                events.append(GameEvent(timestamp=current_ref_msg.packet_timestamp / 1_000_000.0,
+                                        event_type=event_type_str, priority=priority, data=data))
             except ValueError:
                 print(f"Orchestrator: Unknown Stage enum value: {stage_enum_val}")
 
 
         # --- Command Change Detection ---
-        if current_ref_msg.command != prev_ref_msg.command:
+        if current_ref_msg.command != prev_ref_msg.command or command_reissued:
             command_enum_val = current_ref_msg.command
             command_name = referee_pb2.Referee.Command.Name(command_enum_val)
             current_internal_state = self.internal_game_state
+            # イベント時刻は GC がコマンドを出した時刻 (GC の時計)
+            command_time = (current_ref_msg.command_timestamp or current_ref_msg.packet_timestamp) / 1_000_000.0
 
             try:
                 if command_enum_val == referee_pb2.Referee.Command.NORMAL_START:
@@ -270,7 +454,7 @@ class Orchestrator(threading.Thread):
                         # (またはログ出力など)
 
                     print(f"Orchestrator: Detected specific start command: {event_type_str}")
-                    events.append(GameEvent(event_type=event_type_str, priority=priority, data=data))
+                    events.append(GameEvent(timestamp=command_time, event_type=event_type_str, priority=priority, data=data))
 
                 else:
                     # 特殊なコマンド (KICKOFF_PREPなど) はチーム名を付与する必要があるかもしれない
@@ -306,12 +490,16 @@ class Orchestrator(threading.Thread):
                     print(f"Orchestrator: Detected Command change to {event_type_str} with data {data}")
                     priority = self._get_priority(event_type_str) # 将来
                     
-                    events.append(GameEvent(event_type=event_type_str, priority=priority, data=data))
+                    events.append(GameEvent(timestamp=command_time, event_type=event_type_str, priority=priority, data=data))
             except ValueError:
                  print(f"Orchestrator: Unknown Command enum value: {command_enum_val}")
 
 
-        # --- TODO: Other Status Changes (e.g., Timeout taken based on TeamInfo diff) ---
+        # --- Referee / TeamInfo のその他のフィールドの変化 (得点・カード・ファウル数・ゴールキーパーなど) ---
+        if self.referee_diff is not None:
+            for game_event in self.referee_diff.diff(prev_ref_msg, current_ref_msg):
+                print(f"Orchestrator: Detected {game_event.event_type} with data {game_event.data}")
+                events.append(game_event)
 
         return events
 
@@ -340,7 +528,22 @@ class Orchestrator(threading.Thread):
         return events
 
     def _publish_event(self, game_event: GameEvent):
-         """GameEvent を ZeroMQ で Publish する"""
+         """GameEvent を Publish し、複合イベントのルールを進める (一致した複合イベントも続けて Publish する)"""
+         self._send_event(game_event)
+         if self.rule_engine.rules:
+             # 複合イベントはルールに戻さない (ルール同士が互いを生成し続けないように)
+             for composite in self.rule_engine.process(game_event):
+                 self._send_event(composite)
+
+    def add_event_callback(self, callback: Callable[[GameEvent], None]):
+        """
+        publish する GameEvent を同じプロセス内で直接受け取るコールバックを登録する (start() の前に呼ぶこと)。
+        コールバックは run スレッドで呼ばれるので、重い処理は自分のキューに渡して別スレッドで行い、GameEvent は変更しないこと
+        """
+        self._event_callbacks.append(callback)
+
+    def _send_event(self, game_event: GameEvent):
+         """GameEvent を ZeroMQ で Publish し、同じプロセス内のコールバックに渡す"""
          try:
              json_payload = game_event.to_json()
              self.publisher.send_multipart([
@@ -348,45 +551,406 @@ class Orchestrator(threading.Thread):
                  json_payload.encode('utf-8') # ペイロード (bytes)
              ])
              print(f"Orchestrator: Published event: {game_event.event_type}")
+             self._metric_events.labels(game_event.event_type).inc()
          except Exception as e:
              print(f"Orchestrator: Error publishing event {game_event.event_type}: {e}")
+             self._metric_publish_errors.labels("event").inc()
+         for callback in self._event_callbacks:
+             try:
+                 callback(game_event)
+             except Exception as e:
+                 print(f"Orchestrator: Error in event callback {callback}: {e}")
+                 self._metric_callback_errors.inc()
+         self.match_stats.observe(game_event)
+
+    def _publish_ready_events(self, ready_events: List[GameEvent]):
+        """並べ替えバッファから送り出されたイベントを publish する"""
+        self._held_packet_timestamp = self.event_reorder.oldest_packet_timestamp()
+        if not ready_events:
+            return
+        # checkpoint を先に送る: primary がイベント送信中に落ちても standby は再送しない (at-most-once)
+        self._publish_checkpoint()
+        for game_event in ready_events:
+            self._publish_event(game_event)
+
+    def _next_queue_timeout(self) -> float:
+        """キューの待ち時間。保持中のイベントがあれば max_hold_sec の期限までに起きる"""
+        deadline = self.event_reorder.next_deadline()
+        if deadline is None:
+            return self._queue_timeout_sec
+        return min(self._queue_timeout_sec, max(0.001, deadline - time.monotonic()))
+
+    def _report_reorder_stats(self):
+        """並べ替えによる保持時間と時計のずれを定期的にログに出す (0 で無効)"""
+        if self.event_reorder_report_interval_sec <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_reorder_report < self.event_reorder_report_interval_sec:
+            return
+        self._last_reorder_report = now
+        if self.event_reorder.released:
+            print(f"Orchestrator: Event reorder stats: {self.event_reorder.stats()}")
+
+    def _publish_stats(self):
+        """試合統計に変化があれば 'stats' トピックで Publish する (間隔は StatsPublisher が制御)"""
+        payload = self._stats_publisher.poll()
+        if payload is None:
+            return
+        try:
+            self.publisher.send_multipart([b"stats", payload])
+        except zmq.ZMQError as e:
+            print(f"Orchestrator: Error publishing stats: {e}")
+            self._metric_publish_errors.labels("stats").inc()
+
+    def _publish_placement(self):
+        """ボールプレースメントの状態に変化があれば 'placement' トピックで Publish する"""
+        payload = self._placement_publisher.poll()
+        if payload is None:
+            return
+        try:
+            self.publisher.send_multipart([b"placement", payload])
+        except zmq.ZMQError as e:
+            print(f"Orchestrator: Error publishing placement: {e}")
+            self._metric_publish_errors.labels("placement").inc()
+
+    def _publish_timers(self):
+        """残り時間のアンカーが変わっていれば 'timers' トピックで Publish する"""
+        payload = self.timer_anchors.poll()
+        if payload is None:
+            return
+        try:
+            self.publisher.send_multipart([b"timers", payload])
+        except zmq.ZMQError as e:
+            print(f"Orchestrator: Error publishing timers: {e}")
+            self._metric_publish_errors.labels("timers").inc()
+
+    def _publish_ops(self):
+        """Referee パケットの監視結果と ops_sources の統計を 'ops' トピックで Publish する"""
+        now = time.monotonic()
+        if not self._ops_due and now - self._last_ops_publish < self.ops_publish_interval_sec:
+            return
+        self._ops_due = False
+        self._last_ops_publish = now
+        extra: Dict[str, Any] = {"event_reorder": self.event_reorder.stats()}
+        for name, source in self.ops_sources.items():
+            try:
+                extra[name] = source()
+            except Exception as e:
+                print(f"Orchestrator: Error collecting ops stats from {name}: {e}")
+        try:
+            self.publisher.send_multipart([b"ops", self.referee_monitor.to_json(extra, reset_max=True)])
+        except zmq.ZMQError as e:
+            print(f"Orchestrator: Error publishing ops: {e}")
+            self._metric_publish_errors.labels("ops").inc()
+
+    # --- プロファイル ---
+    def request_profile(self, session):
+        """ProfilerControl のスレッドから呼ばれる。run スレッドが次のループで開始する"""
+        self.profile_session = session
+        self._profile_pending = True
+
+    def _service_profile(self):
+        """要求されたセッションを開始し、期限が来た (停止が要求された) らレポートを書いて終了する"""
+        session = self.profile_session
+        if session is None:
+            self._profile_pending = False
+            return
+        if session.started_at is None:
+            # セッション中だけ protobuf_event_handlers を時間を数えるラッパーに差し替える
+            self._unprofiled_handlers = self.protobuf_event_handlers
+            self.protobuf_event_handlers = session.wrap_handlers(self._unprofiled_handlers)
+            session.start()
+            return
+        if not session.finished():
+            return
+        self.protobuf_event_handlers = self._unprofiled_handlers
+        self._unprofiled_handlers = None
+        try:
+            self.last_profile_report = session.finish()
+            print(f"Orchestrator: Profile report written to {self.last_profile_report}")
+        except OSError as e:
+            print(f"Orchestrator: Error writing profile report {session.report_path}: {e}")
+        self.profile_session = None
+        self._profile_pending = False
+
+    # --- 状態チェックポイント / フェイルオーバー ---
+    def make_checkpoint(self) -> OrchestratorCheckpoint:
+        """現在の内部状態から checkpoint を作成する (呼び出し側で _state_lock を保持すること)"""
+        checkpoint = OrchestratorCheckpoint(
+            seq=self.checkpoint_seq,
+            internal_game_state=self.internal_game_state.value,
+            processed_game_event_ids=list(self.processed_game_event_ids))
+        ref = self.previous_ref_msg
+        if ref is not None:
+            checkpoint.stage = ref.stage
+            checkpoint.command = ref.command
+            checkpoint.command_counter = ref.command_counter
+            checkpoint.command_timestamp = ref.command_timestamp
+            checkpoint.packet_timestamp = ref.packet_timestamp
+            held = self._held_packet_timestamp
+            if held is not None and held <= ref.packet_timestamp:
+                # 並べ替えのために保持中 (未 publish) のイベントがある: そのパケットより前までを処理済みとして伝え、
+                # standby が同じイベントを保留から捨てないようにする
+                checkpoint.packet_timestamp = held - 1
+        return checkpoint
+
+    def restore_checkpoint(self, checkpoint: OrchestratorCheckpoint):
+        """checkpoint から内部状態を復元する (呼び出し側で _state_lock を保持すること)"""
+        try:
+            self.internal_game_state = InternalGameState(checkpoint.internal_game_state)
+        except ValueError:
+            self.internal_game_state = InternalGameState.UNKNOWN
+        if checkpoint.has_referee:
+            # 状態遷移の検出には stage/command しか使わないので要約から Referee を組み立てる
+            ref = referee_pb2.Referee()
+            try:
+                ref.stage = checkpoint.stage
+                ref.command = checkpoint.command
+                ref.command_counter = checkpoint.command_counter
+                ref.command_timestamp = checkpoint.command_timestamp
+                ref.packet_timestamp = checkpoint.packet_timestamp
+                self.previous_ref_msg = self._checkpoint_summary = ref
+            except ValueError as e:
+                print(f"Orchestrator: Ignoring referee summary in checkpoint: {e}")
+        self.processed_game_event_ids.update(checkpoint.processed_game_event_ids)
+        self.checkpoint_seq = max(self.checkpoint_seq, checkpoint.seq)
+
+    def _restore_from_checkpoint_file(self, max_age_sec: Optional[float]):
+        """起動時に checkpoint ファイルから状態を復元する"""
+        start = time.perf_counter()
+        checkpoint = read_checkpoint_file(self.checkpoint_file, max_age_sec=max_age_sec)
+        if checkpoint is None:
+            print(f"Orchestrator: No usable checkpoint at {self.checkpoint_file}, starting fresh.")
+            return
+        with self._state_lock:
+            self.restore_checkpoint(checkpoint)
+        self.restored_from_checkpoint = True
+        print(f"Orchestrator: Restored state from {self.checkpoint_file} in {(time.perf_counter() - start) * 1000:.2f} ms "
+              f"(state={self.internal_game_state.name}, {len(self.processed_game_event_ids)} processed event IDs)")
+
+    def _checkpoint_snapshot(self, last_version: int) -> Optional[Tuple[int, OrchestratorCheckpoint]]:
+        """CheckpointFileWriter 用: 前回書き込み以降に状態が変化していれば checkpoint を返す"""
+        if self._state_version == last_version:
+            return None
+        with self._state_lock:
+            return self._state_version, self.make_checkpoint()
 
-    def run(self):
-        """メインループ"""
-        print("Orchestrator thread started.")
+    def apply_primary_checkpoint(self, checkpoint: OrchestratorCheckpoint):
+        """
+        peer (primary / 昇格した standby) から受信した checkpoint を反映する (StandbyMonitor スレッドから呼ばれる)。
+        自分も publish している場合は、seq の大きい方 (同じなら standby として起動した方) だけが publish を続ける
+        """
+        with self._state_lock:
+            if self.active:
+                if checkpoint.seq > self.checkpoint_seq or (checkpoint.seq == self.checkpoint_seq and self.role != "standby"):
+                    if not self._demote_event.is_set():
+                        print(f"Orchestrator: Peer is also publishing (peer seq {checkpoint.seq}, "
+                              f"own seq {self.checkpoint_seq}), stepping down to standby.")
+                    self._demote_event.set()
+                return
+            # peer が publish しているので、出していた昇格要求は取り消す
+            self._promote_event.clear()
+            if self.previous_ref_msg is None or self.previous_ref_msg is self._checkpoint_summary:
+                # まだ Referee を受信していなければ (checkpoint ファイルからの復元分より新しい) peer の状態から開始する
+                self.restore_checkpoint(checkpoint)
+            else:
+                self.processed_game_event_ids.update(checkpoint.processed_game_event_ids)
+            # 昇格した時に peer より大きい seq から publish する
+            self.checkpoint_seq = max(self.checkpoint_seq, checkpoint.seq)
+            self._state_version += 1
+            if checkpoint.packet_timestamp > self._last_primary_packet_timestamp:
+                self._last_primary_packet_timestamp = checkpoint.packet_timestamp
+            # primary が処理済みのパケットから検出したイベントは publish 済みなので捨てる
+            while self._pending_events and self._pending_events[0][0] <= self._last_primary_packet_timestamp:
+                self._pending_events.popleft()
+
+    def promote(self):
+        """standby を primary に昇格させる (実際の bind は run スレッドで行う)"""
+        self._promote_event.set()
+
+    def _publish_checkpoint(self):
+        """内部状態の checkpoint を 'checkpoint' トピックで Publish する (heartbeat を兼ねる)"""
+        with self._state_lock:
+            self.checkpoint_seq += 1
+            payload = self.make_checkpoint().to_bytes()
         try:
-            self.publisher.bind(self.zmq_publisher_uri)
-            print(f"Orchestrator bound to {self.zmq_publisher_uri}")
+            self.publisher.send_multipart([b"checkpoint", payload])
         except zmq.ZMQError as e:
-            print(f"Error binding ZeroMQ socket: {e}")
-            return # スレッド終了
+            print(f"Orchestrator: Error publishing checkpoint: {e}")
+            self._metric_publish_errors.labels("checkpoint").inc()
+        self._last_checkpoint_sent = time.monotonic()
+
+    def _bind_publisher(self):
+        """zmq_publisher_uri と (設定されていれば) zmq_inproc_uri に bind する"""
+        self.publisher.bind(self.zmq_publisher_uri)
+        if self.zmq_inproc_uri:
+            self.publisher.bind(self.zmq_inproc_uri)
+        self._bound = True
+
+    def _take_over(self) -> bool:
+        """standby から primary に切り替え、primary が publish していないイベントを送信する"""
+        if not self._bound:
+            try:
+                self._bind_publisher()
+            except zmq.ZMQError as e:
+                print(f"Orchestrator: Failed to bind {self.zmq_publisher_uri} on takeover: {e}")
+                return False
+            # PUB は接続前の購読者には届かないため、再接続を待つ
+            time.sleep(self.takeover_flush_delay_sec)
+        with self._state_lock:
+            pending = list(self._pending_events)
+            self._pending_events.clear()
+            self.active = True
+            self._promote_event.clear()
+            self._demote_event.clear()
+        self.promoted_at = time.time()
+        print(f"Orchestrator: Promoted to primary, bound to {self.zmq_publisher_uri} "
+              f"({len(pending)} pending events not covered by the previous primary)")
+        # 保留イベントも並べ替えバッファに入れ、run ループで GC の時刻順に送り出す
+        # (同じパケットでは状態変化を game_events より先に検出するので、検出順のままだと時刻が前後する)。
+        # 送り出す直前に checkpoint を送るので、後続の standby はこれらのイベントを重複送信しない
+        for packet_timestamp, game_event in pending:
+            self.event_reorder.push([game_event], packet_timestamp)
+        self._held_packet_timestamp = self.event_reorder.oldest_packet_timestamp()
+        self._publish_checkpoint()
+        return True
+
+    def _step_down(self):
+        """primary から standby に戻る。並べ替えのために保持中 (未 publish) のイベントは保留に戻す"""
+        with self._state_lock:
+            self.active = False
+            self._promote_event.clear()
+            self._demote_event.clear()
+            self._pending_events.extend(sorted(self.event_reorder.take_all(), key=lambda entry: entry[0]))
+            self._queue_timeout_sec = min(self._queue_timeout_sec, 0.05)
+        self._held_packet_timestamp = None
+        self.demotions += 1
+        print(f"Orchestrator: Stepped down to standby ({len(self._pending_events)} events held until promotion).")
+
+    def _process_referee_message(self, ref_msg: referee_pb2.Referee) -> List[GameEvent]:
+        """
+        Referee メッセージ 1 件分のイベント検出と状態更新を行い、publish すべき GameEvent を返す。
+        standby 中は検出したイベントを保留し、空リストを返す。
+        """
+        with self._state_lock:
+            # --- 取りこぼしの検出 ---
+            # command_counter が飛んだ / 減った場合は、間の状態遷移を知らないので現在のパケットから状態を組み立て直す
+            missed_commands = self.referee_monitor.observe(ref_msg, self.previous_ref_msg)
+            if missed_commands:
+                if missed_commands == COUNTER_RESET:
+                    print("Orchestrator: Warning: command_counter decreased (game controller restarted?)")
+                else:
+                    print(f"Orchestrator: Warning: missed {missed_commands} referee command(s)")
+                self._resync_internal_game_state(self.previous_ref_msg, ref_msg)
+                self._ops_due = True
+
+            # --- イベント検出 ---
+            detected_events: List[GameEvent] = []
+            # 1. Refereeステータス変化の検出
+            status_events = self._detect_status_changes(self.previous_ref_msg, ref_msg,
+                                                        command_reissued=bool(missed_commands))
+            if missed_commands:
+                # 取りこぼし後に検出したことを購読側に伝える (実況で断定的な表現を避けるなど)
+                for game_event in status_events:
+                    game_event.data["resynced"] = True
+                    if missed_commands != COUNTER_RESET:
+                        game_event.data["missed_commands"] = missed_commands
+            detected_events.extend(status_events)
+            # 2. Referee.game_events リストの処理
+            detected_events.extend(self._process_game_events_list(ref_msg))
+            # 3. ボールプレースメントの追跡 (standby も追跡しておき、昇格後すぐに送れるようにする)
+            if self.placement_tracker is not None:
+                self.placement_tracker.update(ref_msg, detected_events)
+            if self.timer_anchors is not None:
+                self.timer_anchors.update(ref_msg)
+
+            # --- 状態更新 ---
+            prev_ref_msg = self.previous_ref_msg
+            state_changed = (bool(detected_events) or prev_ref_msg is None
+                             or ref_msg.command_counter != prev_ref_msg.command_counter
+                             or ref_msg.stage != prev_ref_msg.stage)
+            self._update_internal_game_state(ref_msg)
+            self.previous_ref_msg = ref_msg # 次の比較のために現在のメッセージを保持
+
+            if not self.active:
+                # standby: primary の checkpoint で確認されるまで保留
+                for game_event in detected_events:
+                    self._pending_events.append((ref_msg.packet_timestamp, game_event))
+                detected_events = []
+
+        if state_changed:
+            # checkpoint ファイルの書き込み対象 (I/O は CheckpointFileWriter のスレッドで行う)
+            self._state_version += 1
+            if self._checkpoint_writer:
+                self._checkpoint_writer.notify()
+        return detected_events
+
+    def run(self):
+        """メインループ"""
+        print(f"Orchestrator thread started (role: {self.role}).")
+        if self._bound:
+            print(f"Orchestrator publishing on pre-bound {self.zmq_publisher_uri}")
+        elif self.active or self.standby_bind_early:
+            try:
+                self._bind_publisher()
+                print(f"Orchestrator bound to {self.zmq_publisher_uri}"
+                      + (f" and {self.zmq_inproc_uri}" if self.zmq_inproc_uri else ""))
+            except zmq.ZMQError as e:
+                print(f"Error binding ZeroMQ socket: {e}")
+                return # スレッド終了
+        if not self.active and self.role == "standby":
+            print("Orchestrator running as standby; events are held until promotion.")
+        elif not self.active:
+            print(f"Orchestrator checking whether {self.peer_uri} is already publishing; events are held until promotion.")
+        if self.checkpoint_file:
+            self._checkpoint_writer = CheckpointFileWriter(
+                self.checkpoint_file, self._checkpoint_snapshot, self.checkpoint_file_interval_sec)
+            self._checkpoint_writer.start()
+        self.ready.set()
 
         # TODO: Start periodic state publisher timer here if implementing GameStateUpdate
 
         while not self._stop_event.is_set():
+            if self._profile_pending:
+                self._service_profile()
+            if self.active and self._demote_event.is_set():
+                self._step_down()
+            if not self.active and self._promote_event.is_set():
+                if not self._take_over():
+                    time.sleep(0.5) # bind できるまで再試行
+                    continue
+            if self.active and time.monotonic() - self._last_checkpoint_sent >= self.checkpoint_interval_sec:
+                self._publish_checkpoint()
+            if self.active and self._stats_publisher:
+                self._publish_stats()
+            if self.active and self._placement_publisher:
+                self._publish_placement()
+            if self.active and self.timer_anchors:
+                self._publish_timers()
+            if self.referee_monitor.check_stale():
+                print(f"Orchestrator: Warning: no referee packet for {self.referee_monitor.stale_after_sec} s")
+                self._ops_due = True
+            if self.active and self.ops_publish_interval_sec > 0:
+                self._publish_ops()
+
             try:
-                ref_msg: referee_pb2.Referee = self.input_queue.get(timeout=1.0)
+                ref_msg: referee_pb2.Referee = self.input_queue.get(timeout=self._next_queue_timeout())
+                received_at = time.time()
                 # print(f"Orchestrator: Received Referee message: {ref_msg}") # デバッグ
 
-                # --- イベント検出 ---
-                detected_events: List[GameEvent] = []
-                # 1. Refereeステータス変化の検出
-                detected_events.extend(self._detect_status_changes(self.previous_ref_msg, ref_msg))
-                # 2. Referee.game_events リストの処理
-                detected_events.extend(self._process_game_events_list(ref_msg))
-
-                # --- イベント送信 ---
-                for game_event in detected_events:
-                    self._publish_event(game_event)
+                started = time.perf_counter()
+                detected_events = self._process_referee_message(ref_msg)
+                self._metric_packet_seconds.observe(time.perf_counter() - started)
+                self.event_reorder.observe_packet(ref_msg.packet_timestamp, received_at)
+                if detected_events:
+                    self.event_reorder.push(detected_events, ref_msg.packet_timestamp)
+                    self._held_packet_timestamp = self.event_reorder.oldest_packet_timestamp()
 
-                # --- 状態更新 ---
-                self._update_internal_game_state(ref_msg)
-                self.previous_ref_msg = ref_msg # 次の比較のために現在のメッセージを保持
                 self.input_queue.task_done()
 
             except queue.Empty:
                 # タイムアウトは正常、stop()をチェックするため
-                continue
+                pass
             except Exception as e:
                 print(f"Orchestrator: Error type in main loop: {type(e)}") # ★ 例外の型を出力
                 print(f"Orchestrator: Error message: {e}")               # ★ 例外メッセージ (内容は "event_timestamp" かもしれない)
@@ -396,11 +960,28 @@ class Orchestrator(threading.Thread):
                 # エラー発生時も可能な限り継続試行
                 time.sleep(1)
 
+            # --- イベント送信 (GC の時刻順、watermark を過ぎたもの) ---
+            if self._demote_event.is_set():
+                self._step_down() # peer が publish しているものを重複して送らない
+            self._publish_ready_events(self.event_reorder.pop_ready())
+            self._report_reorder_stats()
+
+        # 保持中のイベントを送ってから終了する
+        self._publish_ready_events(self.event_reorder.flush())
+        if self.profile_session is not None and self.profile_session.started_at is not None:
+            self.profile_session.stop_requested = True # プロファイル中ならそこまでのレポートを書く
+            self._service_profile()
+        print(f"Orchestrator: Event reorder stats: {self.event_reorder.stats()}")
+
         # --- 終了処理 ---
         print("Orchestrator shutting down...")
+        if self._checkpoint_writer:
+            self._checkpoint_writer.stop()
+            self._checkpoint_writer.join(timeout=2)
         self.publisher.close()
-        self.context.term()
-        print("Orchestrator ZeroMQ context terminated.")
+        if self._owns_context:
+            self.context.term()
+            print("Orchestrator ZeroMQ context terminated.")
 
     def stop(self):
         """スレッドを停止する"""
@@ -0,0 +1,192 @@
+# orchestrator/placement_geometry.py
+# ボールプレースメント中のロボット・ボール位置から派生指標を計算するモジュール。
+#  - ボールと目標位置 (designated_position) の距離と、直近の窓での接近速度・到達予想時間
+#  - ボールに最も近いロボット
+#  - 相手チームのロボットのうち、ボールと目標位置を結ぶ線分から 0.5 m 以内にいるもの (ルール違反の候補)
+# 線分までの距離はフレームごとに 1 回だけ計算し、窓内で線分の近くにいたフレーム数はフレームの出入りで増減させる。
+# compute() が計算するのは前回以降に追加されたフレームの分だけなので、窓の長さによらず 1 フレームあたりの計算量は一定。
+# (22 台・1 s の窓では NumPy の配列でまとめて計算しても速くならなかったため、標準ライブラリだけで実装する)
+import json
+import math
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+# SSL ルール: ボールプレースメント中、相手チームのロボットはボールと目標位置を結ぶ線分から 0.5 m 離れる
+PLACEMENT_STOP_DISTANCE_MM = 500.0
+ROBOTS_PER_TEAM = 16 # ロボット ID は 0–15
+TEAM_NAMES = {1: "YELLOW", 2: "BLUE"} # 'vision' トピックのチーム番号
+TEAM_CODES = {name: code for code, name in TEAM_NAMES.items()}
+
+
+class PositionBuffer:
+    """
+    直近 capacity フレームの位置を保持するリングバッファ。1 フレームは (timestamp [s], ball, robots) で、
+    ball は [x, y, ...] (mm) または None、robots は 'vision' トピックと同じ [team, id, x, y, orientation_mrad] のリスト。
+    """
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.frames: Deque[Tuple[float, Optional[Sequence[float]], List[Sequence[float]]]] = deque(maxlen=capacity)
+        self.appended = 0 # clear() 以降に追加したフレーム数
+        self.generation = 0 # clear() のたびに増える (派生値のキャッシュの無効化用)
+
+    @property
+    def size(self) -> int:
+        return len(self.frames)
+
+    def clear(self):
+        self.frames.clear()
+        self.appended = 0
+        self.generation += 1
+
+    def append(self, timestamp: float, ball: Optional[Sequence[float]], robots: List[Sequence[float]]):
+        """1 フレーム分を追加する (チーム番号・ID が範囲外のロボットは除く)"""
+        robots = [robot for robot in robots
+                  if (robot[0] == 1 or robot[0] == 2) and 0 <= robot[1] < ROBOTS_PER_TEAM]
+        self.frames.append((timestamp, ball, robots))
+        self.appended += 1
+
+
+def segment_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """点 (px, py) から線分 (ax, ay)–(bx, by) への距離。線分の長さが 0 なら始点からの距離"""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    ratio = 0.0 if length_sq <= 1e-9 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + ratio * dx), py - (ay + ratio * dy))
+
+
+class PlacementGeometry:
+    """
+    PositionBuffer と進行中のプレースメント (チーム・目標位置) から派生指標を計算する。
+    window_sec の窓で接近速度と、各ロボットが違反範囲にいたフレームの割合を求める。
+    窓内のフレームごとに (時刻, ボール–目標の距離, ロボットごとの線分までの距離, 線分の近くにいたロボット) を保持し、
+    目標位置が変わるか buffer が clear されたら計算し直す。
+    """
+    def __init__(self, buffer: PositionBuffer, window_sec: float = 1.0,
+                 stop_distance_mm: float = PLACEMENT_STOP_DISTANCE_MM):
+        self.buffer = buffer
+        self.window_sec = window_sec
+        self.stop_distance_mm = stop_distance_mm
+        self._window: Deque[Tuple[float, Optional[float], Dict[Tuple[int, int], float], List[Tuple[int, int]]]] = (
+            deque(maxlen=buffer.capacity))
+        self._inside_counts: Counter = Counter() # (チーム, ID) -> 窓内で線分の近くにいたフレーム数
+        self._cache_key = None # (buffer.generation, 目標 x, 目標 y)
+        self._evaluated = 0 # _window に反映済みのフレーム数 (buffer.appended と比較する)
+
+    def _update_window(self, tx: float, ty: float):
+        buffer = self.buffer
+        key = (buffer.generation, tx, ty)
+        if key != self._cache_key:
+            self._cache_key = key
+            self._evaluated = 0
+            self._window.clear()
+            self._inside_counts.clear()
+        pending = min(buffer.appended - self._evaluated, buffer.size)
+        if pending <= 0:
+            return
+        window, inside_counts, stop = self._window, self._inside_counts, self.stop_distance_mm
+        for index in range(buffer.size - pending, buffer.size):
+            timestamp, ball, robots = buffer.frames[index]
+            distances = {}
+            ball_distance = None
+            if ball is not None:
+                bx, by = ball[0], ball[1]
+                ball_distance = math.hypot(bx - tx, by - ty)
+                for team, robot_id, x, y, _ in robots:
+                    distances[(team, robot_id)] = segment_distance(x, y, tx, ty, bx, by)
+            inside = [robot for robot, distance in distances.items() if distance < stop]
+            inside_counts.update(inside)
+            if len(window) == window.maxlen:
+                inside_counts.subtract(window[0][3])
+            window.append((timestamp, ball_distance, distances, inside))
+        self._evaluated = buffer.appended
+        # 最新フレームから window_sec より古いものを外す
+        oldest = window[-1][0] - self.window_sec
+        while window[0][0] < oldest:
+            inside_counts.subtract(window.popleft()[3])
+
+    def compute(self, team: Optional[str], target: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """最新フレームの指標。ボールが見えていなければ None"""
+        buffer = self.buffer
+        if buffer.size == 0:
+            return None
+        timestamp, ball, robots = buffer.frames[-1]
+        if ball is None:
+            return None
+        tx, ty = float(target["x"]), float(target["y"])
+        bx, by = float(ball[0]), float(ball[1])
+
+        ball_distance = math.hypot(bx - tx, by - ty)
+        closest = None
+        closest_distance = math.inf
+        for robot_team, robot_id, x, y, _ in robots:
+            distance = math.hypot(x - bx, y - by)
+            if distance < closest_distance:
+                closest_distance = distance
+                closest = {"team": TEAM_NAMES[robot_team], "id": robot_id}
+        if closest is not None:
+            closest["distance"] = round(closest_distance)
+
+        # 違反: 最新フレームで線分の近くにいる相手チームのロボット (黄 0–15, 青 0–15 の順)
+        self._update_window(tx, ty)
+        window = self._window
+        own_team = TEAM_CODES.get(team, 0)
+        frames = len(window)
+        distances = window[-1][2]
+        violations = [{"team": TEAM_NAMES[robot[0]], "id": robot[1], "distance": round(distances[robot]),
+                       "window_ratio": round(self._inside_counts[robot] / frames, 2)}
+                      for robot in sorted(window[-1][3]) if robot[0] != own_team]
+
+        # 接近速度: 窓内のボール–目標距離の最小二乗の傾き (近づいていれば正)
+        approach = None
+        eta = None
+        samples = [(t, d) for t, d, _, _ in window if d is not None]
+        if len(samples) >= 2:
+            mean_t = sum(t for t, _ in samples) / len(samples)
+            mean_d = sum(d for _, d in samples) / len(samples)
+            denominator = sum((t - mean_t) ** 2 for t, _ in samples)
+            if denominator > 0:
+                approach = -sum((t - mean_t) * (d - mean_d) for t, d in samples) / denominator
+                if approach > 1.0:
+                    eta = round(ball_distance / approach, 1)
+                approach = round(approach)
+
+        return {
+            "t": float(timestamp),
+            "team": team,
+            "target": target,
+            "ball_distance": round(ball_distance),
+            "approach_mm_s": approach,
+            "eta_sec": eta,
+            "closest": closest,
+            "violations": violations,
+        }
+
+    def to_json(self, team: Optional[str], target: Dict[str, float]) -> Optional[bytes]:
+        metrics = self.compute(team, target)
+        if metrics is None:
+            return None
+        return json.dumps(metrics, separators=(",", ":")).encode("utf-8")
+
+
+if __name__ == '__main__':
+    buffer = PositionBuffer(capacity=64)
+    geometry = PlacementGeometry(buffer, window_sec=0.5)
+    target = {"x": 1000.0, "y": 0.0}
+    # ボールが 100 Hz で目標に向かって 1 m/s で近づく。黄 3 番は線分上、青 5 番はボールの近く、黄 7 番は遠く
+    for i in range(100):
+        t = i / 100
+        ball_x = -1000.0 + 1000.0 * t
+        buffer.append(t, [ball_x, 0.0, 0.0], [[1, 3, 500, 200, 0], [2, 5, ball_x - 100, 0, 3142], [1, 7, -4000, 3000, 0]])
+    metrics = geometry.compute("BLUE", target)
+    print(json.dumps(metrics))
+    assert metrics["ball_distance"] == 1010
+    assert metrics["closest"] == {"team": "BLUE", "id": 5, "distance": 100}
+    assert [(v["team"], v["id"]) for v in metrics["violations"]] == [("YELLOW", 3)]
+    assert abs(metrics["approach_mm_s"] - 1000) <= 1 and abs(metrics["eta_sec"] - 1.0) <= 0.1
+    # 写っていないロボットは違反にも最近傍にも含まれない
+    buffer.append(1.0, [0.0, 0.0, 0.0], [])
+    assert geometry.compute("BLUE", target)["closest"] is None
+    # 目標位置が変わったら窓を計算し直す (線分が黄 3 番から離れる向きになると違反が無くなる)
+    buffer.append(1.01, [0.0, 0.0, 0.0], [[1, 3, 500, 200, 0]])
+    assert [(v["id"], v["distance"]) for v in geometry.compute("BLUE", target)["violations"]] == [(3, 200)]
+    assert geometry.compute("BLUE", {"x": 0.0, "y": -3000.0})["violations"] == []
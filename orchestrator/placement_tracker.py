@@ -0,0 +1,205 @@
+# orchestrator/placement_tracker.py
+# ボールプレースメントの指示 (Referee.command = BALL_PLACEMENT_*) と結果 (EVENT_PLACEMENT_SUCCEEDED / FAILED) を
+# 対応付け、current_action_time_remaining の残り時間を追跡するモジュール。
+# Referee パケット 1 件ごとの処理は数回の比較のみで、'placement' トピックへの送信は PlacementPublisher が間引く。
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: common/data_models.py not found.")
+    exit(1)
+
+try:
+    from state import ssl_gc_referee_message_pb2 as referee_pb2
+except ImportError:
+    print("Error: Protobuf generated code not found in 'state' directory.")
+    exit(1)
+
+# 指示の終了 (コマンド変更) から結果イベントを待つ時間 (パケット時刻, 秒)。
+# GC は結果の game_event とコマンド変更を同じパケットで送ることが多いが、前後することもある
+DEFAULT_RESULT_GRACE_SEC = 2.0
+
+_PLACEMENT_TEAMS = {
+    referee_pb2.Referee.BALL_PLACEMENT_YELLOW: "YELLOW",
+    referee_pb2.Referee.BALL_PLACEMENT_BLUE: "BLUE",
+}
+_RESULT_PREFIXES = ("EVENT_PLACEMENT_SUCCEEDED_", "EVENT_PLACEMENT_FAILED_")
+# 結果イベントの data から結果に含めるフィールド
+_RESULT_FIELDS = ("time_taken", "precision", "distance", "remaining_distance")
+
+
+class PlacementTracker:
+    """
+    Referee パケットごとに update() を呼び、進行中のボールプレースメントと直近の結果を保持する。
+    version は publish する内容 (コマンド・プレースメントの状態) が変化するたびに増加する。
+    残り時間のカウントダウンは 'timers' トピックのアンカー (action) で送るため、残り時間の変化だけでは増加しない。
+    """
+    def __init__(self, result_grace_sec: float = DEFAULT_RESULT_GRACE_SEC):
+        self.result_grace_sec = result_grace_sec
+        self.command: Optional[str] = None
+        self.remaining_ds: Optional[int] = None # current_action_time_remaining (0.1 秒単位, 負なら超過)
+        self.active: Optional[Dict[str, Any]] = None # 指示が出ている最中のプレースメント
+        self.awaiting: Optional[Dict[str, Any]] = None # 指示は終わり、結果イベント待ちのプレースメント
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_packet_time: float = 0.0
+        self.version = 0
+        self.urgent = False # 開始・終了など、間引かずにすぐ送るべき変化があった
+        self._command_enum: Optional[int] = None
+        self._command_counter: Optional[int] = None
+
+    def update(self, ref_msg: referee_pb2.Referee, events: List[GameEvent]):
+        """Referee パケット 1 件と、そのパケットで検出された GameEvent を反映する"""
+        now = ref_msg.packet_timestamp / 1_000_000.0
+        self.last_packet_time = now
+        if ref_msg.command_counter != self._command_counter or ref_msg.command != self._command_enum:
+            self._command_counter = ref_msg.command_counter
+            if ref_msg.command != self._command_enum:
+                self._on_command(ref_msg, now)
+
+        if ref_msg.HasField("current_action_time_remaining"):
+            remaining_ds = ref_msg.current_action_time_remaining // 100_000
+        else:
+            remaining_ds = None
+        self.remaining_ds = remaining_ds
+
+        for game_event in events:
+            if game_event.event_type.startswith(_RESULT_PREFIXES):
+                self._on_result(game_event, now)
+
+        if self.awaiting is not None and now - self.awaiting["ended"] > self.result_grace_sec:
+            self._finish(self.awaiting, "unknown", {})
+            self.awaiting = None
+
+    def _on_command(self, ref_msg: referee_pb2.Referee, now: float):
+        self._command_enum = ref_msg.command
+        self.command = referee_pb2.Referee.Command.Name(ref_msg.command)
+        self.version += 1
+        team = _PLACEMENT_TEAMS.get(ref_msg.command)
+        if self.active is not None and self.active["team"] != team:
+            # 指示が終わった: 結果イベントを待つ (前のプレースメントの結果がまだなら打ち切る)
+            if self.awaiting is not None:
+                self._finish(self.awaiting, "unknown", {})
+            self.active["ended"] = now
+            self.awaiting, self.active = self.active, None
+            self.urgent = True
+        if team is not None and self.active is None:
+            target = None
+            if ref_msg.HasField("designated_position"):
+                target = {"x": ref_msg.designated_position.x, "y": ref_msg.designated_position.y}
+            self.active = {"team": team, "target": target, "started": now}
+            self.urgent = True
+
+    def _on_result(self, game_event: GameEvent, now: float):
+        team = game_event.data.get("team")
+        if self.awaiting is not None and self.awaiting["team"] == team:
+            placement, self.awaiting = self.awaiting, None
+        elif self.active is not None and self.active["team"] == team:
+            placement, self.active = self.active, None
+            placement["ended"] = now
+        else:
+            # 指示を受信していない (起動直後など)
+            placement = {"team": team, "target": None, "started": None, "ended": now}
+        outcome = "succeeded" if game_event.event_type.startswith(_RESULT_PREFIXES[0]) else "failed"
+        self._finish(placement, outcome, game_event.data)
+
+    def _finish(self, placement: Dict[str, Any], outcome: str, data: Dict[str, Any]):
+        started, ended = placement["started"], placement.get("ended")
+        result = {
+            "team": placement["team"],
+            "outcome": outcome,
+            "target": placement["target"],
+            "duration_sec": round(ended - started, 1) if started is not None and ended is not None else None,
+        }
+        for field in _RESULT_FIELDS:
+            if data.get(field) is not None:
+                result[field] = data[field]
+        self.last_result = result
+        self.version += 1
+        self.urgent = True
+
+    def snapshot(self) -> Dict[str, Any]:
+        placement = None
+        if self.active is not None:
+            placement = {
+                "team": self.active["team"],
+                "target": self.active["target"],
+                "elapsed_sec": round(self.last_packet_time - self.active["started"], 1),
+            }
+        return {
+            "command": self.command,
+            "remaining_sec": self.remaining_ds / 10 if self.remaining_ds is not None else None,
+            "placement": placement,
+            "last_result": self.last_result,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), separators=(",", ":"))
+
+
+class PlacementPublisher:
+    """
+    PlacementTracker の publish 間隔を制御する。内容が変化していて、interval_sec 以上経過しているか
+    プレースメントの開始・終了があった場合に payload を返す。
+    """
+    def __init__(self, tracker: PlacementTracker, interval_sec: float = 0.1):
+        self.tracker = tracker
+        self.interval_sec = interval_sec
+        self._published_version = -1
+        self._last_published = 0.0
+
+    def poll(self, now: Optional[float] = None) -> Optional[bytes]:
+        tracker = self.tracker
+        if tracker.version == self._published_version:
+            return None
+        now = time.monotonic() if now is None else now
+        if not tracker.urgent and now - self._last_published < self.interval_sec:
+            return None
+        self._published_version = tracker.version
+        self._last_published = now
+        tracker.urgent = False
+        return tracker.to_json().encode("utf-8")
+
+
+if __name__ == '__main__':
+    tracker = PlacementTracker()
+    publisher = PlacementPublisher(tracker, interval_sec=0.5)
+    ref = referee_pb2.Referee()
+    ref.stage = referee_pb2.Referee.NORMAL_FIRST_HALF
+    ref.command = referee_pb2.Referee.STOP
+    ref.command_counter = 1
+    ref.command_timestamp = 0
+    sent = []
+
+    def packet(t_sec: float, events=()):
+        ref.packet_timestamp = int(t_sec * 1_000_000)
+        msg = referee_pb2.Referee()
+        msg.CopyFrom(ref)
+        tracker.update(msg, list(events))
+        payload = publisher.poll(now=t_sec)
+        if payload is not None:
+            sent.append(json.loads(payload))
+
+    packet(100.0)
+    ref.command = referee_pb2.Referee.BALL_PLACEMENT_BLUE
+    ref.command_counter += 1
+    ref.designated_position.x, ref.designated_position.y = 1500.0, -300.0
+    ref.current_action_time_remaining = 30_000_000
+    for i in range(1, 61): # 10 Hz で 6 秒
+        ref.current_action_time_remaining = 30_000_000 - i * 100_000
+        packet(100.0 + i * 0.1)
+    ref.command = referee_pb2.Referee.STOP
+    ref.command_counter += 1
+    ref.ClearField("current_action_time_remaining")
+    packet(106.2, [GameEvent(event_type="EVENT_PLACEMENT_SUCCEEDED_BLUE", data={"team": "BLUE", "time_taken": 6.1, "precision": 0.04})])
+    packet(106.3)
+
+    print(f"{len(sent)} updates published")
+    for update in sent:
+        print(json.dumps(update))
+    assert sent[1]["placement"]["target"] == {"x": 1500.0, "y": -300.0}
+    assert len(sent) <= 4 # 開始・終了のみ (カウントダウンは 'timers' トピック)
+    assert sent[-1]["placement"] is None and sent[-1]["last_result"]["outcome"] == "succeeded"
+    assert sent[-1]["last_result"]["duration_sec"] == 6.1
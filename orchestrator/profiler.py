@@ -0,0 +1,251 @@
+# orchestrator/profiler.py
+# 動作中のオーケストレーターを再起動せずにプロファイルするための制御チャネル。
+# REQ/REP ソケット (profiler_control_uri) で開始・停止を受け付け、指定した秒数だけ run スレッドで cProfile を有効にする。
+# 終了時にレポート (関数ごとの統計, protobuf_event_handlers のハンドラーごとの時間, スレッドごとの CPU 時間) を
+# profiler_output_dir にテキストで、pstats 形式 (.prof, snakeviz などで開ける) と一緒に書き出す。
+#
+# リクエスト (JSON):
+#   {"op": "start", "duration_sec": 10}   (duration_sec は profiler_max_duration_sec まで)
+#   {"op": "stop"}                        (期限前に終了してレポートを書く)
+#   {"op": "status"}
+# レスポンス: {"ok": true, "state": "running" | "idle", "report": "<path>", ...} / {"ok": false, "error": "..."}
+#
+# 無効の間は run ループで属性を 1 回確認するだけで、プロファイラもハンドラーのラッパーも入らない。
+#
+#   PYTHONPATH=.:./proto python -m orchestrator.profiler start --duration 10
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import zmq
+
+TOP_FUNCTIONS = 40
+
+
+def thread_cpu_times() -> Dict[int, Tuple[str, float]]:
+    """プロセスの全スレッドの {native_id: (名前, CPU 時間 [秒])} (/proc/self/task が読めなければ空)"""
+    names = {thread.native_id: thread.name for thread in threading.enumerate()}
+    ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    times = {}
+    try:
+        tids = os.listdir("/proc/self/task")
+    except OSError:
+        return times
+    for tid in tids:
+        try:
+            with open(f"/proc/self/task/{tid}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue # 読む前に終了したスレッド
+        # comm は空白や括弧を含み得るので最後の ')' の後から数える (utime, stime は 14, 15 番目)
+        comm = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        native_id = int(tid)
+        times[native_id] = (names.get(native_id, comm), (int(fields[11]) + int(fields[12])) / ticks)
+    return times
+
+
+class ProfileSession:
+    """1 回のプロファイル。start() / finish() はプロファイル対象のスレッド (オーケストレーターの run スレッド) で呼ぶ"""
+
+    def __init__(self, duration_sec: float, output_dir: str, packets: Callable[[], int]):
+        self.duration_sec = duration_sec
+        self.packets = packets
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.report_path = os.path.join(output_dir, f"profile-{stamp}.txt")
+        self.stats_path = os.path.join(output_dir, f"profile-{stamp}.prof")
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.stop_requested = False
+        self.handler_times: Dict[str, List[float]] = {} # ハンドラー名 -> [呼び出し回数, 合計 [秒], 最大 [秒]]
+        self._profile = cProfile.Profile()
+        self._start_wall = 0.0
+        self._start_packets = 0
+        self._start_cpu: Dict[int, Tuple[str, float]] = {}
+
+    def wrap_handlers(self, handlers: Dict[int, Callable]) -> Dict[int, Callable]:
+        """ハンドラーの呼び出し時間を数えるラッパーの辞書 (セッション中だけ差し替える)"""
+        wrapped = {}
+        for event_type, handler in handlers.items():
+            record = self.handler_times.setdefault(handler.__name__, [0, 0.0, 0.0])
+            def timed(*args, _handler=handler, _record=record, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return _handler(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    _record[0] += 1
+                    _record[1] += elapsed
+                    if elapsed > _record[2]:
+                        _record[2] = elapsed
+            wrapped[event_type] = timed
+        return wrapped
+
+    def start(self):
+        self.started_at = time.time()
+        self._start_wall = time.monotonic()
+        self.deadline = self._start_wall + self.duration_sec
+        self._start_packets = self.packets()
+        self._start_cpu = thread_cpu_times()
+        self._profile.enable()
+
+    def finished(self, now: Optional[float] = None) -> bool:
+        return self.stop_requested or (time.monotonic() if now is None else now) >= self.deadline
+
+    def finish(self) -> str:
+        """プロファイラを止めてレポートを書き、レポートのパスを返す"""
+        self._profile.disable()
+        elapsed = time.monotonic() - self._start_wall
+        end_cpu = thread_cpu_times()
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        self._profile.dump_stats(self.stats_path)
+        with open(self.report_path, "w") as f:
+            f.write(self.report(elapsed, end_cpu))
+        return self.report_path
+
+    def report(self, elapsed: float, end_cpu: Dict[int, Tuple[str, float]]) -> str:
+        out = io.StringIO()
+        packets = self.packets() - self._start_packets
+        out.write(f"Orchestrator profile: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}, "
+                  f"{elapsed:.1f} s, {packets} referee packets\n")
+        out.write(f"pstats: {self.stats_path}\n\n")
+
+        out.write("== CPU per thread ==\n")
+        if not end_cpu:
+            out.write("(/proc/self/task not available)\n")
+        rows = []
+        for native_id, (name, cpu) in end_cpu.items():
+            start = self._start_cpu.get(native_id, (name, 0.0))[1] # 途中で始まったスレッドは 0 から
+            rows.append((cpu - start, name, native_id))
+        for cpu, name, native_id in sorted(rows, reverse=True):
+            out.write(f"{name:32s} tid {native_id:<8d} {cpu:8.3f} s  {cpu / elapsed * 100 if elapsed else 0:6.1f} % of a core\n")
+
+        out.write("\n== protobuf_event_handlers ==\n")
+        out.write(f"{'handler':48s} {'calls':>7s} {'total ms':>10s} {'mean us':>9s} {'max us':>9s}\n")
+        for name, (calls, total, longest) in sorted(self.handler_times.items(), key=lambda item: -item[1][1]):
+            if calls:
+                out.write(f"{name:48s} {calls:7d} {total * 1000:10.3f} {total / calls * 1e6:9.1f} {longest * 1e6:9.1f}\n")
+
+        for sort_key, title in (("cumulative", "cumulative time"), ("tottime", "own time")):
+            out.write(f"\n== Functions by {title} (orchestrator thread, top {TOP_FUNCTIONS}) ==\n")
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.strip_dirs().sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+        return out.getvalue()
+
+
+class ProfilerControl(threading.Thread):
+    """
+    プロファイルの開始・停止を REP ソケットで受け付けるスレッド。
+    セッションの開始・終了はオーケストレーターの run スレッドが Orchestrator.request_profile で受け取って行う
+    """
+
+    def __init__(self, orchestrator, bind_uri: str, output_dir: str, max_duration_sec: float = 300.0,
+                 context: Optional[zmq.Context] = None):
+        super().__init__(daemon=True, name="ProfilerControl")
+        self.orchestrator = orchestrator
+        self.bind_uri = bind_uri
+        self.output_dir = output_dir
+        self.max_duration_sec = max_duration_sec
+        self.context = context or zmq.Context.instance()
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        print(f"ProfilerControl initialized on {self.bind_uri}, reports to {self.output_dir}")
+
+    def stop(self):
+        self._stop_event.set()
+        print("ProfilerControl stop requested.")
+
+    def handle_request(self, request_bytes: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(request_bytes)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            op = request.get("op", "status")
+            session: Optional[ProfileSession] = self.orchestrator.profile_session
+            if op == "start":
+                if session is not None:
+                    raise ValueError(f"already profiling until {session.report_path} is written")
+                duration_sec = float(request.get("duration_sec", 10.0))
+                if not 0 < duration_sec <= self.max_duration_sec:
+                    raise ValueError(f"duration_sec must be in (0, {self.max_duration_sec}]")
+                session = ProfileSession(duration_sec, self.output_dir, lambda: self.orchestrator.referee_monitor.packets)
+                self.orchestrator.request_profile(session)
+                print(f"ProfilerControl: profiling for {duration_sec} s -> {session.report_path}")
+                return {"ok": True, "state": "running", "duration_sec": duration_sec, "report": session.report_path}
+            if op == "stop":
+                if session is None:
+                    raise ValueError("not profiling")
+                session.stop_requested = True
+                return {"ok": True, "state": "stopping", "report": session.report_path}
+            if op == "status":
+                if session is None:
+                    return {"ok": True, "state": "idle", "last_report": self.orchestrator.last_profile_report}
+                remaining = None if session.deadline is None else max(0.0, session.deadline - time.monotonic())
+                return {"ok": True, "state": "running", "remaining_sec": remaining, "report": session.report_path}
+            raise ValueError(f"unknown op: {op}")
+        except (ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    def run(self):
+        responder = self.context.socket(zmq.REP)
+        try:
+            responder.bind(self.bind_uri)
+        except zmq.ZMQError as e:
+            print(f"ProfilerControl: Failed to bind {self.bind_uri}: {e}")
+            responder.close(linger=0)
+            return
+        self.ready.set()
+        print(f"ProfilerControl listening on {self.bind_uri}")
+        try:
+            while not self._stop_event.is_set():
+                if not responder.poll(timeout=1000):
+                    continue
+                responder.send(json.dumps(self.handle_request(responder.recv())).encode("utf-8"))
+        except zmq.ZMQError as e:
+            print(f"ProfilerControl: ZeroMQ Error: {e}")
+        finally:
+            responder.close(linger=0)
+
+
+def request(uri: str, message: Dict[str, Any], timeout_ms: int = 2000) -> Dict[str, Any]:
+    """クライアント用のヘルパー。応答が無い場合は TimeoutError"""
+    requester = zmq.Context.instance().socket(zmq.REQ)
+    requester.setsockopt(zmq.RCVTIMEO, timeout_ms)
+    requester.setsockopt(zmq.LINGER, 0)
+    requester.connect(uri)
+    try:
+        requester.send(json.dumps(message).encode("utf-8"))
+        return json.loads(requester.recv())
+    except zmq.Again:
+        raise TimeoutError(f"No reply from profiler control at {uri}")
+    finally:
+        requester.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Start / stop profiling of a running orchestrator")
+    parser.add_argument("op", choices=("start", "stop", "status"))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to profile (start)")
+    parser.add_argument("--uri", default="tcp://127.0.0.1:5559", help="profiler_control_uri of the orchestrator")
+    parser.add_argument("--wait", action="store_true", help="start: wait until the report is written")
+    args = parser.parse_args()
+
+    message: Dict[str, Any] = {"op": args.op}
+    if args.op == "start":
+        message["duration_sec"] = args.duration
+    try:
+        reply = request(args.uri, message)
+    except TimeoutError as e:
+        print(f"Error: {e}")
+        exit(1)
+    print(json.dumps(reply))
+    if args.op == "start" and args.wait and reply.get("ok"):
+        while request(args.uri, {"op": "status"}).get("state") != "idle":
+            time.sleep(0.5)
+        print(f"Report written to {reply['report']}")
@@ -0,0 +1,197 @@
+# orchestrator/referee_diff.py
+# Referee / TeamInfo のフィールドの変化 (得点・カード・ファウル数・ゴールキーパー・最大ロボット数・サイドなど) を
+# 型付きのイベント (TEAM_CARD_YELLOW_ISSUED_BLUE, TEAM_GOALKEEPER_CHANGED_YELLOW, REFEREE_SIDES_SWITCHED など) にするモジュール。
+# 監視するフィールドは protobuf の記述子 (DESCRIPTOR) から起動時に 1 度だけ平らなリストに組み立て、パケットごとには
+# そのフィールドだけを読む。TeamInfo はシリアライズしたバイト列が前のパケットと同じなら比較しない
+# (イエローカードの残り時間が進んでいる間以外は、ほとんどのパケットで同じ)。
+# stage / command は Orchestrator._detect_status_changes、残り時間は timer_anchors、game_events は
+# _process_game_events_list、designated_position は placement_tracker が扱うので監視しない。
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from common.data_models import GameEvent
+except ImportError:
+    print("Error: common/data_models.py not found.")
+    exit(1)
+
+try:
+    from state import ssl_gc_referee_message_pb2 as referee_pb2
+except ImportError:
+    print("Error: Protobuf generated code not found in 'state' directory.")
+    exit(1)
+
+# 監視しないフィールド (他の処理が扱う / パケットごとに変わる)
+REFEREE_IGNORED_FIELDS = frozenset({
+    "packet_timestamp", "stage", "stage_time_left", "command", "command_counter", "command_timestamp",
+    "designated_position", "current_action_time_remaining", "game_events", "game_event_proposals"})
+TEAM_IGNORED_FIELDS = frozenset({"timeout_time", "bot_substitution_time_left"}) # 残り時間 ('timers' トピック)
+
+# フィールド名 -> (値が増えた時, それ以外の変化の時) のイベント名。None ならイベントを出さない。
+# ここに無いフィールドは "<フィールド名>_CHANGED"。Referee のものには "REFEREE_"、TeamInfo のものには
+# "TEAM_" と "_YELLOW" / "_BLUE" が付く。繰り返しフィールドは要素数を比べる
+REFEREE_EVENT_NAMES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    "blue_team_on_positive_half": ("SIDES_SWITCHED", "SIDES_SWITCHED"),
+}
+TEAM_EVENT_NAMES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    "score": ("SCORE_CHANGED", "SCORE_CHANGED"),
+    "red_cards": ("CARD_RED_ISSUED", "RED_CARDS_CHANGED"),
+    "yellow_cards": ("CARD_YELLOW_ISSUED", "YELLOW_CARDS_CHANGED"),
+    # 有効なイエローカードの数。増えた時は yellow_cards で分かるので、減った (期限が切れた) 時だけ出す
+    "yellow_card_times": (None, "CARD_YELLOW_EXPIRED"),
+    "foul_counter": ("FOUL_COUNTED", "FOUL_COUNTER_CHANGED"),
+    "ball_placement_failures": ("PLACEMENT_FAILURE_COUNTED", "BALL_PLACEMENT_FAILURES_CHANGED"),
+    "bot_substitution_intent": ("BOT_SUBSTITUTION_REQUESTED", None),
+}
+
+
+class FieldWatch:
+    """監視する 1 フィールド: 値の読み出し方と、変化した時のイベント名"""
+    __slots__ = ("name", "read", "ordered", "enum_names", "on_increase", "on_change")
+
+    def __init__(self, field, prefix: str, event_names: Dict[str, Tuple[Optional[str], Optional[str]]]):
+        self.name = name = field.name
+        repeated = field.is_repeated if hasattr(field, "is_repeated") else field.label == field.LABEL_REPEATED
+        if repeated:
+            self.read: Callable[[Any], Any] = lambda msg: len(getattr(msg, name))
+        elif getattr(field, "has_presence", True):
+            # 未設定 (None) と 0 / false を区別する
+            self.read = lambda msg: getattr(msg, name) if msg.HasField(name) else None
+        else:
+            self.read = lambda msg: getattr(msg, name)
+        # 大小に意味があるもの (数値・bool・要素数) だけ「増えた」を判定する
+        self.ordered = repeated or field.type not in (field.TYPE_STRING, field.TYPE_BYTES, field.TYPE_ENUM)
+        self.enum_names: Optional[Dict[int, str]] = (
+            {value.number: value.name for value in field.enum_type.values} if field.enum_type is not None else None)
+        on_increase, on_change = event_names.get(name, (f"{name.upper()}_CHANGED",) * 2)
+        self.on_increase = prefix + on_increase if on_increase else None
+        self.on_change = prefix + on_change if on_change else None
+
+    def label(self, value):
+        """イベントの data に入れる値 (enum は名前)"""
+        if value is None or self.enum_names is None:
+            return value
+        return self.enum_names.get(value, value)
+
+
+def compile_watches(descriptor, ignored: frozenset, prefix: str,
+                    event_names: Dict[str, Tuple[Optional[str], Optional[str]]]) -> List[FieldWatch]:
+    """記述子の (無視するもの・サブメッセージ以外の) フィールドを FieldWatch のリストにする"""
+    return [FieldWatch(field, prefix, event_names) for field in descriptor.fields
+            if field.name not in ignored and field.message_type is None]
+
+
+class RefereeDiff:
+    """
+    Referee パケットごとに diff(前のパケット, 今のパケット) を呼び、監視フィールドの変化をイベントにして返す。
+    前のパケットの監視値と TeamInfo のバイト列は覚えておき、パケットごとに読むのは今のパケットだけにする
+    """
+    def __init__(self, priority_of: Optional[Callable[[str], int]] = None, descriptor=referee_pb2.Referee.DESCRIPTOR):
+        self.priority_of = priority_of or (lambda event_type: 5)
+        self.referee_watches = compile_watches(descriptor, REFEREE_IGNORED_FIELDS, "REFEREE_", REFEREE_EVENT_NAMES)
+        # TeamInfo 型のフィールド (yellow / blue)
+        team_fields = [field for field in descriptor.fields
+                       if field.message_type is not None and field.message_type.name == "TeamInfo"]
+        self.teams: List[Tuple[str, str]] = [(field.name, field.name.upper()) for field in team_fields]
+        self.team_watches = (compile_watches(team_fields[0].message_type, TEAM_IGNORED_FIELDS, "TEAM_", TEAM_EVENT_NAMES)
+                             if team_fields else [])
+        self._last: Optional[referee_pb2.Referee] = None
+        self._referee_values: Optional[tuple] = None # _last の監視値
+        self._team_bytes: Dict[str, bytes] = {}      # _last の TeamInfo のバイト列
+        self._team_values: Dict[str, tuple] = {}     # _last の TeamInfo の監視値 (バイト列が変わった時に比べる)
+        self.packets = 0
+        self.team_compares = 0 # バイト列が変わり、フィールドを比べた TeamInfo の数
+
+    def _remember(self, ref_msg: referee_pb2.Referee):
+        self._last = ref_msg
+        self._referee_values = tuple(watch.read(ref_msg) for watch in self.referee_watches)
+        for field, _ in self.teams:
+            team = getattr(ref_msg, field)
+            self._team_bytes[field] = team.SerializePartialToString()
+            self._team_values[field] = tuple(watch.read(team) for watch in self.team_watches)
+
+    def diff(self, prev_ref_msg: Optional[referee_pb2.Referee], current_ref_msg: referee_pb2.Referee) -> List[GameEvent]:
+        events: List[GameEvent] = []
+        self.packets += 1
+        if prev_ref_msg is None or prev_ref_msg is not self._last:
+            # checkpoint から復元した要約 (TeamInfo を持たない) とは比べず、今のパケットを基準にする
+            if prev_ref_msg is None or not all(prev_ref_msg.HasField(field) for field, _ in self.teams):
+                self._remember(current_ref_msg)
+                return events
+            self._remember(prev_ref_msg)
+        timestamp = current_ref_msg.packet_timestamp / 1_000_000.0
+
+        values = tuple(watch.read(current_ref_msg) for watch in self.referee_watches)
+        if values != self._referee_values:
+            self._compare(self.referee_watches, self._referee_values, values, None, timestamp, events)
+            self._referee_values = values
+
+        for field, team in self.teams:
+            team_msg = getattr(current_ref_msg, field)
+            team_bytes = team_msg.SerializePartialToString()
+            if team_bytes == self._team_bytes[field]:
+                continue
+            self.team_compares += 1
+            self._team_bytes[field] = team_bytes
+            team_values = tuple(watch.read(team_msg) for watch in self.team_watches)
+            previous = self._team_values[field]
+            if team_values != previous:
+                self._compare(self.team_watches, previous, team_values, team, timestamp, events)
+                self._team_values[field] = team_values
+        self._last = current_ref_msg
+        return events
+
+    def _compare(self, watches: List[FieldWatch], old_values: tuple, new_values: tuple, team: Optional[str],
+                 timestamp: float, events: List[GameEvent]):
+        for watch, old, new in zip(watches, old_values, new_values):
+            if old == new:
+                continue
+            increased = watch.ordered and new is not None and (old is None or new > old)
+            event_type = watch.on_increase if increased else watch.on_change
+            if event_type is None:
+                continue
+            data = {"field": watch.name, "value": watch.label(new), "previous": watch.label(old)}
+            if team is not None:
+                event_type = f"{event_type}_{team}"
+                data["team"] = team
+            events.append(GameEvent(timestamp=timestamp, event_type=event_type,
+                                    priority=self.priority_of(event_type), data=data))
+
+
+if __name__ == '__main__':
+    diff = RefereeDiff()
+    print("watched:", [w.name for w in diff.referee_watches], [w.name for w in diff.team_watches])
+
+    def packet(t: float, **team_values) -> referee_pb2.Referee:
+        ref = referee_pb2.Referee()
+        ref.packet_timestamp = int(t * 1_000_000)
+        for field in ("yellow", "blue"):
+            team = getattr(ref, field)
+            team.name, team.score, team.red_cards, team.yellow_cards = field, 0, 0, 0
+            team.timeouts, team.timeout_time, team.goalkeeper = 4, 300_000_000, 0
+        for name, value in team_values.items():
+            field, _, attr = name.partition("__")
+            if attr == "yellow_card_times":
+                getattr(ref, field).yellow_card_times.extend(value)
+            else:
+                setattr(getattr(ref, field), attr, value)
+        return ref
+
+    summary = referee_pb2.Referee(packet_timestamp=0) # checkpoint の要約
+    first = packet(1.0, blue__yellow_cards=1, blue__yellow_card_times=[120_000_000])
+    assert diff.diff(summary, first) == []
+    second = packet(1.1, blue__yellow_cards=1, blue__yellow_card_times=[119_900_000])
+    assert diff.diff(first, second) == [] # 残り時間だけ変化
+    third = packet(1.2, blue__yellow_cards=2, blue__yellow_card_times=[119_800_000, 120_000_000],
+                   yellow__goalkeeper=3, yellow__foul_counter=1)
+    third.blue_team_on_positive_half = True
+    events = diff.diff(second, third)
+    for game_event in events:
+        print(game_event.event_type, game_event.data)
+    assert sorted(e.event_type for e in events) == [
+        "REFEREE_SIDES_SWITCHED", "TEAM_CARD_YELLOW_ISSUED_BLUE", "TEAM_FOUL_COUNTED_YELLOW",
+        "TEAM_GOALKEEPER_CHANGED_YELLOW"], events
+    fourth = packet(1.3, blue__yellow_cards=2, blue__yellow_card_times=[120_000_000],
+                    yellow__goalkeeper=3, yellow__foul_counter=1)
+    fourth.blue_team_on_positive_half = True
+    assert [e.event_type for e in diff.diff(third, fourth)] == ["TEAM_CARD_YELLOW_EXPIRED_BLUE"]
+    assert diff.diff(fourth, fourth) == []
@@ -0,0 +1,159 @@
+# orchestrator/referee_monitor.py
+# Referee パケットの取りこぼし・到着間隔の揺らぎ・途絶を監視するモジュール。
+#  - command_counter の飛び: 間のコマンドを見逃した (オーケストレーターは現在のパケットから状態を組み立て直す)
+#  - command_counter の減少: GC の再起動
+#  - packet_timestamp の逆転・重複 (複数経路からの受信など)
+#  - 到着間隔と揺らぎ (RFC 3550 の interarrival jitter: 到着間隔と packet_timestamp の間隔の差の平滑化)
+#  - 途絶: stale_after_sec の間パケットが届かない
+# パケットごとの処理は数回の比較と加算のみ。'ops' トピックの JSON は snapshot() で作る。
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+# observe() の戻り値: command_counter が減った (GC の再起動)
+COUNTER_RESET = -1
+# 揺らぎ・到着間隔の平滑化係数 (RFC 3550 と同じ 1/16)
+SMOOTHING = 1.0 / 16.0
+
+
+class RefereeMonitor:
+    """
+    observe() に Referee パケットを 1 件ずつ渡す (直前のパケットは呼び出し側が保持するものを渡す)。
+    check_stale() は受信が無い間も定期的に呼び、途絶の開始を検出する。
+    """
+    def __init__(self, stale_after_sec: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.stale_after_sec = stale_after_sec
+        self.clock = clock
+        self.packets = 0
+        self.gaps = 0               # command_counter が 2 以上進んだ回数
+        self.missed_commands = 0    # 見逃したコマンドの合計
+        self.counter_resets = 0
+        self.out_of_order = 0       # packet_timestamp が前のパケット以前だったもの (重複を含む)
+        self.stale = False
+        self.stale_periods = 0
+        self.longest_stale_sec = 0.0
+        self.interval_ms: Optional[float] = None # 到着間隔 (平滑化)
+        self.jitter_ms = 0.0
+        self.max_interval_ms = 0.0 # 前回の snapshot(reset_max=True) 以降の最大到着間隔
+        self._last_arrival: Optional[float] = None
+        self._last_packet_timestamp: Optional[int] = None
+        self._stale_since: Optional[float] = None
+
+    def observe(self, ref_msg, prev_ref_msg=None, arrived_at: Optional[float] = None) -> int:
+        """
+        パケット 1 件を反映し、見逃したコマンドの数を返す (0: 飛びなし、COUNTER_RESET: GC の再起動)。
+        prev_ref_msg が None (最初のパケット) なら 0。
+        """
+        now = self.clock() if arrived_at is None else arrived_at
+        self.packets += 1
+        packet_timestamp = ref_msg.packet_timestamp
+        last_arrival = self._last_arrival
+        last_timestamp = self._last_packet_timestamp
+        if last_arrival is not None:
+            arrival_ms = (now - last_arrival) * 1000.0
+            if arrival_ms > self.max_interval_ms:
+                self.max_interval_ms = arrival_ms
+            if packet_timestamp <= last_timestamp:
+                self.out_of_order += 1
+            else:
+                self.interval_ms = arrival_ms if self.interval_ms is None else (
+                    self.interval_ms + (arrival_ms - self.interval_ms) * SMOOTHING)
+                transit_delta_ms = arrival_ms - (packet_timestamp - last_timestamp) / 1000.0
+                self.jitter_ms += (abs(transit_delta_ms) - self.jitter_ms) * SMOOTHING
+        if last_timestamp is None or packet_timestamp > last_timestamp:
+            self._last_packet_timestamp = packet_timestamp
+        self._last_arrival = now
+        if self.stale:
+            self._end_stale(now)
+
+        if prev_ref_msg is None:
+            return 0
+        delta = ref_msg.command_counter - prev_ref_msg.command_counter
+        if delta < 0:
+            self.counter_resets += 1
+            return COUNTER_RESET
+        if delta > 1:
+            self.gaps += 1
+            self.missed_commands += delta - 1
+            return delta - 1
+        return 0
+
+    def check_stale(self, now: Optional[float] = None) -> bool:
+        """途絶が始まった時だけ True を返す"""
+        if self.stale or self._last_arrival is None or self.stale_after_sec <= 0:
+            return False
+        now = self.clock() if now is None else now
+        if now - self._last_arrival < self.stale_after_sec:
+            return False
+        self.stale = True
+        self.stale_periods += 1
+        self._stale_since = self._last_arrival
+        return True
+
+    def _end_stale(self, now: float):
+        self.stale = False
+        if self._stale_since is not None:
+            self.longest_stale_sec = max(self.longest_stale_sec, now - self._stale_since)
+        self._stale_since = None
+
+    def snapshot(self, reset_max: bool = False) -> Dict[str, Any]:
+        now = self.clock()
+        snapshot = {
+            "packets": self.packets,
+            "gaps": self.gaps,
+            "missed_commands": self.missed_commands,
+            "counter_resets": self.counter_resets,
+            "out_of_order": self.out_of_order,
+            "stale": self.stale,
+            "stale_periods": self.stale_periods,
+            "longest_stale_sec": round(self.longest_stale_sec, 3),
+            "last_packet_age_sec": round(now - self._last_arrival, 3) if self._last_arrival is not None else None,
+            "interval_ms": round(self.interval_ms, 2) if self.interval_ms is not None else None,
+            "jitter_ms": round(self.jitter_ms, 3),
+            "max_interval_ms": round(self.max_interval_ms, 2),
+        }
+        if reset_max:
+            self.max_interval_ms = 0.0
+        return snapshot
+
+    def to_json(self, extra: Optional[Dict[str, Any]] = None, reset_max: bool = False) -> bytes:
+        """'ops' トピックの JSON: {"t": 時刻, "referee": snapshot, ...extra}"""
+        payload = {"t": time.time(), "referee": self.snapshot(reset_max=reset_max)}
+        if extra:
+            payload.update(extra)
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+if __name__ == '__main__':
+    from types import SimpleNamespace
+    clock = [0.0]
+    monitor = RefereeMonitor(stale_after_sec=1.0, clock=lambda: clock[0])
+
+    def packet(t: float, counter: int):
+        return SimpleNamespace(packet_timestamp=int(1_700_000_000_000_000 + t * 1_000_000), command_counter=counter)
+
+    prev = None
+    results = []
+    # 10 Hz。t=0.5 で 3 つ飛ぶ、t=1.0 で再起動、到着は 2 ms 揺らぐ
+    for i in range(15):
+        t = i * 0.1
+        counter = 1 if i < 5 else 4 if i < 10 else 0
+        ref = packet(t, counter)
+        clock[0] = t + 0.002 * (i % 2)
+        results.append(monitor.observe(ref, prev))
+        prev = ref
+    print(results, monitor.snapshot())
+    assert results[5] == 2 and results[10] == COUNTER_RESET and results.count(0) == 13
+    assert monitor.gaps == 1 and monitor.missed_commands == 2 and monitor.counter_resets == 1
+    assert 1.0 < monitor.jitter_ms < 2.0 and abs(monitor.interval_ms - 100.0) < 2.0
+    # 途絶: 1 秒届かなければ 1 回だけ True、次のパケットで解除
+    clock[0] = 1.45
+    assert not monitor.check_stale()
+    clock[0] = 2.5
+    assert monitor.check_stale() and not monitor.check_stale()
+    monitor.observe(packet(2.5, 0), prev)
+    assert not monitor.stale and monitor.stale_periods == 1 and monitor.longest_stale_sec > 1.0
+    # 重複パケット
+    monitor.observe(packet(2.5, 0), prev)
+    assert monitor.out_of_order == 1
+    print(monitor.to_json().decode())
@@ -0,0 +1,220 @@
+# orchestrator/state_checkpoint.py
+# オーケストレーターの内部状態をコンパクトなバイナリに詰めるためのモジュール。
+# hot-standby へのハンドオフ ('checkpoint' トピック) と、再起動用の checkpoint ファイルで使用する。
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CHECKPOINT_MAGIC = b"SSOC"
+CHECKPOINT_VERSION = 1
+
+# magic, version, seq, internal_game_state, stage, command,
+# command_counter, command_timestamp, packet_timestamp, 処理済みID数
+_HEADER = struct.Struct("<4sBQBiiIQQH")
+_EVENT_ID = struct.Struct("<Q")
+_CRC = struct.Struct("<I") # ファイル末尾に付与する CRC32 (途中まで書かれたファイルの検出用)
+MAX_CHECKPOINT_IDS = 0xFFFF
+
+
+class EventIdWindow:
+    """
+    処理済み game_event ID を直近 maxlen 件だけ保持する、挿入順付きのセット。
+    GC は game_events を一定期間しか保持しないため、古い ID は捨てても再通知されない。
+    """
+    __slots__ = ("maxlen", "_ids")
+
+    def __init__(self, maxlen: int = 512, ids: Iterable[int] = ()):
+        self.maxlen = max(1, min(int(maxlen), MAX_CHECKPOINT_IDS))
+        self._ids: Dict[int, None] = {}
+        for event_id in ids:
+            self.add(event_id)
+
+    def __contains__(self, event_id: object) -> bool:
+        return event_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def add(self, event_id: int):
+        if event_id in self._ids:
+            return
+        self._ids[event_id] = None
+        if len(self._ids) > self.maxlen:
+            # dict は挿入順なので先頭が最も古い
+            del self._ids[next(iter(self._ids))]
+
+    def update(self, event_ids: Iterable[int]):
+        for event_id in event_ids:
+            self.add(event_id)
+
+
+@dataclass
+class OrchestratorCheckpoint:
+    """
+    オーケストレーターの再開に必要な最小限の状態。
+    Referee メッセージ全体ではなく、状態遷移の検出に使う要約だけを保持する。
+    """
+    seq: int = 0                      # checkpoint の通し番号 (publish ごとに増加)
+    internal_game_state: int = 0      # InternalGameState.value (0 = 未設定)
+    stage: int = -1                   # 最後に処理した Referee.stage (-1 = 未受信)
+    command: int = -1                 # 最後に処理した Referee.command (-1 = 未受信)
+    command_counter: int = 0
+    command_timestamp: int = 0        # μs (GC 時刻)
+    packet_timestamp: int = 0         # μs (GC 時刻) この時刻までのパケットは処理済み
+    processed_game_event_ids: List[int] = field(default_factory=list)
+
+    @property
+    def has_referee(self) -> bool:
+        return self.stage >= 0 and self.command >= 0
+
+    def to_bytes(self) -> bytes:
+        ids = self.processed_game_event_ids[-MAX_CHECKPOINT_IDS:]
+        try:
+            header = _HEADER.pack(
+                CHECKPOINT_MAGIC, CHECKPOINT_VERSION, self.seq, self.internal_game_state,
+                self.stage, self.command, self.command_counter,
+                self.command_timestamp, self.packet_timestamp, len(ids))
+            return header + struct.pack(f"<{len(ids)}Q", *ids)
+        except struct.error as e:
+            raise ValueError(f"Could not serialize OrchestratorCheckpoint: {e}") from e
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> 'OrchestratorCheckpoint':
+        try:
+            (magic, version, seq, internal_game_state, stage, command, command_counter,
+             command_timestamp, packet_timestamp, n_ids) = _HEADER.unpack_from(payload, 0)
+            if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+                raise ValueError(f"unsupported checkpoint header {magic!r} v{version}")
+            ids = list(struct.unpack_from(f"<{n_ids}Q", payload, _HEADER.size))
+        except struct.error as e:
+            raise ValueError(f"Could not decode OrchestratorCheckpoint: {e}") from e
+        return cls(seq=seq, internal_game_state=internal_game_state, stage=stage,
+                   command=command, command_counter=command_counter,
+                   command_timestamp=command_timestamp, packet_timestamp=packet_timestamp,
+                   processed_game_event_ids=ids)
+
+
+def write_checkpoint_file(path: str, checkpoint: OrchestratorCheckpoint):
+    """
+    checkpoint をファイルに書き込む。一時ファイルに書いて fsync した後に rename するため、
+    書き込み途中でプロセスが落ちても前回の checkpoint が残る。
+    """
+    payload = checkpoint.to_bytes()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload + _CRC.pack(zlib.crc32(payload)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # rename 自体を永続化するためにディレクトリも fsync する
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def read_checkpoint_file(path: str, max_age_sec: Optional[float] = None) -> Optional[OrchestratorCheckpoint]:
+    """
+    checkpoint ファイルを読み込む。存在しない・古すぎる・壊れている場合は None を返す。
+    """
+    try:
+        if max_age_sec is not None and time.time() - os.path.getmtime(path) > max_age_sec:
+            print(f"Ignoring stale checkpoint file (older than {max_age_sec}s): {path}")
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Error reading checkpoint file {path}: {e}")
+        return None
+
+    payload = data[:-_CRC.size]
+    if len(data) < _CRC.size or _CRC.unpack_from(data, len(payload))[0] != zlib.crc32(payload):
+        print(f"Error: Checkpoint file is corrupted (CRC mismatch): {path}")
+        return None
+    try:
+        return OrchestratorCheckpoint.from_bytes(payload)
+    except ValueError as e:
+        print(f"Error decoding checkpoint file {path}: {e}")
+        return None
+
+
+class CheckpointFileWriter(threading.Thread):
+    """
+    interval_sec ごと (または notify() 時) に状態を確認し、前回の書き込みから変化があった場合だけ
+    checkpoint ファイルを書く。パケット処理スレッドではファイル I/O を行わないためのバックグラウンドスレッド。
+    notify() による書き込みは min_interval_sec 以上の間隔に間引く。
+
+    snapshot(last_version) は状態が last_version から変化していれば (version, checkpoint) を、
+    変化が無ければ None を返す関数。
+    """
+    def __init__(self,
+                 path: str,
+                 snapshot: Callable[[int], Optional[Tuple[int, OrchestratorCheckpoint]]],
+                 interval_sec: float = 1.0,
+                 min_interval_sec: float = 0.05):
+        super().__init__(daemon=True, name="CheckpointFileWriter")
+        self.path = path
+        self.snapshot = snapshot
+        self.interval_sec = interval_sec
+        self.min_interval_sec = min_interval_sec
+        self.written_version = 0
+        self.writes = 0
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    def notify(self):
+        """状態が変化したことを知らせる (次の周期を待たずに書き込む)"""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def flush(self):
+        """変化があれば今すぐ書き込む"""
+        result = self.snapshot(self.written_version)
+        if result is None:
+            return
+        version, checkpoint = result
+        try:
+            write_checkpoint_file(self.path, checkpoint)
+            self.written_version = version
+            self.writes += 1
+        except OSError as e:
+            print(f"Error writing checkpoint file {self.path}: {e}")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.interval_sec)
+            self._wakeup.clear()
+            self.flush()
+            self._stop_event.wait(self.min_interval_sec)
+        self.flush() # 終了時に最後の状態を書き出す
+
+
+if __name__ == '__main__':
+    window = EventIdWindow(maxlen=3, ids=[1, 2, 3, 4])
+    assert list(window) == [2, 3, 4]
+    cp = OrchestratorCheckpoint(seq=7, internal_game_state=3, stage=1, command=2,
+                                command_counter=12, command_timestamp=1_700_000_000_000_000,
+                                packet_timestamp=1_700_000_000_100_000,
+                                processed_game_event_ids=list(window))
+    payload = cp.to_bytes()
+    print(f"Checkpoint size: {len(payload)} bytes")
+    assert OrchestratorCheckpoint.from_bytes(payload) == cp
+    try:
+        OrchestratorCheckpoint.from_bytes(payload[:10])
+    except ValueError as e:
+        print(f"Caught expected error: {e}")
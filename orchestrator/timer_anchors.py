@@ -0,0 +1,134 @@
+# orchestrator/timer_anchors.py
+# Referee の残り時間 (stage_time_left, current_action_time_remaining, 各チームの timeout_time / yellow_card_times) を
+# アンカー {"value": 値 [秒], "t": GC 時刻 [秒], "rate": 変化率, "running": 進行中か} として 'timers' トピックで送るモジュール。
+# パケットごとには送らず、タイマーの出現・消滅・開始・停止と、アンカーから外挿した値とのずれが tolerance を超えた時
+# (飛び・停止の検出) だけ送る。受信側は common/timer_anchor.py (JS 版: placement_visualizer/web/src/timerAnchors.js) で外挿する。
+import json
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+try:
+    from common.timer_anchor import extrapolate
+except ImportError:
+    print("Error: common/timer_anchor.py not found.")
+    exit(1)
+
+try:
+    from state import ssl_gc_referee_message_pb2 as referee_pb2
+except ImportError:
+    print("Error: Protobuf generated code not found in 'state' directory.")
+    exit(1)
+
+# タイマー名: "stage", "action", "<team>.timeout", "<team>.card_<n>" (n は yellow_card_times の順番)
+_TEAMS = (("yellow", "yellow"), ("blue", "blue"))
+
+
+class TimerAnchorTracker:
+    """
+    Referee パケットごとに update() を呼び、poll() で送るべき 'timers' メッセージを得る。
+    メッセージは全てのタイマーのアンカーを含み、refresh_sec ごとに変化が無くても再送する (後から接続した購読者用)
+    """
+    def __init__(self, tolerance_sec: float = 0.1, refresh_sec: float = 5.0):
+        self.tolerance_sec = tolerance_sec
+        self.refresh_sec = refresh_sec
+        self.anchors: Dict[str, Dict[str, Any]] = {}
+        self.changed: Set[str] = set() # 前回の poll() 以降にアンカーが変わった / 消えたタイマー
+        self.anchor_updates = 0
+        self.seq = 0
+        self._last: Dict[str, Tuple[float, float]] = {} # タイマー名 -> 前のパケットの (GC 時刻, 値)
+        self._card_counts = {"yellow": 0, "blue": 0}
+        self._last_time: Optional[float] = None
+        self._last_sent: Optional[float] = None
+
+    def update(self, ref_msg: referee_pb2.Referee):
+        now = ref_msg.packet_timestamp / 1_000_000.0
+        if self._last_time is not None and now <= self._last_time:
+            return # 重複・逆転したパケット
+        self._last_time = now
+        self._observe("stage", ref_msg.stage_time_left if ref_msg.HasField("stage_time_left") else None, now)
+        self._observe("action", ref_msg.current_action_time_remaining
+                      if ref_msg.HasField("current_action_time_remaining") else None, now)
+        for name, field in _TEAMS:
+            team = getattr(ref_msg, field)
+            self._observe(f"{name}.timeout", team.timeout_time if team.HasField("timeout_time") else None, now)
+            card_times = team.yellow_card_times
+            for i, remaining in enumerate(card_times):
+                self._observe(f"{name}.card_{i}", remaining, now)
+            for i in range(len(card_times), self._card_counts[name]):
+                self._observe(f"{name}.card_{i}", None, now)
+            self._card_counts[name] = len(card_times)
+
+    def _observe(self, name: str, value_us: Optional[int], now: float):
+        if value_us is None:
+            if name in self.anchors:
+                del self.anchors[name]
+                self._last.pop(name, None)
+                self.changed.add(name)
+            return
+        value = value_us / 1_000_000.0
+        last = self._last.get(name)
+        self._last[name] = (now, value)
+        anchor = self.anchors.get(name)
+        if anchor is None or last is None:
+            # 出現: 進行中かは次のパケットで分かる
+            self._set(name, value, now, 0.0)
+            return
+        last_time, last_value = last
+        if anchor["rate"] == 0.0:
+            if value == last_value:
+                return
+            # 前のパケットから経過時間分だけ減っていれば開始、そうでなければ飛び (停止のまま)
+            started = abs((value - last_value) + (now - last_time)) <= self.tolerance_sec
+            self._set(name, value, now, -1.0 if started else 0.0)
+        elif abs(value - extrapolate(anchor, now)) > self.tolerance_sec:
+            # 停止 (前のパケットから変わっていない) または飛び・ずれ
+            self._set(name, value, now, 0.0 if value == last_value else anchor["rate"])
+
+    def _set(self, name: str, value: float, now: float, rate: float):
+        self.anchors[name] = {"value": round(value, 3), "t": round(now, 3), "rate": rate, "running": rate != 0.0}
+        self.changed.add(name)
+        self.anchor_updates += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"now": self._last_time, "seq": self.seq, "changed": sorted(self.changed), "timers": self.anchors}
+
+    def poll(self, now: Optional[float] = None) -> Optional[bytes]:
+        """アンカーが変わったか、前回から refresh_sec 経過していれば 'timers' の payload を返す"""
+        if self._last_time is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if not self.changed and (self.refresh_sec <= 0 or now - self._last_sent < self.refresh_sec):
+            return None
+        self.seq += 1
+        payload = json.dumps(self.snapshot(), separators=(",", ":")).encode("utf-8")
+        self.changed.clear()
+        self._last_sent = now
+        return payload
+
+
+if __name__ == '__main__':
+    tracker = TimerAnchorTracker(tolerance_sec=0.1, refresh_sec=5.0)
+    ref = referee_pb2.Referee()
+    ref.stage_time_left = 300_000_000
+    sent = []
+    # 10 Hz: 0–2 秒は停止、2–5 秒は進行、5 秒で停止、6 秒でボールプレースメント (30 秒) 開始
+    for i in range(80):
+        t = 100.0 + i * 0.1
+        ref.packet_timestamp = int(round(t * 1_000_000))
+        if 2.0 < i * 0.1 <= 5.0 + 1e-9:
+            ref.stage_time_left -= 100_000
+        if i == 60:
+            ref.current_action_time_remaining = 30_000_000
+        elif i > 60:
+            ref.current_action_time_remaining -= 100_000
+        tracker.update(ref)
+        payload = tracker.poll(now=t)
+        if payload is not None:
+            sent.append(json.loads(payload))
+    for message in sent:
+        print(json.dumps(message))
+    # 出現 / 開始 / 停止 / action の出現 / action の開始
+    assert [m["changed"] for m in sent] == [["stage"], ["stage"], ["stage"], ["action"], ["action"]], sent
+    stopped = sent[2]["timers"]["stage"]
+    assert not stopped["running"] and abs(stopped["value"] - 297.0) < 1e-6
+    assert sent[-1]["timers"]["action"]["running"]
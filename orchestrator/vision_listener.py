@@ -0,0 +1,268 @@
+# orchestrator/vision_listener.py
+# トラッカー (ssl-vision の tracked 出力 / autoRef の tracker) の TrackerWrapperPacket をマルチキャストで受信し、
+# ボールとロボットの位置を表示用のレートに間引いて 'vision' トピックで publish するリスナー。
+# 60–100 Hz の受信は Referee / イベントの経路とは別のスレッド・別の PUB ソケットで処理し、イベント処理を待たせない。
+import json
+import select
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import zmq
+
+from .placement_geometry import PositionBuffer, PlacementGeometry
+
+try:
+    from tracker import ssl_vision_wrapper_tracked_pb2 as tracker_pb2
+    from state import ssl_gc_common_pb2 as common_pb2
+    from google.protobuf.message import DecodeError
+except ImportError:
+    print("Error: Protobuf generated code not found (tracker/ssl_vision_wrapper_tracked_pb2).")
+    exit(1)
+
+try:
+    from common import metrics
+except ImportError:
+    print("Error: common/metrics.py not found.")
+    exit(1)
+
+# 'vision' トピックのチーム番号 (可視化ブリッジのバイナリ形式の TEAM_CODES と同じ)
+TEAM_CODES = {common_pb2.YELLOW: 1, common_pb2.BLUE: 2}
+
+
+def frame_positions(frame):
+    """TrackedFrame からボール [x, y, z] (なければ None) とロボット [[team, id, x, y, orientation], ...] を取り出す (mm, mrad の整数)"""
+    ball = None
+    if frame.balls:
+        pos = frame.balls[0].pos
+        ball = [round(pos.x * 1000), round(pos.y * 1000), round(pos.z * 1000)]
+    robots = []
+    append = robots.append
+    for robot in frame.robots:
+        robot_id, pos = robot.robot_id, robot.pos
+        append([TEAM_CODES.get(robot_id.team, 0), robot_id.id,
+                round(pos.x * 1000), round(pos.y * 1000), round(robot.orientation * 1000)])
+    return ball, robots
+
+
+def encode_positions(timestamp: float, frame_number: int, ball, robots) -> bytes:
+    """
+    'vision' トピックのコンパクトな JSON。座標は mm の整数、向きは mrad の整数。
+    {"t": timestamp, "f": frame_number, "ball": [x, y, z] | null, "robots": [[team, id, x, y, orientation], ...]}
+    """
+    return json.dumps({"t": timestamp, "f": frame_number, "ball": ball, "robots": robots},
+                      separators=(",", ":")).encode("utf-8")
+
+
+def encode_frame(frame) -> bytes:
+    """TrackedFrame を 'vision' トピックの JSON にする"""
+    ball, robots = frame_positions(frame)
+    return encode_positions(frame.timestamp, frame.frame_number, ball, robots)
+
+
+class VisionListener(threading.Thread):
+    """
+    受信したデータグラムはまとめて読み出し (溜まっていれば最新の 1 件だけ使う)、publish する時刻になった時だけ
+    最新のデータグラムをパースする。間引かれたパケットはパースしない。
+    (upb 実装ではメッセージを再利用するよりも FromString で新しく作る方が速いため、毎回作る)
+    placement_source が進行中のボールプレースメント ({"team", "target"} または None) を返す間は全パケットをパースして
+    PositionBuffer に保存し、PlacementGeometry の指標を 'placement_metrics' トピックで publish する。
+    """
+    def __init__(self,
+                 multicast_group: str = "224.5.23.2",
+                 multicast_port: int = 10010,
+                 publish_uri: str = "tcp://*:5558",
+                 display_rate_hz: float = 20.0,
+                 source_name: Optional[str] = None,
+                 interface_ip: Optional[str] = None,
+                 context: Optional[zmq.Context] = None,
+                 placement_source: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+                 metrics_window_sec: float = 1.0):
+        super().__init__(daemon=True, name="VisionListener")
+        self.multicast_group = multicast_group
+        self.multicast_port = multicast_port
+        self.publish_uri = publish_uri
+        self.publish_interval_sec = 1.0 / display_rate_hz if display_rate_hz > 0 else 0.0
+        self.source_name = source_name or None # 複数のトラッカーがいる場合に使うもの (None なら最初に届いたもの全て)
+        self.interface_ip = interface_ip if interface_ip else '0.0.0.0'
+        self.context = context or zmq.Context.instance()
+        # 別スレッド (オーケストレーター) の PlacementTracker.active を参照する。dict の差し替えのみで書き換えはされない
+        self.placement_source = placement_source
+        self.buffer = PositionBuffer(capacity=max(16, int(metrics_window_sec * 120) + 16)) # 120 Hz でも窓が収まる
+        self.geometry = PlacementGeometry(self.buffer, window_sec=metrics_window_sec)
+        # 統計
+        self.packets_received = 0
+        self.frames_published = 0
+        self.metrics_published = 0
+        self.decode_errors = 0
+        # Prometheus 形式の計測値 (上の統計を scrape 時に読む)
+        registry = metrics.REGISTRY
+        registry.counter("ssl_vision_packets_total", "Tracker datagrams received").set_function(
+            lambda: self.packets_received)
+        registry.counter("ssl_vision_frames_published_total", "Frames published on the 'vision' topic").set_function(
+            lambda: self.frames_published)
+        registry.counter("ssl_vision_placement_metrics_published_total",
+                         "Messages published on the 'placement_metrics' topic").set_function(lambda: self.metrics_published)
+        registry.counter("ssl_vision_decode_errors_total", "Tracker datagrams that could not be parsed").set_function(
+            lambda: self.decode_errors)
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        print(f"VisionListener initialized for {self.multicast_group}:{self.multicast_port}, "
+              f"publishing to {self.publish_uri} at {display_rate_hz} Hz")
+
+    def stop(self):
+        self._stop_event.set()
+        print("VisionListener stop requested.")
+
+    def _open_socket(self) -> Optional[socket.socket]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((self.interface_ip, self.multicast_port))
+            mreq = socket.inet_aton(self.multicast_group) + socket.inet_aton(self.interface_ip)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError as e:
+            print(f"VisionListener: Error opening {self.multicast_group}:{self.multicast_port}: {e}")
+            sock.close()
+            return None
+        sock.setblocking(False)
+        return sock
+
+    def run(self):
+        publisher = self.context.socket(zmq.PUB)
+        publisher.setsockopt(zmq.SNDHWM, 10) # 遅い購読者には古いフレームを溜めずに捨てる
+        publisher.setsockopt(zmq.LINGER, 0)
+        try:
+            publisher.bind(self.publish_uri)
+        except zmq.ZMQError as e:
+            print(f"VisionListener: Error binding {self.publish_uri}: {e}")
+            publisher.close()
+            return
+        sock = self._open_socket()
+        if sock is None:
+            publisher.close()
+            return
+        print(f"VisionListener joined {self.multicast_group}:{self.multicast_port}")
+        self.ready.set()
+
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+        next_publish = 0.0
+        current_placement = None
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([sock], [], [], 1.0) # stop() を確認するためのタイムアウト
+                if not readable:
+                    continue
+                # 溜まっているデータグラムを全て読み出す。buffer には最後に読んだもの (最新) が残る
+                size = 0
+                while True:
+                    try:
+                        size = sock.recv_into(buffer)
+                    except BlockingIOError:
+                        break
+                    except OSError as e:
+                        print(f"VisionListener: Socket error: {e}")
+                        break
+                    self.packets_received += 1
+                if size == 0:
+                    continue
+
+                now = time.monotonic()
+                placement = self.placement_source() if self.placement_source is not None else None
+                if placement is not None and placement.get("target") is None:
+                    placement = None
+                if placement is not current_placement:
+                    current_placement = placement
+                    self.buffer.clear()
+                due = now >= next_publish
+                if not due and placement is None:
+                    continue # 表示レートに間引く (パースもしない)
+                try:
+                    packet = tracker_pb2.TrackerWrapperPacket.FromString(view[:size])
+                except DecodeError:
+                    self.decode_errors += 1
+                    continue
+                if not packet.HasField("tracked_frame"):
+                    continue
+                if self.source_name is not None and packet.source_name != self.source_name:
+                    continue
+                frame = packet.tracked_frame
+                ball, robots = frame_positions(frame)
+                if placement is not None:
+                    self.buffer.append(frame.timestamp, ball, robots)
+                if not due:
+                    continue
+                messages = [[b"vision", encode_positions(frame.timestamp, frame.frame_number, ball, robots)]]
+                if placement is not None:
+                    placement_metrics = self.geometry.to_json(placement["team"], placement["target"])
+                    if placement_metrics is not None:
+                        messages.append([b"placement_metrics", placement_metrics])
+                for message in messages:
+                    try:
+                        publisher.send_multipart(message, flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        continue
+                    if message[0] == b"vision":
+                        self.frames_published += 1
+                    else:
+                        self.metrics_published += 1
+                # 位相を保って次の送信時刻を決める (大きく遅れた場合は今から数え直す)
+                next_publish = next_publish + self.publish_interval_sec
+                if next_publish <= now:
+                    next_publish = now + self.publish_interval_sec
+        finally:
+            sock.close()
+            publisher.close()
+            print(f"VisionListener stopped ({self.packets_received} packets received, "
+                  f"{self.frames_published} frames / {self.metrics_published} placement metrics published, "
+                  f"{self.decode_errors} decode errors)")
+
+
+if __name__ == '__main__':
+    # テスト用: 合成したトラッカーパケットをマルチキャストで送り、間引かれた 'vision' フレームを受信する
+    port = 10010
+    # 後半の 0.5 秒は青チームのボールプレースメント中として 'placement_metrics' も publish させる
+    placement = {"team": "BLUE", "target": {"x": 0.0, "y": 0.0}, "started": 0.0}
+    placement_active = threading.Event()
+    listener = VisionListener(multicast_port=port, publish_uri="tcp://127.0.0.1:55558", display_rate_hz=20,
+                              placement_source=lambda: placement if placement_active.is_set() else None)
+    listener.start()
+    listener.ready.wait(timeout=5)
+    subscriber = zmq.Context.instance().socket(zmq.SUB)
+    subscriber.setsockopt(zmq.SUBSCRIBE, b"vision")
+    subscriber.setsockopt(zmq.SUBSCRIBE, b"placement_metrics")
+    subscriber.connect("tcp://127.0.0.1:55558")
+    time.sleep(0.3)
+
+    wrapper = tracker_pb2.TrackerWrapperPacket(uuid="self-test", source_name="self-test")
+    frame = wrapper.tracked_frame
+    frame.frame_number, frame.timestamp = 0, time.time()
+    ball = frame.balls.add()
+    ball.pos.x, ball.pos.y, ball.pos.z = 1.0, -0.5, 0.0
+    robot = frame.robots.add()
+    robot.robot_id.id, robot.robot_id.team = 3, common_pb2.BLUE
+    robot.pos.x, robot.pos.y, robot.orientation = -2.0, 1.25, 1.5708
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    for i in range(100): # 100 Hz で 1 秒
+        frame.frame_number = i
+        if i == 50:
+            placement_active.set()
+        sender.sendto(wrapper.SerializeToString(), (listener.multicast_group, port))
+        time.sleep(0.01)
+    time.sleep(0.1)
+    received, placement_metrics = [], []
+    while subscriber.poll(100):
+        topic, payload = subscriber.recv_multipart()
+        (received if topic == b"vision" else placement_metrics).append(json.loads(payload))
+    listener.stop()
+    listener.join()
+    print(f"received {len(received)} frames, last: {received[-1] if received else None}")
+    assert 15 <= len(received) <= 25
+    assert received[-1]["ball"] == [1000, -500, 0] and received[-1]["robots"] == [[2, 3, -2000, 1250, 1571]]
+    print(f"received {len(placement_metrics)} placement metrics, last: {placement_metrics[-1] if placement_metrics else None}")
+    assert 5 <= len(placement_metrics) <= 13 and placement_metrics[-1]["ball_distance"] == 1118
+    assert placement_metrics[-1]["closest"]["id"] == 3 and placement_metrics[-1]["violations"] == []
@@ -6,25 +6,31 @@ set -e
 
 echo "===== サッカーフィールド可視化システムを起動しています ====="
 
+# ページのビルド (web/dist) が無ければビルドする (Docker イメージではビルド済み)
+if [ -z "$SERVE_DIRECTORY" ] && [ ! -f web/dist/index.html ]; then
+    echo "ページをビルド..."
+    (cd web && npm install --no-audit --no-fund && npm run build)
+fi
+
+# 計測値のモジュール (common/metrics.py) を import できるようにリポジトリのルートを追加する
+# (Docker イメージではブリッジと同じディレクトリにある)
+export PYTHONPATH="${PYTHONPATH:+$PYTHONPATH:}$(cd "$(dirname "$0")/.." && pwd)"
+
 # ZeroMQ WebSocketブリッジを起動（バックグラウンド）
+# ページ (HTTP) と WebSocket は同じポートで提供される
 echo "ZeroMQ-WebSocketブリッジを起動..."
 python zmq_websocket_bridge.py &
 BRIDGE_PID=$!
 
-# HTTPサーバーを起動（バックグラウンド）
-echo "HTTPサーバーを起動..."
-python serve.py &
-SERVER_PID=$!
-
 echo "システムが起動しました！"
-echo " - WebSocketブリッジは ws://localhost:8765 で利用可能"
-echo " - Webインターフェースは http://localhost:8080 で利用可能"
+echo " - Webインターフェースは http://localhost:${HTTP_PORT:-8080} で利用可能"
+echo " - WebSocketは ws://localhost:${HTTP_PORT:-8080}/ws で利用可能"
+echo " - 計測値は http://localhost:${METRICS_PORT:-9154}/metrics で利用可能"
 
 # 終了時のクリーンアップ関数
 function cleanup {
     echo "サービスを停止しています..."
     kill $BRIDGE_PID
-    kill $SERVER_PID
     echo "サービスが停止しました"
     exit 0
 }
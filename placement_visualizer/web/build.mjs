@@ -0,0 +1,57 @@
+// placement_visualizer/web/build.mjs
+// 可視化ページのオフラインビルド。
+//  1. Tailwind CLI で、ソース中で使われているクラスだけの CSS を生成する
+//  2. esbuild で JSX をバンドル・minify し、内容のハッシュ付きファイル名で dist/assets/ に出力する
+//  3. index.html のプレースホルダをハッシュ付きファイルへの参照に置き換えて dist/ に出力する
+// dist/assets/ のファイルは内容が変わると名前も変わるため、ブリッジは immutable として長期キャッシュさせる。
+//
+//   npm ci && npm run build
+import { build } from "esbuild";
+import { execFileSync } from "node:child_process";
+import { mkdirSync, readFileSync, rmSync, writeFileSync } from "node:fs";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+
+const root = path.dirname(fileURLToPath(import.meta.url));
+const outdir = path.join(root, "dist");
+const tmpdir = path.join(root, "build");
+
+rmSync(outdir, { recursive: true, force: true });
+mkdirSync(tmpdir, { recursive: true });
+
+execFileSync(
+  path.join(root, "node_modules", ".bin", "tailwindcss"),
+  ["-c", "tailwind.config.js", "-i", "src/styles.css", "-o", "build/styles.css", "--minify"],
+  { cwd: root, stdio: "inherit" },
+);
+
+const result = await build({
+  absWorkingDir: root,
+  entryPoints: { app: "src/main.jsx", styles: "build/styles.css" },
+  entryNames: "assets/[name]-[hash]",
+  outdir,
+  bundle: true,
+  minify: true,
+  format: "iife",
+  target: ["es2017"], // 会場の古いブラウザでも動くように
+  jsx: "automatic",
+  define: { "process.env.NODE_ENV": '"production"' },
+  legalComments: "none",
+  metafile: true,
+  logLevel: "info",
+});
+
+// エントリごとの出力ファイル (dist からの相対 URL)
+const urls = {};
+for (const [file, output] of Object.entries(result.metafile.outputs)) {
+  if (output.entryPoint) {
+    urls[output.entryPoint] = "/" + path.relative(outdir, path.join(root, file)).split(path.sep).join("/");
+  }
+}
+
+const html = readFileSync(path.join(root, "index.html"), "utf8")
+  .replace("<!-- build:styles -->", `<link rel="stylesheet" href="${urls["build/styles.css"]}">`)
+  .replace("<!-- build:app -->", `<script src="${urls["src/main.jsx"]}" defer></script>`);
+writeFileSync(path.join(outdir, "index.html"), html);
+rmSync(tmpdir, { recursive: true, force: true });
+console.log(`Wrote ${path.relative(root, outdir)}/index.html -> ${urls["src/main.jsx"]}, ${urls["build/styles.css"]}`);
@@ -0,0 +1,353 @@
+// placement_visualizer/web/src/fieldRenderer.js
+// フィールドを canvas に描画するレンダラー。
+// 静的な要素 (芝・センターライン・センターサークル・ペナルティ / ゴールエリア・座標軸) は
+// オフスクリーンの canvas に 1 回だけ描画し、フレームごとにはそれを drawImage で貼ってから
+// マーカー (ロボット・ボール・配置位置・履歴・マウス位置) だけを重ねる。描画は requestAnimationFrame で 1 フレーム 1 回にまとめる。
+
+const FIELD_COLOR = "#16a34a"; // 旧 DOM 版の bg-green-600
+const LINE_COLOR = "#ffffff";
+const AXIS_COLOR = "#000000";
+const PLACEMENT_COLOR = "#f97316"; // bg-orange-500
+const MOUSE_COLOR = "rgba(59, 130, 246, 0.7)"; // bg-blue-500 opacity-70
+const TEAM_COLORS = { YELLOW: "#ca8a04", BLUE: "#2563eb" };
+const HISTORY_COLOR = "#6b7280";
+const ROBOT_COLORS = ["#6b7280", "#facc15", "#3b82f6"]; // 'vision' トピックのチーム番号 (0: 不明, 1: 黄, 2: 青)
+const ROBOT_OUTLINE_COLOR = "#000000";
+const BALL_COLOR = "#fb923c";
+const VIOLATION_COLOR = "#dc2626"; // プレースメント中に線分 0.5 m 以内にいる相手ロボットの枠
+const VIOLATION_TEAM_CODES = { YELLOW: 1, BLUE: 2 };
+
+const CENTER_CIRCLE_RADIUS_MM = 500; // SSL ルールのセンターサークル半径
+const ROBOT_RADIUS_MM = 90; // SSL ロボットの最大直径 180 mm
+const BALL_RADIUS_MM = 21.5;
+const BALL_MIN_RADIUS_PX = 3;
+const LINE_WIDTH_PX = 2;
+const AXIS_LENGTH_PX = 15;
+const AXIS_TIP_PX = 3;
+const MOUSE_RADIUS_PX = 6;
+const HISTORY_RADIUS_PX = 4;
+
+export const DEFAULT_OPTIONS = {
+  fieldLength: 12000, // mm
+  fieldWidth: 9000, // mm
+  showCenterLine: true,
+  showCenterCircle: true,
+  showPenaltyAreas: true,
+  showGoalAreas: true,
+  showCoordinateAxes: true,
+  ballSize: 10, // フィールド表示幅に対する % (旧 DOM 版と同じ)
+};
+
+function createLayer() {
+  return document.createElement("canvas");
+}
+
+export class FieldRenderer {
+  constructor(canvas) {
+    this.canvas = canvas;
+    this.ctx = canvas.getContext("2d");
+    this.options = { ...DEFAULT_OPTIONS };
+    this.placement = null; // {x, y} (mm)
+    this.history = []; // [{location, team}] 古い順
+    this.mouse = null; // {x, y} (mm)
+    this.vision = null; // 'vision' トピックの最新フレーム {ball: [x, y, z] | null, robots: [[team, id, x, y, orientation_mrad]]}
+    this.violations = new Set(); // 違反中のロボット (team * 16 + id)
+
+    this.staticLayer = createLayer();
+    this.staticDirty = true;
+    this.cssWidth = 0;
+    this.cssHeight = 0;
+    this.dpr = 1;
+    this.frame = 0; // 予約済みの requestAnimationFrame の ID (0 なら未予約)
+    this.framesDrawn = 0;
+
+    this._draw = this._draw.bind(this);
+    // 表示サイズの変更は ResizeObserver で検知し、静的レイヤーを描き直す
+    this.resizeObserver = typeof ResizeObserver !== "undefined"
+      ? new ResizeObserver(() => this.invalidate())
+      : null;
+    if (this.resizeObserver) {
+      this.resizeObserver.observe(canvas);
+    }
+  }
+
+  destroy() {
+    if (this.frame) {
+      cancelAnimationFrame(this.frame);
+      this.frame = 0;
+    }
+    if (this.resizeObserver) {
+      this.resizeObserver.disconnect();
+    }
+  }
+
+  // 表示設定を変更する (静的レイヤーに関わる設定が変わった場合だけ描き直す)
+  setOptions(options) {
+    let changed = false;
+    for (const key of Object.keys(options)) {
+      if (this.options[key] !== options[key]) {
+        this.options[key] = options[key];
+        changed = true;
+      }
+    }
+    if (changed) {
+      this.invalidate();
+    }
+  }
+
+  setPlacement(location, history) {
+    this.placement = location;
+    this.history = history;
+    this.requestRender();
+  }
+
+  // ロボット・ボールの位置 (20 Hz 程度で届く)。React の state を通さず直接描画する
+  setVision(frame) {
+    this.vision = frame;
+    this.requestRender();
+  }
+
+  // 'placement_metrics' の violations ([{team, id, ...}]) のロボットを強調する
+  setViolations(violations) {
+    this.violations = new Set((violations || []).map((v) => VIOLATION_TEAM_CODES[v.team] * 16 + v.id));
+    this.requestRender();
+  }
+
+  setMouse(location) {
+    this.mouse = location;
+    this.requestRender();
+  }
+
+  invalidate() {
+    this.staticDirty = true;
+    this.requestRender();
+  }
+
+  // 次のフレームで 1 回だけ描画する (同じフレーム内の複数回の呼び出しはまとめられる)
+  requestRender() {
+    if (!this.frame) {
+      this.frame = requestAnimationFrame(this._draw);
+    }
+  }
+
+  // --- 座標変換 (フィールド座標 mm は中心が原点、y は上向き) ---
+  toPixel(x, y) {
+    const { fieldLength, fieldWidth } = this.options;
+    return [
+      ((x + fieldLength / 2) / fieldLength) * this.cssWidth,
+      ((-y + fieldWidth / 2) / fieldWidth) * this.cssHeight,
+    ];
+  }
+
+  // clientX / clientY をフィールド座標 (mm) に変換する
+  toField(clientX, clientY) {
+    const rect = this.canvas.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0) return null;
+    const { fieldLength, fieldWidth } = this.options;
+    const normalizedX = (clientX - rect.left) / rect.width;
+    const normalizedY = (clientY - rect.top) / rect.height;
+    return {
+      x: normalizedX * fieldLength - fieldLength / 2,
+      y: -1 * (normalizedY * fieldWidth - fieldWidth / 2),
+    };
+  }
+
+  _resize() {
+    const rect = this.canvas.getBoundingClientRect();
+    const dpr = window.devicePixelRatio || 1;
+    if (rect.width === this.cssWidth && rect.height === this.cssHeight && dpr === this.dpr) {
+      return;
+    }
+    this.cssWidth = rect.width;
+    this.cssHeight = rect.height;
+    this.dpr = dpr;
+    for (const layer of [this.canvas, this.staticLayer]) {
+      layer.width = Math.max(1, Math.round(rect.width * dpr));
+      layer.height = Math.max(1, Math.round(rect.height * dpr));
+    }
+    this.staticDirty = true;
+  }
+
+  // 静的レイヤーの描画 (設定・サイズが変わった時だけ)
+  _drawStatic() {
+    const ctx = this.staticLayer.getContext("2d");
+    const { fieldLength } = this.options;
+    const w = this.cssWidth;
+    const h = this.cssHeight;
+    ctx.setTransform(this.dpr, 0, 0, this.dpr, 0, 0);
+    ctx.fillStyle = FIELD_COLOR;
+    ctx.fillRect(0, 0, w, h);
+
+    ctx.strokeStyle = LINE_COLOR;
+    ctx.lineWidth = LINE_WIDTH_PX;
+    ctx.beginPath();
+    // 外周
+    ctx.rect(LINE_WIDTH_PX / 2, LINE_WIDTH_PX / 2, w - LINE_WIDTH_PX, h - LINE_WIDTH_PX);
+    if (this.options.showCenterLine) {
+      ctx.moveTo(w / 2, 0);
+      ctx.lineTo(w / 2, h);
+    }
+    // ペナルティエリア・ゴールエリアは旧 DOM 版と同じ比率 (長さ 1/6 x 幅 1/2, 長さ 1/12 x 幅 1/4)
+    if (this.options.showPenaltyAreas) {
+      this._goalSideBoxes(ctx, w / 6, h / 2);
+    }
+    if (this.options.showGoalAreas) {
+      this._goalSideBoxes(ctx, w / 12, h / 4);
+    }
+    ctx.stroke();
+
+    if (this.options.showCenterCircle) {
+      const radius = (CENTER_CIRCLE_RADIUS_MM / fieldLength) * w;
+      ctx.beginPath();
+      ctx.arc(w / 2, h / 2, radius, 0, 2 * Math.PI);
+      ctx.stroke();
+    }
+
+    if (this.options.showCoordinateAxes) {
+      const cx = w / 2;
+      const cy = h / 2;
+      ctx.strokeStyle = AXIS_COLOR;
+      ctx.lineWidth = 1;
+      ctx.beginPath();
+      // X 軸 (右向き) と Y 軸 (上向き)
+      ctx.moveTo(cx, cy);
+      ctx.lineTo(cx + AXIS_LENGTH_PX, cy);
+      ctx.moveTo(cx + AXIS_LENGTH_PX - AXIS_TIP_PX, cy - AXIS_TIP_PX);
+      ctx.lineTo(cx + AXIS_LENGTH_PX, cy);
+      ctx.lineTo(cx + AXIS_LENGTH_PX - AXIS_TIP_PX, cy + AXIS_TIP_PX);
+      ctx.moveTo(cx, cy);
+      ctx.lineTo(cx, cy - AXIS_LENGTH_PX);
+      ctx.moveTo(cx - AXIS_TIP_PX, cy - AXIS_LENGTH_PX + AXIS_TIP_PX);
+      ctx.lineTo(cx, cy - AXIS_LENGTH_PX);
+      ctx.lineTo(cx + AXIS_TIP_PX, cy - AXIS_LENGTH_PX + AXIS_TIP_PX);
+      ctx.stroke();
+    }
+    this.staticDirty = false;
+  }
+
+  // 左右のゴール側に、奥行き depth・高さ height の枠を描く (外周側の辺は外周線と重なる)
+  _goalSideBoxes(ctx, depth, height) {
+    const top = (this.cssHeight - height) / 2;
+    ctx.moveTo(0, top);
+    ctx.lineTo(depth, top);
+    ctx.lineTo(depth, top + height);
+    ctx.lineTo(0, top + height);
+    ctx.moveTo(this.cssWidth, top);
+    ctx.lineTo(this.cssWidth - depth, top);
+    ctx.lineTo(this.cssWidth - depth, top + height);
+    ctx.lineTo(this.cssWidth, top + height);
+  }
+
+  _dot(x, y, radius, color) {
+    const [px, py] = this.toPixel(x, y);
+    this.ctx.fillStyle = color;
+    this.ctx.beginPath();
+    this.ctx.arc(px, py, radius, 0, 2 * Math.PI);
+    this.ctx.fill();
+  }
+
+  _drawVision(frame) {
+    const ctx = this.ctx;
+    const scale = this.cssWidth / this.options.fieldLength; // px / mm
+    const robotRadius = ROBOT_RADIUS_MM * scale;
+    ctx.lineWidth = 1;
+    ctx.strokeStyle = ROBOT_OUTLINE_COLOR;
+    for (const [team, , x, y, orientation] of frame.robots) {
+      const [px, py] = this.toPixel(x, y);
+      const angle = orientation / 1000;
+      ctx.fillStyle = ROBOT_COLORS[team] || ROBOT_COLORS[0];
+      ctx.beginPath();
+      ctx.arc(px, py, robotRadius, 0, 2 * Math.PI);
+      ctx.fill();
+      // 向き (y は画面上で下向きなので符号を反転する)
+      ctx.moveTo(px, py);
+      ctx.lineTo(px + Math.cos(angle) * robotRadius, py - Math.sin(angle) * robotRadius);
+      ctx.stroke();
+    }
+    if (this.violations.size) {
+      ctx.strokeStyle = VIOLATION_COLOR;
+      ctx.lineWidth = 2;
+      ctx.beginPath();
+      for (const [team, id, x, y] of frame.robots) {
+        if (!this.violations.has(team * 16 + id)) continue;
+        const [px, py] = this.toPixel(x, y);
+        ctx.moveTo(px + robotRadius + 2, py);
+        ctx.arc(px, py, robotRadius + 2, 0, 2 * Math.PI);
+      }
+      ctx.stroke();
+    }
+    if (frame.ball) {
+      this._dot(frame.ball[0], frame.ball[1], Math.max(BALL_MIN_RADIUS_PX, BALL_RADIUS_MM * scale), BALL_COLOR);
+    }
+  }
+
+  _draw() {
+    this.frame = 0;
+    this._resize();
+    if (this.cssWidth === 0 || this.cssHeight === 0) return;
+    if (this.staticDirty) {
+      this._drawStatic();
+    }
+    const ctx = this.ctx;
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.drawImage(this.staticLayer, 0, 0);
+    ctx.setTransform(this.dpr, 0, 0, this.dpr, 0, 0);
+
+    if (this.vision) {
+      this._drawVision(this.vision);
+    }
+
+    // 直近の配置履歴 (最新は配置位置として別に描くので除く)
+    const older = this.history.length - 1;
+    for (let i = 0; i < older; i++) {
+      const entry = this.history[i];
+      ctx.globalAlpha = 0.25 + (0.5 * (i + 1)) / older;
+      this._dot(entry.location.x, entry.location.y, HISTORY_RADIUS_PX, TEAM_COLORS[entry.team] || HISTORY_COLOR);
+    }
+    ctx.globalAlpha = 1;
+
+    if (this.placement) {
+      const radius = ((this.options.ballSize / 100) * this.cssWidth) / 2;
+      this._dot(this.placement.x, this.placement.y, radius, PLACEMENT_COLOR);
+    }
+    if (this.mouse) {
+      this._dot(this.mouse.x, this.mouse.y, MOUSE_RADIUS_PX, MOUSE_COLOR);
+    }
+    this.framesDrawn += 1;
+  }
+}
+
+// フレームごとに 1 回だけ flush するキュー。
+// WebSocket のメッセージを受信のたびに処理せず溜めておき、次のフレームでまとめて渡す。
+export class FrameBatcher {
+  constructor(flush) {
+    this.flush = flush;
+    this.pending = [];
+    this.frame = 0;
+    this._run = this._run.bind(this);
+  }
+
+  push(item) {
+    this.pending.push(item);
+    if (!this.frame) {
+      this.frame = requestAnimationFrame(this._run);
+    }
+  }
+
+  cancel() {
+    if (this.frame) {
+      cancelAnimationFrame(this.frame);
+      this.frame = 0;
+    }
+    this.pending = [];
+  }
+
+  _run() {
+    this.frame = 0;
+    const batch = this.pending;
+    this.pending = [];
+    if (batch.length) {
+      this.flush(batch);
+    }
+  }
+}
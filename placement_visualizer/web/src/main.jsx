@@ -0,0 +1,548 @@
+// placement_visualizer/web/src/main.jsx
+// ブラウザ上の Babel 変換をやめ、build.mjs (esbuild) で事前にバンドルする
+import { useState, useEffect, useRef } from "react";
+import { createRoot } from "react-dom/client";
+import { FieldRenderer, FrameBatcher } from "./fieldRenderer.js";
+import { BINARY_SUBPROTOCOL, decodePlacements } from "./placementCodec.js";
+import { TimerAnchors } from "./timerAnchors.js";
+
+const HISTORY_LENGTH = 10; // 履歴に残すイベント数
+const COUNTDOWN_INTERVAL_MS = 100; // プレースメントの残り時間の表示を更新する間隔
+
+// ブリッジに送る購読条件 (このページは配置関連のイベントと、ロボット・ボールの位置を受け取る)
+const SUBSCRIPTION = {
+  op: "subscribe",
+  topics: ["event", "placement", "timers", "vision", "placement_metrics"],
+  filters: [{ event_types: ["COMMAND_BALL_PLACEMENT_*", "EVENT_PLACEMENT_*"] }],
+};
+
+// 配置イベントから位置を取り出す (配置イベントでなければ null)
+const placementOf = (event) => {
+  if (!event.event_type || !(
+      event.event_type.includes("PLACEMENT_SUCCEEDED") ||
+      event.event_type.includes("BALL_PLACEMENT") ||
+      event.event_type.includes("COMMAND_BALL_PLACEMENT")
+    )) {
+    return null;
+  }
+  const location = event.data && event.data.location ?
+                  event.data.location :
+                  (event.data && event.data.placement_pos ?
+                    event.data.placement_pos : null);
+  if (!location) return null;
+  return {
+    timestamp: event.timestamp,
+    event_type: event.event_type,
+    location: location,
+    team: event.data.team || "UNKNOWN"
+  };
+};
+
+const FieldVisualization = () => {
+
+  // フィールドの寸法（mm単位、RoboCup SSLフィールドの標準寸法を使用）
+  const [fieldLength, setFieldLength] = useState(12000); // mm
+  const [fieldWidth, setFieldWidth] = useState(9000);   // mm
+
+  // 装飾表示の制御用state
+  const [showCenterLine, setShowCenterLine] = useState(true);
+  const [showCenterCircle, setShowCenterCircle] = useState(true);
+  const [showPenaltyAreas, setShowPenaltyAreas] = useState(true);
+  const [showGoalAreas, setShowGoalAreas] = useState(true);
+  const [showCoordinateAxes, setShowCoordinateAxes] = useState(true);
+
+  const [placementLocation, setPlacementLocation] = useState(null);
+  const [mousePosition, setMousePosition] = useState(null);
+  const [ballSize, setBallSize] = useState(10); // %
+  const [eventHistory, setEventHistory] = useState([]);
+  // オーケストレーターの 'placement' トピック (目標位置・直近の結果)
+  const [placementStatus, setPlacementStatus] = useState(null);
+  // プレースメントの残り時間 ('timers' トピックの action のアンカーから外挿する)
+  const [actionRemaining, setActionRemaining] = useState(null);
+  const timerAnchorsRef = useRef(new TimerAnchors());
+  // プレースメント中の派生指標 ('placement_metrics' トピック: 目標までの距離・接近速度・違反ロボット)
+  const [placementMetrics, setPlacementMetrics] = useState(null);
+  const [connected, setConnected] = useState(false);
+  const [error, setError] = useState(null);
+
+  // フィールドの canvas と、その描画・イベントのまとめ処理
+  // (イベントやマウス移動のたびに React の再レンダリングをせず、1 フレームに 1 回だけ反映する)
+  const canvasRef = useRef(null);
+  const rendererRef = useRef(null);
+  const historyRef = useRef([]);
+  const eventBatcherRef = useRef(null);
+  const mouseBatcherRef = useRef(null);
+
+  useEffect(() => {
+    const renderer = new FieldRenderer(canvasRef.current);
+    rendererRef.current = renderer;
+
+    // 1 フレーム分のイベントをまとめて履歴に反映し、state の更新と再描画を 1 回で済ませる
+    const eventBatcher = new FrameBatcher((events) => {
+      let history = historyRef.current;
+      let changed = false;
+      for (const event of events) {
+        const entry = placementOf(event);
+        if (entry) {
+          history = history.length >= HISTORY_LENGTH ? history.slice(1) : history.slice();
+          history.push(entry);
+          changed = true;
+        }
+      }
+      if (!changed) return;
+      historyRef.current = history;
+      const latest = history[history.length - 1].location;
+      renderer.setPlacement(latest, history);
+      setPlacementLocation(latest);
+      setEventHistory(history);
+    });
+    // マウス位置は canvas にはすぐ反映し、座標表示の state は 1 フレームに 1 回だけ更新する
+    const mouseBatcher = new FrameBatcher((positions) => {
+      setMousePosition(positions[positions.length - 1]);
+    });
+    eventBatcherRef.current = eventBatcher;
+    mouseBatcherRef.current = mouseBatcher;
+
+    return () => {
+      eventBatcher.cancel();
+      mouseBatcher.cancel();
+      renderer.destroy();
+    };
+  }, []);
+
+  // 表示設定の変更 (静的レイヤーの描き直し)
+  useEffect(() => {
+    rendererRef.current.setOptions({
+      fieldLength, fieldWidth, showCenterLine, showCenterCircle,
+      showPenaltyAreas, showGoalAreas, showCoordinateAxes, ballSize,
+    });
+  }, [fieldLength, fieldWidth, showCenterLine, showCenterCircle,
+      showPenaltyAreas, showGoalAreas, showCoordinateAxes, ballSize]);
+
+  // プレースメント中だけ、アンカーから残り時間を外挿して表示を更新する
+  const placementActive = Boolean(placementStatus && placementStatus.placement);
+  useEffect(() => {
+    if (!placementActive) {
+      setActionRemaining(null);
+      return undefined;
+    }
+    const tick = () => setActionRemaining(timerAnchorsRef.current.value("action"));
+    tick();
+    const timer = setInterval(tick, COUNTDOWN_INTERVAL_MS);
+    return () => clearInterval(timer);
+  }, [placementActive]);
+
+  // フィールドサイズの変更ハンドラー
+  const handleFieldLengthChange = (e) => {
+    const value = parseInt(e.target.value, 10);
+    if (!isNaN(value) && value > 0) {
+      setFieldLength(value);
+    }
+  };
+
+  const handleFieldWidthChange = (e) => {
+    const value = parseInt(e.target.value, 10);
+    if (!isNaN(value) && value > 0) {
+      setFieldWidth(value);
+    }
+  };
+
+  const handleBallSizeChange = (e) => {
+    const value = parseInt(e.target.value, 10);
+    if (!isNaN(value) && value > 0 && value <= 100) {
+      setBallSize(value);
+    }
+  };
+
+  // マウス位置をピクセルから実際のフィールド座標（mm）に変換
+  const handleMouseMove = (e) => {
+    const renderer = rendererRef.current;
+    const position = renderer.toField(e.clientX, e.clientY);
+    if (!position) return;
+    renderer.setMouse(position);
+    mouseBatcherRef.current.push(position);
+  };
+
+  const handleMouseLeave = () => {
+    rendererRef.current.setMouse(null);
+    mouseBatcherRef.current.push(null);
+  };
+
+  // テスト用のイベントシミュレーション関数
+  const simulateEvent = () => {
+    // ランダムな位置を生成
+    const randomX = Math.random() * fieldLength - (fieldLength / 2);
+    const randomY = Math.random() * fieldWidth - (fieldWidth / 2);
+    const position = { x: randomX, y: randomY };
+
+    // ランダムなチームを選択
+    const teams = ["YELLOW", "BLUE"];
+    const randomTeam = teams[Math.floor(Math.random() * teams.length)];
+    const eventType = randomTeam === "YELLOW" ? "EVENT_PLACEMENT_SUCCEEDED_YELLOW" : "EVENT_PLACEMENT_SUCCEEDED_BLUE";
+    // イベントを生成
+    const newEvent = {
+      timestamp: Date.now() / 1000,
+      event_type: eventType,
+      data: {
+        team: randomTeam,
+        location: position
+      }
+    };
+
+    handleNewEvent(newEvent);
+  };
+
+  // 新しいイベントを次のフレームでまとめて処理する
+  const handleNewEvent = (event) => {
+    eventBatcherRef.current.push(event);
+  };
+
+  // WebSocketブリッジに接続する
+  useEffect(() => {
+    let socket = null;
+
+    // トピックごとに処理 (vision: 位置, event: 配置イベント, placement: 目標位置・結果, timers: 残り時間のアンカー)
+    const handleMessage = (message) => {
+      if (message.topic === 'vision' && message.data) {
+        // 位置は頻繁に届くので React の state を経由せず、レンダラーに直接渡す
+        if (rendererRef.current) rendererRef.current.setVision(message.data);
+      } else if (message.topic === 'event' && message.data) {
+        handleNewEvent(message.data);
+      } else if (message.topic === 'timers' && message.data) {
+        timerAnchorsRef.current.update(message.data);
+      } else if (message.topic === 'placement_metrics' && message.data) {
+        setPlacementMetrics(message.data);
+        if (rendererRef.current) rendererRef.current.setViolations(message.data.violations);
+      } else if (message.topic === 'placement' && message.data) {
+        setPlacementStatus(message.data);
+        if (!message.data.placement) {
+          setPlacementMetrics(null);
+          if (rendererRef.current) rendererRef.current.setViolations([]);
+        }
+      } else if (message.topic === 'subscription' && message.data && message.data.error) {
+        console.error("購読条件の設定エラー:", message.data.error);
+      }
+    };
+
+    const connectToEventStream = async () => {
+      try {
+        // WebSocketサーバーに接続
+        // ページと同じホスト・ポートの /ws (ブリッジが HTTP と WebSocket を同じポートで提供する)
+        const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+        const wsUrl = `${scheme}://${window.location.host}/ws`;
+        // 配置イベントはバイナリのレコードで受け取る (?protocol=json で従来の JSON に戻せる)。
+        // ブリッジが対応していなければサブプロトコル無し (JSON) で接続される
+        const useJson = new URLSearchParams(window.location.search).get("protocol") === "json";
+        socket = useJson ? new WebSocket(wsUrl) : new WebSocket(wsUrl, [BINARY_SUBPROTOCOL]);
+        socket.binaryType = "arraybuffer";
+
+        // 接続開始
+        socket.addEventListener('open', (event) => {
+          console.log(`イベントストリームに接続しました（WebSocket経由, ${socket.protocol || "json"}）`);
+          socket.send(JSON.stringify(SUBSCRIPTION));
+          setConnected(true);
+          setError(null);
+        });
+
+        // メッセージを受信
+        socket.addEventListener('message', (event) => {
+          try {
+            if (event.data instanceof ArrayBuffer) {
+              decodePlacements(event.data, handleNewEvent);
+              return;
+            }
+            // ブリッジは同じ表示フレーム内に届いたメッセージを配列 1 つにまとめて送る
+            const parsed = JSON.parse(event.data);
+            for (const message of Array.isArray(parsed) ? parsed : [parsed]) {
+              handleMessage(message);
+            }
+          } catch (err) {
+            console.error("WebSocketメッセージの処理エラー:", err);
+          }
+        });
+
+        // 接続エラー
+        socket.addEventListener('error', (event) => {
+          console.error("WebSocketエラー:", event);
+          setConnected(false);
+          setError("WebSocket接続エラー");
+        });
+
+        // 接続終了
+        socket.addEventListener('close', (event) => {
+          console.log("WebSocket接続が閉じられました");
+          setConnected(false);
+
+          // これがクリーンな終了でなかった場合、遅延後に再接続を試みる
+          if (!event.wasClean) {
+            setError(`予期せず接続が閉じられました: ${event.reason || "不明な理由"}`);
+            setTimeout(connectToEventStream, 3000);
+          }
+        });
+      } catch (err) {
+        setConnected(false);
+        setError(`接続エラー: ${err.message}`);
+        // 遅延後に再接続を試みる
+        setTimeout(connectToEventStream, 3000);
+      }
+    };
+
+    connectToEventStream();
+
+    // クリーンアップ関数
+    return () => {
+      if (socket) {
+        console.log("WebSocket接続を閉じています");
+        socket.close();
+      }
+    };
+  }, []);
+
+  return (
+    <div className="flex flex-col items-center p-4 bg-gray-100 min-h-screen">
+      <h1 className="text-2xl font-bold mb-2">サッカーフィールド配置可視化</h1>
+
+      {/* フィールドサイズ設定 */}
+      <div className="w-full max-w-6xl mb-4 bg-white p-4 rounded shadow">
+        <h3 className="font-semibold mb-2">フィールド設定</h3>
+        <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+          {/* サイズ設定 */}
+          <div>
+            <h4 className="font-medium mb-2">フィールドサイズ</h4>
+            <div className="flex flex-col gap-2">
+              <div className="flex items-center">
+                <label htmlFor="fieldLength" className="mr-2 w-24">長さ:</label>
+                <input 
+                  id="fieldLength"
+                  type="number" 
+                  value={fieldLength} 
+                  onChange={handleFieldLengthChange}
+                  className="w-24 px-2 py-1 border rounded" 
+                />
+                <span className="ml-1">mm</span>
+              </div>
+              <div className="flex items-center">
+                <label htmlFor="fieldWidth" className="mr-2 w-24">幅:</label>
+                <input 
+                  id="fieldWidth"
+                  type="number" 
+                  value={fieldWidth} 
+                  onChange={handleFieldWidthChange}
+                  className="w-24 px-2 py-1 border rounded" 
+                />
+                <span className="ml-1">mm</span>
+              </div>
+            </div>
+          </div>
+
+          {/* 装飾表示設定 */}
+          <div>
+            <h4 className="font-medium mb-2">フィールド装飾</h4>
+            <div className="grid grid-cols-2 gap-2">
+              <div className="flex items-center">
+                <input 
+                  id="centerLine" 
+                  type="checkbox" 
+                  checked={showCenterLine} 
+                  onChange={(e) => setShowCenterLine(e.target.checked)}
+                  className="mr-2"
+                />
+                <label htmlFor="centerLine">センターライン</label>
+              </div>
+              <div className="flex items-center">
+                <input 
+                  id="centerCircle" 
+                  type="checkbox" 
+                  checked={showCenterCircle} 
+                  onChange={(e) => setShowCenterCircle(e.target.checked)}
+                  className="mr-2"
+                />
+                <label htmlFor="centerCircle">センターサークル</label>
+              </div>
+              <div className="flex items-center">
+                <input 
+                  id="penaltyAreas" 
+                  type="checkbox" 
+                  checked={showPenaltyAreas} 
+                  onChange={(e) => setShowPenaltyAreas(e.target.checked)}
+                  className="mr-2"
+                />
+                <label htmlFor="penaltyAreas">ペナルティエリア</label>
+              </div>
+              <div className="flex items-center">
+                <input 
+                  id="goalAreas" 
+                  type="checkbox" 
+                  checked={showGoalAreas} 
+                  onChange={(e) => setShowGoalAreas(e.target.checked)}
+                  className="mr-2"
+                />
+                <label htmlFor="goalAreas">ゴールエリア</label>
+              </div>
+              <div className="flex items-center">
+                <input 
+                  id="coordinateAxes" 
+                  type="checkbox" 
+                  checked={showCoordinateAxes} 
+                  onChange={(e) => setShowCoordinateAxes(e.target.checked)}
+                  className="mr-2"
+                />
+                <label htmlFor="coordinateAxes">座標軸</label>
+              </div>
+              {/* ボールサイズ設定 */}
+              <div className="flex items-center">
+                <label htmlFor="ballSize" className="mr-2 w-24">ボールサイズ:</label>
+                <input 
+                  id="ballSize"
+                  type="number" 
+                  value={ballSize} 
+                  onChange={handleBallSizeChange}
+                  className="w-24 px-2 py-1 border rounded" 
+                />
+                <span className="ml-1">%</span>
+              </div>
+            </div>
+          </div>
+        </div>
+      </div>
+
+      <div className="flex w-full max-w-6xl">
+        {/* フィールド可視化 */}
+        <div className="w-2/3 mr-4">
+          <div className="bg-white p-4 rounded shadow">
+            <div 
+              className="relative" 
+              style={{ width: '100%', paddingBottom: `${(fieldWidth / fieldLength) * 100}%` }}
+            >
+              {/* サッカーフィールド (fieldRenderer.js が描画する) */}
+              <canvas
+                ref={canvasRef}
+                className="absolute inset-0 w-full h-full"
+                onMouseMove={handleMouseMove}
+                onMouseLeave={handleMouseLeave}
+              ></canvas>
+            </div>
+
+            <div className="mt-4 flex justify-between items-center">
+              <div>
+                {connected ? (
+                  <span className="text-green-600 font-semibold">✓ 接続済み</span>
+                ) : (
+                  <span className="text-red-600 font-semibold">✗ 未接続</span>
+                )}
+                {error && <p className="text-red-600 text-sm">{error}</p>}
+              </div>
+
+              {/* テストコントロール */}
+              <div>
+                <button 
+                  className="bg-blue-500 hover:bg-blue-600 text-white px-4 py-1 rounded"
+                  onClick={simulateEvent}
+                >
+                  配置イベントをシミュレート
+                </button>
+              </div>
+            </div>
+          </div>
+
+          {/* 座標表示 */}
+          <div className="bg-white mt-4 p-4 rounded shadow">
+            <div className="grid grid-cols-3 gap-4">
+              <div>
+                <h3 className="font-semibold mb-2">現在の配置位置:</h3>
+                {placementLocation ? (
+                  <p>
+                    X: {placementLocation.x.toFixed(2)} mm, 
+                    Y: {placementLocation.y.toFixed(2)} mm
+                  </p>
+                ) : (
+                  <p>配置位置が受信されていません</p>
+                )}
+              </div>
+
+              <div>
+                <h3 className="font-semibold mb-2">マウス位置:</h3>
+                {mousePosition ? (
+                  <p>
+                    X: {mousePosition.x.toFixed(2)} mm, 
+                    Y: {mousePosition.y.toFixed(2)} mm
+                  </p>
+                ) : (
+                  <p>フィールド上にマウスを置いてください</p>
+                )}
+              </div>
+
+              <div>
+                <h3 className="font-semibold mb-2">ボールプレースメント:</h3>
+                {placementStatus && placementStatus.placement ? (
+                  <p>
+                    <span className={placementStatus.placement.team === "YELLOW" ? "text-yellow-600" : "text-blue-600"}>
+                      {placementStatus.placement.team}
+                    </span>
+                    {actionRemaining !== null && (
+                      <span className="ml-2 font-mono">残り {actionRemaining.toFixed(1)} s</span>
+                    )}
+                  </p>
+                ) : (
+                  <p>実行中のプレースメントはありません</p>
+                )}
+                {placementStatus && placementStatus.placement && placementMetrics && (
+                  <p className="text-sm font-mono">
+                    目標まで {(placementMetrics.ball_distance / 1000).toFixed(2)} m
+                    {placementMetrics.eta_sec !== null && ` (約 ${placementMetrics.eta_sec} s)`}
+                    {placementMetrics.violations.length > 0 && (
+                      <span className="ml-2 text-red-600">
+                        違反: {placementMetrics.violations.map((v) => `${v.team[0]}${v.id}`).join(", ")}
+                      </span>
+                    )}
+                  </p>
+                )}
+                {placementStatus && placementStatus.last_result && (
+                  <p className="text-sm text-gray-500">
+                    前回: {placementStatus.last_result.team} {placementStatus.last_result.outcome}
+                    {placementStatus.last_result.duration_sec !== null && ` (${placementStatus.last_result.duration_sec} s)`}
+                  </p>
+                )}
+              </div>
+            </div>
+          </div>
+        </div>
+
+
+        {/* イベント履歴 */}
+        <div className="w-1/3">
+          <div className="bg-white p-4 rounded shadow h-full">
+            <h3 className="font-semibold mb-2">イベント履歴</h3>
+            {eventHistory.length === 0 ? (
+              <p className="text-gray-500">イベントが受信されていません</p>
+            ) : (
+              <ul className="divide-y">
+                {eventHistory.slice().reverse().map((event, idx) => (
+                  <li key={idx} className="py-2">
+                    <div className="flex justify-between">
+                      <span className={`font-medium ${event.team === "YELLOW" ? "text-yellow-600" : "text-blue-600"}`}>
+                        {event.event_type.replace("EVENT_", "").replace("_YELLOW", "").replace("_BLUE", "")}
+                      </span>
+                      <span className="text-sm text-gray-500">
+                        {new Date(event.timestamp * 1000).toLocaleTimeString()}
+                      </span>
+                    </div>
+                    <div className="text-sm">
+                      X: {event.location.x.toFixed(2)} mm, 
+                      Y: {event.location.y.toFixed(2)} mm
+                    </div>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
+        </div>
+      </div>
+    </div>
+  );
+};
+
+// アプリケーションをレンダリング
+const rootElement = document.getElementById('root');
+const root = createRoot(rootElement);
+root.render(<FieldVisualization />);
@@ -0,0 +1,34 @@
+// placement_visualizer/web/src/placementCodec.js
+// ブリッジのバイナリサブプロトコル (zmq_websocket_bridge.py の BINARY_SUBPROTOCOL) のデコーダー。
+// 配置イベント 1 件を固定長のリトルエンディアンのレコードで受け取る:
+//   type code (u8), team (u8), x [mm] (f32), y [mm] (f32), timestamp [s] (f64)  = 18 バイト
+// 1 メッセージに複数のレコードが連続していてもよい。
+
+export const BINARY_SUBPROTOCOL = "ssl-placement.v1";
+export const RECORD_SIZE = 18;
+
+// type code -> event_type の接頭辞 (ブリッジの PLACEMENT_TYPE_CODES と対応)
+const EVENT_TYPES = [null, "EVENT_PLACEMENT_SUCCEEDED", "COMMAND_BALL_PLACEMENT"];
+const TEAMS = ["UNKNOWN", "YELLOW", "BLUE"];
+
+// ArrayBuffer のレコードを JSON 版と同じ形のイベント ({timestamp, event_type, data: {team, location}}) にして
+// onEvent に渡す。未知の type code のレコードは読み飛ばす。返り値はデコードしたイベント数
+export function decodePlacements(buffer, onEvent) {
+  const view = new DataView(buffer);
+  let decoded = 0;
+  for (let offset = 0; offset + RECORD_SIZE <= buffer.byteLength; offset += RECORD_SIZE) {
+    const prefix = EVENT_TYPES[view.getUint8(offset)];
+    if (!prefix) continue;
+    const team = TEAMS[view.getUint8(offset + 1)] || "UNKNOWN";
+    onEvent({
+      timestamp: view.getFloat64(offset + 10, true),
+      event_type: team === "UNKNOWN" ? prefix : `${prefix}_${team}`,
+      data: {
+        team,
+        location: { x: view.getFloat32(offset + 2, true), y: view.getFloat32(offset + 6, true) },
+      },
+    });
+    decoded += 1;
+  }
+  return decoded;
+}
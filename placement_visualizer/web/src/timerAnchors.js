@@ -0,0 +1,30 @@
+// placement_visualizer/web/src/timerAnchors.js
+// 'timers' トピックの受信側ヘルパー (Python 版: common/timer_anchor.py)。
+// 残り時間はパケットごとには届かず、開始・停止・飛びの時だけアンカー
+// {value: 値 [秒], t: その値の GC 時刻 [秒], rate: 1 秒あたりの変化量, running} が届くので、ページ側で外挿する。
+
+export const extrapolate = (anchor, gcTime) => anchor.value + anchor.rate * (gcTime - anchor.t);
+
+export class TimerAnchors {
+  constructor(clock = () => Date.now() / 1000) {
+    this.clock = clock;
+    this.anchors = {};
+    this.offset = null; // ブラウザの時刻 - GC 時刻 [秒]
+  }
+
+  // メッセージは全てのタイマーを含む (含まれないタイマーは消えたもの)。
+  // GC 時刻はメッセージの now と受信時刻の差から推定する (誤差は配送の遅延程度)
+  update(message, receivedAt = this.clock()) {
+    this.anchors = message.timers || {};
+    if (message.now !== null && message.now !== undefined) {
+      this.offset = receivedAt - message.now;
+    }
+  }
+
+  // タイマー name の現在の値 [秒] (無ければ null)
+  value(name, now = this.clock()) {
+    const anchor = this.anchors[name];
+    if (!anchor || this.offset === null) return null;
+    return extrapolate(anchor, now - this.offset);
+  }
+}
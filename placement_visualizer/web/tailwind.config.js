@@ -0,0 +1,9 @@
+/** @type {import('tailwindcss').Config} */
+export default {
+  // ここに含まれるファイルで使われているクラスだけが CSS に出力される
+  content: ["./index.html", "./src/**/*.{js,jsx}"],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
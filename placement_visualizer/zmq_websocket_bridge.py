@@ -1,12 +1,38 @@
 #!/usr/bin/env python3
 # zmq_websocket_bridge.py
+# Serves the visualizer page and the WebSocket event stream on a single port.
 import asyncio
+import fnmatch
+import gzip
+import hashlib
 import json
+import mimetypes
+import os
+import struct
+import time
+import zlib
 import zmq
 import zmq.asyncio
-from websockets.server import serve
+from http import HTTPStatus
+from websockets import frames
+from websockets.asyncio.server import serve
+from websockets.datastructures import Headers
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.http11 import Request, Response
 import logging
-from typing import Set, Dict, Any
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import brotli  # Optional: adds precompressed "br" variants
+except ImportError:
+    brotli = None
+
+try:
+    from common import metrics  # Shared with the other processes (copied next to this file in Dockerfile.viz)
+except ImportError:
+    print("Error: common/metrics.py not found. Run from the repository root or add it to PYTHONPATH.")
+    exit(1)
 
 # Configure logging
 logging.basicConfig(
@@ -14,16 +40,449 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger("zmq_websocket_bridge")
+# websockets logs every plain HTTP response as a "rejected" handshake
+logging.getLogger("websockets").setLevel(logging.WARNING)
 
 # Connected WebSocket clients
 connected_clients: Set = set()
+# Per-client subscription (clients without one receive every event)
+client_filters: Dict = {}
 
 # ZeroMQ configuration
-ZMQ_SUBSCRIBER_URI = "tcp://localhost:5555"  # Connect to the orchestrator
-ZMQ_TOPICS = [b"event"]  # Subscribe to 'event' topic
+ZMQ_SUBSCRIBER_URI = os.environ.get("ZMQ_SUBSCRIBER_URI", "tcp://localhost:5555")  # Connect to the orchestrator
+# Events, live ball placement state (target, result) and timer anchors (stage time, placement countdown, ...)
+ZMQ_TOPICS = [b"event", b"placement", b"timers"]
+# Live ball / robot positions, and derived metrics during ball placement, from the orchestrator's
+# vision listener (empty to disable)
+ZMQ_VISION_URI = os.environ.get("ZMQ_VISION_URI", "tcp://localhost:5558")
+VISION_TOPICS = [b"vision", b"placement_metrics"]
+# Topics forwarded without parsing (compact JSON from the orchestrator)
+RAW_TOPICS = frozenset(VISION_TOPICS + [b"timers"])
+# Timer anchors only change on start/stop/jump, so the latest one is replayed to clients when they subscribe
+latest_timers: Optional[bytes] = None
+
+# HTTP + WebSocket configuration
+HTTP_HOST = "0.0.0.0"  # Listen on all interfaces
+HTTP_PORT = int(os.environ.get("HTTP_PORT", 8080))
+# Prometheus text-format metrics (GET http://host:METRICS_PORT/metrics, 0 to disable)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9154))
+# Output of the offline build (placement_visualizer/web: npm run build)
+SERVE_DIRECTORY = os.environ.get("SERVE_DIRECTORY",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "web", "dist"))
+
+# Opt-in binary subprotocol (Sec-WebSocket-Protocol). Clients that do not offer it get text JSON
+# {"topic": ..., "data": ...} as before. On the 'event' topic, binary clients only receive placement
+# events, one fixed-size little-endian record per event (see web/src/placementCodec.js); other topics
+# are sent to them as JSON text:
+#   type code (u8), team (u8), x [mm] (f32), y [mm] (f32), timestamp [s] (f64)
+BINARY_SUBPROTOCOL = "ssl-placement.v1"
+PLACEMENT_RECORD = struct.Struct("<BBffd")
+PLACEMENT_TYPE_CODES = {"EVENT_PLACEMENT_SUCCEEDED": 1, "COMMAND_BALL_PLACEMENT": 2}
+TEAM_CODES = {"YELLOW": 1, "BLUE": 2}  # 0: unknown
+
+# Subscription messages sent by clients, e.g.
+#   {"op": "subscribe", "filters": [{"event_types": ["EVENT_PLACEMENT_*", "COMMAND_BALL_PLACEMENT_*"]},
+#                                   {"event_types": ["*"], "min_priority": 8}]}
+# An event is sent if any filter matches its event_type (fnmatch patterns) with priority >= min_priority.
+# "topics": ["event", "placement", "timers", "vision", "placement_metrics"] limits the topics as well (default: all topics).
+# {"op": "subscribe", "filters": null} goes back to receiving everything.
+MAX_FILTERS = 32
+MAX_PATTERNS = 256
+
+# Frame coalescing: messages arriving within this window (one display frame by default) are sent to each
+# client as a single frame, a JSON array of {"topic", "data"} objects when there is more than one
+# (0 sends every message on its own as before). Binary clients get their placement records of the window
+# concatenated in one binary frame.
+COALESCE_WINDOW_MS = float(os.environ.get("COALESCE_WINDOW_MS", 16))
+# Flush early when this many messages are pending (the listener waits for the flush, as it waits for each
+# send without coalescing, so a stalled client cannot grow the queue without bound)
+COALESCE_MAX_MESSAGES = 256
+# permessage-deflate: "shared" keeps one compression context per group of clients with the same
+# subscription and compresses each coalesced frame once for the group, "deflate" keeps a context per
+# connection (websockets' default), "off" disables compression
+WS_COMPRESSION = os.environ.get("WS_COMPRESSION", "shared")
+
+# Metrics: counters are per-thread cells summed on scrape, client counts are read on scrape
+METRIC_MESSAGES = metrics.REGISTRY.counter(
+    "ssl_bridge_zmq_messages_total", "Messages received from ZeroMQ", ("topic",))
+METRIC_FRAMES = metrics.REGISTRY.counter(
+    "ssl_bridge_frames_sent_total", "WebSocket frames sent to clients", ("topic",))
+METRIC_SEND_ERRORS = metrics.REGISTRY.counter(
+    "ssl_bridge_send_errors_total", "WebSocket sends that failed (client closed mid-send)")
+METRIC_ERRORS = metrics.REGISTRY.counter("ssl_bridge_errors_total", "Decode and ZeroMQ errors", ("kind",))
+METRIC_BROADCAST = metrics.REGISTRY.histogram(
+    "ssl_bridge_broadcast_seconds", "Time to fan out one message to the connected clients", ("topic",))
+METRIC_COALESCED = metrics.REGISTRY.histogram(
+    "ssl_bridge_coalesced_messages", "Messages sent together in one flush of the coalescing window",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+METRIC_HTTP = metrics.REGISTRY.counter("ssl_bridge_http_requests_total", "Plain HTTP responses", ("status",))
+metrics.REGISTRY.gauge("ssl_bridge_clients", "Connected WebSocket clients").set_function(
+    lambda: len(connected_clients))
+metrics.REGISTRY.gauge("ssl_bridge_filtered_clients", "Clients with a subscription filter").set_function(
+    lambda: len(client_filters))
+
+# Static files served from memory (anything else returns 404)
+STATIC_EXTENSIONS = {".html", ".js", ".css", ".json", ".svg", ".png", ".ico", ".map", ".woff2", ".txt"}
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Files under this prefix have a content hash in their name and never change
+IMMUTABLE_PREFIX = "/assets/"
+
+
+class StaticAsset:
+    """A static file held in memory with precomputed compressed variants"""
+    __slots__ = ("content_type", "cache_control", "variants")
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        # encoding -> (etag, body); each encoding gets its own ETag
+        self.variants: Dict[str, tuple] = {"identity": (f'"{digest}"', body)}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = (f'"{digest}-gzip"', compressed)
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = (f'"{digest}-br"', compressed)
+
+
+class StaticAssets:
+    """Loads the static files of a directory into memory once at startup"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets: Dict[str, StaticAsset] = {}
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if os.path.splitext(name)[1] not in STATIC_EXTENSIONS:
+                    continue
+                path = os.path.join(root, name)
+                url_path = "/" + os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type == "application/javascript":
+                    content_type += "; charset=utf-8"
+                cache_control = ("public, max-age=31536000, immutable" if url_path.startswith(IMMUTABLE_PREFIX)
+                                 else "no-cache")
+                self.assets[url_path] = StaticAsset(body, content_type, cache_control)
+        logger.info(f"Loaded {len(self.assets)} static files from {directory}"
+                    f" (brotli {'enabled' if brotli else 'not installed'})")
+        if "/index.html" in self.assets:
+            self.assets["/"] = self.assets["/index.html"]
+        else:
+            logger.warning(f"No index.html in {directory}; build the page with 'npm run build' in placement_visualizer/web")
+
+    @staticmethod
+    def _accepted_encodings(accept_encoding: str) -> Set[str]:
+        accepted = set()
+        for item in accept_encoding.split(","):
+            token, _, params = item.strip().partition(";")
+            if params.replace(" ", "").lower() in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(token.strip().lower())
+        return accepted
+
+    def response(self, request: Request) -> Response:
+        asset = self.assets.get(request.path.split("?", 1)[0])
+        if asset is None:
+            return self._plain(HTTPStatus.NOT_FOUND)
+
+        accepted = self._accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        etag, body = asset.variants[encoding]
+
+        # Revalidation: any variant of the current file is still valid
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or any(variant_etag in tags for variant_etag, _ in asset.variants.values()):
+                headers = Headers({"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"})
+                return Response(HTTPStatus.NOT_MODIFIED.value, HTTPStatus.NOT_MODIFIED.phrase, headers)
+
+        headers = Headers({
+            "Content-Type": asset.content_type,
+            "Content-Length": str(len(body)),
+            "ETag": etag,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        })
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(HTTPStatus.OK.value, HTTPStatus.OK.phrase, headers, body)
+
+    @staticmethod
+    def _plain(status: HTTPStatus) -> Response:
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = Headers({"Content-Type": "text/plain; charset=utf-8", "Content-Length": str(len(body))})
+        return Response(status.value, status.phrase, headers, body)
+
+    def process_request(self, connection, request: Request) -> Optional[Response]:
+        """websockets hook: let WebSocket upgrades through, answer plain HTTP from memory"""
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return None
+        response = self.response(request)
+        METRIC_HTTP.labels(str(response.status_code)).inc()
+        return response
+
+
+class SubscriptionFilter:
+    """A client's subscription compiled into one regex per filter, with a per-event-type cache"""
+    __slots__ = ("topics", "key", "_filters", "_thresholds")
+
+    def __init__(self, filters: Optional[List[dict]], topics: Optional[List[str]] = None):
+        # Clients with equal subscriptions receive the same frames (and share a DeflateStream)
+        self.key = json.dumps([filters, topics], sort_keys=True)
+        if topics is not None and (not isinstance(topics, list) or not all(isinstance(t, str) for t in topics)):
+            raise ValueError("'topics' must be a list of strings")
+        self.topics = frozenset(topics) if topics is not None else None
+        if filters is None:
+            self._filters = None  # every event
+            return
+        if not isinstance(filters, list) or len(filters) > MAX_FILTERS:
+            raise ValueError(f"'filters' must be a list of at most {MAX_FILTERS} objects")
+        self._filters = []
+        pattern_count = 0
+        for item in filters:
+            if not isinstance(item, dict):
+                raise ValueError("each filter must be an object")
+            patterns = item.get("event_types", ["*"])
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+                raise ValueError("'event_types' must be a list of strings")
+            pattern_count += len(patterns)
+            if pattern_count > MAX_PATTERNS:
+                raise ValueError(f"at most {MAX_PATTERNS} event type patterns")
+            min_priority = item.get("min_priority", 0)
+            if isinstance(min_priority, bool) or not isinstance(min_priority, (int, float)):
+                raise ValueError("'min_priority' must be a number")
+            regex = re.compile("|".join(fnmatch.translate(p) for p in patterns)) if patterns else None
+            self._filters.append((regex, min_priority))
+        # event_type -> lowest min_priority among the matching filters (None: no filter matches)
+        self._thresholds: Dict[str, Optional[float]] = {}
+
+    def matches(self, event_type: str, priority) -> bool:
+        if self._filters is None:
+            return True
+        try:
+            threshold = self._thresholds[event_type]
+        except KeyError:
+            thresholds = [min_priority for regex, min_priority in self._filters
+                          if regex is not None and regex.match(event_type)]
+            threshold = self._thresholds[event_type] = min(thresholds) if thresholds else None
+        return threshold is not None and (priority or 0) >= threshold
+
+
+def encode_placement(event: dict) -> Optional[bytes]:
+    """Pack a placement event into a binary record, or return None if it is not one"""
+    event_type = event.get("event_type") or ""
+    base = event_type.removesuffix("_YELLOW").removesuffix("_BLUE")
+    type_code = PLACEMENT_TYPE_CODES.get(base)
+    data = event.get("data")
+    if type_code is None or not isinstance(data, dict):
+        return None
+    location = data.get("location") or data.get("placement_pos")
+    if not location:
+        return None
+    try:
+        return PLACEMENT_RECORD.pack(type_code, TEAM_CODES.get(data.get("team"), 0),
+                                     location["x"], location["y"], event.get("timestamp") or 0.0)
+    except (KeyError, TypeError, struct.error) as e:
+        logger.warning(f"Cannot encode placement event {event_type}: {e}")
+        return None
+
+
+def select_subprotocol(connection, subprotocols):
+    """Use the binary subprotocol if the client offers it, otherwise plain JSON (no subprotocol)"""
+    return BINARY_SUBPROTOCOL if BINARY_SUBPROTOCOL in subprotocols else None
+
+
+class SharedPerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate where the Coalescer compresses, once per group of clients receiving the same frames.
 
-async def zmq_listener(context):
+    encode() only attaches the output prepared for the frame being sent. Everything else (subscription
+    replies, the timers replay, binary records) goes out uncompressed, which leaves the client's
+    decompression window untouched and so in step with the group's shared compressor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Optional[Tuple[bytes, bytes]] = None  # (frame, compressed payload)
+        self.stream: Optional["DeflateStream"] = None  # the shared context this client is in step with
+        self.generation = 0
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        prepared = self.prepared
+        if prepared is not None and prepared[0] is frame.data and frame.fin:
+            self.prepared = None
+            return frames.Frame(frame.opcode, prepared[1], frame.fin, True, frame.rsv2, frame.rsv3)
+        return frame
+
+
+class SharedDeflateFactory(ServerPerMessageDeflateFactory):
+    """Negotiates permessage-deflate like websockets' default (12-bit windows, memLevel 5) but hands the
+    compression to the Coalescer through SharedPerMessageDeflate"""
+
+    def __init__(self):
+        super().__init__(server_max_window_bits=12, client_max_window_bits=12, compress_settings={"memLevel": 5})
+
+    def process_request_params(self, params, accepted_extensions) -> Tuple[list, PerMessageDeflate]:
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, SharedPerMessageDeflate(
+            extension.remote_no_context_takeover, extension.local_no_context_takeover,
+            extension.remote_max_window_bits, extension.local_max_window_bits, extension.compress_settings)
+
+
+class DeflateStream:
+    """A compressor shared by the clients that receive the same sequence of frames.
+
+    A client can only decode the stream if it received every frame since the compressor was created, so
+    the stream starts over (a new generation) whenever a recipient is not in step with it: a client that
+    just connected, changed its subscription, or negotiated no server context takeover.
+    """
+    __slots__ = ("window_bits", "compress_settings", "no_context_takeover", "encoder", "generation")
+
+    def __init__(self, extension: SharedPerMessageDeflate):
+        self.window_bits = extension.local_max_window_bits
+        self.compress_settings = extension.compress_settings
+        self.no_context_takeover = extension.local_no_context_takeover
+        self.encoder = None
+        self.generation = 0
+
+    def compress(self, frame: bytes, recipients: List[SharedPerMessageDeflate]) -> bytes:
+        if (self.encoder is None or self.no_context_takeover
+                or any(r.stream is not self or r.generation != self.generation for r in recipients)):
+            self.encoder = zlib.compressobj(wbits=-self.window_bits, **self.compress_settings)
+            self.generation += 1
+            for recipient in recipients:
+                recipient.stream, recipient.generation = self, self.generation
+        # A sync flush ends with 00 00 ff ff, which permessage-deflate leaves out
+        return (self.encoder.compress(frame) + self.encoder.flush(zlib.Z_SYNC_FLUSH))[:-4]
+
+
+def shared_deflate(connection) -> Optional[SharedPerMessageDeflate]:
+    for extension in connection.protocol.extensions:
+        if isinstance(extension, SharedPerMessageDeflate):
+            return extension
+    return None
+
+
+def compression_options(mode: str) -> dict:
+    """serve() arguments for WS_COMPRESSION"""
+    if mode == "shared":
+        return {"compression": None, "extensions": [SharedDeflateFactory()]}
+    if mode == "deflate":
+        return {"compression": "deflate"}
+    if mode != "off":
+        logger.warning(f"Unknown WS_COMPRESSION {mode!r}; compression disabled")
+    return {"compression": None}
+
+
+class Coalescer:
+    """Collects outgoing messages for COALESCE_WINDOW_MS and sends each client one frame per window.
+
+    Each pending message is (topic, event_type, priority, JSON bytes, binary placement record or None).
+    Clients with the same selection of pending messages share the same frame object. With WS_COMPRESSION
+    "shared", the JSON frames of clients with the same subscription and deflate parameters are compressed
+    once per window by their DeflateStream.
+    """
+
+    def __init__(self, window_ms: float):
+        self.window_sec = window_ms / 1000.0
+        self.pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()  # one fan-out at a time, in order
+        self.streams: Dict[tuple, DeflateStream] = {}
+
+    async def add(self, topic_name: str, message: bytes, event_type: Optional[str] = None,
+                  priority=None, binary: Optional[bytes] = None):
+        self.pending.append((topic_name, event_type, priority, message, binary))
+        if self.window_sec <= 0 or len(self.pending) >= COALESCE_MAX_MESSAGES:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_sec, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)  # keep a reference until it is done
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            pending, self.pending = self.pending, []
+            if not pending:
+                return
+            started = time.perf_counter()
+            shared_frames: Dict[tuple, bytes] = {}  # selection -> frame
+            stream_recipients: Dict[tuple, tuple] = {}  # stream key -> (frame, [extension])
+            live_streams = set()
+            sends = []
+            for client in connected_clients:
+                client_filter = client_filters.get(client)
+                binary_client = client.subprotocol == BINARY_SUBPROTOCOL
+                text_selection, binary_selection = [], []
+                for index, (topic_name, event_type, priority, _message, binary) in enumerate(pending):
+                    if client_filter is not None:
+                        if client_filter.topics is not None and topic_name not in client_filter.topics:
+                            continue
+                        if event_type is not None and not client_filter.matches(event_type, priority):
+                            continue
+                    if not binary_client or topic_name != "event":
+                        text_selection.append(index)
+                    elif binary is not None:
+                        binary_selection.append(index)
+                deflate = shared_deflate(client)
+                if deflate is not None:
+                    # Same subscription and deflate parameters: same frames, one compressor
+                    stream_key = (client_filter.key if client_filter is not None else None, binary_client,
+                                  deflate.local_max_window_bits, deflate.local_no_context_takeover)
+                    live_streams.add(stream_key)
+                if text_selection:
+                    key = (False, *text_selection)
+                    frame = shared_frames.get(key)
+                    if frame is None:
+                        frame = shared_frames[key] = (
+                            pending[text_selection[0]][3] if len(text_selection) == 1
+                            else b"[" + b",".join(pending[index][3] for index in text_selection) + b"]")
+                    if deflate is not None:
+                        stream_recipients.setdefault(stream_key, (frame, []))[1].append(deflate)
+                    sends.append(client.send(frame, text=True))
+                if binary_selection:
+                    key = (True, *binary_selection)
+                    frame = shared_frames.get(key)
+                    if frame is None:
+                        frame = shared_frames[key] = b"".join(pending[index][4] for index in binary_selection)
+                    sends.append(client.send(frame))
+            for stream_key, (frame, recipients) in stream_recipients.items():
+                stream = self.streams.get(stream_key)
+                if stream is None:
+                    stream = self.streams[stream_key] = DeflateStream(recipients[0])
+                prepared = (frame, stream.compress(frame, recipients))
+                for recipient in recipients:
+                    recipient.prepared = prepared
+            for stream_key in self.streams.keys() - live_streams:
+                del self.streams[stream_key]
+            results = await asyncio.gather(
+                *sends,
+                return_exceptions=True  # A client closing mid-send must not stop the listener
+            )
+            topics = {message[0] for message in pending}
+            record_broadcast(topics.pop() if len(topics) == 1 else "batch", results, started)
+            METRIC_COALESCED.observe(len(pending))
+            logger.debug(f"Sent {len(pending)} messages in {len(sends)} frames")
+
+
+async def zmq_listener(context, coalescer: Coalescer):
     """Listen for ZeroMQ messages and broadcast to WebSocket clients"""
+    global latest_timers
     socket = context.socket(zmq.SUB)
     
     # Subscribe to topics
@@ -32,6 +491,12 @@ async def zmq_listener(context):
     
     logger.info(f"Connecting to ZeroMQ publisher at {ZMQ_SUBSCRIBER_URI}")
     socket.connect(ZMQ_SUBSCRIBER_URI)
+    if ZMQ_VISION_URI:
+        # Positions arrive already thinned to the display rate (~20 Hz) on their own publisher
+        for topic in VISION_TOPICS:
+            socket.setsockopt(zmq.SUBSCRIBE, topic)
+        logger.info(f"Connecting to vision publisher at {ZMQ_VISION_URI}")
+        socket.connect(ZMQ_VISION_URI)
     
     logger.info("ZeroMQ listener started")
     
@@ -40,7 +505,16 @@ async def zmq_listener(context):
             try:
                 # Receive multipart message [topic, payload]
                 topic, payload = await socket.recv_multipart()
-                
+                METRIC_MESSAGES.labels(topic.decode('utf-8', 'replace')).inc()
+
+                if topic in RAW_TOPICS:
+                    # Already compact JSON from the orchestrator: wrap it without a parse/serialize round trip
+                    if topic == b"timers":
+                        latest_timers = payload
+                    if connected_clients:
+                        await coalescer.add(topic.decode('utf-8'), b'{"topic":"' + topic + b'","data":' + payload + b'}')
+                    continue
+
                 # Decode the JSON payload
                 try:
                     json_str = payload.decode('utf-8')
@@ -52,61 +526,99 @@ async def zmq_listener(context):
                         "data": data
                     }
                     
-                    # Broadcast to all connected WebSocket clients
+                    # Queue for the connected WebSocket clients (sent at the end of the coalescing window)
                     if connected_clients:
-                        websocket_message = json.dumps(message)
-                        await asyncio.gather(
-                            *[client.send(websocket_message) for client in connected_clients]
-                        )
-                        logger.debug(f"Broadcasted message to {len(connected_clients)} clients")
+                        is_event = topic == b"event" and isinstance(data, dict)
+                        await coalescer.add(
+                            message["topic"], json.dumps(message).encode('utf-8'),
+                            event_type=data.get("event_type") if is_event else None,
+                            priority=data.get("priority") if is_event else None,
+                            binary=encode_placement(data) if is_event else None)
                     
                 except json.JSONDecodeError as e:
                     logger.error(f"JSON decode error: {e}")
+                    METRIC_ERRORS.labels("json").inc()
                 except UnicodeDecodeError as e:
                     logger.error(f"Unicode decode error: {e}")
+                    METRIC_ERRORS.labels("unicode").inc()
                     
             except zmq.ZMQError as e:
                 logger.error(f"ZMQ error: {e}")
+                METRIC_ERRORS.labels("zmq").inc()
                 await asyncio.sleep(1)  # Wait before retrying
                 
     finally:
         socket.close()
         logger.info("ZMQ listener stopped")
 
+def record_broadcast(topic_name: str, results: list, started: float):
+    """Count the frames sent (sends return None, failed ones their exception) and the fan-out time"""
+    sent = results.count(None)
+    METRIC_FRAMES.labels(topic_name).inc(sent)
+    if sent != len(results):
+        METRIC_SEND_ERRORS.inc(len(results) - sent)
+    METRIC_BROADCAST.labels(topic_name).observe(time.perf_counter() - started)
+
 async def websocket_handler(websocket):
     """Handle WebSocket client connections"""
     # Register new client
     connected_clients.add(websocket)
     client_ip = websocket.remote_address[0]
-    logger.info(f"New client connected: {client_ip} (Total clients: {len(connected_clients)})")
+    logger.info(f"New client connected: {client_ip} ({websocket.subprotocol or 'json'}) "
+                f"(Total clients: {len(connected_clients)})")
     
     try:
-        # Keep the connection alive until client disconnects
+        # Client messages: subscription updates
         async for message in websocket:
-            # We could process client messages here if needed
-            # For now, we're just using one-way communication from ZMQ to clients
-            pass
+            await handle_client_message(websocket, message)
     except Exception as e:
         logger.error(f"Error handling WebSocket client {client_ip}: {e}")
     finally:
         # Unregister client
         connected_clients.remove(websocket)
+        client_filters.pop(websocket, None)
         logger.info(f"Client disconnected: {client_ip} (Total clients: {len(connected_clients)})")
 
-async def main():
+async def handle_client_message(websocket, message):
+    """Apply a subscription message and acknowledge it on the 'subscription' topic"""
+    try:
+        request = json.loads(message)
+        if not isinstance(request, dict) or request.get("op") != "subscribe":
+            raise ValueError("expected {\"op\": \"subscribe\", \"filters\": [...]}")
+        filters, topics = request.get("filters"), request.get("topics")
+        if filters is None and topics is None:
+            client_filters.pop(websocket, None)
+        else:
+            client_filters[websocket] = SubscriptionFilter(filters, topics)
+        reply = {"topic": "subscription", "data": {"filters": filters, "topics": topics}}
+        logger.info(f"Client {websocket.remote_address[0]} subscribed: topics {json.dumps(topics)}, "
+                    f"filters {json.dumps(filters)}")
+    except (ValueError, re.error) as e:  # json.JSONDecodeError is a ValueError
+        reply = {"topic": "subscription", "data": {"error": str(e)}}
+    await websocket.send(json.dumps(reply))
+    client_filter = client_filters.get(websocket)
+    if latest_timers is not None and (client_filter is None or client_filter.topics is None
+                                      or "timers" in client_filter.topics):
+        await websocket.send('{"topic":"timers","data":' + latest_timers.decode('utf-8') + '}')
+
+async def main(host: str = HTTP_HOST, port: int = HTTP_PORT, directory: str = SERVE_DIRECTORY):
     """Main entry point"""
+    # Load static files before accepting connections
+    assets = StaticAssets(directory)
+    metrics_server = metrics.start_http_server(METRICS_PORT)
+
     # Create ZeroMQ context
     context = zmq.asyncio.Context()
     
     # Start ZeroMQ listener
-    zmq_task = asyncio.create_task(zmq_listener(context))
+    logger.info(f"Coalescing window {COALESCE_WINDOW_MS:g} ms, compression {WS_COMPRESSION}")
+    zmq_task = asyncio.create_task(zmq_listener(context, Coalescer(COALESCE_WINDOW_MS)))
     
-    # Start WebSocket server
-    ws_host = "0.0.0.0"  # Listen on all interfaces
-    ws_port = 8765
-    logger.info(f"Starting WebSocket server on {ws_host}:{ws_port}")
+    # Start HTTP + WebSocket server (page at http://host:port/, stream at ws://host:port/ws)
+    logger.info(f"Starting HTTP/WebSocket server on {host}:{port}")
     
-    async with serve(websocket_handler, ws_host, ws_port):
+    async with serve(websocket_handler, host, port, process_request=assets.process_request,
+                     select_subprotocol=select_subprotocol, **compression_options(WS_COMPRESSION)):
         try:
             # Run forever
             await asyncio.Future()
@@ -121,6 +633,8 @@ async def main():
                 pass
             # Clean up ZeroMQ context
             context.term()
+            if metrics_server:
+                metrics_server.stop()
             logger.info("Server shutdown complete")
 
 if __name__ == "__main__":